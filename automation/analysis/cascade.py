@@ -0,0 +1,124 @@
+"""
+Two-Tier Model Cascade for TechShift
+
+A cheap, fast model screens every item. Only items that are hard to call are
+escalated to a stronger model:
+- scoring: score within +-band points of the generation threshold
+- relevance / duplication: model confidence below the confidence floor
+- any task: output that failed validation (missing id, bad JSON, out-of-range
+  score, a duplicate whose duplicate_of is null or not among the existing
+  titles); the strong tier's duplicate verdict is kept even then
+
+Configuration (.env):
+    CASCADE_ENABLED=1
+    CASCADE_CHEAP_MODEL=gemini-2.0-flash
+    CASCADE_STRONG_MODEL=gemini-3-flash-preview
+    CASCADE_SCORE_BAND=10
+    CASCADE_CONFIDENCE_FLOOR=0.7
+
+Escalation rates and per-tier latency are collected in cascade_stats
+(printed by the pipeline, exported on the daemon's /metrics).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CascadePolicy:
+    """Models and escalation thresholds, read from the environment."""
+
+    def __init__(self, cheap_model=None, strong_model=None, score_band=None, confidence_floor=None, enabled=None):
+        self.cheap_model = cheap_model or os.getenv("CASCADE_CHEAP_MODEL", "gemini-2.0-flash")
+        self.strong_model = strong_model or os.getenv("CASCADE_STRONG_MODEL", "gemini-3-flash-preview")
+        self.score_band = score_band if score_band is not None else int(os.getenv("CASCADE_SCORE_BAND", "10"))
+        self.confidence_floor = confidence_floor if confidence_floor is not None else float(os.getenv("CASCADE_CONFIDENCE_FLOOR", "0.7"))
+        if enabled is None:
+            enabled = os.getenv("CASCADE_ENABLED", "1").lower() not in ("0", "false", "no")
+        self.enabled = enabled
+
+    def needs_score_escalation(self, score, threshold):
+        return threshold is not None and abs(score - threshold) <= self.score_band
+
+    def needs_confidence_escalation(self, confidence):
+        try:
+            return float(confidence) < self.confidence_floor
+        except (TypeError, ValueError):
+            return True
+
+
+class CascadeStats:
+    """Thread-safe per-task counters: items per tier, escalations by reason, call latency per tier."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}
+
+    def _task(self, task):
+        return self._tasks.setdefault(task, {
+            "items": 0,
+            "escalated": 0,
+            "reasons": {},
+            "tiers": {},
+        })
+
+    def record_items(self, task, count):
+        with self._lock:
+            self._task(task)["items"] += count
+
+    def record_escalation(self, task, reason, count=1):
+        if not count:
+            return
+        with self._lock:
+            t = self._task(task)
+            t["escalated"] += count
+            t["reasons"][reason] = t["reasons"].get(reason, 0) + count
+
+    def record_call(self, task, tier, seconds, items=1):
+        with self._lock:
+            tier_stats = self._task(task)["tiers"].setdefault(tier, {"calls": 0, "items": 0, "seconds": 0.0})
+            tier_stats["calls"] += 1
+            tier_stats["items"] += items
+            tier_stats["seconds"] += seconds
+
+    @contextmanager
+    def timed(self, task, tier, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_call(task, tier, time.perf_counter() - start, items)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                task: {**t, "reasons": dict(t["reasons"]), "tiers": {k: dict(v) for k, v in t["tiers"].items()}}
+                for task, t in self._tasks.items()
+            }
+
+    def summary(self):
+        lines = []
+        for task, t in self.snapshot().items():
+            rate = t["escalated"] / t["items"] if t["items"] else 0.0
+            reasons = ", ".join(f"{k}={v}" for k, v in t["reasons"].items()) or "-"
+            lines.append(f"[{task}] items={t['items']} escalated={t['escalated']} ({rate:.0%}; {reasons})")
+            for tier, s in t["tiers"].items():
+                avg = s["seconds"] / s["calls"] if s["calls"] else 0.0
+                lines.append(f"    {tier:<6} calls={s['calls']} items={s['items']} avg_latency={avg:.2f}s")
+        return "\n".join(lines) if lines else "(no cascade calls)"
+
+    def render_metrics(self, prefix="techshift_cascade"):
+        """Prometheus text lines (used by daemon.py /metrics)."""
+        lines = []
+        for task, t in self.snapshot().items():
+            lines.append(f'{prefix}_items_total{{task="{task}"}} {t["items"]}')
+            for reason, count in t["reasons"].items():
+                lines.append(f'{prefix}_escalations_total{{task="{task}",reason="{reason}"}} {count}')
+            for tier, s in t["tiers"].items():
+                lines.append(f'{prefix}_calls_total{{task="{task}",tier="{tier}"}} {s["calls"]}')
+                lines.append(f'{prefix}_latency_seconds_total{{task="{task}",tier="{tier}"}} {s["seconds"]:.3f}')
+        return lines
+
+
+cascade_stats = CascadeStats()
@@ -0,0 +1,194 @@
+"""
+Cross-Source Story Clustering for TechShift
+
+The same announcement is often carried by several feeds at once
+(techcrunch_ai, venturebeat_ai, mit_tech_review, vendor blogs).
+This module groups near-duplicate feed items locally so that scoring,
+summarization and dedup LLM calls scale with unique stories.
+
+- Shingles: normalized title + summary head. Latin text -> words,
+  Japanese/CJK text -> character bigrams (no morphological analyzer needed)
+- MinHash signatures + LSH banding to find candidate pairs
+- Candidates are confirmed by estimated Jaccard similarity against each
+  story's leader
+
+Usage:
+    from automation.analysis.clustering import cluster_articles
+    stories = cluster_articles(collected_articles)
+    # each story: the representative article + "corroborating_sources"
+"""
+
+import hashlib
+import random
+import re
+import unicodedata
+from datetime import datetime
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: candidate pairs from ~0.5 Jaccard upwards
+SIMILARITY_THRESHOLD = 0.5
+SUMMARY_CHARS = 300
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # fixed seed: signatures are comparable across runs
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_LATIN_RE = re.compile(r"[a-z0-9][a-z0-9\-\.]*[a-z0-9]|[a-z0-9]")
+_CJK_RUN_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿]+")
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "at", "from",
+    "is", "are", "was", "were", "be", "its", "it", "this", "that", "as", "new", "how", "why",
+    "what", "has", "have", "will", "can", "now", "says", "said", "after", "into", "about",
+}
+
+
+def normalize(text):
+    """NFKC + lowercase + strip HTML tags (RSS summaries are often HTML)."""
+    text = unicodedata.normalize("NFKC", _TAG_RE.sub(" ", text or ""))
+    return text.lower()
+
+
+def shingles(text):
+    """
+    Token set for similarity: Latin words (minus stopwords) and CJK character bigrams.
+    Japanese has no spaces, so bigrams stand in for word segmentation.
+    """
+    text = normalize(text)
+    tokens = {w for w in _LATIN_RE.findall(text) if w not in STOPWORDS and len(w) > 1}
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.add(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def article_text(article):
+    return f"{article.get('title', '')} {normalize(article.get('summary', ''))[:SUMMARY_CHARS]}"
+
+
+def minhash(tokens):
+    """MinHash signature (NUM_PERM ints) of a token set."""
+    if not tokens:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big") for t in tokens]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+class StoryIndex:
+    """
+    LSH index of story signatures.
+
+    Used in batch by cluster_articles() and incrementally by the daemon,
+    which keeps one index across polls so a story already queued from one
+    source is not scored again when another source picks it up.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, bands=BANDS, max_items=5000):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.max_items = max_items
+        self._buckets = {}
+        self._signatures = {}
+
+    def _band_keys(self, signature):
+        r = self.rows
+        return [(i, signature[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def query(self, signature):
+        """Keys of indexed stories similar to signature (best match first)."""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        scored = [(similarity(signature, self._signatures[key]), key) for key in candidates]
+        return [key for sim, key in sorted(scored, reverse=True) if sim >= self.threshold]
+
+    def add(self, key, signature):
+        if len(self._signatures) >= self.max_items:
+            self._evict_oldest()
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def _evict_oldest(self):
+        key = next(iter(self._signatures))
+        signature = self._signatures.pop(key)
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def match(self, article, key=None):
+        """
+        Return the key of an already-indexed story the article belongs to, or
+        None after indexing it as a new story under key (default: its URL).
+        """
+        signature = minhash(shingles(article_text(article)))
+        if signature is None:
+            return None
+        key = article.get('url') if key is None else key
+        matches = self.query(signature)
+        if matches:
+            return matches[0]
+        self.add(key, signature)
+        return None
+
+
+def _published_key(article):
+    published_at = getattr(article, 'published_at', None)
+    if published_at is not None:
+        return published_at.timestamp()
+    try:
+        return datetime.fromisoformat(str(article.get('published'))).timestamp()
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def _pick_representative(members):
+    """Earliest published copy (closest to the original announcement); ties -> longest summary."""
+    return min(members, key=lambda a: (_published_key(a), -len(a.get('summary') or '')))
+
+
+def cluster_articles(articles, threshold=SIMILARITY_THRESHOLD):
+    """
+    Group near-duplicate articles into stories.
+
+    Each article joins the story whose first article (leader) it matches best;
+    matching only against leaders avoids chaining loosely related items into
+    one cluster.
+
+    Returns:
+        list of representative articles (in order of each story's first article),
+        updated in place with "cluster_size" and "corroborating_sources"
+        ([{"source", "url", "title"}, ...] for the other members).
+    """
+    index = StoryIndex(threshold=threshold, max_items=max(len(articles), 1))
+    groups = {}
+    for i, article in enumerate(articles):
+        leader = index.match(article, key=i)
+        groups.setdefault(i if leader is None else leader, []).append(article)
+
+    stories = []
+    for members in groups.values():
+        rep = _pick_representative(members)
+        rep['cluster_size'] = len(members)
+        rep['corroborating_sources'] = [
+            {"source": m.get('source'), "url": m.get('url'), "title": m.get('title')}
+            for m in members if m.get('url') != rep.get('url')
+        ]
+        stories.append(rep)
+    return stories
+
+
+def cluster_members(story):
+    """URLs of every copy in a story (representative first)."""
+    return [story.get('url')] + [c['url'] for c in story.get('corroborating_sources', [])]
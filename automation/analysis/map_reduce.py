@@ -0,0 +1,171 @@
+"""
+Hierarchical Map-Reduce for Large Analysis Windows
+
+analyze_tech_impact() used to paste every article into one prompt, so a long
+window (--hours 72, all regions) grew the prompt - and the latency - without
+bound. In map-reduce mode the work is split into stages with fixed budgets:
+
+1. map: articles are grouped by sector (sub_region, else region) and cut into
+   shards of at most shard_tokens; each shard is condensed into a short digest
+   by the fast model, all shards in parallel
+2. reduce: while the digests together exceed synthesis_tokens they are grouped
+   and condensed again (at most max_levels rounds, then trimmed)
+3. synthesis: one call over the sector digests produces the usual analysis JSON
+   (output capped at synthesis_output_tokens; the direct single call is not
+   capped, since the thinking model's reasoning counts against the limit)
+
+A map or reduce call that fails keeps its input lines, trimmed to
+digest_tokens, so a sector is never dropped.
+
+Budgets (.env, estimated tokens - see token_budget.estimate_tokens):
+    ANALYSIS_MAP_REDUCE=auto              auto | on | off
+    ANALYSIS_DIRECT_MAX_TOKENS=12000      auto: smaller inputs use the single call
+    ANALYSIS_SHARD_TOKENS=6000            input per map call
+    ANALYSIS_DIGEST_TOKENS=1024           output per map call
+    ANALYSIS_SYNTHESIS_TOKENS=16000       digest input to the synthesis call
+    ANALYSIS_SYNTHESIS_OUTPUT_TOKENS=16384  output of the map-reduce synthesis call
+    ANALYSIS_MAP_WORKERS=6
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from automation.token_budget import estimate_tokens, trim_to_tokens
+except ImportError:
+    from token_budget import estimate_tokens, trim_to_tokens
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class AnalysisBudget:
+    """Per-stage token budgets for analyze_tech_impact, read from the environment."""
+
+    def __init__(self, mode=None, direct_max_tokens=None, shard_tokens=None, digest_tokens=None,
+                 synthesis_tokens=None, synthesis_output_tokens=None, workers=None, max_levels=2):
+        self.mode = (mode or os.getenv("ANALYSIS_MAP_REDUCE", "auto")).lower()
+        self.direct_max_tokens = direct_max_tokens or _env_int("ANALYSIS_DIRECT_MAX_TOKENS", 12000)
+        self.shard_tokens = shard_tokens or _env_int("ANALYSIS_SHARD_TOKENS", 6000)
+        self.digest_tokens = digest_tokens or _env_int("ANALYSIS_DIGEST_TOKENS", 1024)
+        self.synthesis_tokens = synthesis_tokens or _env_int("ANALYSIS_SYNTHESIS_TOKENS", 16000)
+        self.synthesis_output_tokens = synthesis_output_tokens or _env_int("ANALYSIS_SYNTHESIS_OUTPUT_TOKENS", 16384)
+        self.workers = workers or _env_int("ANALYSIS_MAP_WORKERS", 6)
+        self.max_levels = max_levels
+
+    def use_map_reduce(self, input_tokens):
+        if self.mode in ("on", "1", "true", "yes"):
+            return True
+        if self.mode in ("off", "0", "false", "no"):
+            return False
+        return input_tokens > self.direct_max_tokens
+
+    @property
+    def items_per_digest(self):
+        # Roughly 60 tokens per condensed item (title + one-line significance)
+        return max(3, self.digest_tokens // 60)
+
+
+def article_line(art, summary_chars=200):
+    """One prompt line per article (same format as the single-call prompt)."""
+    return f"- [{art.get('published_at')}] {art.get('title')}: {(art.get('summary') or '')[:summary_chars]}"
+
+
+def sector_of(art):
+    return art.get('sub_region') or art.get('region') or "General"
+
+
+def trim_to_budget(text, tokens):
+    """Cut text to `tokens` estimated tokens, on a line / sentence boundary where possible."""
+    return trim_to_tokens(text, tokens)
+
+
+def split_lines(lines, budget):
+    """Split lines into consecutive chunks of at most `budget` estimated tokens."""
+    chunks, current, used = [], [], 0
+    for line in lines:
+        line = trim_to_budget(line, budget)
+        cost = estimate_tokens(line) + 1
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def shard_articles(articles, shard_tokens):
+    """
+    Group articles by sector (in first-seen order) and split each group into shards.
+
+    Returns:
+        List of (sector, [lines]) tuples.
+    """
+    groups = {}
+    for art in articles:
+        groups.setdefault(sector_of(art), []).append(article_line(art))
+    return [(sector, chunk) for sector, lines in groups.items() for chunk in split_lines(lines, shard_tokens)]
+
+
+def map_parallel(func, items, workers):
+    """Run func over items in a thread pool; results keep input order, failures become None."""
+    def safe(item):
+        try:
+            return func(item)
+        except Exception as e:
+            print(f"Map-reduce shard failed: {e}")
+            return None
+
+    if len(items) <= 1:
+        return [safe(item) for item in items]
+    # Workers inherit the caller's context (e.g. its llm_stage for the LLM budget)
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as executor:
+        return list(executor.map(lambda ctx, item: ctx.run(safe, item), contexts, items))
+
+
+def fallback_digest(lines, budget):
+    """Input lines of a failed condense call, trimmed to the digest budget."""
+    return trim_to_budget("\n".join(lines), budget.digest_tokens).split("\n")
+
+
+def digest_text(digests):
+    """Render (sector, lines) digests as the synthesis input."""
+    return "\n\n".join(f"#### {sector}\n" + "\n".join(lines) for sector, lines in digests if lines)
+
+
+def condense_digests(digests, budget, condense):
+    """
+    Reduce stage: condense sector digests until their rendered size fits `budget`.
+
+    Args:
+        digests: [(sector, [lines])] from the map stage
+        condense: callable(sector, lines) -> [lines] (one model call)
+    """
+    for level in range(budget.max_levels):
+        if estimate_tokens(digest_text(digests)) <= budget.synthesis_tokens:
+            return digests
+        # Merge each sector's digests, then re-shard so one call stays within the shard budget
+        merged = {}
+        for sector, lines in digests:
+            merged.setdefault(sector, []).extend(lines)
+        shards = [(sector, chunk) for sector, lines in merged.items()
+                  for chunk in split_lines(lines, budget.shard_tokens)]
+        print(f"  Reduce level {level + 1}: {len(shards)} group(s)")
+        results = map_parallel(lambda shard: condense(*shard), shards, budget.workers)
+        digests = [(sector, lines if lines else fallback_digest(chunk, budget))
+                   for (sector, chunk), lines in zip(shards, results)]
+
+    # Still too large after max_levels: keep each sector's leading (most significant) items
+    text = digest_text(digests)
+    if estimate_tokens(text) > budget.synthesis_tokens:
+        share = budget.synthesis_tokens // max(1, len(digests))
+        digests = [(sector, trim_to_budget("\n".join(lines), share).split("\n")) for sector, lines in digests]
+    return digests
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Local Learned Pre-filter for TechShift
+
+Triage collected articles before LLM scoring. A hashed n-gram logistic
+regression (NumPy) trained on past ArticleScorer results and ts_articles
+is_relevant labels drops clear rejects (consumer gadgets, funding noise),
+so only plausible candidates reach score_articles_batch.
+
+- Training data:
+  - data/score_history.jsonl (appended by pipeline.py / daemon.py after every scoring run)
+  - ts_articles is_relevant labels (GET techshift/v1/articles/labels), lower weight
+- Cutoff: the highest probability that still keeps --recall of held-out positives;
+  with fewer than MIN_VALIDATION_POSITIVES held-out positives the retrained model
+  is not saved (the current one, if any, stays in use)
+- Rejects are not added to the known-URL index, so they are checked again by
+  the next (possibly retrained) model
+- A small random share of rejects is still scored (explore_rate) so future
+  training data is not limited to what the filter let through
+
+Usage:
+    python -m automation train-prefilter --recall 0.95 --positive-score 85
+    python -m automation train-prefilter --report-only
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from automation.lazy import lazy_import
+from automation.analysis.clustering import shingles, normalize
+from automation.analysis.scorer import scoring_failed
+
+np = lazy_import("numpy")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+HISTORY_PATH = os.path.join(DATA_DIR, "score_history.jsonl")
+MODEL_PATH = os.path.join(DATA_DIR, "prefilter_model.npz")
+
+NUM_FEATURES = 1 << 18
+MIN_POSITIVES = 20
+MIN_VALIDATION_POSITIVES = 10
+
+
+# --- Features ----------------------------------------------------------------
+
+def _feature_index(token):
+    # Stable hash (Python's hash() is salted per process)
+    return zlib.crc32(token.encode("utf-8")) % NUM_FEATURES
+
+
+def featurize(article):
+    """Hashed feature indices: title tokens, summary tokens, title word bigrams, source."""
+    title = article.get('title', '')
+    summary = normalize(article.get('summary', ''))[:600]
+    features = {"bias"}
+    title_tokens = shingles(title)
+    features.update("t:" + t for t in title_tokens)
+    features.update("s:" + t for t in shingles(summary))
+    words = normalize(title).split()
+    features.update(f"tb:{a} {b}" for a, b in zip(words, words[1:]))
+    features.add("src:" + str(article.get('source', '')))
+    return sorted({_feature_index(f) for f in features})
+
+
+def _to_sparse(rows):
+    """List of index lists -> (indices, row_offsets) with L2-normalized binary values."""
+    lengths = [len(r) for r in rows]
+    indices = np.fromiter((i for r in rows for i in r), dtype=np.int64, count=sum(lengths))
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.repeat(1.0 / np.sqrt(np.maximum(lengths, 1)), lengths)
+    return indices, offsets, values
+
+
+# --- Model -------------------------------------------------------------------
+
+class Prefilter:
+    """Logistic regression over hashed n-grams with a recall-tuned cutoff."""
+
+    def __init__(self, weights=None, cutoff=0.5, meta=None):
+        self.weights = weights
+        self.cutoff = cutoff
+        self.meta = meta or {}
+
+    # Inference
+
+    def predict_proba(self, articles):
+        if not articles:
+            return np.zeros(0)
+        indices, offsets, values = _to_sparse([featurize(a) for a in articles])
+        return self._proba(indices, offsets, values)
+
+    def _proba(self, indices, offsets, values):
+        contrib = self.weights[indices] * values
+        sums = np.add.reduceat(contrib, offsets[:-1]) if len(contrib) else np.zeros(len(offsets) - 1)
+        return 1.0 / (1.0 + np.exp(-sums))
+
+    def split(self, articles, explore_rate=0.05, rng=None):
+        """
+        Split articles into (candidates, rejected).
+        Each article gets "prefilter_prob". A share of rejects (explore_rate)
+        is passed through anyway and marked "prefilter_explore".
+        """
+        rng = rng or random.Random()
+        probs = self.predict_proba(articles)
+        candidates, rejected = [], []
+        for article, prob in zip(articles, probs):
+            article['prefilter_prob'] = round(float(prob), 4)
+            if prob >= self.cutoff:
+                candidates.append(article)
+            elif rng.random() < explore_rate:
+                article['prefilter_explore'] = True
+                candidates.append(article)
+            else:
+                rejected.append(article)
+        return candidates, rejected
+
+    # Training
+
+    def fit(self, articles, labels, sample_weights=None, epochs=300, learning_rate=0.5, l2=1e-5):
+        """Full-batch Adagrad on the weighted log loss."""
+        indices, offsets, values = _to_sparse([featurize(a) for a in articles])
+        y = np.asarray(labels, dtype=float)
+        sw = np.ones(len(y)) if sample_weights is None else np.asarray(sample_weights, dtype=float)
+        # Balance classes: positives are rare
+        pos_weight = max(1.0, (y == 0).sum() / max(1, (y == 1).sum()))
+        sw = sw * np.where(y == 1, pos_weight, 1.0)
+        sw = sw / sw.sum()
+
+        self.weights = np.zeros(NUM_FEATURES)
+        grad_sq = np.full(NUM_FEATURES, 1e-8)
+        row_of_entry = np.repeat(np.arange(len(y)), np.diff(offsets))
+        for _ in range(epochs):
+            err = (self._proba(indices, offsets, values) - y) * sw
+            grad = np.bincount(indices, weights=err[row_of_entry] * values, minlength=NUM_FEATURES)
+            grad += l2 * self.weights
+            grad_sq += grad * grad
+            self.weights -= learning_rate * grad / np.sqrt(grad_sq)
+        return self
+
+    def tune_cutoff(self, articles, labels, recall_target=0.95, min_positives=MIN_VALIDATION_POSITIVES):
+        """
+        Highest cutoff that keeps recall_target of the positives.
+        Returns None (cutoff unchanged) when there are fewer than min_positives.
+        """
+        probs = self.predict_proba(articles)
+        pos = np.sort(probs[np.asarray(labels, dtype=int) == 1])
+        if len(pos) < max(1, min_positives):
+            return None
+        # Keep the top recall_target share of positives
+        k = int(np.floor((1.0 - recall_target) * len(pos)))
+        self.cutoff = float(pos[k])
+        return self.cutoff
+
+    def evaluate(self, articles, labels):
+        probs = self.predict_proba(articles)
+        y = np.asarray(labels)
+        passed = probs >= self.cutoff
+        tp = int((passed & (y == 1)).sum())
+        return {
+            "n": int(len(y)),
+            "positives": int((y == 1).sum()),
+            "passed": int(passed.sum()),
+            "precision": tp / max(1, int(passed.sum())),
+            "recall": tp / max(1, int((y == 1).sum())),
+            "reject_rate": 1.0 - float(passed.mean()) if len(y) else 0.0,
+        }
+
+    # Persistence
+
+    def save(self, path=None):
+        path = path or MODEL_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, weights=self.weights.astype(np.float32), cutoff=self.cutoff,
+                            meta=json.dumps(self.meta, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path=None):
+        """Load the trained model, or None if it hasn't been trained yet."""
+        path = path or MODEL_PATH
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        return cls(weights=data["weights"].astype(float), cutoff=float(data["cutoff"]),
+                   meta=json.loads(str(data["meta"])))
+
+
+# --- History -----------------------------------------------------------------
+
+def record_scores(scored_articles, path=None):
+    """Append scorer outputs to the training history (one JSON object per line)."""
+    path = path or HISTORY_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    now = int(time.time())
+    with open(path, "a", encoding="utf-8") as f:
+        for a in scored_articles:
+            if scoring_failed(a):
+                continue  # scoring failures are not labels
+            f.write(json.dumps({
+                "ts": now,
+                "title": a.get('title', ''),
+                "summary": normalize(a.get('summary', ''))[:600],
+                "source": a.get('source', ''),
+                "score": a.get('score', 0),
+                "reasoning": a.get('reasoning', ''),
+                "prefilter_prob": a.get('prefilter_prob'),
+                "prefilter_explore": a.get('prefilter_explore', False),
+            }, ensure_ascii=False) + "\n")
+
+
+def load_history(path=None):
+    path = path or HISTORY_PATH
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    # Latest score per title wins
+    latest = {}
+    for row in rows:
+        latest[row.get('title')] = row
+    return sorted(latest.values(), key=lambda r: r.get('ts', 0))
+
+
+def load_db_labels(db_client, page_size=2000):
+    """ts_articles is_relevant labels (oldest first). Cluster copies are skipped."""
+    rows, since_id = [], 0
+    while True:
+        res = db_client.get_article_labels(since_id=since_id, limit=page_size)
+        if not res:
+            break
+        for row in res.get("articles", []):
+            if str(row.get('relevance_reason') or '').startswith("Same story as:"):
+                continue
+            rows.append(row)
+        if not res.get("has_more") or int(res.get("last_id") or 0) <= since_id:
+            break
+        since_id = int(res["last_id"])
+    return rows
+
+
+def build_dataset(history, db_rows, positive_score, db_weight):
+    articles, labels, weights = [], [], []
+    for row in history:
+        articles.append(row)
+        labels.append(1 if row.get('score', 0) >= positive_score else 0)
+        weights.append(1.0)
+    for row in db_rows:
+        articles.append(row)
+        labels.append(1 if int(row.get('is_relevant') or 0) else 0)
+        weights.append(db_weight)
+    return articles, labels, weights
+
+
+def _chrono_split(n, val_share=0.15, test_share=0.15):
+    # Small histories give small (possibly empty) held-out splits; callers check their positives
+    n_test = int(n * test_share)
+    n_val = int(n * val_share)
+    n_train = n - n_val - n_test
+    return slice(0, n_train), slice(n_train, n_train + n_val), slice(n_train + n_val, n)
+
+
+def _format_report(name, r):
+    return (f"{name:<6} n={r['n']:<6} positives={r['positives']:<5} passed={r['passed']:<5} "
+            f"precision={r['precision']:.3f} recall={r['recall']:.3f} reject_rate={r['reject_rate']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train / evaluate the local pre-filter for LLM scoring")
+    parser.add_argument("--recall", type=float, default=0.95, help="Recall target for positives (cutoff tuning)")
+    parser.add_argument("--positive-score", type=int, default=85, help="Scorer score counted as a positive")
+    parser.add_argument("--db-weight", type=float, default=0.5, help="Sample weight of ts_articles is_relevant labels")
+    parser.add_argument("--no-db", action="store_true", help="Train on local score history only")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--report-only", action="store_true", help="Evaluate the saved model on the latest history")
+    args = parser.parse_args()
+
+    history = load_history()
+    db_rows = []
+    if not args.no_db:
+        from automation.db.client import DBClient
+        db_rows = load_db_labels(DBClient())
+    print(f"Loaded {len(history)} scored articles and {len(db_rows)} ts_articles labels.")
+
+    articles, labels, weights = build_dataset(history, db_rows, args.positive_score, args.db_weight)
+    if args.report_only:
+        model = Prefilter.load()
+        if not model:
+            print("No trained model found. Run without --report-only first.")
+            sys.exit(1)
+        _, _, test = _chrono_split(len(history))
+        report = model.evaluate(history[test], labels[:len(history)][test])
+        print(_format_report("test", report))
+        if report["positives"] < MIN_VALIDATION_POSITIVES:
+            print(f"Warning: only {report['positives']} positives in the test split; recall is not meaningful.")
+        return
+
+    if sum(labels) < MIN_POSITIVES:
+        print(f"Not enough positives to train ({sum(labels)} < {MIN_POSITIVES}). Keep collecting score history.")
+        sys.exit(1)
+
+    # Chronological split of the score history (the held-out part is the newest);
+    # DB labels only ever go to training.
+    train, val, test = _chrono_split(len(history))
+    n_hist = len(history)
+    train_x = history[train] + articles[n_hist:]
+    train_y = labels[:n_hist][train] + labels[n_hist:]
+    train_w = weights[:n_hist][train] + weights[n_hist:]
+
+    model = Prefilter()
+    model.fit(train_x, train_y, sample_weights=train_w, epochs=args.epochs)
+    cutoff = model.tune_cutoff(history[val], labels[:n_hist][val], recall_target=args.recall)
+    if cutoff is None:
+        # A cutoff tuned on (almost) no positives would be 0.0 and let everything through
+        val_positives = sum(labels[:n_hist][val])
+        print(f"Not enough held-out positives to tune the cutoff ({val_positives} < {MIN_VALIDATION_POSITIVES} "
+              f"in {len(history[val])} validation rows). Keep collecting score history; the model was not saved.")
+        sys.exit(1)
+
+    print(f"Cutoff for recall >= {args.recall:.0%} on validation: {cutoff:.4f}")
+    print(_format_report("train", model.evaluate(train_x, train_y)))
+    print(_format_report("val", model.evaluate(history[val], labels[:n_hist][val])))
+    test_report = model.evaluate(history[test], labels[:n_hist][test])
+    print(_format_report("test", test_report))
+
+    model.meta = {
+        "trained_at": int(time.time()),
+        "positive_score": args.positive_score,
+        "recall_target": args.recall,
+        "train_size": len(train_x),
+        "test": test_report,
+    }
+    model.save()
+    print(f"Saved model to {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
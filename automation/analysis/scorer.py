@@ -13,7 +13,8 @@ import textwrap
 # Add parent directory to path to import GeminiClient
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from automation.gemini_client import GeminiClient
+from automation.client_registry import get_gemini_client
+from automation.analysis.cascade import CascadePolicy, cascade_stats
 
 # Editorial Persona and Scoring Criteria for TechShift
 SHARED_CRITERIA = """あなたは「TechShift Lead Analyst」です。
@@ -39,53 +40,63 @@ SHARED_CRITERIA = """あなたは「TechShift Lead Analyst」です。
     - **【重要】** 技術普及の障壁となる「法規制の強化」「地政学的リスク」など、ロードマップを遅延・阻害するネガティブインパクトも、その影響が大きければ高スコアを与える。
 """
 
-SCORING_PROMPT = SHARED_CRITERIA + """
-【記事情報】
-タイトル: {title}
-要約: {summary}
-ソース: {source}
-
+# Fixed instruction blocks are sent as a (cached) system prefix; only the
+# article text below is new input per call (see context_cache.py)
+SCORING_INSTRUCTIONS = SHARED_CRITERIA + """
 【出力形式】
 以下のJSON形式で出力してください:
-{{
+{
   "score": <0-100の整数>,
   "reasoning": "<評価理由をアナリスト視点で2-3文で簡潔に。技術的確変、横断シナジー、社会実装・コストを中心に>",
   "relevance": "<high/medium/low>"
-}}
+}
 """
 
-BATCH_SCORING_PROMPT = SHARED_CRITERIA + """
-【記事リスト】
-{articles_text}
+BATCH_SCORING_INSTRUCTIONS = SHARED_CRITERIA + """
+記事リストの各記事を評価してください。
 
 【出力形式】
 以下のJSON配列形式のみで出力してください。Markdownコードブロックは不要です。
 [
-  {{
+  {
     "id": <記事ID(整数)>,
     "score": <0-100の整数>,
     "reasoning": "<評価理由>",
     "relevance": "<high/medium/low>"
-  }}
+  }
 ]
 """
 
+SCORING_PROMPT = """【記事情報】
+タイトル: {title}
+要約: {summary}
+ソース: {source}
+"""
+
+BATCH_SCORING_PROMPT = """【記事リスト】
+{articles_text}
+"""
+
 class ArticleScorer:
-    def __init__(self, client=None):
+    def __init__(self, client=None, policy=None):
         if client:
              self.client = client
         else:
             try:
-                self.client = GeminiClient()
+                self.client = get_gemini_client()
             except Exception as e:
                 print(f"Error initializing GeminiClient: {e}", file=sys.stderr)
                 self.client = None
+        # Cheap model screens, strong model re-scores items near the threshold (cascade.py)
+        self.policy = policy or CascadePolicy()
 
-    def score_article(self, article, model_name="gemini-3-flash-preview"):
-        """Score a single article."""
+    def score_article(self, article, model_name=None):
+        """Score a single article (fallback path: uses the strong model)."""
         if not self.client:
-            return {**article, "score": 0, "reasoning": "Client Init Failed"}
+            article.update(score=0, reasoning="Client Init Failed")
+            return article
 
+        model_name = model_name or self.policy.strong_model
         prompt = SCORING_PROMPT.format(
             title=article.get("title", ""),
             summary=article.get("summary", ""),
@@ -93,7 +104,8 @@ class ArticleScorer:
         )
 
         try:
-            response = self.client.generate_content(prompt, model=model_name)
+            with cascade_stats.timed("scoring", "single"):
+                response = self.client.generate_with_prefix(SCORING_INSTRUCTIONS, prompt, model=model_name)
             if not response: raise Exception("No response")
             
             text = self._clean_json(response.text)
@@ -107,13 +119,50 @@ class ArticleScorer:
             
         except Exception as e:
             print(f"Scoring error {article.get('title')}: {e}")
-            return {**article, "score": 0, "reasoning": f"Error: {e}"}
+            article.update(score=0, reasoning=f"Error: {e}")
+            return article
 
-    def score_articles_batch(self, articles, model_name="gemini-3-flash-preview", start_id=0):
-        """Score a batch of articles."""
+    def score_articles_batch(self, articles, model_name=None, start_id=0, threshold=None):
+        """
+        Score a batch of articles.
+
+        With the cascade enabled (default), the cheap model scores the batch and
+        items within the policy's band around `threshold`, or with invalid output,
+        are re-scored by the strong model. Passing model_name scores with that
+        single model instead.
+        """
         if not articles or not self.client:
             return []
 
+        if model_name or not self.policy.enabled:
+            results = self._score_batch_once(articles, model_name or self.policy.strong_model, tier="single")
+            return [self._merge(articles[i], res) for i, res in sorted((results or {}).items())]
+
+        policy = self.policy
+        cascade_stats.record_items("scoring", len(articles))
+        results = self._score_batch_once(articles, policy.cheap_model, tier="cheap") or {}
+
+        escalate = []
+        for i in range(len(articles)):
+            res = results.get(i)
+            if res is None:
+                escalate.append((i, "invalid"))
+            elif policy.needs_score_escalation(res['score'], threshold):
+                escalate.append((i, "band"))
+        for reason in ("invalid", "band"):
+            cascade_stats.record_escalation("scoring", reason, sum(1 for _, r in escalate if r == reason))
+
+        if escalate:
+            subset = [articles[i] for i, _ in escalate]
+            strong = self._score_batch_once(subset, policy.strong_model, tier="strong") or {}
+            for j, (i, _) in enumerate(escalate):
+                if j in strong:
+                    results[i] = {**strong[j], "scored_by": "strong"}
+
+        return [self._merge(articles[i], res) for i, res in sorted(results.items())]
+
+    def _score_batch_once(self, articles, model_name, tier):
+        """One batch call. Returns {index: validated result} or None if the call failed."""
         articles_text = ""
         for i, article in enumerate(articles):
             articles_text += f"\nID: {i}\nタイトル: {article.get('title')}\n要約: {article.get('summary', 'なし')}\nソース: {article.get('source')}\n---\n"
@@ -121,27 +170,37 @@ class ArticleScorer:
         prompt = BATCH_SCORING_PROMPT.format(articles_text=articles_text)
 
         try:
-            response = self.client.generate_content(prompt, model=model_name)
+            with cascade_stats.timed("scoring", tier, items=len(articles)):
+                response = self.client.generate_with_prefix(BATCH_SCORING_INSTRUCTIONS, prompt, model=model_name)
             if not response: raise Exception("No response")
             
             text = self._clean_json(response.text)
             results = json.loads(text)
             
-            scored_articles = []
+            validated = {}
             for res in results:
                 idx = res.get('id')
-                if isinstance(idx, int) and 0 <= idx < len(articles):
-                    original = articles[idx].copy()
-                    original['score'] = res.get('score', 0)
-                    original['reasoning'] = res.get('reasoning', '')
-                    original['relevance'] = res.get('relevance', 'low')
-                    scored_articles.append(original)
-            
-            return scored_articles
+                score = res.get('score')
+                if not (isinstance(idx, int) and 0 <= idx < len(articles)):
+                    continue
+                if not isinstance(score, (int, float)) or not 0 <= score <= 100:
+                    continue
+                validated[idx] = {
+                    "score": int(score),
+                    "reasoning": res.get('reasoning', ''),
+                    "relevance": res.get('relevance', 'low'),
+                    "scored_by": tier,
+                }
+            return validated
 
         except Exception as e:
-            print(f"Batch scoring error: {e}")
-            return []
+            print(f"Batch scoring error ({model_name}): {e}")
+            return None
+
+    def _merge(self, article, result):
+        # In place: the article moves on to the next stage with its score attached
+        article.update(result)
+        return article
 
     def _clean_json(self, text):
         text = text.strip()
@@ -152,14 +211,36 @@ class ArticleScorer:
         if text.endswith(","): text = text[:-1]
         return text
 
+def scoring_failed(article):
+    """True if the article's score is an error placeholder (score_article failure), not a real score."""
+    reasoning = str(article.get('reasoning', ''))
+    return reasoning.startswith("Error") or reasoning == "Client Init Failed"
+
+# Scorer reused by the module-level wrappers when no client is given
+_shared_scorer = None
+
+def _get_scorer(client=None):
+    global _shared_scorer
+    if client is None:
+        if _shared_scorer is None or _shared_scorer.client is None:
+            _shared_scorer = ArticleScorer()
+        return _shared_scorer
+    # Kept in the client's article_scorer slot (GeminiClient) so it lives and dies
+    # with it (a WeakKeyDictionary would never drop it: the scorer holds the client).
+    # Clients without the slot get a fresh scorer (it holds no state of its own).
+    scorer = getattr(client, "article_scorer", None)
+    if scorer is None:
+        scorer = ArticleScorer(client=client)
+        if hasattr(client, "article_scorer"):
+            client.article_scorer = scorer
+    return scorer
+
 # Legacy function aliases for compatibility if needed
 def score_article(article, client=None):
-    scorer = ArticleScorer(client=client)
-    return scorer.score_article(article)
+    return _get_scorer(client).score_article(article)
 
-def score_articles_batch(articles, client=None, start_id=0):
-    scorer = ArticleScorer(client=client)
-    return scorer.score_articles_batch(articles, start_id=start_id)
+def score_articles_batch(articles, client=None, start_id=0, threshold=None):
+    return _get_scorer(client).score_articles_batch(articles, start_id=start_id, threshold=threshold)
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Multi-Credential Backend Pool for TechShift
+
+GeminiClient used to bind to exactly one backend (Vertex AI in one location,
+or one API key), so every stage shared a single quota bucket. BackendPool
+spreads requests over several credentials:
+
+- backends: the primary one (GOOGLE_CLOUD_PROJECT/LOCATION or GEMINI_API_KEY)
+  plus extra API keys (GEMINI_API_KEYS) and Vertex locations (VERTEX_LOCATIONS,
+  "location" for GOOGLE_CLOUD_PROJECT or "project:location")
+- routing: each generate_content / generate_content_stream call goes to the
+  least-loaded backend (in-flight requests, then requests in the last minute)
+  that has headroom (optional per-backend BACKEND_POOL_RPM)
+- 429: the backend is parked for the server's retry delay and the request
+  moves on to the next backend at once; the error only reaches the caller
+  (and the LLM budget) when every backend is cooling down
+- health: auth / permission errors take a backend out of rotation; after
+  BACKEND_RECHECK seconds it gets one trial request. health_check() probes
+  every backend explicitly (daemon start-up, `python -m automation backends`)
+
+Requests that reference a cached context, and everything other than
+generate_content(_stream) (caches, Imagen), stay on the primary backend:
+cached contents and Vertex-only models are not shared between credentials.
+
+PooledClient is a drop-in for a google-genai Client. FakeGenaiClient is an
+in-memory backend (per-minute quota, latency, auth failure) for tests and
+`backends --simulate`.
+
+Configuration (.env):
+    GEMINI_API_KEYS=key2,key3
+    VERTEX_LOCATIONS=us-central1,europe-west4
+    BACKEND_POOL_RPM=0
+    BACKEND_RECHECK=300
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+try:
+    from automation.client_registry import get_genai_client
+    from automation.llm_budget import retry_delay
+except ImportError:
+    from client_registry import get_genai_client
+    from llm_budget import retry_delay
+
+DEFAULT_COOLDOWN = 30
+RECHECK_SECONDS = 300
+RATE_WINDOW = 60
+HEALTH_CHECK_MODEL = "gemini-2.0-flash"
+
+_NO_CHUNK = object()
+
+
+def is_quota_error(error):
+    text = str(error).lower()
+    return "429" in text or "quota" in text or "exhausted" in text
+
+
+def is_auth_error(error):
+    text = str(error).lower()
+    return any(s in text for s in ("401", "403", "permission", "unauthenticated", "api key not valid", "api_key_invalid"))
+
+
+class BackendUnavailable(Exception):
+    """
+    The backend a request is pinned to (cached context) is cooling down or
+    unhealthy. Transient: the cached context is still valid.
+    """
+
+
+class Backend:
+    """One credential: a genai client plus its load, cooldown and health state."""
+
+    def __init__(self, name, client, rpm=None):
+        self.name = name
+        self.client = client
+        self.rpm = rpm
+        self.inflight = 0
+        self.window = deque()
+        self.cooldown_until = 0.0
+        self.healthy = True
+        self.recheck_at = 0.0
+        self.last_error = None
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+
+    def __repr__(self):
+        return f"Backend({self.name!r})"
+
+    def _prune(self, now):
+        while self.window and self.window[0] <= now - RATE_WINDOW:
+            self.window.popleft()
+
+    def available(self, now):
+        if now < self.cooldown_until:
+            return False
+        if not self.healthy and now < self.recheck_at:
+            return False
+        self._prune(now)
+        return not self.rpm or len(self.window) < self.rpm
+
+
+class BackendPool:
+    """Thread-safe least-loaded routing over several backends."""
+
+    def __init__(self, backends, recheck=RECHECK_SECONDS, default_cooldown=DEFAULT_COOLDOWN, clock=time.time):
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = list(backends)
+        self.primary = self.backends[0]
+        self.recheck = recheck
+        self.default_cooldown = default_cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.backends)
+
+    @classmethod
+    def from_env(cls, primary_name, primary_client):
+        """Primary backend plus the extra credentials configured in the environment."""
+        rpm = int(os.getenv("BACKEND_POOL_RPM", "0")) or None
+        backends = [Backend(primary_name, primary_client, rpm=rpm)]
+        seen = {primary_name}
+
+        for key in filter(None, (k.strip() for k in os.getenv("GEMINI_API_KEYS", "").split(","))):
+            name = f"api_key:...{key[-4:]}"
+            if name in seen:
+                continue
+            try:
+                backends.append(Backend(name, get_genai_client("api_key", api_key=key), rpm=rpm))
+                seen.add(name)
+            except Exception as e:
+                print(f"Warning: Skipping backend {name}: {e}")
+
+        default_project = os.getenv("GOOGLE_CLOUD_PROJECT")
+        for entry in filter(None, (e.strip() for e in os.getenv("VERTEX_LOCATIONS", "").split(","))):
+            project, _, location = entry.rpartition(":")
+            project = project or default_project
+            name = f"vertex:{project}/{location}"
+            if name in seen:
+                continue
+            try:
+                backends.append(Backend(name, get_genai_client("vertex", project=project, location=location), rpm=rpm))
+                seen.add(name)
+            except Exception as e:
+                print(f"Warning: Skipping backend {name}: {e}")
+
+        return cls(backends, recheck=int(os.getenv("BACKEND_RECHECK", str(RECHECK_SECONDS))))
+
+    # --- Routing -------------------------------------------------------------
+
+    def acquire(self, exclude=(), pinned=None):
+        """Reserve the least-loaded available backend (None if none is available)."""
+        now = self.clock()
+        with self._lock:
+            candidates = [pinned] if pinned is not None else self.backends
+            candidates = [b for b in candidates if b.name not in exclude and b.available(now)]
+            if not candidates:
+                return None
+            backend = min(candidates, key=lambda b: (b.inflight, len(b.window)))
+            if not backend.healthy:
+                # One trial request per recheck period
+                backend.recheck_at = now + self.recheck
+            backend.inflight += 1
+            backend.window.append(now)
+            backend.stats["requests"] += 1
+            return backend
+
+    def release(self, backend, error=None):
+        now = self.clock()
+        with self._lock:
+            backend.inflight -= 1
+            if error is None:
+                if not backend.healthy:
+                    print(f"[backends] {backend.name}: healthy again")
+                backend.healthy = True
+                return
+            backend.last_error = str(error)[:200]
+            if is_quota_error(error):
+                backend.stats["rate_limited"] += 1
+                delay = retry_delay(str(error)) or self.default_cooldown
+                backend.cooldown_until = max(backend.cooldown_until, now + delay)
+            elif is_auth_error(error):
+                backend.stats["errors"] += 1
+                if backend.healthy:
+                    print(f"[backends] {backend.name}: taken out of rotation ({backend.last_error[:80]})")
+                backend.healthy = False
+                backend.recheck_at = now + self.recheck
+            else:
+                backend.stats["errors"] += 1
+
+    def next_available_in(self):
+        """Seconds until the first cooling-down backend is usable again."""
+        now = self.clock()
+        with self._lock:
+            waits = [max(0.0, b.cooldown_until - now) for b in self.backends if b.healthy or now >= b.recheck_at]
+        return min(waits) if waits else self.recheck
+
+    def call(self, method, *args, **kwargs):
+        """
+        Run client.models.<method> on a backend. A 429 or auth failure moves
+        the request to the next backend; when none is left the last error is
+        raised (a 429 carries the shortest remaining cooldown as its retry delay).
+        """
+        pinned = self.primary if _uses_cached_content(kwargs.get("config")) else None
+        tried = set()
+        last_error = None
+        while True:
+            backend = self.acquire(exclude=tried, pinned=pinned)
+            if backend is None:
+                if pinned is not None:
+                    raise BackendUnavailable(f"{pinned.name} is not available for cached requests") from last_error
+                if last_error is not None and not is_quota_error(last_error):
+                    raise last_error
+                wait = self.next_available_in()
+                raise RuntimeError(f"429 all {len(self.backends)} backends are rate limited (retry in {wait:.1f}s)") \
+                    from last_error
+            tried.add(backend.name)
+
+            if method.endswith("_stream"):
+                # Streams are lazy: a 429 or auth error only shows up with the first
+                # chunk, so pull it here where the request can still move on
+                try:
+                    stream = iter(getattr(backend.client.models, method)(*args, **kwargs))
+                    first = next(stream, _NO_CHUNK)
+                except Exception as e:
+                    self.release(backend, e)
+                    if not (is_quota_error(e) or is_auth_error(e)):
+                        raise
+                    last_error = e
+                    continue
+                return self._tracked(backend, stream, first)
+
+            try:
+                result = getattr(backend.client.models, method)(*args, **kwargs)
+            except Exception as e:
+                self.release(backend, e)
+                if not (is_quota_error(e) or is_auth_error(e)):
+                    raise
+                last_error = e
+                continue
+            self.release(backend)
+            return result
+
+    def _tracked(self, backend, stream, first=_NO_CHUNK):
+        """Keep a streamed request counted as in flight until it is consumed or closed."""
+        error = None
+        try:
+            if first is not _NO_CHUNK:
+                yield first
+            yield from stream
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(backend, error)
+
+    # --- Health --------------------------------------------------------------
+
+    def health_check(self, model=HEALTH_CHECK_MODEL):
+        """Probe every backend with a metadata request. Returns {name: error or None}."""
+        results = {}
+        for backend in self.backends:
+            with self._lock:
+                backend.inflight += 1
+            try:
+                backend.client.models.get(model=model)
+            except Exception as e:
+                self.release(backend, e)
+                results[backend.name] = str(e)[:200]
+                continue
+            self.release(backend)
+            results[backend.name] = None
+        return results
+
+    # --- Reporting -----------------------------------------------------------
+
+    def snapshot(self):
+        now = self.clock()
+        with self._lock:
+            return [{
+                "backend": b.name,
+                "healthy": b.healthy,
+                "cooling_down": max(0.0, b.cooldown_until - now),
+                "inflight": b.inflight,
+                "last_minute": len(b.window),
+                **b.stats,
+                "last_error": b.last_error,
+            } for b in self.backends]
+
+    def summary(self):
+        lines = [f"{'backend':<40} {'state':<9} {'requests':>8} {'429':>5} {'errors':>6} {'inflight':>8}"]
+        for s in self.snapshot():
+            state = "cooldown" if s["cooling_down"] else ("ok" if s["healthy"] else "down")
+            lines.append(f"{s['backend']:<40} {state:<9} {s['requests']:>8} {s['rate_limited']:>5} "
+                         f"{s['errors']:>6} {s['inflight']:>8}")
+        return "\n".join(lines)
+
+    def render_metrics(self, prefix="techshift_backend"):
+        """Prometheus text lines (used by daemon.py /metrics)."""
+        lines = []
+        for s in self.snapshot():
+            label = f'backend="{s["backend"]}"'
+            lines.append(f"{prefix}_requests_total{{{label}}} {s['requests']}")
+            lines.append(f"{prefix}_rate_limited_total{{{label}}} {s['rate_limited']}")
+            lines.append(f"{prefix}_errors_total{{{label}}} {s['errors']}")
+            lines.append(f"{prefix}_inflight{{{label}}} {s['inflight']}")
+            lines.append(f"{prefix}_healthy{{{label}}} {1 if s['healthy'] and not s['cooling_down'] else 0}")
+        return lines
+
+
+def _uses_cached_content(config):
+    if config is None:
+        return False
+    if isinstance(config, dict):
+        return bool(config.get("cached_content"))
+    return bool(getattr(config, "cached_content", None))
+
+
+class _PooledModels:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def generate_content(self, *args, **kwargs):
+        return self._pool.call("generate_content", *args, **kwargs)
+
+    def generate_content_stream(self, *args, **kwargs):
+        return self._pool.call("generate_content_stream", *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Anything else (Imagen, model metadata) stays on the primary backend
+        return getattr(self._pool.primary.client.models, name)
+
+
+class PooledClient:
+    """Drop-in for a google-genai Client that routes generation over a BackendPool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.models = _PooledModels(pool)
+
+    def __getattr__(self, name):
+        # caches, files, ...: per-credential resources live on the primary backend
+        return getattr(self.pool.primary.client, name)
+
+
+class FakeGenaiClient:
+    """
+    In-memory stand-in for a google-genai Client (tests, --simulate).
+
+    Args:
+        rpm: per-minute quota; requests beyond it raise a 429 with a retry delay
+        latency: seconds per request
+        broken: every request fails with a 403 (bad credential)
+    """
+
+    def __init__(self, name, rpm=None, latency=0.0, broken=False, clock=time.time, sleep=time.sleep):
+        self.name = name
+        self.rpm = rpm
+        self.latency = latency
+        self.broken = broken
+        self.clock = clock
+        self.sleep = sleep
+        self.calls = 0
+        self.models = self
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        if self.broken:
+            raise RuntimeError(f"403 PERMISSION_DENIED: API key not valid ({self.name})")
+        now = self.clock()
+        with self._lock:
+            while self._window and self._window[0] <= now - RATE_WINDOW:
+                self._window.popleft()
+            if self.rpm and len(self._window) >= self.rpm:
+                wait = self._window[0] + RATE_WINDOW - now
+                raise RuntimeError(f"429 RESOURCE_EXHAUSTED ({self.name}). Please retry in {wait:.1f}s")
+            self._window.append(now)
+            self.calls += 1
+
+    def _response(self, model, contents):
+        text = f"[{self.name}/{model}] {str(contents)[:40]}"
+        usage = SimpleNamespace(prompt_token_count=len(str(contents)) // 3, candidates_token_count=len(text) // 3)
+        return SimpleNamespace(text=text, usage_metadata=usage, backend=self.name)
+
+    def generate_content(self, model, contents, config=None):
+        self._admit()
+        if self.latency:
+            self.sleep(self.latency)
+        return self._response(model, contents)
+
+    def generate_content_stream(self, model, contents, config=None):
+        self._admit()
+        response = self._response(model, contents)
+        for i in range(0, len(response.text), 16):
+            if self.latency:
+                self.sleep(self.latency / 4)
+            yield SimpleNamespace(text=response.text[i:i + 16], usage_metadata=response.usage_metadata)
+
+    def get(self, model):
+        if self.broken:
+            raise RuntimeError(f"403 PERMISSION_DENIED: API key not valid ({self.name})")
+        return SimpleNamespace(name=model)
+
+
+def simulate(backends, rpm, requests, workers, latency):
+    """Run `requests` calls through a pool of fake backends and report throughput."""
+    fakes = [FakeGenaiClient(f"fake-{i}", rpm=rpm, latency=latency) for i in range(backends)]
+    pool = BackendPool([Backend(f.name, f) for f in fakes])
+    client = PooledClient(pool)
+    outcome = {"ok": 0, "rate_limited": 0}
+    lock = threading.Lock()
+
+    def one(i):
+        try:
+            client.models.generate_content(model=HEALTH_CHECK_MODEL, contents=f"request {i}")
+            key = "ok"
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            key = "rate_limited"
+        with lock:
+            outcome[key] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{backends} fake backend(s), {rpm} rpm each, {requests} requests in {elapsed:.2f}s: "
+          f"{outcome['ok']} served, {outcome['rate_limited']} rejected (all backends cooling down)")
+    print(pool.summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the configured Gemini backends or simulate a pool")
+    parser.add_argument("--model", default=HEALTH_CHECK_MODEL, help="Model used for the health check")
+    parser.add_argument("--simulate", action="store_true", help="Run fake backends instead of the configured ones")
+    parser.add_argument("--backends", type=int, default=3, help="Fake backends (--simulate)")
+    parser.add_argument("--rpm", type=int, default=20, help="Per-minute quota of each fake backend (--simulate)")
+    parser.add_argument("--requests", type=int, default=100, help="Requests to send (--simulate)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent callers (--simulate)")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds per fake request (--simulate)")
+    args = parser.parse_args()
+
+    if args.simulate:
+        simulate(args.backends, args.rpm, args.requests, args.workers, args.latency)
+        return
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from automation.client_registry import get_gemini_client
+
+    gemini = get_gemini_client()
+    pool = getattr(gemini.client, "pool", None) or BackendPool([Backend("primary", gemini.client)])
+    failed = False
+    for name, error in pool.health_check(args.model).items():
+        print(f"{name:<40} {'OK' if error is None else 'FAIL: ' + error}")
+        failed = failed or error is not None
+    print()
+    print(pool.summary())
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
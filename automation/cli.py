@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+TechShift Automation CLI
+
+Single entry point for the automation scripts:
+
+    python -m automation <command> [args...]
+
+Each subcommand only imports the module it needs, so `--help`,
+collection-only runs and batch tools don't load the Gemini SDK, bs4/lxml,
+markdown or tweepy unless the command actually uses them.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+# Allow `python automation/cli.py` as well as `python -m automation`
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# command -> (module, function, help)
+COMMANDS = {
+    "collect": ("automation.collectors.collector", "main", "Collect articles from RSS feeds"),
+    "read-url": ("automation.collectors.url_reader", "main", "Extract article content from a URL"),
+    "source-health": ("automation.collectors.visualize_url_reader", "main", "Feed / scrape health and circuit state per source"),
+    "pipeline": ("automation.pipeline", "main", "Run the topic-focus article pipeline"),
+    "daemon": ("automation.daemon", "main", "Run the pipeline continuously (poll -> score -> generate)"),
+    "worker": ("automation.worker", "main", "Consume queued scrape / score / generate / briefing tasks"),
+    "work-queue": ("automation.work_queue", "main", "Work queue stats, requeue of dead tasks, or serve it to other nodes"),
+    "generate": ("automation.generate_article", "main", "Generate and post a single article"),
+    "briefing": ("automation.daily_briefing", "main", "Run the daily briefing (collect / analyze)"),
+    "weekly": ("automation.generate_weekly_summary", "main", "Generate the weekly summary article"),
+    "summarize": ("automation.summarizer", "main", "Summarize an external article"),
+    "batch-summarize": ("automation.tools.batch_summarize", "main", "Backfill AI structured summaries"),
+    "batch-generate": ("automation.tools.batch_generate_2025", "main", "Generate SEO target articles in batch"),
+    "train-prefilter": ("automation.analysis.prefilter", "main", "Train / evaluate the local scoring pre-filter"),
+    "setup-taxonomy": ("automation.setup_taxonomy", "main", "Sync WordPress categories and tags"),
+    "bench-imports": ("automation.tools.bench_imports", "main", "Measure import time / startup of each command"),
+    "backends": ("automation.backend_pool", "main", "Health-check the Gemini backend pool (or --simulate one)"),
+    "bench-scrape": ("automation.tools.bench_scrape", "main", "Benchmark per-source HTML extraction on recorded pages"),
+    "token-budget": ("automation.token_budget", "main", "Token counts / budgeted trimming of prompt inputs (--calibrate)"),
+    "link-inject": ("automation.link_injector", "main", "Insert internal links into a Markdown article (entity matching, no LLM)"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="automation",
+        description="TechShift Automation CLI",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Commands:\n" + "\n".join(f"  {name:<16} {spec[2]}" for name, spec in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command", help="Command to run (see below)")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments passed to the command")
+    return parser
+
+
+def run_command(command, args):
+    """Import the command's module on demand and run its main() with args."""
+    module_name, func_name, _ = COMMANDS[command]
+    module = importlib.import_module(module_name)
+    sys.argv = [f"automation {command}"] + list(args)
+    return getattr(module, func_name)()
+
+
+def main(argv=None):
+    parser = build_parser()
+    ns = parser.parse_args(argv)
+    return run_command(ns.command, ns.args)
+
+
+if __name__ == "__main__":
+    main()
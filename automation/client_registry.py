@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Process-wide Client Registry for TechShift
+
+Lazily builds and shares API clients so that connections and auth are reused
+across the scorer, classifier, SEO optimizer, summarizer and orchestrators.
+
+- get_genai_client(backend, api_version): one google-genai Client per (backend, api_version)
+  (and per explicit credential, for the extra backends of backend_pool.py)
+- get_gemini_client(): one shared GeminiClient per process
+"""
+
+import os
+import threading
+
+_lock = threading.RLock()
+_genai_clients = {}
+_gemini_client = None
+
+
+def get_genai_client(backend, api_version=None, api_key=None, project=None, location=None):
+    """
+    Return the shared google-genai Client for (backend, api_version).
+
+    Args:
+        backend: "vertex" (GOOGLE_CLOUD_PROJECT/LOCATION) or "api_key" (GEMINI_API_KEY)
+        api_version: Optional API version override (e.g. "v1beta")
+        api_key / project / location: Explicit credentials instead of the environment
+
+    Raises:
+        ValueError: If the credentials for the backend are missing.
+        Exception: Any client construction error (not cached, so the next call retries).
+    """
+    key = (backend, api_version, api_key, project, location)
+    with _lock:
+        client = _genai_clients.get(key)
+        if client is None:
+            client = _build_genai_client(backend, api_version, api_key=api_key, project=project, location=location)
+            _genai_clients[key] = client
+        return client
+
+
+def _build_genai_client(backend, api_version=None, api_key=None, project=None, location=None):
+    from google import genai
+
+    http_options = {'api_version': api_version} if api_version else None
+
+    if backend == "vertex":
+        project_id = project or os.getenv("GOOGLE_CLOUD_PROJECT")
+        location = location or os.getenv("GOOGLE_CLOUD_LOCATION")
+        if not (project_id and location):
+            raise ValueError("Missing Vertex AI settings. Set GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION in .env")
+        return genai.Client(vertexai=True, project=project_id, location=location, http_options=http_options)
+
+    if backend == "api_key":
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("Missing GEMINI_API_KEY in .env")
+        return genai.Client(api_key=api_key, vertexai=False, http_options=http_options)
+
+    raise ValueError(f"Unknown genai backend: {backend}")
+
+
+def get_gemini_client():
+    """
+    Return the shared GeminiClient, building it on first use.
+
+    Raises:
+        ValueError: If no Gemini credentials are configured.
+    """
+    global _gemini_client
+    with _lock:
+        if _gemini_client is None:
+            try:
+                from automation.gemini_client import GeminiClient
+            except ImportError:
+                from gemini_client import GeminiClient
+            _gemini_client = GeminiClient()
+        return _gemini_client
+
+
+def reset_clients():
+    """Drop all cached clients (e.g. after credentials change)."""
+    global _gemini_client
+    with _lock:
+        _genai_clients.clear()
+        _gemini_client = None
@@ -1,12 +1,22 @@
 import argparse
-import feedparser
-import requests
 import json
 import os
+import sys
 from datetime import datetime, timedelta
-from dateutil import parser as date_parser
 import time
 
+# Add parent directory to path to import automation modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from automation.lazy import lazy_import
+from automation.models import Article
+from automation.collectors.health import get_source_health
+
+# Heavy dependencies are imported on first use (fast `--help` / CLI startup)
+feedparser = lazy_import("feedparser")
+requests = lazy_import("requests")
+date_parser = lazy_import("dateutil.parser")
+
 # TechShift RSS Sources
 # Focus: AI (Multi-Agent, LLM), Quantum (PQC), Green (Battery, Fusion)
 DEFAULT_SOURCES = {
@@ -55,9 +65,23 @@ REGION_MAPPING = {
     "General": ["mit_tech_review", "wired_science"]
 }
 
-def fetch_rss(url, source_name, days=None, hours=None):
-    """Fetches and parses an RSS feed."""
+def fetch_rss(url, source_name, days=None, hours=None, scheduler=None):
+    """
+    Fetches and parses an RSS feed.
+    If a PollScheduler is passed, the timestamps of every entry (or the failure)
+    are recorded so it can plan the source's next poll.
+    Sources whose circuit is open (collectors/health.py) are skipped, and the
+    scheduler is told not to poll them again before the circuit lets a trial through.
+    """
+    health = get_source_health()
+    if not health.allow(source_name, "feed"):
+        print(f"Skipping {source_name}: circuit open (see `python -m automation source-health`)")
+        if scheduler:
+            scheduler.defer(source_name, max(60, health.retry_at(source_name, "feed") - time.time()))
+        return []
+
     print(f"Fetching {source_name} from {url}...")
+    started = time.time()
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -66,14 +90,27 @@ def fetch_rss(url, source_name, days=None, hours=None):
         resp = requests.get(url, headers=headers, timeout=15)
         if resp.status_code != 200:
             print(f"Error fetching {url}: Status {resp.status_code}")
+            health.record(source_name, "feed", ok=False, latency=time.time() - started, error=f"status {resp.status_code}")
+            if scheduler:
+                scheduler.record_failure(source_name)
             return []
             
         feed = feedparser.parse(resp.content)
     except Exception as e:
         print(f"Error fetching {url}: {e}")
+        health.record(source_name, "feed", ok=False, latency=time.time() - started, error=type(e).__name__)
+        if scheduler:
+            scheduler.record_failure(source_name)
         return []
 
+    if feed.bozo and not feed.entries:
+        health.record(source_name, "feed", ok=False, latency=time.time() - started, size=len(resp.content),
+                      error="unparseable feed")
+    else:
+        health.record(source_name, "feed", ok=True, latency=time.time() - started, size=len(resp.content))
+
     articles = []
+    entry_times = []
     
     if feed.bozo:
         print(f"Warning: Error parsing feed {source_name}: {feed.bozo_exception}")
@@ -92,6 +129,7 @@ def fetch_rss(url, source_name, days=None, hours=None):
              except:
                 pass
         
+        entry_times.append(published_parsed)
         is_recent = False
         if published_parsed:
              # Make timezone-aware comparison
@@ -121,14 +159,17 @@ def fetch_rss(url, source_name, days=None, hours=None):
                     domain = d
                     break
             
-            articles.append({
-                "title": entry.title,
-                "url": entry.link,
-                "published": str(published_parsed) if published_parsed else "Unknown",
-                "source": source_name,
-                "summary": entry.summary if hasattr(entry, 'summary') else "",
-                "region": domain # Mapping "Region" field to Domain for schema compatibility
-            })
+            articles.append(Article(
+                title=entry.title,
+                url=entry.link,
+                source=source_name,
+                region=domain, # Mapping "Region" field to Domain for schema compatibility
+                published_at=published_parsed,
+                summary=entry.summary if hasattr(entry, 'summary') else ""
+            ))
+
+    if scheduler:
+        scheduler.record(source_name, entry_times)
             
     return articles
 
@@ -187,7 +228,7 @@ def main():
         all_articles = collect_articles(args.region, days=args.days, hours=args.hours)
 
     print(f"\nFound {len(all_articles)} articles.")
-    print(json.dumps(all_articles, indent=2, ensure_ascii=False))
+    print(json.dumps([a.to_dict() for a in all_articles], indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
     main()
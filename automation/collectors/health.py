@@ -0,0 +1,248 @@
+"""
+Source Health Registry and Circuit Breaker for TechShift
+
+A dead or blocking source (403, timeouts) used to cost the full request
+timeout on every run (15s per feed in fetch_rss, 10s per article page in
+extract_content) before falling back to the RSS summary anyway.
+
+The registry records every feed / page fetch per source:
+- success rate, latency percentiles (p50 / p95), bytes, RSS-summary fallback rate
+- over a sliding window of the last WINDOW fetches, persisted in
+  automation/data/source_health.json across runs
+
+and runs a circuit breaker per (source, kind):
+- closed: requests go through
+- open: after FAILURE_THRESHOLD consecutive failures; requests are skipped
+  (feeds return no items, pages go straight to the RSS summary) until the
+  cooldown passes. The cooldown doubles each time a trial fails (max MAX_COOLDOWN)
+- half-open: after the cooldown one trial request is let through; success
+  closes the circuit, failure re-opens it
+- degraded pages: when nearly every recent page fetch ended in the RSS-summary
+  fallback, the page fetch is skipped as well (one probe per cooldown)
+
+Usage:
+    health = get_source_health()
+    if health.allow("electrek", "feed"):
+        ...
+        health.record("electrek", "feed", ok=True, latency=0.8, size=52311)
+    print(health.report())
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "source_health.json")
+
+KINDS = ("feed", "page")
+WINDOW = 50
+FAILURE_THRESHOLD = 3
+BASE_COOLDOWN = 30 * 60
+MAX_COOLDOWN = 24 * 3600
+DEGRADED_FALLBACK_RATE = 0.9
+DEGRADED_MIN_SAMPLES = 5
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[idx]
+
+
+class SourceHealthRegistry:
+    """Thread-safe per-source fetch statistics and circuit state."""
+
+    def __init__(self, path=DEFAULT_PATH, state=None, window=WINDOW, failure_threshold=FAILURE_THRESHOLD,
+                 base_cooldown=BASE_COOLDOWN, max_cooldown=MAX_COOLDOWN, clock=time.time):
+        self.path = path
+        self.state = state or {}
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH, **kwargs):
+        state = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read source health ({e}). Starting fresh.")
+        return cls(path=path, state=state, **kwargs)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self.state, indent=1, sort_keys=True)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def _entry(self, source, kind):
+        return self.state.setdefault(source, {}).setdefault(kind, {
+            "samples": [],  # [ts, ok, latency_ms, bytes, fallback]
+            "consecutive_failures": 0,
+            "circuit": "closed",
+            "open_until": 0.0,
+            "cooldown": self.base_cooldown,
+            "last_error": None,
+        })
+
+    # --- Circuit breaker -----------------------------------------------------
+
+    def allow(self, source, kind):
+        """
+        True if a request to the source should be attempted now.
+        An open circuit lets exactly one trial through once its cooldown has passed.
+        """
+        now = self.clock()
+        with self._lock:
+            e = self._entry(source, kind)
+            if e["circuit"] == "closed":
+                if kind == "page" and self._degraded(e):
+                    if now < e.get("probe_at", 0.0):
+                        return False
+                    e["probe_at"] = now + e["cooldown"]
+                    self._dirty = True
+                return True
+            if e["circuit"] == "open" and now >= e["open_until"]:
+                e["circuit"] = "half_open"
+                e["trial_started"] = now
+                self._dirty = True
+                return True
+            # half_open: one trial at a time (a stuck trial is retried after the cooldown)
+            if e["circuit"] == "half_open" and now - e.get("trial_started", 0.0) >= e["cooldown"]:
+                e["trial_started"] = now
+                return True
+            return False
+
+    def retry_at(self, source, kind):
+        """Epoch seconds when allow() lets the next request through (0 = now)."""
+        with self._lock:
+            e = self.state.get(source, {}).get(kind)
+            if not e:
+                return 0.0
+            if e["circuit"] == "open":
+                return e["open_until"]
+            if e["circuit"] == "half_open":
+                return e.get("trial_started", 0.0) + e["cooldown"]
+            if kind == "page" and self._degraded(e):
+                return e.get("probe_at", 0.0)
+            return 0.0
+
+    def _degraded(self, e):
+        samples = e["samples"][-DEGRADED_MIN_SAMPLES * 2:]
+        if len(samples) < DEGRADED_MIN_SAMPLES:
+            return False
+        return sum(1 for s in samples if s[4]) / len(samples) >= DEGRADED_FALLBACK_RATE
+
+    def record(self, source, kind, ok, latency=None, size=0, fallback=False, error=None):
+        """
+        Record one fetch.
+
+        Args:
+            ok: the request succeeded (HTTP 200 and parseable)
+            latency: seconds
+            size: response bytes
+            fallback: the caller ended up using the RSS summary instead of the page
+            error: short description for failures (e.g. "status 403", "timeout")
+        """
+        now = self.clock()
+        with self._lock:
+            e = self._entry(source, kind)
+            e["samples"].append([round(now), 1 if ok else 0,
+                                 None if latency is None else round(latency * 1000), int(size or 0), 1 if fallback else 0])
+            del e["samples"][:-self.window]
+            if ok:
+                e["consecutive_failures"] = 0
+                if e["circuit"] != "closed":
+                    print(f"[health] {source} {kind}: circuit closed")
+                e["circuit"] = "closed"
+                e["cooldown"] = self.base_cooldown
+            else:
+                e["consecutive_failures"] += 1
+                e["last_error"] = error
+                if e["circuit"] == "half_open":
+                    e["cooldown"] = min(self.max_cooldown, e["cooldown"] * 2)
+                    self._open(source, kind, e, now)
+                elif e["circuit"] == "closed" and e["consecutive_failures"] >= self.failure_threshold:
+                    self._open(source, kind, e, now)
+            self._dirty = True
+
+    def _open(self, source, kind, e, now):
+        e["circuit"] = "open"
+        e["open_until"] = now + e["cooldown"]
+        print(f"[health] {source} {kind}: circuit open for {e['cooldown'] // 60:.0f} min "
+              f"({e['consecutive_failures']} failures, last: {e['last_error']})")
+
+    # --- Reporting -----------------------------------------------------------
+
+    def stats(self, source, kind):
+        e = self.state.get(source, {}).get(kind)
+        if not e or not e["samples"]:
+            return None
+        samples = e["samples"]
+        latencies = [s[2] for s in samples if s[2] is not None]
+        ok = [s for s in samples if s[1]]
+        return {
+            "requests": len(samples),
+            "success_rate": len(ok) / len(samples),
+            "p50_ms": _percentile(latencies, 0.5),
+            "p95_ms": _percentile(latencies, 0.95),
+            "avg_bytes": sum(s[3] for s in ok) / len(ok) if ok else 0,
+            "fallback_rate": sum(1 for s in samples if s[4]) / len(samples),
+            "circuit": e["circuit"],
+            "degraded": kind == "page" and self._degraded(e),
+            "last_error": e.get("last_error"),
+        }
+
+    def report(self, sources=None):
+        lines = [f"{'source':<24} {'kind':<5} {'req':>4} {'ok%':>5} {'p50':>7} {'p95':>7} "
+                 f"{'avg KB':>7} {'fallback':>8}  circuit"]
+        for source in sorted(sources or self.state):
+            for kind in KINDS:
+                s = self.stats(source, kind)
+                if s is None:
+                    continue
+                circuit = s["circuit"] + (" (degraded)" if s["degraded"] else "")
+                if s["circuit"] != "closed" and s["last_error"]:
+                    circuit += f" - {s['last_error']}"
+                lines.append(
+                    f"{source:<24} {kind:<5} {s['requests']:>4} {s['success_rate'] * 100:>4.0f}% "
+                    f"{_ms(s['p50_ms']):>7} {_ms(s['p95_ms']):>7} {s['avg_bytes'] / 1024:>7.1f} "
+                    f"{s['fallback_rate'] * 100:>7.0f}%  {circuit}"
+                )
+        return "\n".join(lines)
+
+
+def _ms(value):
+    return "-" if value is None else f"{value}ms"
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_source_health():
+    """Process-wide registry (loaded on first use, saved at exit)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SourceHealthRegistry.load()
+            atexit.register(_registry.save)
+        return _registry
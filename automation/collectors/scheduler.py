@@ -0,0 +1,219 @@
+"""
+Adaptive Per-Source Poll Scheduler for TechShift
+
+Feeds publish at very different rates (cleantechnica / electrek: dozens of
+items a day, y_combinator: a few a month), so polling every source on every
+run wastes requests on slow feeds while fast feeds wait for the next run.
+
+The scheduler learns each feed's cadence from the entry timestamps seen on
+every fetch and keeps a next-poll time per source:
+
+- cadence: EWMA of the mean gap between the feed's listed entries (and the age
+  of its newest entry, so a feed that went quiet slows down)
+- interval: cadence * POLL_FRACTION, clamped to [min_interval, max_interval],
+  with +-jitter so sources don't synchronise
+- burst: after a poll that found new entries the next BURST_POLLS polls use
+  burst_interval (news tends to arrive in clusters)
+- failures back off exponentially (up to max_interval)
+
+State is persisted in automation/data/poll_schedule.json.
+
+Usage:
+    scheduler = PollScheduler.load()
+    for name in scheduler.due(DEFAULT_SOURCES):
+        hours = scheduler.lookback_hours(name, default=6)
+        fetch_rss(url, name, hours=hours, scheduler=scheduler)
+    scheduler.save()
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "poll_schedule.json")
+
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 12 * 3600
+DEFAULT_INTERVAL = 15 * 60
+BURST_INTERVAL = 5 * 60
+BURST_POLLS = 2
+POLL_FRACTION = 0.5  # poll about twice per expected new entry
+EWMA_ALPHA = 0.3
+JITTER = 0.1
+LOOKBACK_MARGIN = 1.5  # lookback covers 1.5x the time since the last poll
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.timestamp()
+        return value.astimezone(timezone.utc).timestamp()
+    return float(value)
+
+
+class PollScheduler:
+    """Thread-safe next-poll bookkeeping per source."""
+
+    def __init__(self, path=DEFAULT_PATH, state=None, initial_intervals=None, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL, default_interval=DEFAULT_INTERVAL, burst_interval=BURST_INTERVAL,
+                 burst_polls=BURST_POLLS, jitter=JITTER, clock=time.time, rng=None):
+        self.path = path
+        self.state = state or {}
+        self.initial_intervals = initial_intervals or {}
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.burst_interval = burst_interval
+        self.burst_polls = burst_polls
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH, **kwargs):
+        state = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read poll schedule ({e}). Starting fresh.")
+        return cls(path=path, state=state, **kwargs)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self.state, indent=1, sort_keys=True)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    # --- Queries -------------------------------------------------------------
+
+    def next_poll(self, name):
+        """Epoch seconds when the source is due (0 = never polled)."""
+        return self.state.get(name, {}).get("next_poll", 0.0)
+
+    def is_due(self, name, now=None):
+        return self.next_poll(name) <= (self.clock() if now is None else now)
+
+    def due(self, names, now=None):
+        now = self.clock() if now is None else now
+        return [name for name in names if self.is_due(name, now)]
+
+    def lookback_hours(self, name, default):
+        """Freshness window for the next fetch: covers the time since the last poll."""
+        last = self.state.get(name, {}).get("last_poll")
+        if not last:
+            return default
+        since = (self.clock() - last) / 3600 * LOOKBACK_MARGIN
+        return max(default, int(math.ceil(since)))
+
+    # --- Updates -------------------------------------------------------------
+
+    def _bounded(self, seconds):
+        seconds = min(self.max_interval, max(self.min_interval, seconds))
+        return seconds * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def record(self, name, entry_times, now=None):
+        """
+        Update a source after a successful fetch.
+
+        Args:
+            entry_times: published times of every entry in the feed (datetime or epoch),
+                         not only the ones inside the freshness window
+        Returns:
+            Seconds until the next poll.
+        """
+        now = self.clock() if now is None else now
+        times = sorted(_timestamp(t) for t in entry_times if t is not None)
+        with self._lock:
+            s = self.state.setdefault(name, {"polls": 0, "hits": 0})
+            s["polls"] += 1
+            s["failures"] = 0
+
+            newest_seen = s.get("newest_entry", 0.0)
+            new_entries = sum(1 for t in times if t > newest_seen) if newest_seen else 0
+            if times:
+                s["newest_entry"] = max(newest_seen, times[-1])
+
+            observed = None
+            if len(times) >= 2:
+                observed = (times[-1] - times[0]) / (len(times) - 1)
+            if times:
+                # A feed whose newest entry is old has slowed down
+                observed = max(observed or 0.0, (now - times[-1]) / 2)
+            if observed:
+                gap = s.get("gap")
+                s["gap"] = observed if gap is None else EWMA_ALPHA * observed + (1 - EWMA_ALPHA) * gap
+
+            if new_entries:
+                s["hits"] += 1
+                s["burst_left"] = self.burst_polls
+                s["last_new"] = new_entries
+
+            if s.get("burst_left"):
+                s["burst_left"] -= 1
+                interval = self._bounded(min(self.burst_interval, self._cadence_interval(name, s)))
+            else:
+                interval = self._bounded(self._cadence_interval(name, s))
+
+            s["last_poll"] = now
+            s["interval"] = round(interval)
+            s["next_poll"] = now + interval
+            return interval
+
+    def record_failure(self, name, now=None):
+        """Back off after a failed fetch (doubles per consecutive failure)."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            s = self.state.setdefault(name, {"polls": 0, "hits": 0})
+            s["failures"] = s.get("failures", 0) + 1
+            interval = self._bounded(self._cadence_interval(name, s) * (2 ** min(s["failures"], 6)))
+            s["interval"] = round(interval)
+            s["next_poll"] = now + interval
+            return interval
+
+    def defer(self, name, seconds, now=None):
+        """Push a due source back without counting a poll (e.g. downstream is full)."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self.state.setdefault(name, {"polls": 0, "hits": 0})["next_poll"] = now + seconds
+
+    def _cadence_interval(self, name, s):
+        gap = s.get("gap")
+        if gap is None:
+            return self.initial_intervals.get(name, self.default_interval)
+        return gap * POLL_FRACTION
+
+    # --- Reporting -----------------------------------------------------------
+
+    def summary(self, names=None):
+        now = self.clock()
+        lines = [f"{'source':<24} {'cadence':>9} {'interval':>9} {'next in':>9} {'hits/polls':>11}"]
+        for name in sorted(names or self.state):
+            s = self.state.get(name, {})
+            gap = s.get("gap")
+            lines.append(
+                f"{name:<24} {_fmt(gap):>9} {_fmt(s.get('interval')):>9} "
+                f"{_fmt(max(0, s.get('next_poll', 0) - now)):>9} {s.get('hits', 0):>5}/{s.get('polls', 0):<5}"
+            )
+        return "\n".join(lines)
+
+
+def _fmt(seconds):
+    if seconds is None:
+        return "-"
+    if seconds >= 86400:
+        return f"{seconds / 86400:.1f}d"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 60:.0f}m"
@@ -4,13 +4,26 @@ URL Content Extractor for FinShift
 
 Extracts article content from URLs using BeautifulSoup.
 Supports major logistics news sources with fallback to Gemini URL reading.
+
+parse_html() is the network-free half of extract_content(); the scraping
+benchmark (tools/bench_scrape.py) runs it against recorded pages.
 """
 
-import requests
-from bs4 import BeautifulSoup
+import os
+import time
 from typing import Dict, Optional
 import sys
 
+# Add parent directory to path to import automation modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from automation.lazy import lazy_import
+from automation.collectors.health import get_source_health
+
+# Heavy dependencies are imported on first use (fast `--help` / CLI startup)
+requests = lazy_import("requests")
+bs4 = lazy_import("bs4")
+
 # Content selectors for each source
 # Content selectors for FinShift sources
 CONTENT_SELECTORS = {
@@ -98,6 +111,72 @@ CONTENT_SELECTORS = {
 }
 
 
+GENERIC_SELECTORS = {
+    "content": "article, div.content, div.post-content, div.entry-content",
+    "title": "h1",
+    "author": "span.author, a.author, span.author-name",
+}
+
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,ja;q=0.8,zh-CN;q=0.7,zh;q=0.6,id;q=0.5,hi;q=0.4",
+    "Referer": "https://www.google.com/",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+# Tags stripped from the content element before taking its text
+NOISE_TAGS = ['script', 'style', 'nav', 'aside', 'iframe', 'ads']
+
+
+def selectors_for(source: str) -> Dict[str, str]:
+    selectors = CONTENT_SELECTORS.get(source)
+    if not selectors:
+        print(f"Warning: No selectors defined for source '{source}', using generic extraction")
+        selectors = GENERIC_SELECTORS
+    return selectors
+
+
+def parse_html(html, selectors: Dict[str, str], parser: str = "lxml", paragraph_fallback: bool = True) -> Dict[str, str]:
+    """
+    Extract title / content / author from a fetched page (no network).
+
+    Args:
+        html: page bytes or str
+        selectors: a CONTENT_SELECTORS entry
+        parser: BeautifulSoup tree builder ('lxml', 'html.parser', ...)
+        paragraph_fallback: when the content selector yields nothing, join every <p>
+
+    Returns:
+        Dictionary with keys: title, content, author, path
+        path is 'selector' (content selector hit), 'paragraphs' (all-<p> fallback)
+        or 'empty' (nothing extracted)
+    """
+    soup = bs4.BeautifulSoup(html, parser)
+
+    title_elem = soup.select_one(selectors["title"])
+    title = title_elem.get_text(strip=True) if title_elem else "No Title"
+
+    content = None
+    content_elem = soup.select_one(selectors["content"])
+    if content_elem:
+        for tag in content_elem.find_all(NOISE_TAGS):
+            tag.decompose()
+        content = content_elem.get_text(separator='\n', strip=True)
+
+    path = "selector"
+    if not content:
+        path = "empty"
+        if paragraph_fallback:
+            content = '\n'.join(p.get_text(strip=True) for p in soup.find_all('p'))
+            path = "paragraphs" if content else "empty"
+
+    author_elem = soup.select_one(selectors["author"])
+    author = author_elem.get_text(strip=True) if author_elem else "Unknown"
+
+    return {"title": title, "content": content or "", "author": author, "path": path}
+
+
 def extract_content(url: str, source: str, rss_summary: Optional[str] = None) -> Dict[str, str]:
     """
     Extract article content from URL.
@@ -109,34 +188,45 @@ def extract_content(url: str, source: str, rss_summary: Optional[str] = None) ->
     
     Returns:
         Dictionary with keys: title, content, author, url, is_fallback
+
+    Fetch outcomes are recorded in the source health registry; while a
+    source's page circuit is open (or its pages are degraded to the RSS
+    summary anyway) the fetch is skipped.
     """
-    print(f"Extracting content from {source}: {url}")
-    
-    # Get selectors for this source
-    selectors = CONTENT_SELECTORS.get(source)
-    
-    if not selectors:
-        print(f"Warning: No selectors defined for source '{source}', using generic extraction")
-        selectors = {
-            "content": "article, div.content, div.post-content, div.entry-content",
-            "title": "h1",
-            "author": "span.author, a.author, span.author-name",
+    health = get_source_health()
+    if not health.allow(source, "page"):
+        print(f"Skipping page fetch for {source}: circuit open or degraded")
+        if rss_summary:
+            return {
+                "title": "RSS Summary (Source Unhealthy)",
+                "content": rss_summary,
+                "author": "Unknown",
+                "url": url,
+                "is_fallback": True
+            }
+        return {
+            "title": "Error",
+            "content": f"Failed to fetch content: source '{source}' is unhealthy",
+            "author": "Unknown",
+            "url": url,
+            "is_fallback": True
         }
+
+    print(f"Extracting content from {source}: {url}")
     
+    selectors = selectors_for(source)
+
+    started = time.time()
+    recorded = False
     try:
-        # Fetch URL
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.9,ja;q=0.8,zh-CN;q=0.7,zh;q=0.6,id;q=0.5,hi;q=0.4",
-            "Referer": "https://www.google.com/",
-            "Upgrade-Insecure-Requests": "1",
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
         # response.raise_for_status() # Don't raise immediately, handle 403/404 with fallback
 
         if response.status_code != 200:
              print(f"Error fetching URL: Status {response.status_code}")
+             health.record(source, "page", ok=False, latency=time.time() - started, fallback=bool(rss_summary),
+                           error=f"status {response.status_code}")
+             recorded = True
              if rss_summary:
                  print("Using RSS summary fallback.")
                  return {
@@ -147,29 +237,17 @@ def extract_content(url: str, source: str, rss_summary: Optional[str] = None) ->
                      "is_fallback": True
                  }
              raise requests.RequestException(f"Status {response.status_code}")
+        latency = time.time() - started
         
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        # Extract title
-        title_elem = soup.select_one(selectors["title"])
-        title = title_elem.get_text(strip=True) if title_elem else "No Title"
-        
-        # Extract content
-        content_elem = soup.select_one(selectors["content"])
-        if content_elem:
-            # Remove script and style tags
-            for tag in content_elem.find_all(['script', 'style', 'nav', 'aside', 'iframe', 'ads']):
-                tag.decompose()
-            content = content_elem.get_text(separator='\n', strip=True)
-        else:
-             content = None # Explicitly set to None for check below
-        
-        # If content selector found nothing or text is empty, try fallback
-        if not content:
+        parsed = parse_html(response.content, selectors, paragraph_fallback=not rss_summary)
+        title, content, author = parsed["title"], parsed["content"], parsed["author"]
+
+        # If content selector found nothing or text is empty, use the RSS summary
+        if parsed["path"] != "selector":
             print(f"Warning: Content selector '{selectors['content']}' yielded empty result.")
             if rss_summary:
                  print("Using RSS summary fallback.")
+                 health.record(source, "page", ok=True, latency=latency, size=len(response.content), fallback=True)
                  return {
                      "title": title,
                      "content": rss_summary, # Use RSS summary
@@ -177,16 +255,8 @@ def extract_content(url: str, source: str, rss_summary: Optional[str] = None) ->
                      "url": url,
                      "is_fallback": True
                  }
-            
-            # Last resort fallback: get all paragraphs
             print("Using all <p> tags fallback.")
-            paragraphs = soup.find_all('p')
-            content = '\n'.join([p.get_text(strip=True) for p in paragraphs])
-        
-        # Extract author
-        author_elem = soup.select_one(selectors["author"])
-        author = author_elem.get_text(strip=True) if author_elem else "Unknown"
-        
+
         result = {
             "title": title,
             "content": content,
@@ -194,12 +264,16 @@ def extract_content(url: str, source: str, rss_summary: Optional[str] = None) ->
             "url": url,
             "is_fallback": False
         }
+        health.record(source, "page", ok=True, latency=latency, size=len(response.content))
         
         print(f"Successfully extracted: {len(content)} chars")
         return result
         
     except Exception as e:
         print(f"Error extracting content: {e}")
+        if not recorded:
+            health.record(source, "page", ok=False, latency=time.time() - started, fallback=bool(rss_summary),
+                          error=type(e).__name__)
         if rss_summary:
              print("Using RSS summary fallback due to exception.")
              return {
@@ -1,65 +1,57 @@
-import sys
-import os
+#!/usr/bin/env python3
+"""
+Source Health Report
+
+Shows feed / page fetch health per source from the registry that fetch_rss
+and extract_content update on every run (collectors/health.py): success
+rate, latency p50/p95, response size, RSS-summary fallback rate and circuit
+state. Nothing is fetched.
+
+Usage:
+    python -m automation source-health
+    python -m automation source-health --unhealthy
+    python -m automation source-health --json
+"""
+
+import argparse
 import json
-import time
+import os
+import sys
 
-# Add automation directory to path
-sys.path.append(os.path.join(os.getcwd(), 'automation'))
+# Add parent directory to path to import automation modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from automation.collectors.collector import DEFAULT_SOURCES
+from automation.collectors.health import KINDS, SourceHealthRegistry
 
-from collectors.collector import fetch_rss, DEFAULT_SOURCES
-from collectors.url_reader import extract_content
 
 def main():
-    print("=== Visualizing Scraping Success Rates ===")
-    
-    results = {}
-    
-    # Test one URL from each source
-    for source_key, rss_url in DEFAULT_SOURCES.items():
-        print(f"\n--- Testing {source_key} ---")
-        try:
-            # 1. Fetch RSS to get a real URL
-            articles = fetch_rss(rss_url, source_key)
-            if not articles:
-                print(f"Skipping {source_key}: No articles found in RSS.")
-                results[source_key] = "RSS_EMPTY"
-                continue
-                
-            target_article = articles[0]
-            url = target_article['url']
-            summary = target_article.get('summary', 'No Summary')
-            
-            print(f"Target URL: {url}")
-            
-            # 2. Try Scraping
-            content_data = extract_content(url, source_key, rss_summary=summary)
-            
-            # 3. Analyze Result
-            is_fallback = content_data.get('is_fallback', False)
-            content_len = len(content_data.get('content', ''))
-            
-            if is_fallback:
-                status = "FALLBACK (Scraping Failed)"
-            elif content_len < 200:
-                status = "WARNING (Content < 200 chars)"
-            else:
-                status = f"SUCCESS ({content_len} chars)"
-                
-            print(f"Result: {status}")
-            results[source_key] = status
-            
-            time.sleep(1) # Be nice
-            
-        except Exception as e:
-            print(f"Error testing {source_key}: {e}")
-            results[source_key] = f"ERROR: {str(e)}"
+    parser = argparse.ArgumentParser(description="Report feed / scrape health per source")
+    parser.add_argument("--unhealthy", action="store_true", help="Only sources with an open circuit or degraded pages")
+    parser.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+    args = parser.parse_args()
+
+    registry = SourceHealthRegistry.load()
+    sources = sorted(set(DEFAULT_SOURCES) | set(registry.state))
+
+    if args.unhealthy:
+        sources = [
+            name for name in sources
+            if any((s := registry.stats(name, kind)) and (s["circuit"] != "closed" or s["degraded"]) for kind in KINDS)
+        ]
+
+    if args.json:
+        print(json.dumps({name: {kind: registry.stats(name, kind) for kind in KINDS} for name in sources},
+                         indent=2, ensure_ascii=False))
+        return
+
+    print("=== Source Health ===")
+    print(registry.report(sources))
+
+    never = [name for name in sources if name in DEFAULT_SOURCES and name not in registry.state]
+    if never:
+        print(f"\nNo fetches recorded yet: {', '.join(never)}")
 
-    # Summary Reort
-    print("\n\n=== Final Report ===")
-    print(f"{'Source':<25} | {'Status':<30}")
-    print("-" * 60)
-    for source, status in results.items():
-        print(f"{source:<25} | {status:<30}")
 
 if __name__ == "__main__":
     main()
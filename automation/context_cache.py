@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Explicit Context Caching for TechShift
+
+Several prompts carry a large fixed instruction block (scoring criteria, the
+category/tag taxonomy, the topic-focus writing guide, the briefing guide) and
+only a small variable part. Those prompts are split into a stable system
+instruction prefix + a short suffix, and the prefix is stored server-side as a
+cached context so each call only pays prefill for the suffix.
+
+ContextCacheManager keeps one cached context per (model, prefix hash):
+- create on first use
+- reuse while the cache has more than REFRESH_MARGIN seconds left
+- refresh (extend the TTL) when it is about to expire
+- recreate when it has expired or the server no longer knows it
+- fall back to sending the prefix as a plain system_instruction when the
+  prefix is below the model's minimum cacheable size or the backend fails
+
+Create / refresh calls run outside the registry lock: a miss on one prefix
+does not hold up the others, and concurrent misses on the same prefix wait
+for the single in-flight create instead of each creating a cache.
+
+Backends:
+    GenaiCacheBackend(client): google-genai `client.caches`
+    FakeCacheBackend(): in-memory, for tests and dry runs
+
+Configuration (.env):
+    CONTEXT_CACHE_ENABLED=1
+    CONTEXT_CACHE_TTL=3600
+    CONTEXT_CACHE_MIN_TOKENS=1024
+"""
+
+import hashlib
+import itertools
+import os
+import threading
+import time
+
+try:
+    from automation.lazy import lazy_import
+    from automation.token_budget import estimate_tokens
+except ImportError:
+    from lazy import lazy_import
+    from token_budget import estimate_tokens
+
+types = lazy_import("google.genai.types")
+
+DEFAULT_TTL = 3600
+REFRESH_MARGIN = 300
+FAILURE_BACKOFF = 1800
+# Longest a caller waits for another thread's create of the same prefix
+# before sending the prefix uncached
+INFLIGHT_WAIT = 60
+
+
+def prefix_hash(prefix):
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+class GenaiCacheBackend:
+    """Cached contents through google-genai (Vertex AI or API key client)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, model, system_instruction, ttl):
+        """Returns (cache name, expire timestamp)."""
+        cache = self.client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                display_name=f"techshift-{prefix_hash(system_instruction)[:12]}",
+                ttl=f"{int(ttl)}s",
+            ),
+        )
+        return cache.name, self._expire_ts(cache, ttl)
+
+    def refresh(self, name, ttl):
+        """Extend the TTL. Returns the new expire timestamp."""
+        cache = self.client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{int(ttl)}s"))
+        return self._expire_ts(cache, ttl)
+
+    def delete(self, name):
+        self.client.caches.delete(name=name)
+
+    def _expire_ts(self, cache, ttl):
+        expire_time = getattr(cache, "expire_time", None)
+        return expire_time.timestamp() if expire_time else time.time() + ttl
+
+
+class FakeCacheBackend:
+    """
+    In-memory stand-in for the caches API.
+
+    Honours TTLs against the given clock, counts calls, and can be told to
+    reject prefixes below min_tokens the way the real service does.
+    """
+
+    def __init__(self, clock=time.time, min_tokens=0):
+        self.clock = clock
+        self.min_tokens = min_tokens
+        self.caches = {}
+        self.calls = {"create": 0, "refresh": 0, "delete": 0}
+        self._ids = itertools.count(1)
+
+    def create(self, model, system_instruction, ttl):
+        self.calls["create"] += 1
+        if estimate_tokens(system_instruction) < self.min_tokens:
+            raise ValueError("400 INVALID_ARGUMENT: cached content is too small")
+        name = f"cachedContents/fake-{next(self._ids)}"
+        self.caches[name] = {"model": model, "system_instruction": system_instruction, "expire": self.clock() + ttl}
+        return name, self.caches[name]["expire"]
+
+    def refresh(self, name, ttl):
+        self.calls["refresh"] += 1
+        cache = self.caches.get(name)
+        if cache is None or cache["expire"] <= self.clock():
+            self.caches.pop(name, None)
+            raise KeyError(f"404 NOT_FOUND: {name}")
+        cache["expire"] = self.clock() + ttl
+        return cache["expire"]
+
+    def delete(self, name):
+        self.calls["delete"] += 1
+        self.caches.pop(name, None)
+
+    def get(self, name):
+        """Stored system instruction for a live cache, or None (what a generate call would see)."""
+        cache = self.caches.get(name)
+        if cache is None or cache["expire"] <= self.clock():
+            return None
+        return cache["system_instruction"]
+
+
+class ContextCacheManager:
+    """
+    Thread-safe registry of server-side cached prefixes.
+
+    Usage:
+        name = manager.get(model, prefix)
+        config = {"cached_content": name} if name else {"system_instruction": prefix}
+    """
+
+    def __init__(self, backend, ttl=None, refresh_margin=REFRESH_MARGIN, min_tokens=None, enabled=None, clock=time.time):
+        self.backend = backend
+        self.ttl = ttl if ttl is not None else int(os.getenv("CONTEXT_CACHE_TTL", str(DEFAULT_TTL)))
+        self.refresh_margin = min(refresh_margin, self.ttl // 2)
+        self.min_tokens = min_tokens if min_tokens is not None else int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+        if enabled is None:
+            enabled = os.getenv("CONTEXT_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+        self.enabled = enabled
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}    # (model, hash) -> {"name", "expire"}
+        self._uncacheable = {}  # (model, hash) -> retry-after timestamp
+        self._inflight = {}     # (model, hash) -> Event set when its create / refresh is done
+        self.stats = {"hits": 0, "creates": 0, "refreshes": 0, "expired": 0, "uncached": 0, "failures": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0}
+
+    def get(self, model, prefix):
+        """
+        Name of a live cached context holding prefix for model, or None when the
+        caller should send the prefix as a plain system instruction.
+        """
+        if not self.enabled or not prefix:
+            return None
+        key = (model, prefix_hash(prefix))
+        while True:
+            now = self.clock()
+            with self._lock:
+                if self._uncacheable.get(key, 0) > now:
+                    self.stats["uncached"] += 1
+                    return None
+                if estimate_tokens(prefix) < self.min_tokens:
+                    self._uncacheable[key] = float("inf")
+                    self.stats["uncached"] += 1
+                    return None
+
+                entry = self._entries.get(key)
+                pending = self._inflight.get(key)
+                if entry and (entry["expire"] - now > self.refresh_margin
+                              or (pending and entry["expire"] > now)):
+                    self.stats["hits"] += 1
+                    return entry["name"]
+                if pending is None:
+                    pending = self._inflight[key] = threading.Event()
+                    break
+            # Another thread is creating this prefix's cache: wait for its result
+            if not pending.wait(INFLIGHT_WAIT):
+                with self._lock:
+                    self.stats["uncached"] += 1
+                return None
+
+        # Network calls run outside the lock; other prefixes are not held up
+        try:
+            return self._renew(key, model, prefix, entry, now)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set()
+
+    def _renew(self, key, model, prefix, entry, now):
+        """Refresh entry if it is still alive, else (re)create the cache."""
+        if entry and entry["expire"] > now:
+            try:
+                expire = self.backend.refresh(entry["name"], self.ttl)
+            except Exception as e:
+                print(f"Context cache refresh failed ({model}): {e}")
+            else:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        entry["expire"] = expire
+                    self.stats["refreshes"] += 1
+                return entry["name"]
+        if entry:
+            with self._lock:
+                self.stats["expired"] += 1
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+
+        try:
+            name, expire = self.backend.create(model, prefix, self.ttl)
+        except Exception as e:
+            print(f"Context cache create failed ({model}), sending prefix uncached: {e}")
+            with self._lock:
+                self._uncacheable[key] = now + FAILURE_BACKOFF
+                self.stats["failures"] += 1
+            return None
+        with self._lock:
+            self._entries[key] = {"name": name, "expire": expire}
+            self.stats["creates"] += 1
+        return name
+
+    def invalidate(self, name):
+        """Forget a cache the server rejected (e.g. expired early or deleted)."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["name"] == name:
+                    del self._entries[key]
+
+    def record_usage(self, response):
+        """Accumulate prompt / cached token counts from a response's usage metadata."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        with self._lock:
+            self.stats["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            self.stats["cached_tokens"] += getattr(usage, "cached_content_token_count", 0) or 0
+
+    def close(self):
+        """Delete every cache this process created (storage is billed per hour)."""
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            try:
+                self.backend.delete(entry["name"])
+            except Exception as e:
+                print(f"Context cache delete failed: {e}")
+
+    def summary(self):
+        s = dict(self.stats)
+        share = s["cached_tokens"] / s["prompt_tokens"] if s["prompt_tokens"] else 0.0
+        return (f"Context cache: hits={s['hits']} creates={s['creates']} refreshes={s['refreshes']} "
+                f"expired={s['expired']} uncached={s['uncached']} failures={s['failures']} "
+                f"cached_input_tokens={s['cached_tokens']}/{s['prompt_tokens']} ({share:.0%})")
+
+    def render_metrics(self, prefix="techshift_context_cache"):
+        """Prometheus text lines (used by daemon.py /metrics)."""
+        return [f"{prefix}_{name}_total {value}" for name, value in self.stats.items()]
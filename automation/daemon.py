@@ -0,0 +1,679 @@
+#!/usr/bin/env python3
+"""
+TechShift Pipeline Daemon
+
+Long-running, event-driven alternative to the cron-triggered pipeline.py run.
+Clients, the known-URL index (db/known_urls.py) and the dedup title pool stay
+warm in memory.
+
+Flow (one thread per stage, connected by bounded queues):
+1. Poller: fetches each RSS source when it is due (interval learned from the
+   feed's publish cadence, collectors/scheduler.py), pushes unseen items
+   (copies of a story already picked up from another source are dropped)
+2. Scorer: scores new items in small batches (scorer.py)
+3. Generator: dedup check + generation for items above the threshold; once
+   the daily limit is reached, items are held for the next day
+
+Backpressure: when a downstream queue is full the upstream stage blocks
+(the poller defers the source to its next turn instead of dropping items).
+SIGTERM / SIGINT stop polling, let the in-flight item finish and drain
+hero image jobs before exiting. Candidates still waiting for generation are
+saved to automation/data/daemon_pending.json and picked up on the next start.
+
+Health / metrics (default port 8765):
+    GET /healthz  -> JSON status (503 if a stage thread died)
+    GET /metrics  -> Prometheus text format
+
+Usage:
+    python -m automation daemon --threshold 85 --daily-limit 6
+"""
+
+import argparse
+import heapq
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automation.collectors.collector import fetch_rss, DEFAULT_SOURCES
+from automation.collectors.scheduler import PollScheduler
+from automation.collectors.health import KINDS, get_source_health
+from automation.db.client import DBClient
+from automation.db.known_urls import KnownUrlIndex, url_hash
+from automation.analysis.clustering import StoryIndex
+from automation.analysis.prefilter import Prefilter, record_scores
+from automation.analysis.cascade import cascade_stats
+from automation.hedging import hedge_stats
+from automation.llm_budget import get_llm_budget, set_stage
+from automation.models import Article
+
+# Initial poll interval (seconds) per source until the scheduler has learned its
+# cadence; sources not listed use DEFAULT_POLL_INTERVAL
+DEFAULT_POLL_INTERVAL = 15 * 60
+SOURCE_POLL_INTERVALS = {
+    "techcrunch_ai": 5 * 60,
+    "venturebeat_ai": 5 * 60,
+    "techcrunch_transport": 10 * 60,
+    "electrek": 10 * 60,
+    "y_combinator": 60 * 60,
+    "huggingface_blog": 30 * 60,
+}
+
+# Remember this many URLs to skip items that were already seen
+SEEN_URL_CAPACITY = 20000
+
+# How long a stage without LLM budget waits before checking the headroom again
+BUDGET_RETRY_SECONDS = 10 * 60
+
+# Candidates not generated before shutdown, restored on the next start
+PENDING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "daemon_pending.json")
+
+
+def _seconds_until_tomorrow(now=None):
+    """Seconds until local midnight, when the daily generation limit resets."""
+    now = now or datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1.0, (tomorrow - now).total_seconds())
+
+
+class DaemonMetrics:
+    """Thread-safe counters and gauges exposed on /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "polls_total": 0,
+            "poll_errors_total": 0,
+            "poll_deferred_total": 0,
+            "items_collected_total": 0,
+            "items_known_skipped_total": 0,
+            "items_clustered_total": 0,
+            "items_prefiltered_total": 0,
+            "items_scored_total": 0,
+            "items_above_threshold_total": 0,
+            "duplicates_skipped_total": 0,
+            "articles_generated_total": 0,
+            "generation_errors_total": 0,
+        }
+        self.last_poll_at = {}
+        self.started_at = time.time()
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def mark_poll(self, source):
+        with self._lock:
+            self.last_poll_at[source] = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters), dict(self.last_poll_at)
+
+
+class PipelineDaemon:
+    """
+    Poll -> score -> generate, continuously.
+
+    Args:
+        threshold: Minimum score for generation
+        daily_limit: Max articles generated per calendar day (0 = unlimited)
+        lookback_hours: Freshness window applied to feed items
+        score_batch_size: Items per scoring call
+        queue_size: Capacity of each stage queue (backpressure bound)
+        dry_run: Generate without posting
+    """
+
+    def __init__(self, threshold=85, daily_limit=6, lookback_hours=6, score_batch_size=10,
+                 queue_size=50, dry_run=False, sources=None, pending_path=PENDING_PATH):
+        self.threshold = threshold
+        self.daily_limit = daily_limit
+        self.lookback_hours = lookback_hours
+        self.score_batch_size = score_batch_size
+        self.dry_run = dry_run
+        self.sources = sources or DEFAULT_SOURCES
+
+        self.scheduler = PollScheduler.load(initial_intervals=SOURCE_POLL_INTERVALS,
+                                            default_interval=DEFAULT_POLL_INTERVAL)
+
+        self.score_queue = queue.Queue(maxsize=queue_size)
+        self.generate_queue = queue.PriorityQueue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.metrics = DaemonMetrics()
+        self.budget = get_llm_budget()
+
+        self._seen_urls = OrderedDict()
+        self._seen_lock = threading.Lock()
+        # Recent stories across all sources (cross-source near-duplicate check)
+        self.story_index = StoryIndex(max_items=SEEN_URL_CAPACITY // 4)
+        self._generate_seq = 0
+        self._generated_today = (datetime.now().date(), 0)
+        # Candidates the generator holds back (budget, daily limit) or got back from a
+        # stopping scorer; a heap of generate_queue items, checked before the queue
+        self.pending_path = pending_path
+        self._held = []
+        self._held_lock = threading.Lock()
+        self._threads = []
+
+        self.gemini = None
+        self.wp = None
+        self.classifier = None
+        self.image_queue = None
+        self.known_index = None
+        self.prefilter = None
+        self.existing_titles = []
+
+    # --- Setup -------------------------------------------------------------
+
+    def warm_up(self):
+        """Build long-lived clients and load the dedup title pool once."""
+        from automation.client_registry import get_gemini_client
+        from automation.analysis.classifier import ArticleClassifier
+        from automation.image_queue import ImageJobQueue
+        from automation.wp_client import WordPressClient
+
+        self.known_index = KnownUrlIndex.open()
+        synced = self.known_index.sync(DBClient())
+        if synced is None:
+            print("Warning: Known-URL index sync failed. Using local index only.")
+
+        self.prefilter = Prefilter.load()
+        if not self.prefilter:
+            print("Pre-filter model not trained yet. Scoring all articles.")
+
+        self.gemini = get_gemini_client()
+        if len(self.gemini.pool) > 1:
+            for name, error in self.gemini.pool.health_check().items():
+                print(f"Backend {name}: {'OK' if error is None else 'FAILED (' + error[:80] + ')'}")
+        self.classifier = ArticleClassifier(client=self.gemini)
+        try:
+            self.wp = WordPressClient()
+        except Exception as e:
+            print(f"Warning: Failed to initialize WP Client: {e}")
+        self.image_queue = ImageJobQueue(self.gemini, self.wp)
+        self.refresh_existing_titles()
+        self.load_pending()
+
+    def refresh_existing_titles(self):
+        if not self.wp:
+            return
+        try:
+            recent_posts = self.wp.get_posts(limit=30, status="publish")
+            if recent_posts:
+                self.existing_titles = [p['title']['rendered'] for p in recent_posts]
+                print(f"Loaded {len(self.existing_titles)} existing post titles.")
+        except Exception as e:
+            print(f"Warning: Failed to fetch existing posts: {e}")
+
+    # --- Seen index --------------------------------------------------------
+
+    def _mark_seen(self, url):
+        """Record url; returns False if it was already seen."""
+        with self._seen_lock:
+            if url in self._seen_urls:
+                self._seen_urls.move_to_end(url)
+                return False
+            self._seen_urls[url] = True
+            if len(self._seen_urls) > SEEN_URL_CAPACITY:
+                self._seen_urls.popitem(last=False)
+            return True
+
+    def _unmark_seen(self, url):
+        with self._seen_lock:
+            self._seen_urls.pop(url, None)
+
+    def _mark_known(self, articles):
+        """Add articles to the known-URL index so later runs skip them."""
+        if self.known_index is not None:
+            self.known_index.add_many(url_hash(a['url']) for a in articles)
+            self.known_index.save()
+
+    # --- Stages ------------------------------------------------------------
+
+    def poll_loop(self):
+        """Fetch each source when it is due and push unseen items downstream."""
+        scheduler = self.scheduler
+
+        while not self.stop_event.is_set():
+            due = scheduler.due(self.sources)
+
+            for name in due:
+                if self.stop_event.is_set():
+                    break
+
+                # Backpressure: don't fetch more than the scorer can take
+                if self.score_queue.full():
+                    self.metrics.inc("poll_deferred_total")
+                    scheduler.defer(name, 60)
+                    continue
+
+                self.metrics.inc("polls_total")
+                try:
+                    items = fetch_rss(self.sources[name], name, hours=scheduler.lookback_hours(name, self.lookback_hours),
+                                      scheduler=scheduler)
+                except Exception as e:
+                    print(f"Error polling {name}: {e}")
+                    self.metrics.inc("poll_errors_total")
+                    scheduler.record_failure(name)
+                    items = []
+                self.metrics.mark_poll(name)
+
+                for item in items:
+                    if not self._mark_seen(item['url']):
+                        continue
+                    if self.known_index and url_hash(item['url']) in self.known_index:
+                        self.metrics.inc("items_known_skipped_total")
+                        continue
+                    story = self.story_index.match(item)
+                    if story is not None:
+                        print(f"  - Same story as {story[:60]}: {item['title'][:40]}... ({name})")
+                        self.metrics.inc("items_clustered_total")
+                        if self.known_index:
+                            self.known_index.add(url_hash(item['url']))
+                        continue
+                    if not self._put(self.score_queue, item):
+                        # Shutting down: forget it so the next run picks it up
+                        self._unmark_seen(item['url'])
+                        break
+                    self.metrics.inc("items_collected_total")
+
+            if due:
+                scheduler.save()
+                get_source_health().save()
+                self.budget.save()
+            wait = max(0.5, min(scheduler.next_poll(name) for name in self.sources) - time.time())
+            self.stop_event.wait(min(wait, 30))
+
+    def score_loop(self):
+        """Score queued items in batches; forward those above the threshold."""
+        from automation.analysis.scorer import score_article, score_articles_batch, scoring_failed
+
+        set_stage("scoring")
+        while not self.stop_event.is_set():
+            batch = self._drain(self.score_queue, self.score_batch_size, first_timeout=1.0)
+            if not batch:
+                continue
+
+            if self.prefilter:
+                batch, rejected = self.prefilter.split(batch)
+                if rejected:
+                    # Not marked known: a retrained pre-filter may let them through later
+                    self.metrics.inc("items_prefiltered_total", len(rejected))
+                if not batch:
+                    continue
+
+            # Scoring yields to generation and the daily briefing when the budget runs low
+            if self.budget.allowance("scoring", self.gemini.cascade.cheap_model) == 0:
+                print(f"LLM budget for scoring is used up. Deferring {len(batch)} item(s).")
+                self.metrics.inc("items_budget_deferred_total", len(batch))
+                for article in batch:
+                    self._unmark_seen(article['url'])
+                self.stop_event.wait(BUDGET_RETRY_SECONDS)
+                continue
+
+            try:
+                results = score_articles_batch(batch, client=self.gemini, threshold=self.threshold)
+                if not results:
+                    results = [score_article(article, client=self.gemini) for article in batch]
+            except Exception as e:
+                print(f"Error scoring batch: {e}")
+                for article in batch:
+                    self._unmark_seen(article['url'])
+                self.stop_event.wait(10)
+                continue
+
+            self.metrics.inc("items_scored_total", len(results))
+            record_scores(results)
+            # Failed scores (and items the batch didn't return) stay unknown so a later poll retries them;
+            # candidates are marked known by the generator once generated or rejected as duplicates
+            scored = [res for res in results if not scoring_failed(res)]
+            self._mark_known(a for a in scored if a.get('score', 0) < self.threshold)
+            scored_urls = {a['url'] for a in scored}
+            for article in batch:
+                if article['url'] not in scored_urls:
+                    self._unmark_seen(article['url'])
+            for res in results:
+                score = res.get('score', 0)
+                print(f"  - Scored: {res.get('title', 'Unknown')[:40]}... -> {score} pts")
+                if score < self.threshold:
+                    continue
+                self.metrics.inc("items_above_threshold_total")
+                # Highest score first; seq keeps FIFO order among equal scores
+                self._generate_seq += 1
+                if not self._put(self.generate_queue, (-score, self._generate_seq, res)):
+                    # Stopping: saved with the other pending candidates
+                    self._hold((-score, self._generate_seq, res))
+
+    def generate_loop(self):
+        """Dedup and generate one article at a time, respecting the daily limit."""
+        from automation.pipeline import generate_from_article
+        from automation.generate_article import ARTICLE_MODEL, LLM_REQUESTS_PER_ARTICLE
+
+        set_stage("generation")
+        generated_titles = []
+        while not self.stop_event.is_set():
+            item = self._next_candidate()
+            if item is None:
+                continue
+            article = item[2]
+
+            allowance = self.budget.allowance("generation", ARTICLE_MODEL)
+            if allowance is not None and allowance < LLM_REQUESTS_PER_ARTICLE:
+                print(f"LLM budget for generation is used up. Holding: {article['title'][:40]}...")
+                self.metrics.inc("generation_budget_deferred_total")
+                self._hold(item)
+                self.stop_event.wait(BUDGET_RETRY_SECONDS)
+                continue
+
+            if not self._reserve_daily_slot():
+                # The seen set skips it on later polls, so dropping it here would
+                # lose it for this run: hold it for tomorrow's quota instead
+                print(f"Daily limit ({self.daily_limit}) reached. Holding until tomorrow: {article['title'][:40]}...")
+                self.metrics.inc("generation_limit_deferred_total")
+                self._hold(item)
+                self.stop_event.wait(_seconds_until_tomorrow())
+                continue
+
+            print(f"Generating article for: {article['title']} (Score: {article['score']})")
+            try:
+                comparison_pool = self.existing_titles + generated_titles
+                duplicate_of = self.gemini.check_duplication(article['title'], article.get('summary', ''), comparison_pool)
+                if duplicate_of:
+                    print(f"SKIP: Duplicate detected! '{article['title']}' is a duplicate of '{duplicate_of}'")
+                    self.metrics.inc("duplicates_skipped_total")
+                    self._release_daily_slot()
+                    self._mark_known([article])
+                    continue
+
+                success = generate_from_article(article, self.gemini, self.classifier, self.wp,
+                                                image_queue=self.image_queue, dry_run=self.dry_run)
+            except Exception as e:
+                print(f"Error executing generation task: {e}")
+                success = False
+
+            if success:
+                generated_titles.append(article['title'])
+                self.metrics.inc("articles_generated_total")
+                self._mark_known([article])
+            else:
+                self.metrics.inc("generation_errors_total")
+                self._release_daily_slot()
+
+    # --- Helpers -----------------------------------------------------------
+
+    def _put(self, q, item):
+        """Blocking put that gives up when the daemon is stopping."""
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=1.0)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _hold(self, item):
+        """Keep a candidate for later without touching the bounded queue (never blocks)."""
+        with self._held_lock:
+            heapq.heappush(self._held, item)
+
+    def _next_candidate(self):
+        """Best of the held candidates and the queue's head, or None after a 1s idle wait."""
+        with self._held_lock:
+            if self._held:
+                # Let a better-scored queued item compete with the held ones
+                try:
+                    heapq.heappush(self._held, self.generate_queue.get_nowait())
+                except queue.Empty:
+                    pass
+                return heapq.heappop(self._held)
+        try:
+            return self.generate_queue.get(timeout=1.0)
+        except queue.Empty:
+            return None
+
+    def save_pending(self):
+        """Write held and still-queued candidates to pending_path (after the threads stopped)."""
+        with self._held_lock:
+            items, self._held = self._held, []
+        while True:
+            try:
+                items.append(self.generate_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not self.pending_path:
+            return
+        if not items:
+            if os.path.exists(self.pending_path):
+                os.remove(self.pending_path)
+            return
+        data = [a.to_dict() if hasattr(a, "to_dict") else dict(a) for _, _, a in sorted(items)]
+        os.makedirs(os.path.dirname(self.pending_path), exist_ok=True)
+        tmp = self.pending_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self.pending_path)
+        print(f"Saved {len(data)} pending candidate(s) for the next start.")
+
+    def load_pending(self):
+        """Restore candidates saved by a previous run (kept until the next stop() rewrites it)."""
+        if not self.pending_path or not os.path.exists(self.pending_path):
+            return
+        try:
+            with open(self.pending_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Failed to load pending candidates: {e}")
+            return
+        restored = 0
+        for record in data:
+            article = Article.from_dict(record)
+            # Generated after the file was written (e.g. the run was killed later)
+            if self.known_index is not None and url_hash(article['url']) in self.known_index:
+                continue
+            self._mark_seen(article['url'])
+            self._generate_seq += 1
+            self._hold((-article.get('score', 0), self._generate_seq, article))
+            restored += 1
+        print(f"Restored {restored} pending candidate(s).")
+
+    def _drain(self, q, max_items, first_timeout):
+        items = []
+        try:
+            items.append(q.get(timeout=first_timeout))
+        except queue.Empty:
+            return items
+        while len(items) < max_items:
+            try:
+                items.append(q.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _reserve_daily_slot(self):
+        day, count = self._generated_today
+        today = datetime.now().date()
+        if day != today:
+            day, count = today, 0
+            # New day: refresh the dedup pool from WordPress
+            self.refresh_existing_titles()
+        if self.daily_limit and count >= self.daily_limit:
+            self._generated_today = (day, count)
+            return False
+        self._generated_today = (day, count + 1)
+        return True
+
+    def _release_daily_slot(self):
+        day, count = self._generated_today
+        self._generated_today = (day, max(0, count - 1))
+
+    # --- Lifecycle ---------------------------------------------------------
+
+    def start(self):
+        for name, target in [("poller", self.poll_loop), ("scorer", self.score_loop), ("generator", self.generate_loop)]:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self.save_pending()
+        if self.known_index:
+            self.known_index.close()
+        self.scheduler.save()
+        get_source_health().save()
+        self.budget.save()
+        context_cache = getattr(self.gemini, "context_cache", None)
+        if context_cache:
+            context_cache.close()
+        if self.image_queue:
+            print("Waiting for hero image jobs to finish...")
+            self.image_queue.shutdown(wait=True)
+
+    def health(self):
+        threads = {t.name: t.is_alive() for t in self._threads}
+        counters, last_poll_at = self.metrics.snapshot()
+        last_poll = max(last_poll_at.values()) if last_poll_at else None
+        return {
+            "status": "ok" if all(threads.values()) else "degraded",
+            "uptime_seconds": int(time.time() - self.metrics.started_at),
+            "threads": threads,
+            "last_poll": datetime.fromtimestamp(last_poll).isoformat() if last_poll else None,
+            "queues": {"score": self.score_queue.qsize(), "generate": self.generate_queue.qsize()},
+            "generated_today": self._generated_today[1],
+            "counters": counters,
+        }
+
+    def render_metrics(self):
+        counters, last_poll_at = self.metrics.snapshot()
+        lines = []
+        for name, value in counters.items():
+            lines.append(f"# TYPE techshift_{name} counter")
+            lines.append(f"techshift_{name} {value}")
+        lines.append("# TYPE techshift_queue_depth gauge")
+        lines.append(f'techshift_queue_depth{{stage="score"}} {self.score_queue.qsize()}')
+        lines.append(f'techshift_queue_depth{{stage="generate"}} {self.generate_queue.qsize()}')
+        lines.append("# TYPE techshift_generated_today gauge")
+        lines.append(f"techshift_generated_today {self._generated_today[1]}")
+        lines.append("# TYPE techshift_source_last_poll_timestamp_seconds gauge")
+        for source, ts in sorted(last_poll_at.items()):
+            lines.append(f'techshift_source_last_poll_timestamp_seconds{{source="{source}"}} {ts:.0f}')
+        lines.append("# TYPE techshift_source_poll_interval_seconds gauge")
+        for source in sorted(self.sources):
+            interval = self.scheduler.state.get(source, {}).get("interval")
+            if interval is not None:
+                lines.append(f'techshift_source_poll_interval_seconds{{source="{source}"}} {interval}')
+        health = get_source_health()
+        lines.append("# TYPE techshift_source_circuit_open gauge")
+        for source in sorted(self.sources):
+            for kind in KINDS:
+                stats = health.stats(source, kind)
+                if stats:
+                    is_open = 0 if stats["circuit"] == "closed" else 1
+                    lines.append(f'techshift_source_circuit_open{{source="{source}",kind="{kind}"}} {is_open}')
+        lines.extend(cascade_stats.render_metrics())
+        lines.extend(self.budget.render_metrics())
+        lines.extend(hedge_stats.render_metrics())
+        pool = getattr(self.gemini, "pool", None)
+        if pool:
+            lines.extend(pool.render_metrics())
+        context_cache = getattr(self.gemini, "context_cache", None)
+        if context_cache:
+            lines.extend(context_cache.render_metrics())
+        return "\n".join(lines) + "\n"
+
+
+def make_health_server(daemon, port, host="0.0.0.0"):
+    """HTTP server for /healthz and /metrics (serve_forever in a thread)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/healthz":
+                health = daemon.health()
+                body = json.dumps(health, ensure_ascii=False).encode("utf-8")
+                status = 200 if health["status"] == "ok" else 503
+                content_type = "application/json"
+            elif self.path == "/metrics":
+                body = daemon.render_metrics().encode("utf-8")
+                status = 200
+                content_type = "text/plain; version=0.0.4"
+            else:
+                body = b"not found"
+                status = 404
+                content_type = "text/plain"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep the daemon log for pipeline events
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TechShift Pipeline Daemon (continuous collect -> score -> generate)")
+    parser.add_argument("--threshold", type=int, default=85, help="Score threshold for generation")
+    parser.add_argument("--daily-limit", type=int, default=6, help="Max articles generated per day (0 for unlimited)")
+    parser.add_argument("--hours", type=int, default=6, help="Freshness window for feed items")
+    parser.add_argument("--score-batch", type=int, default=10, help="Items per scoring batch")
+    parser.add_argument("--queue-size", type=int, default=50, help="Capacity of each stage queue")
+    parser.add_argument("--port", type=int, default=int(os.getenv("DAEMON_HEALTH_PORT", "8765")), help="Health/metrics port (0 to disable)")
+    parser.add_argument("--source", type=str, default=None, help="Comma-separated source keys (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Dry run mode (no posting)")
+    args = parser.parse_args()
+
+    sources = None
+    if args.source:
+        sources = {k.strip(): DEFAULT_SOURCES[k.strip()] for k in args.source.split(",") if k.strip() in DEFAULT_SOURCES}
+
+    daemon = PipelineDaemon(
+        threshold=args.threshold,
+        daily_limit=args.daily_limit,
+        lookback_hours=args.hours,
+        score_batch_size=args.score_batch,
+        queue_size=args.queue_size,
+        dry_run=args.dry_run,
+        sources=sources,
+    )
+
+    def handle_signal(signum, frame):
+        print(f"\nReceived signal {signum}. Shutting down gracefully...")
+        daemon.stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print("Initializing clients...")
+    daemon.warm_up()
+    daemon.start()
+
+    server = None
+    if args.port:
+        server = make_health_server(daemon, args.port)
+        threading.Thread(target=server.serve_forever, name="health", daemon=True).start()
+        print(f"Health endpoint: http://localhost:{args.port}/healthz (metrics: /metrics)")
+
+    print(f"Daemon started: {len(daemon.sources)} sources, threshold {args.threshold}, daily limit {args.daily_limit}")
+    while not daemon.stop_event.is_set():
+        daemon.stop_event.wait(1.0)
+
+    daemon.stop()
+    if server:
+        server.shutdown()
+    print("Daemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,6 @@ import argparse
 import sys
 import os
 import json
-import hashlib
-import markdown
 import time
 from datetime import datetime, timedelta
 
@@ -17,21 +15,29 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from automation.db.client import DBClient
-from automation.gemini_client import GeminiClient
+from automation.db.known_urls import BRIEFING_PATH, KnownUrlIndex, url_hash
+from automation.analysis.clustering import cluster_articles
+from automation.client_registry import get_gemini_client
+from automation.llm_budget import get_llm_budget, set_stage
+from automation.token_budget import budget_for
 from automation.wp_client import WordPressClient
 from automation.collectors.collector import collect_articles
 from automation.collectors.url_reader import extract_content
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from automation.internal_linker import InternalLinkSuggester
+from automation.image_queue import ImageJobQueue
+from automation.lazy import lazy_import
+
+markdown = lazy_import("markdown")
 
 def get_url_hash(url):
-    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return url_hash(url)
 
 def phase_1_collection(args):
     print("\n=== Phase 1: Global Data Collection ===")
     db = DBClient()
-    gemini = GeminiClient()
+    gemini = get_gemini_client()
     
     # Ensure DB Schema is up to date
     try:
@@ -48,21 +54,34 @@ def phase_1_collection(args):
     
     today_date = datetime.now()
     
-    # --- Optimization: Batch Deduplication ---
-    print(">> Checking Database for duplicates (Batch)...")
-    art_map = {}
-    all_hashes = []
-    
-    for art in articles:
-        u_hash = get_url_hash(art['url'])
-        art['url_hash'] = u_hash
-        all_hashes.append(u_hash)
-        art_map[u_hash] = art
-        
-    known_hashes = db.check_known_hashes(all_hashes)
+    # --- Optimization: Local Known-URL Index (no REST round-trip per hash) ---
+    # The briefing's own index: the shared one also holds URLs the pipeline / daemon
+    # only scored or rejected, which were never saved to ts_articles
+    print(">> Checking known-URL index for duplicates...")
+    known_index = KnownUrlIndex.open(BRIEFING_PATH)
+    synced = known_index.sync(db)
+    if synced is None:
+        print("Warning: Known-URL index sync failed. Falling back to DB check for unknown hashes.")
+    else:
+        print(f"Known-URL index synced (+{synced} hashes).")
+
+    known_hashes = {art['url_hash'] for art in articles if art['url_hash'] in known_index}
+    if synced is None:
+        unknown = [art['url_hash'] for art in articles if art['url_hash'] not in known_hashes]
+        known_hashes |= db.check_known_hashes(unknown)
     print(f"Skipped {len(known_hashes)} existing articles.")
     
     new_articles = [art for art in articles if art['url_hash'] not in known_hashes]
+
+    # Cross-source near-duplicates: check relevance once per story
+    stories = cluster_articles(new_articles)
+    duplicate_copies = {}
+    for story in stories:
+        for copy in story['corroborating_sources']:
+            duplicate_copies[copy['url']] = story
+    if duplicate_copies:
+        print(f"Clustered {len(new_articles)} new articles into {len(stories)} unique stories.")
+    new_articles, copies = stories, [art for art in new_articles if art['url'] in duplicate_copies]
     
     if not new_articles:
         print("No new articles to process.")
@@ -90,9 +109,9 @@ def phase_1_collection(args):
                         extracted = future.result()
                         # Update summary with full content if available
                         if extracted and extracted.get('content') and len(extracted.get('content')) > 200:
-                            # Truncate to reasonable length for Gemini (e.g. 3000 chars)
-                            # Enough for relevance check and analysis, but not too huge for DB
-                            art['summary'] = extracted['content'][:4000]
+                            # Lead + most salient paragraphs within a token budget (token_budget.py):
+                            # enough for relevance check and analysis, but not too huge for DB
+                            art.attach_content(extracted['content'], summary_tokens=budget_for("article_summary"))
                             # art['is_full_content'] = True # usage flag if needed
                     except Exception as exc:
                         print(f"    Content fetch failed for {art['title'][:20]}...: {exc}")
@@ -104,41 +123,52 @@ def phase_1_collection(args):
             for art in batch:
                 try:
                     u_hash = art['url_hash']
-                    res = results_map.get(u_hash, {'is_relevant': False, 'reason': 'Batch Error/Missing'})
+                    res = results_map.get(u_hash, {'is_relevant': False, 'reason': 'Batch Error/Missing', 'failed': True})
+                    if res.get('failed'):
+                        # Neither saved nor marked known: the next run checks it again
+                        print(f"Relevance check failed, retrying next run: {art['title'][:30]}...")
+                        continue
                     
                     is_relevant = res['is_relevant']
                     reason = res['reason']
                     
                     # Save
-                    article_record = {
-                        "url_hash": u_hash,
-                        "title": art['title'],
-                        "source": art['source'],
-                        "region": art.get('region', 'Global'),
-                        "published_at": art['published'],
-                        "summary": art['summary'],
-                        "is_relevant": is_relevant,
-                        "relevance_reason": reason
-                    }
-                    if article_record['published_at'] == "Unknown":
-                         article_record['published_at'] = today_date
+                    article_record = art.to_record(default_date=today_date, is_relevant=is_relevant, relevance_reason=reason)
                     
                     if args.dry_run:
                         print(f"[Dry-Run] Processed: {art['title'][:40]}... (Relevant: {is_relevant})")
                     else:
                          db.save_article(article_record)
+                         known_index.add(u_hash)
                          print(f"Saved: {art['title'][:30]}... (Relevant: {is_relevant})")
                     
                     new_count += 1
                     
                 except Exception as e:
                     print(f"Error processing {art['title'][:20]}...: {e}")
+                finally:
+                    art.content = None # full text is not needed after the relevance check
             
             # Small buffer between batches
             time.sleep(2)
                 
         print(f"Finished processing {new_count} new articles.")
 
+    # Store the other copies as known (not relevant) so they aren't collected again
+    for art in copies:
+        story = duplicate_copies[art['url']]
+        record = art.to_record(
+            default_date=today_date,
+            summary=art.summary[:1000],
+            is_relevant=False,
+            relevance_reason=f"Same story as: {story['title']} ({story['source']})"
+        )
+        if not args.dry_run:
+            db.save_article(record)
+            known_index.add(art['url_hash'])
+
+    known_index.close()
+
     # 2. Market Data & Economic Calendar (Deprecated/Removed)
     print(">> Market Data & Economic Calendar collection skipped (Modules removed).")
 
@@ -157,7 +187,7 @@ def phase_2_analysis(args):
         primary_region_label = args.region
         
     db = DBClient()
-    gemini = GeminiClient()
+    gemini = get_gemini_client()
     wp = WordPressClient()
     today_str = datetime.now().strftime('%Y-%m-%d')
 
@@ -170,25 +200,24 @@ def phase_2_analysis(args):
 
     print(f">> Consolidating News from: {target_regions}")
 
-    # 1. Iterate Sub-regions to collect CONTEXT
-    for region in target_regions:
-        print(f"   [Collecting] {region}...")
-        
-        # Get News
-        news = db.get_articles(region=region, hours=args.hours)
-        if news:
-            for n in news:
-                # Deduplicate
-                # Try url_hash, fallback to title if API not updated yet
-                unique_key = n.get('url_hash') or n.get('title')
-                
-                if unique_key and unique_key not in seen_urls:
-                    n['sub_region'] = region # Tag source region
-                    all_news.append(n)
-                    seen_urls.add(unique_key)
-        
-        # Get Deep Dives (Created Today)
-        created_articles = db.get_todays_generated_articles(region=region)
+    # 1. Collect CONTEXT for all sub-regions in one request
+    # (rows come back once, tagged with the regions they belong to)
+    context_rows = db.get_articles_context(target_regions, hours=args.hours)
+    deep_dives = {region: [] for region in target_regions}
+    for n in context_rows:
+        regions = n.get('regions') or [n.get('region')]
+        if n.get('in_window', 1):
+            # Try url_hash, fallback to title if API not updated yet
+            unique_key = n.get('url_hash') or n.get('title')
+            if unique_key and unique_key not in seen_urls:
+                n['sub_region'] = regions[0] # Tag source region
+                all_news.append(n)
+                seen_urls.add(unique_key)
+        if n.get('is_generated'):
+            for region in regions:
+                deep_dives.setdefault(region, []).append(n)
+
+    for region, created_articles in deep_dives.items():
         if created_articles:
              full_str_context += f"\n## {region} Deep Dives (Must Feature/Link)\n"
              for art in created_articles:
@@ -344,18 +373,8 @@ def phase_2_analysis(args):
 
     content_body_html = markdown.markdown(content_body_md, extensions=['tables', 'fenced_code', 'nl2br'])
     
-    featured_media_id = None
-    if not args.dry_run:
-        try:
-            print("Generating Feature Image...")
-            img_prompt = gemini.generate_image_prompt(title, content_body_md[:2000], "daily-briefing")
-            img_path = os.path.join(output_dir, f"{filename_base}.png")
-            saved_img = gemini.generate_image(img_prompt, img_path)
-            if saved_img:
-                media_res = wp.upload_media(saved_img, alt_text=title)
-                if media_res: featured_media_id = media_res.get('id')
-        except Exception as e:
-            print(f"Image generation failed: {e}")
+    # Feature image is generated after publishing; use the placeholder until then
+    featured_media_id = ImageJobQueue.placeholder_media_id()
 
     # Post Meta - Map TechShift keys to Custom Fields
     post_meta = {
@@ -378,6 +397,20 @@ def phase_2_analysis(args):
             # Maybe fall back to General if Global tag doesn't exist, or just skip
             pass
         
+        # Queue workers (worker.py): one briefing post per day and region
+        publish_guard = getattr(args, "publish_guard", None)
+        if publish_guard is not None and not publish_guard.acquire():
+            print("Skipping post: today's briefing was already published by another task.")
+            return
+        if publish_guard is not None:
+            # An earlier lease of this task may have posted before it died
+            existing = publish_guard.existing_post(wp) if publish_guard.in_doubt else None
+            if existing:
+                print(f"Briefing already posted by an earlier attempt (ID: {existing.get('id')}).")
+                publish_guard.settle({"id": existing.get('id'), "link": existing.get('link')})
+                return
+            content_body_html = publish_guard.mark(content_body_html)
+
         res = wp.create_post(
             title=title,
             content=content_body_html,
@@ -389,9 +422,24 @@ def phase_2_analysis(args):
         )
         if res:
             print(f"Posted to WordPress (ID: {res.get('id')}). Status: publish")
+            if publish_guard is not None:
+                publish_guard.settle({"id": res.get('id'), "link": res.get('link')})
             if res.get('link'):
                 analysis_record['article_url'] = res.get('link')
                 db.save_daily_analysis(analysis_record)
+
+            # Feature Image (Background)
+            print("Generating Feature Image...")
+            image_queue = ImageJobQueue(gemini, wp, max_workers=1)
+            image_queue.submit(
+                title,
+                content_body_md[:2000],
+                os.path.join(output_dir, f"{filename_base}.png"),
+                article_type="daily-briefing",
+                post_id=res.get('id'),
+                alt_text=title
+            )
+            image_queue.shutdown(wait=True)
         else:
             print("Failed to post to WordPress.")
 
@@ -407,8 +455,27 @@ def main():
     parser.add_argument("--region", default="all", help="Target region (US, JP, etc) or 'all'")
     parser.add_argument("--hours", type=int, default=24, help="Lookback hours for news")
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--enqueue", action="store_true", help="Queue the run as a briefing task for `worker --kinds briefing`")
     
     args = parser.parse_args()
+
+    if args.enqueue:
+        from automation.work_queue import open_queue
+        work_queue = open_queue()
+        today = datetime.now().strftime('%Y-%m-%d')
+        task_id = work_queue.enqueue(
+            "briefing",
+            {"phase": args.phase, "region": args.region, "hours": args.hours, "dry_run": args.dry_run, "date": today},
+            key=f"{today}:{args.region}:{args.phase}",
+        )
+        print(f"Queued briefing task #{task_id}." if task_id else "Briefing task for today is already queued.")
+        work_queue.close()
+        return
+
+    # The briefing runs at critical priority: it may use the capacity reserved in the LLM budget
+    set_stage("briefing")
+    budget = get_llm_budget()
+    print(budget.summary("briefing"))
     
     if args.phase in ["collect", "all"]:
         phase_1_collection(args)
@@ -416,5 +483,7 @@ def main():
     if args.phase in ["analyze", "all"]:
         phase_2_analysis(args)
 
+    print(budget.summary("briefing"))
+
 if __name__ == "__main__":
     main()
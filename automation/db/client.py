@@ -1,9 +1,17 @@
 import os
+import sys
 import json
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from automation.lazy import lazy_import
+
+# requests is only loaded on the first API call
+requests = lazy_import("requests")
+
 # Load env from parent directory
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 load_dotenv(env_path)
@@ -89,6 +97,20 @@ class DBClient:
                 existing.update(res["exists"])
         return existing
 
+    def get_article_hashes(self, since_id=0, limit=5000):
+        """
+        Incremental url_hash feed for the local known-URL index.
+        Returns {"hashes": [...], "last_id": int, "has_more": bool} or None on failure.
+        """
+        return self._get("articles/hashes", {"since_id": since_id, "limit": limit})
+
+    def get_article_labels(self, since_id=0, limit=2000):
+        """
+        Title/summary/is_relevant rows (id > since_id) used to train the scoring pre-filter.
+        Returns {"articles": [...], "last_id": int, "has_more": bool} or None on failure.
+        """
+        return self._get("articles/labels", {"since_id": since_id, "limit": limit})
+
     def save_article(self, article):
         """
         Save an article via API.
@@ -165,6 +187,66 @@ class DBClient:
                 generated.append(art)
         return generated
 
+    def get_articles_context(self, regions, hours=24, limit=50, generated_hours=24):
+        """
+        Briefing context for several regions in one request (GET articles/context).
+
+        Returns a list of article dicts, each row once, with:
+            regions: requested regions the row belongs to ('Global' rows match all)
+            in_window: 1 if published within `hours`
+            is_generated / article_url: a TechShift post exists for the article
+        Rows outside `hours` are only included when generated within `generated_hours`.
+
+        Falls back to the per-region routes (fetched in parallel) when the server
+        does not have the context route yet.
+        """
+        regions = list(regions)
+        res = self._get("articles/context", {
+            "regions": ",".join(regions),
+            "hours": hours,
+            "limit": limit,
+            "generated_hours": generated_hours
+        })
+        if res is not None and "articles" in res:
+            return res["articles"]
+
+        print("articles/context unavailable, fetching regions in parallel...")
+        return self._get_articles_context_legacy(regions, hours, limit, generated_hours)
+
+    def _get_articles_context_legacy(self, regions, hours, limit, generated_hours):
+        def fetch(region):
+            news = self.get_articles(region=region, hours=hours, limit=limit)
+            recent = self.get_articles(region=region, hours=generated_hours, limit=limit)
+            return region, news, recent
+
+        merged = {}
+        with ThreadPoolExecutor(max_workers=min(8, 2 * max(1, len(regions)))) as executor:
+            for region, news, recent in executor.map(fetch, regions or [None]):
+                for in_window, rows in ((1, news), (0, [a for a in recent if a.get('article_url')])):
+                    for art in rows:
+                        key = art.get('url_hash') or art.get('title')
+                        row = merged.get(key)
+                        if row is None:
+                            row = merged[key] = dict(art, regions=[], in_window=in_window,
+                                                     is_generated=1 if art.get('article_url') else 0)
+                        row['in_window'] = max(row['in_window'], in_window)
+                        tag = region or art.get('region')
+                        if tag not in row['regions']:
+                            row['regions'].append(tag)
+        return list(merged.values())
+
+    def set_article_url(self, url_hash, article_url, record=None):
+        """
+        Record the TechShift post written from a collected article (ts_articles.article_url).
+
+        record (Article.to_record()) lets the server create the row when the article
+        was never saved to ts_articles; without it a missing row is a 404 (False).
+        """
+        payload = dict(record or {})
+        payload.update(url_hash=url_hash, article_url=article_url)
+        res = self._post("articles/link", payload)
+        return bool(res and res.get('success'))
+
     def get_latest_market_snapshot(self):
         # Get list limit 1
         res = self._get("market-snapshots", {"limit": 1})
@@ -0,0 +1,203 @@
+"""
+Known-URL Index for TechShift
+
+Local, persistent index of every article url_hash we have already seen, so
+known items are discarded at collection time without a REST round-trip or
+an LLM call.
+
+- BloomFilter: in-memory bit array; a negative answer is final
+- Exact set: SQLite table (automation/data/known_urls.sqlite) used to resolve
+  Bloom positives, so false positives never drop a new article
+- Sync: incremental from ts_articles via GET techshift/v1/articles/hashes?since_id=N
+- Two indexes: DEFAULT_PATH is shared by pipeline / daemon / worker ("already
+  scored, clustered or pre-filtered"); BRIEFING_PATH is the daily briefing's own
+  ("already saved in ts_articles") and only gets ts_articles syncs and its saves
+
+Usage:
+    index = KnownUrlIndex.open()
+    index.sync(DBClient())
+    new_articles = [a for a in articles if url_hash(a['url']) not in index]
+    index.add_many(url_hash(a['url']) for a in scored)
+    index.save()
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_PATH = os.path.join(DATA_DIR, "known_urls.sqlite")
+BRIEFING_PATH = os.path.join(DATA_DIR, "briefing_known_urls.sqlite")
+
+
+def url_hash(url):
+    """sha256 hex digest of the URL (same key as ts_articles.url_hash)."""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+class BloomFilter:
+    """
+    Bloom filter over sha256 hex keys.
+
+    Bit positions come from double hashing on two 64-bit slices of the key,
+    so no extra hashing is needed for url_hash values.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001, bits=None, num_hashes=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = bits or max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = num_hashes or max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        if len(key) != 64:
+            key = url_hash(key)
+        h1 = int(key[:16], 16)
+        h2 = int(key[16:32], 16) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
+
+
+class KnownUrlIndex:
+    """
+    Bloom filter + exact SQLite set of known url_hashes, persisted locally.
+
+    Thread-safe: the daemon's poller and scorer share one instance.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, capacity=100000, error_rate=0.001):
+        self.path = path
+        self.error_rate = error_rate
+        self._lock = threading.RLock()
+        self._dirty = False
+        self.stats = {"bloom_negative": 0, "bloom_false_positive": 0, "known": 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS known_hashes (url_hash TEXT PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB)")
+        self._conn.commit()
+
+        self.last_id = int(self._get_meta("last_id") or 0)
+        self.bloom = self._load_bloom() or self._rebuild_bloom(capacity)
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH):
+        return cls(path)
+
+    # --- Persistence -------------------------------------------------------
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _load_bloom(self):
+        bits = self._get_meta("bloom_bits")
+        params = self._get_meta("bloom_params")
+        if not bits or not params:
+            return None
+        size, num_hashes, capacity, count = (int(v) for v in params.split(","))
+        bloom = BloomFilter(capacity=capacity, error_rate=self.error_rate, bits=size, num_hashes=num_hashes)
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        return bloom
+
+    def _rebuild_bloom(self, capacity):
+        """Build a fresh filter from the exact set (also used to grow it)."""
+        total = self._conn.execute("SELECT COUNT(*) FROM known_hashes").fetchone()[0]
+        capacity = max(capacity, total * 2)
+        bloom = BloomFilter(capacity=capacity, error_rate=self.error_rate)
+        for (key,) in self._conn.execute("SELECT url_hash FROM known_hashes"):
+            bloom.add(key)
+        self._dirty = True
+        return bloom
+
+    def save(self):
+        """Persist the filter bits and sync cursor."""
+        with self._lock:
+            if not self._dirty:
+                return
+            bloom = self.bloom
+            self._set_meta("bloom_bits", bytes(bloom.bits))
+            self._set_meta("bloom_params", f"{bloom.size},{bloom.num_hashes},{bloom.capacity},{bloom.count}")
+            self._set_meta("last_id", str(self.last_id))
+            self._conn.commit()
+            self._dirty = False
+
+    def close(self):
+        self.save()
+        self._conn.close()
+
+    # --- Lookup / update ---------------------------------------------------
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self.bloom:
+                self.stats["bloom_negative"] += 1
+                return False
+            found = self._conn.execute("SELECT 1 FROM known_hashes WHERE url_hash = ?", (key,)).fetchone() is not None
+            self.stats["known" if found else "bloom_false_positive"] += 1
+            return found
+
+    def add_many(self, keys):
+        """Add url_hashes to the index. Returns the number of new keys."""
+        with self._lock:
+            added = 0
+            for key in keys:
+                cur = self._conn.execute("INSERT OR IGNORE INTO known_hashes (url_hash) VALUES (?)", (key,))
+                if cur.rowcount:
+                    self.bloom.add(key)
+                    added += 1
+            if added:
+                self._dirty = True
+                if self.bloom.is_full:
+                    self._conn.commit()
+                    self.bloom = self._rebuild_bloom(self.bloom.capacity * 2)
+            return added
+
+    def add(self, key):
+        return self.add_many([key]) > 0
+
+    def sync(self, db_client, page_size=5000):
+        """
+        Pull url_hashes added to ts_articles since the last sync.
+
+        Returns:
+            Number of new hashes, or None if the sync failed (index still usable,
+            but may miss articles saved by other hosts).
+        """
+        added = 0
+        with self._lock:
+            while True:
+                prev_id = self.last_id
+                res = db_client.get_article_hashes(since_id=prev_id, limit=page_size)
+                if res is None:
+                    return None
+                added += self.add_many(res.get("hashes", []))
+                last_id = int(res.get("last_id") or prev_id)
+                if last_id > prev_id:
+                    self.last_id = last_id
+                    self._dirty = True
+                if not res.get("has_more") or last_id <= prev_id:
+                    break
+            self.save()
+        return added
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Post-generation Enrichment for TechShift
+
+After an article is generated, run_generation_task needs:
+meta description, hero image prompt, category/tags, structured summary,
+impact analysis and SNS copy. Producing each with its own model call re-sends
+the article text five or six times.
+
+ArticleEnricher asks for all fields in ONE structured-output call against a
+combined response schema, validates every field, and falls back to the
+existing single-purpose method only for the fields that failed validation.
+
+Fields already produced elsewhere (classification and image prompt are started
+from the title while the article body is still streaming) can be passed as
+`precomputed` and are left out of the combined call.
+
+Modes:
+    combined (default): one call + per-field fallbacks
+    separate: the individual methods, as before
+"""
+
+import re
+import textwrap
+
+try:
+    from automation.analysis.classifier import ArticleClassifier, TAXONOMY_GUIDE, CATEGORY_SLUGS, TAG_SLUGS
+    from automation.seo_optimizer import SEOOptimizer
+    from automation.token_budget import budget_for, fit_to_budget
+except ImportError:
+    from analysis.classifier import ArticleClassifier, TAXONOMY_GUIDE, CATEGORY_SLUGS, TAG_SLUGS
+    from seo_optimizer import SEOOptimizer
+    from token_budget import budget_for, fit_to_budget
+
+FIELDS = ["meta_description", "image_prompt", "classification", "structured_summary", "impact_analysis", "sns_content"]
+
+# Only generated on demand when the combined call didn't produce them (e.g. SNS copy
+# is needed only if the post is published and X is configured)
+LAZY_FALLBACK_FIELDS = {"sns_content"}
+
+_STRING = {"type": "STRING"}
+_STRING_LIST = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "meta_description": _STRING,
+        "image_prompt": _STRING,
+        "classification": {
+            "type": "OBJECT",
+            "properties": {"category": _STRING, "tags": _STRING_LIST},
+            "required": ["category", "tags"],
+        },
+        "structured_summary": {
+            "type": "OBJECT",
+            "properties": {
+                "summary": _STRING,
+                "key_topics": _STRING_LIST,
+                "entities": _STRING_LIST,
+                "timeline_impact": _STRING,
+                "technical_bottleneck": _STRING,
+            },
+            "required": ["summary", "key_topics"],
+        },
+        "impact_analysis": {
+            "type": "OBJECT",
+            "properties": {
+                "shift_score": {"type": "INTEGER"},
+                "shift_analysis": {
+                    "type": "OBJECT",
+                    "properties": {"the_shift": _STRING, "catalyst": _STRING, "next_wall": _STRING, "signal": _STRING},
+                    "required": ["the_shift"],
+                },
+            },
+            "required": ["shift_score", "shift_analysis"],
+        },
+        "sns_content": {
+            "type": "OBJECT",
+            "properties": {"hook": _STRING, "summary": _STRING, "hashtags": _STRING_LIST},
+            "required": ["hook", "summary", "hashtags"],
+        },
+    },
+    "required": FIELDS,
+}
+
+
+PROMPT_HEADER = textwrap.dedent("""
+    You are the editorial system of "TechShift", a future foresight media for CTOs, R&D leaders and tech investors.
+    The following Japanese article has just been written. Produce ALL of the metadata fields below in one JSON object.
+
+    ## Article
+    Title: {title}
+    Keyword: {keyword}
+    Type: {article_type}
+    Content:
+    {content}
+
+    ## Fields
+    """)
+
+FIELD_GUIDES = {
+    "meta_description": textwrap.dedent("""
+        meta_description (Japanese, 120-160 chars):
+           Search snippet that conveys why this matters (foresight and technical impact) for investors and engineers.
+           Include the keyword naturally. No beginner "〜とは？" tone.
+        """),
+    "image_prompt": textwrap.dedent("""
+        image_prompt (English, max 100 words):
+           Hero image prompt for Imagen. Theme "Future Technology / Innovation", premium editorial style
+           (Wired / The Verge feature), cinematic volumetric lighting, cyan/magenta/deep blue.
+           No text, no human faces, no complex diagrams.
+        """),
+    "classification": textwrap.dedent("""
+        classification: "category" is ONE slug and "tags" are ALL relevant tag slugs from this taxonomy:
+        """) + TAXONOMY_GUIDE,
+    "structured_summary": textwrap.dedent("""
+        structured_summary (Japanese; used for internal linking):
+           summary (300-500 chars, technical specifics and timeline impact), key_topics, entities (original names),
+           timeline_impact (Accelerated/Delay/Unchanged and why), technical_bottleneck.
+        """),
+    "impact_analysis": textwrap.dedent("""
+        impact_analysis:
+           shift_analysis.the_shift: "Before State -> After State" strictly from the text, concrete, max 60 chars, Japanese.
+           shift_analysis.catalyst (Why now?), next_wall (new bottleneck), signal (what to watch) in Japanese.
+           shift_score (0-100): 80-100 accelerated, 60-79 positive, 40-59 neutral, 20-39 delayed, 0-19 critical failure.
+        """),
+    "sns_content": textwrap.dedent("""
+        sns_content (Japanese X post):
+           hook (max 60 chars, one relevant emoji, what changed in the future timeline),
+           summary (max 120 chars, why this matters for the roadmap),
+           hashtags (5; tech keywords, middle words like #技術戦略 #未来予測, companies mentioned).
+        """),
+}
+
+
+def build_prompt(title, content, keyword, article_type, fields=FIELDS):
+    prompt = PROMPT_HEADER.format(
+        title=title,
+        keyword=keyword,
+        article_type=article_type,
+        content=fit_to_budget(content, budget_for("enrichment"), query=title),
+    )
+    return prompt + "".join(f"\n{i}. {FIELD_GUIDES[field].strip()}\n" for i, field in enumerate(fields, 1))
+
+
+def response_schema(fields=FIELDS):
+    """RESPONSE_SCHEMA restricted to the requested fields."""
+    return {
+        "type": "OBJECT",
+        "properties": {field: RESPONSE_SCHEMA["properties"][field] for field in fields},
+        "required": list(fields),
+    }
+
+
+# --- Validators (return the cleaned value, or None if the field is unusable) ---
+
+def _valid_meta_description(value):
+    if not isinstance(value, str) or len(value.strip()) < 80:
+        return None
+    value = value.strip()
+    if len(value) > 160:
+        value = value[:157] + "..."
+    return value
+
+
+def _valid_image_prompt(value):
+    if not isinstance(value, str) or len(value.split()) < 8:
+        return None
+    return value.strip()
+
+
+def _valid_classification(value):
+    if not isinstance(value, dict) or value.get("category") not in CATEGORY_SLUGS:
+        return None
+    tags = [t for t in value.get("tags") or [] if t in TAG_SLUGS]
+    return {"category": value["category"], "tags": tags}
+
+
+def _valid_structured_summary(value):
+    if not isinstance(value, dict) or not str(value.get("summary") or "").strip():
+        return None
+    if not isinstance(value.get("key_topics"), list):
+        return None
+    return value
+
+
+def _valid_impact_analysis(value):
+    if not isinstance(value, dict):
+        return None
+    score = value.get("shift_score")
+    shift = value.get("shift_analysis")
+    if not isinstance(score, (int, float)) or not 0 <= score <= 100:
+        return None
+    if not isinstance(shift, dict) or not str(shift.get("the_shift") or "").strip():
+        return None
+    return {**value, "shift_score": int(score)}
+
+
+def _valid_sns_content(value):
+    if not isinstance(value, dict) or not str(value.get("hook") or "").strip():
+        return None
+    hashtags = [t if t.startswith("#") else f"#{t}" for t in value.get("hashtags") or [] if isinstance(t, str) and t]
+    if not hashtags:
+        return None
+    return {**value, "hashtags": hashtags}
+
+
+VALIDATORS = {
+    "meta_description": _valid_meta_description,
+    "image_prompt": _valid_image_prompt,
+    "classification": _valid_classification,
+    "structured_summary": _valid_structured_summary,
+    "impact_analysis": _valid_impact_analysis,
+    "sns_content": _valid_sns_content,
+}
+
+
+class ArticleEnricher:
+    """
+    Produce post-generation metadata for one article.
+
+    Usage:
+        enricher = ArticleEnricher(gemini)
+        fields = enricher.enrich(title, content, keyword, article_type)
+        fields["meta_description"], fields["classification"], ...
+    """
+
+    def __init__(self, gemini, classifier=None, optimizer=None, mode="combined"):
+        self.gemini = gemini
+        self.classifier = classifier or ArticleClassifier(client=gemini)
+        self.optimizer = optimizer or SEOOptimizer(client=gemini)
+        self.mode = mode
+        self.stats = {"calls": 0, "fallbacks": []}
+
+    def enrich(self, title, content, keyword, article_type="topic-focus", precomputed=None):
+        """
+        Returns a dict with every field in FIELDS. A field is None only if both
+        the combined call and its fallback failed (or it is a lazy field).
+
+        precomputed: Optional {field: value} produced earlier (e.g. from the title
+        while the body was streaming); valid values are kept and left out of the
+        combined call.
+        """
+        # Plain text is enough for metadata (no HTML/Markdown image tags)
+        text = re.sub('<[^<]+?>', '', content)
+        results = {}
+        for field, value in (precomputed or {}).items():
+            if field in VALIDATORS:
+                results[field] = VALIDATORS[field](value)
+        pending = [field for field in FIELDS if results.get(field) is None]
+
+        if self.mode == "combined" and pending:
+            self.stats["calls"] += 1
+            prompt = build_prompt(title, text, keyword, article_type, fields=pending)
+            raw = self.gemini.generate_json(prompt, response_schema=response_schema(pending)) or {}
+            for field in pending:
+                results[field] = VALIDATORS[field](raw.get(field))
+
+        for field in FIELDS:
+            if results.get(field) is None and field not in LAZY_FALLBACK_FIELDS:
+                results[field] = self.fallback(field, title, text, keyword, article_type)
+
+        if self.stats["fallbacks"]:
+            print(f"Enrichment fallbacks: {', '.join(self.stats['fallbacks'])}")
+        print(f"Enrichment ({self.mode}): {self.stats['calls']} model call(s)")
+        return results
+
+    def fallback(self, field, title, content, keyword, article_type="topic-focus"):
+        """Produce one field with today's single-purpose method."""
+        self.stats["calls"] += 1
+        if self.mode == "combined":
+            self.stats["fallbacks"].append(field)
+        try:
+            if field == "meta_description":
+                return self.optimizer.generate_meta_description(title, content, keyword)
+            if field == "image_prompt":
+                return self.gemini.generate_image_prompt(title, content[:1000], article_type)
+            if field == "classification":
+                return self.classifier.classify_article(title, content[:1000])
+            if field == "structured_summary":
+                return self.gemini.generate_structured_summary(content)
+            if field == "impact_analysis":
+                return self.gemini.analyze_single_article_impact(title=title, content=content, article_type=article_type)
+            if field == "sns_content":
+                return self.gemini.generate_sns_content(title, content, article_type)
+        except Exception as e:
+            print(f"Enrichment fallback failed for {field}: {e}")
+        return None
@@ -1,17 +1,211 @@
 # -*- coding: utf-8 -*-
 import os
 import base64
+import html
 import json
-from google import genai
-from google.genai import types
 from dotenv import load_dotenv
 import time
 import random
 import textwrap
+import unicodedata
+from types import SimpleNamespace
+
+try:
+    from automation.client_registry import get_genai_client
+    from automation.lazy import lazy_import
+    from automation.analysis.cascade import CascadePolicy, cascade_stats
+    from automation.analysis import map_reduce
+    from automation.context_cache import ContextCacheManager, GenaiCacheBackend
+    from automation.llm_budget import get_llm_budget, current_stage
+    from automation.hedging import HedgePolicy, run_hedged, with_timeout
+    from automation.token_budget import budget_for, fit_to_budget, trim_to_tokens
+    from automation.backend_pool import BackendPool, BackendUnavailable, PooledClient
+    from automation.streaming import consume_stream, StreamCancelled, StreamStalled, StreamTruncated, MAX_ATTEMPTS as STREAM_MAX_ATTEMPTS
+except ImportError:
+    from client_registry import get_genai_client
+    from lazy import lazy_import
+    from analysis.cascade import CascadePolicy, cascade_stats
+    from analysis import map_reduce
+    from context_cache import ContextCacheManager, GenaiCacheBackend
+    from llm_budget import get_llm_budget, current_stage
+    from hedging import HedgePolicy, run_hedged, with_timeout
+    from token_budget import budget_for, fit_to_budget, trim_to_tokens
+    from backend_pool import BackendPool, BackendUnavailable, PooledClient
+    from streaming import consume_stream, StreamCancelled, StreamStalled, StreamTruncated, MAX_ATTEMPTS as STREAM_MAX_ATTEMPTS
+
+# google-genai is only loaded when a request is actually built
+types = lazy_import("google.genai.types")
+
+# A streamed article shorter than this is treated as truncated (target is ~4000 chars)
+MIN_ARTICLE_CHARS = 1000
+
+# Static instruction blocks for generate_article. Sent as a (cached) system prefix
+# so only the keyword, context and extra instructions are new input per call.
+TOPIC_FOCUS_INSTRUCTIONS = textwrap.dedent("""
+            あなたは専門技術アナリスト（Tech Analyst）です。
+            指定された技術トピック（キーワード）について、その技術の影響を深掘りする解説記事を執筆してください。
+            
+            ## ターゲット
+            - その技術の実用化時期を真剣に追っている技術責任者や事業責任者
+            
+            ## 執筆ロジック (Level 2 Granularity)
+            - 単に「実用化」だけでなく、「技術的絶対条件 (Prerequisites)」の達成度にフォーカスする。
+            - 例: "全固体電池の実用化" ではなく "電解質伝導率 10mS/cm の達成" に注目。
+            
+            ## 構成案 (TechShift Standard)
+            
+            1. **インパクト要約**:
+               - 単なるニュースの要約ではなく、「この技術登場の前後で、世界（ルール）がどう変わったか」を対比させる。
+               - Format: 「これまではXが限界だったが、YによってZが可能になった」
+            
+            2. **技術的特異点**:
+               - なぜそれが可能になったのか？（Why Now?）
+               - 既存技術(SOTA)との決定的な違い（アーキテクチャ、素材、手法）をエンジニア視点で解説。
+            
+            3. **次なる課題**:
+               - 一つの課題が解決されると、必ず新しいボトルネックが出現する。
+               - 「精度は解決したが、推論コストが課題」「実験室では成功したが、量産プロセスが未確立」など、次に直面するリアリティのある課題を指摘する。
+            
+            4. **今後の注目ポイント**:
+               - 事業責任者や技術責任者が、来週・来月・来年チェックすべき具体的な指標（KPI）。
+               - 抽象的な「期待」ではなく、「どの数値が改善されたらGOサインか」を提示。
+
+            5. **結論**:
+               - 記事の総括。
+               - 読者が取るべきアクションを示唆して締めくくる。
+            
+            ## 執筆トーン
+            - **Insightful**: 事実の羅列ではなく、点と点を線で結ぶ解釈を加える。
+            - **Professional**: 煽り文句は不要。冷徹な分析と熱量のあるビジョンを両立させる。
+               
+            
+            ## 執筆ルール
+            - **一次情報主義**: 論文や公式リリースに基づく事実のみを扱う。噂レベルは除外。
+            - **冷静な評価**: "革命的" "破壊的" といった形容詞を避け、数値で語る。
+            
+            ## フォーマット
+            - Markdown形式
+            - 4000文字程度
+            - 技術仕様はテーブルで比較
+            - HTMLタグ使用禁止
+            
+            ## タイトル作成ルール (SEO Optimized)
+            - **目的**: 検索流入の最大化 (High CTR & Search Volume)。
+            - **ルール1 (キーワード配置)**: 検索されやすい「メインキーワード」を必ず**文頭**に置く。
+            - **ルール2 (サジェスト意識)**: 「仕組み」「いつ」「課題」「ロードマップ」「将来性」など、よく検索されるサジェストワードを含める。
+            - **形式**: [メインキーワード]＋[検索意図を満たす具体的な内容]
+            - **悪い例**: 「今回のブレイクスルーにより全固体電池が進化」 (キーワードが後ろ)
+            - **良い例**: 
+              - 「全固体電池の量産はいつ？最新ロードマップと2つの技術的課題」
+              - 「AIエージェントの仕組みとは？自律動作の原理と3つの実用例」
+              - 「核融合発電のメリット・デメリットを徹底解説｜2030年の実用化予測」
+            """)
+
+ARTICLE_OUTPUT_FORMAT = textwrap.dedent("""
+        
+        ## 出力形式
+        必ず以下の形式で出力してください：
+        
+        1行目: # [生成したタイトル]
+        2行目: 空行
+        3行目以降: 記事本文（導入から始める）
+        
+        **見出しレベル:**
+        - タイトル: # (H1) ← 記事の主題
+        - 大見出し: ## (H2) ← 記事の主要な構成要素（章）
+        - 中見出し: ### (H3) ← 章を構成する具体的なトピック（節）
+        
+        **【重要】Markdown記述ルール:**
+        - **リスト（箇条書き）の前には必ず空行を入れること。**
+        - **ネスト（入れ子）したリストのインデントは必ず半角スペース4つ（4 spaces）を使用すること。**
+        
+        例:
+        # 【技術解説】次世代半導体パッケージング技術の突破口
+        
+        ## 1. Executive Summary
+        MITの研究チームが発表した新しい...
+        
+        ## 2. Technical Spec
+        | 項目 | 今回の成果 | 従来技術 |
+        | :--- | :--- | :--- |
+        | 配線密度 | ... | ... |
+        """)
+
+BRIEFING_INSTRUCTIONS = textwrap.dedent("""
+        You are the Editor-in-Chief of "TechShift". Write the "Daily Briefing" for the region and input data given in the prompt.
+
+        ## Goal
+        Create a **Navigation Chart** for the future. 
+        Do NOT write a generic news summary. Write a strategic analysis of "Structural Changes".
+        
+        ## Tone & Style
+        - **Insightful**: Connect the dots.
+        - **Japanese Language**: Professional, crisp, and visionary.
+        - **No Fluff**: Avoid "We hope", "Expected to". Use "The data suggests", "The barrier is".
+        ## Output Structure (Japanese Headers)
+        
+        1. **Title**: Generated based on rules below.
+        
+        2. **本日の重要ポイント**
+           - High-level summary of the day's tectonic shifts.
+           - Bullet points of top 3 takeaways.
+
+        3. **分野別動向**
+           - **Rule**: Only include sectors with significant updates (Torutsume).
+           - **Mandatory**: If a "Deep Dive Article" exists for a sector (Context 4), you MUST introduce it here with a link.
+           - Official Sectors:
+             - **AI・人工知能 (Advanced AI)**
+             - **ロボティクス・モビリティ (Robotics & Mobility)**
+             - **量子・先端技術 (Quantum & Tech)**
+             - **環境・エネルギー (Green Tech)**
+             - **ライフサイエンス (Life Science)**
+             - **宇宙・航空 (Space & Aero)**
+        
+        4. **複合的影響**
+           - Discuss how these shifts affect each other (Synergy).
+           - e.g., "Quantum advancements accelerating Bio-simulation."
+
+        5. **今後の注目点**
+           - What to watch next week/month.
+           - Specific KPIs or Events.
+        
+        ## Internal Linking
+        - **MANDATORY**: Embed links to "Today's Featured Articles" naturally within the relevant Sector Update.
+        - Format: `[Title](URL)`
+
+        ## フォーマット
+        - Markdown形式
+        - 4000文字程度
+        - 技術仕様はテーブルで比較
+        - HTMLタグ使用禁止
+
+        ## Title Rules (Pure SEO)
+        1. **Goal**: Maximize Click-Through Rate (CTR) and Search Volume.
+        2. **Format**: [Hero Keyword] + [Impact/Action]
+        3. **Rules**:
+           - **NO** "Daily Shift" or Date prefix.
+           - Start with the most important Keyword (e.g., "全固体電池", "GPT-5").
+           - Include "Impact", "Roadmap", "Future", or "Industry Shift".
+           - Limit to 32 characters (Google Search Snippet limit).
+        4. **Good Examples**:
+           - 「全固体電池の量産はいつ？最新ロードマップと課題」
+           - 「AIエージェントが変える仕事の未来と6つの業界動向」
+           - 「核融合発電の現状と2026年の注目ポイント」
+        """)
 
 
 load_dotenv(override=True)
 
+
+# duplicate_of reported for a duplicate verdict that named no existing title
+UNMATCHED_DUPLICATE = "(unidentified existing article)"
+
+
+def _title_key(title):
+    """Comparable form of a post title: entities decoded, NFKC, whitespace collapsed, case-folded."""
+    text = unicodedata.normalize("NFKC", html.unescape(str(title or "")))
+    return " ".join(text.split()).strip("\"'「」").casefold()
+
 class GeminiClient:
     def __init__(self):
         self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -19,12 +213,21 @@ class GeminiClient:
         self.api_key = os.getenv("GEMINI_API_KEY")
         self.client = None
         self.use_vertex = False
+        # Cheap/strong model cascade for relevance and duplication checks
+        self.cascade = CascadePolicy()
+        # ArticleScorer bound to this client, created on first use (analysis/scorer.py)
+        self.article_scorer = None
+        # Daily quota / cost budget shared by every stage (llm_budget.py)
+        self.budget = get_llm_budget()
+        # Per-stage deadlines and optional hedging of slow calls (hedging.py)
+        self.hedge_policy = HedgePolicy()
 
         # Prioritize Vertex AI initialization
+        # Underlying genai clients are shared process-wide (see client_registry.py)
         if self.project_id and self.location:
             try:
                 print(f"Initializing Gemini with Vertex AI (Project: {self.project_id}, Location: {self.location})")
-                self.client = genai.Client(vertexai=True, project=self.project_id, location=self.location)
+                self.client = get_genai_client("vertex")
                 self.use_vertex = True
             except Exception as e:
                 print(f"Warning: Vertex AI initialization failed: {e}, falling back to API Key.")
@@ -34,20 +237,57 @@ class GeminiClient:
         if not self.use_vertex:
             if self.api_key:
                 print("Initializing Gemini with API Key (google-genai)")
-                self.client = genai.Client(api_key=self.api_key)
+                self.client = get_genai_client("api_key")
             else:
                 raise ValueError("Missing Gemini credentials. Set GOOGLE_CLOUD_PROJECT/LOCATION or GEMINI_API_KEY in .env")
 
+        # Extra API keys / Vertex locations (GEMINI_API_KEYS, VERTEX_LOCATIONS): requests are
+        # spread over every credential instead of one quota bucket (backend_pool.py)
+        primary_name = (f"vertex:{self.project_id}/{self.location}" if self.use_vertex
+                        else f"api_key:...{self.api_key[-4:]}")
+        self.pool = BackendPool.from_env(primary_name, self.client)
+        if len(self.pool) > 1:
+            print(f"Gemini backend pool: {', '.join(b.name for b in self.pool.backends)}")
+            self.client = PooledClient(self.pool)
+
+        # Server-side cached system prefixes (scoring criteria, taxonomy, writing guides)
+        self.context_cache = ContextCacheManager(GenaiCacheBackend(self.client))
+
+    def _get_image_client(self):
+        """
+        Return the shared v1beta client used for image generation.
+        Built once per process instead of once per image.
+        """
+        return get_genai_client("api_key", api_version="v1beta")
+
     def _retry_request(self, func, *args, **kwargs):
         """
         Retry a function call with exponential backoff if a quota error occurs.
+
+        Calls that name a model go through the LLM budget (llm_budget.py): it may
+        switch to a cheaper fallback model, waits out per-minute limits and 429
+        retry delays itself, and raises BudgetDeferred (not retried) when the
+        current stage has no headroom left today.
+
+        generate_content calls also run under the stage deadline and may be
+        hedged (see _hedged_call).
         """
         max_retries = 5
         base_delay = 2  # seconds
+        requested = kwargs.get("model")
+        hedged = requested and getattr(func, "__name__", "") == "generate_content"
         
         for attempt in range(max_retries):
+            if requested:
+                kwargs["model"] = self.budget.acquire(requested)
             try:
-                return func(*args, **kwargs)
+                if hedged:
+                    # Every attempt of the race records its own usage
+                    return self._hedged_call(func, *args, **kwargs)
+                response = func(*args, **kwargs)
+                if requested:
+                    self.budget.record(kwargs["model"], response)
+                return response
             except Exception as e:
                 error_str = str(e).lower()
                 # Check for rate limit/quota errors
@@ -57,12 +297,51 @@ class GeminiClient:
                         raise e
                     
                     delay = (base_delay * (2 ** attempt)) + (random.random() * 1)
+                    if requested:
+                        # The next acquire() waits for the model or picks a fallback
+                        self.budget.note_rate_limited(kwargs["model"], str(e), default_delay=delay)
+                        print(f"Quota exceeded (429) for {kwargs['model']}. (Attempt {attempt + 1}/{max_retries})")
+                        continue
                     print(f"Quota exceeded (429). Retrying in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})")
                     time.sleep(delay)
                 else:
                     # Not a quota error, raise immediately
                     raise e
 
+    def _hedged_call(self, func, *args, **kwargs):
+        """
+        Run one generate_content call under its stage deadline (hedging.py).
+
+        The request carries the deadline as its HTTP timeout. If hedging is
+        enabled and the call outlives the observed p95 of its stage, a duplicate
+        goes to the same model on another backend (backend pool) or else to the
+        next model of the budget's fallback chain; the first valid response wins.
+        Requests bound to a cached context are never hedged.
+        """
+        model = kwargs["model"]
+        stage = current_stage()
+        config = kwargs.get("config")
+        kwargs["config"] = with_timeout(config, self.hedge_policy.deadline(stage))
+
+        def attempt(target, acquire=False):
+            def run():
+                chosen = self.budget.acquire(target) if acquire else target
+                response = func(*args, **{**kwargs, "model": chosen})
+                self.budget.record(chosen, response)
+                return response
+            return run
+
+        def alternate():
+            if len(self.pool) > 1:
+                return attempt(model, acquire=True)
+            fallbacks = self.budget.chain(model)[1:]
+            return attempt(fallbacks[0], acquire=True) if fallbacks else None
+
+        cached = bool(config.get("cached_content") if isinstance(config, dict)
+                      else getattr(config, "cached_content", None))
+        return run_hedged(attempt(model), model, stage=stage, alternate=None if cached else alternate,
+                          policy=self.hedge_policy)
+
     def generate_content(self, prompt, model='gemini-3.1-pro-preview', config=None):
         """
         Generic method to generate content with retry logic.
@@ -79,13 +358,156 @@ class GeminiClient:
             print(f"Error generating content: {e}")
             return None
 
-    def generate_article(self, keyword, article_type="topic-focus", context=None, extra_instructions=None, category=None):
+    def generate_with_prefix(self, system_prefix, prompt, model='gemini-3.1-pro-preview', config=None):
+        """
+        Generate from a static system prefix + a variable prompt.
+
+        The prefix is served from a cached context when possible (context_cache.py),
+        otherwise sent as a plain system_instruction. A cache the server rejects is
+        dropped and the call is retried uncached.
+
+        Args:
+            system_prefix: Fixed instruction block (identical across calls)
+            prompt: Per-call input
+            model: Model name
+            config: Optional dict of extra GenerateContentConfig fields
+
+        Returns:
+            The response, or None on failure.
+        """
+        config = dict(config or {})
+        # Caches are per model: look one up for the model the budget will actually use
+        model = self.budget.preferred(model) or model
+        cache_name = self.context_cache.get(model, system_prefix)
+        if cache_name:
+            try:
+                response = self._retry_request(
+                    self.client.models.generate_content,
+                    model=model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(**config, cached_content=cache_name)
+                )
+                self.context_cache.record_usage(response)
+                return response
+            except BackendUnavailable as e:
+                # The cache's backend is cooling down; the cache itself is still valid
+                print(f"Cached generation deferred ({e}), sending uncached.")
+            except Exception as e:
+                print(f"Cached generation failed ({cache_name}), retrying uncached: {e}")
+                self.context_cache.invalidate(cache_name)
+
+        try:
+            response = self._retry_request(
+                self.client.models.generate_content,
+                model=model,
+                contents=prompt,
+                config=types.GenerateContentConfig(**config, system_instruction=system_prefix)
+            )
+            self.context_cache.record_usage(response)
+            return response
+        except Exception as e:
+            print(f"Error generating content: {e}")
+            return None
+
+    def generate_stream(self, prompt, sink, model='gemini-3.1-pro-preview', system_prefix=None, min_chars=0):
+        """
+        Streamed generation into sink (streaming.ArticleStream).
+
+        A stream that stalls, ends without a normal finish or is shorter than
+        min_chars is retried from scratch (sink.reset()). system_prefix is served
+        from the context cache like generate_with_prefix.
+
+        The stream is read to the end inside _retry_request, so 429s raised while
+        reading get the usual backoff / budget fallback, the stage deadline covers
+        the whole stream, and usage is recorded from the last chunk.
+
+        Returns:
+            The full text, or None on failure / cancellation.
+        """
+        use_cache = True
+        model = self.budget.preferred(model) or model
+        deadline = self.hedge_policy.deadline(current_stage())
+        for attempt in range(1, STREAM_MAX_ATTEMPTS + 1):
+            cache_name = self.context_cache.get(model, system_prefix) if system_prefix and use_cache else None
+            if cache_name:
+                config = types.GenerateContentConfig(cached_content=cache_name)
+            elif system_prefix:
+                config = types.GenerateContentConfig(system_instruction=system_prefix)
+            else:
+                config = None
+
+            def run_stream(model, contents, config, cache_model=model, cache_name=cache_name):
+                sink.reset()
+                if cache_name and model != cache_model:
+                    # The budget picked a fallback model; the cache belongs to the requested one
+                    config = types.GenerateContentConfig(system_instruction=system_prefix)
+                usage = []
+                response_stream = self.client.models.generate_content_stream(
+                    model=model, contents=contents, config=with_timeout(config, deadline))
+                try:
+                    return consume_stream(response_stream, sink.write, should_stop=lambda: sink.cancelled,
+                                          min_chars=min_chars, deadline=deadline,
+                                          on_chunk=lambda chunk: usage.append(getattr(chunk, "usage_metadata", None)))
+                finally:
+                    # Truncated / stalled attempts are billed as well
+                    usage = [u for u in usage if u is not None]
+                    if usage:
+                        self.budget.record(model, SimpleNamespace(usage_metadata=usage[-1]))
+
+            try:
+                return self._retry_request(run_stream, model=model, contents=prompt, config=config)
+            except StreamCancelled:
+                print(f"Generation cancelled: {sink.cancel_reason}")
+                return None
+            except (StreamStalled, StreamTruncated) as e:
+                print(f"Stream attempt {attempt}/{STREAM_MAX_ATTEMPTS} failed: {e}")
+            except Exception as e:
+                if not cache_name:
+                    print(f"Error generating content: {e}")
+                    return None
+                if isinstance(e, BackendUnavailable):
+                    # The cache's backend is cooling down; the cache itself is still valid
+                    print(f"Cached stream deferred ({e}), retrying uncached.")
+                else:
+                    print(f"Cached stream failed ({cache_name}), retrying uncached: {e}")
+                    self.context_cache.invalidate(cache_name)
+                use_cache = False
+        print("Streaming generation failed after retries.")
+        return None
+
+    def generate_json(self, prompt, response_schema=None, model='gemini-3.1-pro-preview'):
+        """
+        Structured-output call. Returns the parsed JSON, or None on failure.
+
+        Args:
+            prompt: Prompt text
+            response_schema: Optional OpenAPI-style schema dict enforced by the model
+            model: Model name
+        """
+        config = {'response_mime_type': 'application/json'}
+        if response_schema:
+            config['response_schema'] = response_schema
+        try:
+            response = self._retry_request(
+                self.client.models.generate_content,
+                model=model,
+                contents=prompt,
+                config=types.GenerateContentConfig(**config)
+            )
+            return json.loads(response.text)
+        except Exception as e:
+            print(f"Structured output generation failed: {e}")
+            return None
+
+    def generate_article(self, keyword, article_type="topic-focus", context=None, extra_instructions=None, category=None, stream=None):
         """
         Generate a full blog article in Markdown format.
         
         Args:
             keyword: Main topic or title.
             article_type: "topic-focus" (Deep Dive) is the primary type.
+            stream: Optional streaming.ArticleStream. The article is then streamed
+                (title callback, draft file, stall/truncation retries).
         """
         print(f"Generating article for keyword: {keyword} (Type: {article_type}, Category: {category})")
         
@@ -102,72 +524,13 @@ class GeminiClient:
             Key Facts: {', '.join(context.get('key_facts', []))}
             Analyst View: {context.get('techshift_view', '')}
             """
+            if context.get('corroborating_sources'):
+                sources = "; ".join(f"{c.get('source')}: {c.get('title')}" for c in context['corroborating_sources'])
+                context_section += f"""
+            Also reported by: {sources}
+            """
             
         prompts = {
-            # --- TechShift Primary Prompt ---
-            # [Topic Deep Dive] Single article focus.
-            "topic-focus": textwrap.dedent(f"""
-            {context_section}あなたは専門技術アナリスト（Tech Analyst）です。
-            特定の技術トピック（{keyword}）について、その技術の影響を深掘りする解説記事を執筆してください。
-            
-            キーワード: {keyword}
-            
-            ## ターゲット
-            - その技術の実用化時期を真剣に追っている技術責任者や事業責任者
-            
-            ## 執筆ロジック (Level 2 Granularity)
-            - 単に「実用化」だけでなく、「技術的絶対条件 (Prerequisites)」の達成度にフォーカスする。
-            - 例: "全固体電池の実用化" ではなく "電解質伝導率 10mS/cm の達成" に注目。
-            
-            ## 構成案 (TechShift Standard)
-            
-            1. **インパクト要約**:
-               - 単なるニュースの要約ではなく、「この技術登場の前後で、世界（ルール）がどう変わったか」を対比させる。
-               - Format: 「これまではXが限界だったが、YによってZが可能になった」
-            
-            2. **技術的特異点**:
-               - なぜそれが可能になったのか？（Why Now?）
-               - 既存技術(SOTA)との決定的な違い（アーキテクチャ、素材、手法）をエンジニア視点で解説。
-            
-            3. **次なる課題**:
-               - 一つの課題が解決されると、必ず新しいボトルネックが出現する。
-               - 「精度は解決したが、推論コストが課題」「実験室では成功したが、量産プロセスが未確立」など、次に直面するリアリティのある課題を指摘する。
-            
-            4. **今後の注目ポイント**:
-               - 事業責任者や技術責任者が、来週・来月・来年チェックすべき具体的な指標（KPI）。
-               - 抽象的な「期待」ではなく、「どの数値が改善されたらGOサインか」を提示。
-
-            5. **結論**:
-               - 記事の総括。
-               - 読者が取るべきアクションを示唆して締めくくる。
-            
-            ## 執筆トーン
-            - **Insightful**: 事実の羅列ではなく、点と点を線で結ぶ解釈を加える。
-            - **Professional**: 煽り文句は不要。冷徹な分析と熱量のあるビジョンを両立させる。
-               
-            
-            ## 執筆ルール
-            - **一次情報主義**: 論文や公式リリースに基づく事実のみを扱う。噂レベルは除外。
-            - **冷静な評価**: "革命的" "破壊的" といった形容詞を避け、数値で語る。
-            
-            ## フォーマット
-            - Markdown形式
-            - 4000文字程度
-            - 技術仕様はテーブルで比較
-            - HTMLタグ使用禁止
-            
-            ## タイトル作成ルール (SEO Optimized)
-            - **目的**: 検索流入の最大化 (High CTR & Search Volume)。
-            - **ルール1 (キーワード配置)**: 検索されやすい「メインキーワード」を必ず**文頭**に置く。
-            - **ルール2 (サジェスト意識)**: 「仕組み」「いつ」「課題」「ロードマップ」「将来性」など、よく検索されるサジェストワードを含める。
-            - **形式**: [メインキーワード]＋[検索意図を満たす具体的な内容]
-            - **悪い例**: 「今回のブレイクスルーにより全固体電池が進化」 (キーワードが後ろ)
-            - **良い例**: 
-              - 「全固体電池の量産はいつ？最新ロードマップと2つの技術的課題」
-              - 「AIエージェントの仕組みとは？自律動作の原理と3つの実用例」
-              - 「核融合発電のメリット・デメリットを徹底解説｜2030年の実用化予測」
-            """),
-
             # --- Stock Analysis Prompt (New) ---
             # [Educational/Timeless] Encyclopedia style for SEO targets.
             "stock-analysis": textwrap.dedent(f"""
@@ -234,42 +597,30 @@ class GeminiClient:
             """)
         }
         
-        # Select prompt
-        prompt = prompts.get(article_type, prompts["topic-focus"])
+        if article_type not in prompts:
+            # Topic focus: fixed guide as the system prefix, per-article parts as the prompt
+            prompt = textwrap.dedent(context_section) + f"\nキーワード: {keyword}\n"
+            if extra_instructions:
+                prompt += f"\n{extra_instructions}\n"
+            if stream is not None:
+                return self.generate_stream(prompt, stream, model='gemini-3.1-pro-preview',
+                                            system_prefix=TOPIC_FOCUS_INSTRUCTIONS + ARTICLE_OUTPUT_FORMAT,
+                                            min_chars=MIN_ARTICLE_CHARS)
+            response = self.generate_with_prefix(
+                TOPIC_FOCUS_INSTRUCTIONS + ARTICLE_OUTPUT_FORMAT, prompt, model='gemini-3.1-pro-preview'
+            )
+            return response.text if response else None
+
+        prompt = prompts[article_type]
         
         if extra_instructions:
             prompt += f"\n\n{extra_instructions}\n"
         
         # Add common formatting instruction
-        prompt += textwrap.dedent("""
-        
-        ## 出力形式
-        必ず以下の形式で出力してください：
-        
-        1行目: # [生成したタイトル]
-        2行目: 空行
-        3行目以降: 記事本文（導入から始める）
-        
-        **見出しレベル:**
-        - タイトル: # (H1) ← 記事の主題
-        - 大見出し: ## (H2) ← 記事の主要な構成要素（章）
-        - 中見出し: ### (H3) ← 章を構成する具体的なトピック（節）
-        
-        **【重要】Markdown記述ルール:**
-        - **リスト（箇条書き）の前には必ず空行を入れること。**
-        - **ネスト（入れ子）したリストのインデントは必ず半角スペース4つ（4 spaces）を使用すること。**
-        
-        例:
-        # 【技術解説】次世代半導体パッケージング技術の突破口
-        
-        ## 1. Executive Summary
-        MITの研究チームが発表した新しい...
-        
-        ## 2. Technical Spec
-        | 項目 | 今回の成果 | 従来技術 |
-        | :--- | :--- | :--- |
-        | 配線密度 | ... | ... |
-        """)
+        prompt += ARTICLE_OUTPUT_FORMAT
+
+        if stream is not None:
+            return self.generate_stream(prompt, stream, model='gemini-3.1-pro-preview', min_chars=MIN_ARTICLE_CHARS)
         
         try:
             response = self._retry_request(
@@ -291,7 +642,7 @@ class GeminiClient:
             print(f"Generating image with Gemini 2.5 Flash Image for prompt: {prompt}")
             
             # Use google-genai SDK (v1beta) for API Key support and aspect ratio control
-            client_v1beta = genai.Client(api_key=self.api_key, vertexai=False, http_options={'api_version': 'v1beta'})
+            client_v1beta = self._get_image_client()
             
             response = client_v1beta.models.generate_content(
                 model='gemini-2.5-flash-image',
@@ -517,13 +868,15 @@ class GeminiClient:
         This method is used *AFTER* generation to extract metadata from the **INTERNAL** article.
         The result is saved in WordPress 'ai_structured_summary' field.
         """
+        excerpt = fit_to_budget(content, budget_for("structured_summary"))
+        truncated = "... (truncated)" if len(excerpt) < len(content) else ""
         prompt = textwrap.dedent(f"""
         You are an expert content analyst. Analyze the following tech article and generate a structured summary in JSON format.
         This summary will be used by an AI system to identify relevant internal links.
         IMPORTANT: The content is Japanese, so the 'summary' and 'key_topics' MUST be written in Japanese.
 
         Article Content:
-        {content[:4000]}... (truncated)
+        {excerpt}{truncated}
 
         Output JSON format (Strictly JSON only):
         {{
@@ -555,8 +908,8 @@ class GeminiClient:
         Generate engaging SNS (Twitter/X) post content.
         Output is JSON: {"hook": "...", "summary": "...", "hashtags": ["#tag1", ...]}
         """
-        # Truncate content for efficiency
-        truncated_content = content[:3000]
+        # Lead + most salient paragraphs within the token budget
+        truncated_content = fit_to_budget(content, budget_for("sns"), query=title)
         
         prompt = textwrap.dedent(f"""
         You are an expert social media manager for a futuristic tech media site "TechShift".
@@ -649,36 +1002,74 @@ class GeminiClient:
         Summary: "{new_summary}"
         
         Existing Articles:
-        {json.dumps(existing_titles, ensure_ascii=False, indent=2)}
+        {json.dumps([html.unescape(t) for t in existing_titles], ensure_ascii=False, indent=2)}
         
         Output JSON format:
         {{
             "is_duplicate": true/false,
             "duplicate_of": "Exact Title of Existing Article" (or null if false),
+            "confidence": 0.0-1.0 (how sure you are),
             "reason": "Brief explanation"
         }}
         """
         
+        policy = self.cascade
+        if not policy.enabled:
+            result = self._duplication_call(prompt, existing_titles, 'gemini-2.0-flash-exp', "single")
+        else:
+            cascade_stats.record_items("duplication", 1)
+            result = self._duplication_call(prompt, existing_titles, policy.cheap_model, "cheap", strict=True)
+            reason = "invalid" if result is None else ("low_confidence" if policy.needs_confidence_escalation(result.get("confidence")) else None)
+            if reason:
+                cascade_stats.record_escalation("duplication", reason)
+                result = self._duplication_call(prompt, existing_titles, policy.strong_model, "strong") or result
+
+        if not result:
+            return None
+        if result.get("is_duplicate"):
+            print(f"Duplicate detected! '{new_title}' is duplicate of '{result.get('duplicate_of')}'")
+            print(f"Reason: {result.get('reason')}")
+            return result.get("duplicate_of")
+        return None
+
+    def _duplication_call(self, prompt, existing_titles, model, tier, strict=False):
+        """
+        One duplication check call. Returns the validated result dict or None.
+
+        A duplicate whose duplicate_of matches no existing title (or is null) is
+        invalid when strict (the cheap tier, so it escalates); otherwise the verdict
+        is kept and duplicate_of falls back to the raw value or a placeholder, so a
+        duplicate is never dropped.
+        """
         try:
-            response = self._retry_request(
-                self.client.models.generate_content,
-                model='gemini-2.0-flash-exp',
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
+            with cascade_stats.timed("duplication", tier):
+                response = self._retry_request(
+                    self.client.models.generate_content,
+                    model=model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json"
+                    )
                 )
-            )
             result = json.loads(response.text)
-            
-            if result.get("is_duplicate"):
-                print(f"Duplicate detected! '{new_title}' is duplicate of '{result.get('duplicate_of')}'")
-                print(f"Reason: {result.get('reason')}")
-                return result.get("duplicate_of")
-            
-            return None
+            if not isinstance(result, dict) or not isinstance(result.get("is_duplicate"), bool):
+                raise ValueError("missing is_duplicate")
+            if result["is_duplicate"]:
+                # WP titles carry HTML entities (&#8217;, &amp;) the model echoes back decoded
+                by_key = {_title_key(t): t for t in existing_titles}
+                match = by_key.get(_title_key(result.get("duplicate_of")))
+                if match is None:
+                    if strict:
+                        raise ValueError(f"duplicate_of does not match an existing title: {result.get('duplicate_of')}")
+                    print(f"Duplication check ({model}): duplicate_of does not match an existing title, "
+                          f"keeping the verdict: {result.get('duplicate_of')}")
+                    result["duplicate_of"] = result.get("duplicate_of") or UNMATCHED_DUPLICATE
+                else:
+                    result["duplicate_of"] = match
+            return result
             
         except Exception as e:
-            print(f"Duplication check failed: {e}")
+            print(f"Duplication check failed ({model}): {e}")
             return None
 
     # --- Daily Briefing Methods ---
@@ -698,7 +1089,7 @@ class GeminiClient:
             input_list.append({
                 "id": art.get('url_hash', 'unknown'),
                 "title": art.get('title', ''),
-                "summary": art.get('summary', '')[:500] 
+                "summary": trim_to_tokens(art.get('summary', ''), budget_for("relevance_summary"))
             })
             
         prompt = f"""
@@ -725,52 +1116,87 @@ class GeminiClient:
             {{
                 "id": "article_id_from_input",
                 "is_relevant": true/false,
+                "confidence": 0.0-1.0 (how sure you are),
                 "reason": "Brief explanation"
             }},
             ...
         ]
         """
         
+        policy = self.cascade
+        ids = [item["id"] for item in input_list]
+        if not policy.enabled:
+            result_map = self._relevance_call(prompt, ids, 'gemini-2.0-flash-exp', "single") or {}
+        else:
+            cascade_stats.record_items("relevance", len(ids))
+            result_map = self._relevance_call(prompt, ids, policy.cheap_model, "cheap") or {}
+
+            # Escalate missing/invalid items and low-confidence calls to the strong model
+            escalate = {}
+            for u_hash in ids:
+                res = result_map.get(u_hash)
+                if res is None:
+                    escalate[u_hash] = "invalid"
+                elif policy.needs_confidence_escalation(res.get('confidence')):
+                    escalate[u_hash] = "low_confidence"
+            for reason in ("invalid", "low_confidence"):
+                cascade_stats.record_escalation("relevance", reason, sum(1 for r in escalate.values() if r == reason))
+
+            if escalate:
+                sub_list = [item for item in input_list if item["id"] in escalate]
+                sub_prompt = prompt.replace(
+                    json.dumps(input_list, ensure_ascii=False, indent=2),
+                    json.dumps(sub_list, ensure_ascii=False, indent=2), 1)
+                strong = self._relevance_call(sub_prompt, list(escalate), policy.strong_model, "strong") or {}
+                result_map.update(strong)
+
+        # Fallback: Mark anything still unchecked as Relevant with error note
+        for u_hash in ids:
+            if u_hash not in result_map:
+                result_map[u_hash] = {
+                    'is_relevant': True,
+                    'reason': "Batch AI Check Failed",
+                    'failed': True,
+                }
+        return result_map
+
+    def _relevance_call(self, prompt, ids, model, tier):
+        """One relevance batch call. Returns {url_hash: result} for valid items, or None if the call failed."""
         try:
-            response = self._retry_request(
-                self.client.models.generate_content,
-                model='gemini-2.0-flash-exp', 
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
+            with cascade_stats.timed("relevance", tier, items=len(ids)):
+                response = self._retry_request(
+                    self.client.models.generate_content,
+                    model=model, 
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        response_mime_type="application/json"
+                    )
                 )
-            )
             res_json = json.loads(response.text)
             
             # Map back to url_hash
             result_map = {}
             for res in res_json:
                 u_hash = res.get('id')
-                if u_hash:
+                if u_hash in ids and isinstance(res.get('is_relevant'), bool):
                     result_map[u_hash] = {
-                        'is_relevant': res.get('is_relevant', False),
-                        'reason': res.get('reason', 'Unknown')
+                        'is_relevant': res['is_relevant'],
+                        'reason': res.get('reason', 'Unknown'),
+                        'confidence': res.get('confidence'),
                     }
             return result_map
             
         except Exception as e:
-            print(f"Batch relevance check failed: {e}")
-            # Fallback: Mark all as Relevant with error note
-            fallback_map = {}
-            for art in articles:
-                fallback_map[art.get('url_hash')] = {
-                    'is_relevant': True,
-                    'reason': f"Batch AI Check Failed: {e}"
-                }
-            return fallback_map
+            print(f"Batch relevance check failed ({model}): {e}")
+            return None
 
     def analyze_single_article_impact(self, title, content, article_type="topic-focus"):
         """
         Analyze a SINGLE article to generate "The Shift" and "Impact Score".
         Optimized for individual article generation without macro context.
         """
-        # Increase content context for better accuracy
-        content_excerpt = content[:3000]
+        # Lead + most salient paragraphs within the token budget
+        content_excerpt = fit_to_budget(content, budget_for("impact"), query=title)
         
         prompt = textwrap.dedent(f"""
         You are the "Shift Intelligence Engine". Analyze this specific article to determine its "TechShift Impact".
@@ -835,19 +1261,87 @@ class GeminiClient:
             print(f"Error in analyze_single_article_impact: {e}")
             return None
 
-    def analyze_tech_impact(self, context_news_list, region, extra_context=""):
+    def _condense_shard(self, sector, lines, budget):
+        """Map stage of analyze_tech_impact: condense one shard of news lines into digest lines."""
+        news_text = "\n".join(lines)
+        prompt = textwrap.dedent(f"""
+        You are condensing tech news for the **{sector}** sector of a daily analysis.
+
+        ## News
+        {news_text}
+
+        ## Task
+        Select at most {budget.items_per_digest} developments that matter most for structural
+        technology shifts. Merge items that report the same development. Keep concrete
+        numbers, organisations and dates. Order by significance (most significant first).
+
+        ## Output JSON
+        {{
+            "developments": [ {{ "date": "...", "title": "...", "significance": "one sentence" }} ]
+        }}
+        """)
+        response = self._retry_request(
+            self.client.models.generate_content,
+            model='gemini-2.0-flash', # Condensation only; reasoning happens in the synthesis call
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                max_output_tokens=budget.digest_tokens
+            )
+        )
+        result = json.loads(response.text)
+        if isinstance(result, list):
+            result = result[0] if result else {}
+        return [
+            f"- [{item.get('date', '')}] {item.get('title', '')}: {item.get('significance', '')}"
+            for item in result.get("developments", [])
+            if isinstance(item, dict) and item.get("title")
+        ]
+
+    def _condensed_news(self, context_news_list, budget):
+        """Map + reduce stages: sector digests that fit the synthesis budget."""
+        start = time.time()
+        shards = map_reduce.shard_articles(context_news_list, budget.shard_tokens)
+        print(f"  Map: {len(context_news_list)} articles -> {len(shards)} shard(s)")
+        results = map_reduce.map_parallel(lambda shard: self._condense_shard(shard[0], shard[1], budget),
+                                          shards, budget.workers)
+        # A failed shard falls back to its raw lines, trimmed to the digest budget
+        digests = [
+            (sector, lines if lines else map_reduce.fallback_digest(raw, budget))
+            for (sector, raw), lines in zip(shards, results)
+        ]
+        digests = map_reduce.condense_digests(digests, budget, lambda sector, lines: self._condense_shard(sector, lines, budget))
+        text = map_reduce.digest_text(digests)
+        print(f"  Digests: ~{map_reduce.estimate_tokens(text)} tokens in {time.time() - start:.1f}s")
+        return text
+
+    def analyze_tech_impact(self, context_news_list, region, extra_context="", budget=None):
         """
         Analyze tech news to generate content structure (Hero Topic, Sectors, etc).
         (Generic Batch Analysis - Market Data removed as it belongs in writing phase)
+
+        Large inputs are condensed per sector first (see analysis/map_reduce.py);
+        the output shape is the same in both modes.
         """
-        news_text = "\n".join([f"- [{art['published_at']}] {art['title']}: {art['summary'][:200]}" for art in context_news_list])
-        
+        budget = budget or map_reduce.AnalysisBudget()
+        news_text = "\n".join(map_reduce.article_line(art) for art in context_news_list)
+        news_heading = "Tech News (Last 24h)"
+        config_kwargs = {"response_mime_type": "application/json"}
+
+        if budget.use_map_reduce(map_reduce.estimate_tokens(news_text)):
+            print(f"Map-reduce analysis (~{map_reduce.estimate_tokens(news_text)} input tokens)...")
+            news_text = self._condensed_news(context_news_list, budget)
+            news_heading = "Tech News Digests (condensed by sector, most significant first)"
+            # Only the bounded digest input gets an output cap; thinking tokens
+            # count against it, so the direct call keeps the model default
+            config_kwargs["max_output_tokens"] = budget.synthesis_output_tokens
+
         prompt = textwrap.dedent(f"""
         You are the "Shift Intelligence Engine" for TechShift. Analyze the provided data for the **{region}** region.
         
         ## Input Data
         
-        ### 1. Tech News (Last 24h)
+        ### 1. {news_heading}
         {news_text}
         
         ### 2. Context & Continuity
@@ -904,9 +1398,7 @@ class GeminiClient:
                 self.client.models.generate_content,
                 model='gemini-3.1-pro-preview', # High reasoning model
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
+                config=types.GenerateContentConfig(**config_kwargs)
             )
             result = json.loads(response.text)
             if isinstance(result, list):
@@ -930,7 +1422,7 @@ class GeminiClient:
              news_text = "\n".join([f"- {art['title']}" for art in context_news[:10]])
 
         prompt = textwrap.dedent(f"""
-        You are the Editor-in-Chief of "TechShift". Write a "Daily Briefing" for the **{region}** region.
+        Write today's "Daily Briefing" for the **{region}** region.
         
         ## Input Data
         
@@ -943,71 +1435,11 @@ class GeminiClient:
         ### 3. Internal Links (Reference)
         {internal_links_context if internal_links_context else "N/A"}
         
-        ## Goal
-        Create a **Navigation Chart** for the future. 
-        Do NOT write a generic news summary. Write a strategic analysis of "Structural Changes".
-        
-        ## Tone & Style
-        - **Insightful**: Connect the dots.
-        - **Japanese Language**: Professional, crisp, and visionary.
-        - **No Fluff**: Avoid "We hope", "Expected to". Use "The data suggests", "The barrier is".
-        ## Output Structure (Japanese Headers)
-        
-        1. **Title**: Generated based on rules below.
-        
-        2. **本日の重要ポイント**
-           - High-level summary of the day's tectonic shifts.
-           - Bullet points of top 3 takeaways.
-
-        3. **分野別動向**
-           - **Rule**: Only include sectors with significant updates (Torutsume).
-           - **Mandatory**: If a "Deep Dive Article" exists for a sector (Context 4), you MUST introduce it here with a link.
-           - Official Sectors:
-             - **AI・人工知能 (Advanced AI)**
-             - **ロボティクス・モビリティ (Robotics & Mobility)**
-             - **量子・先端技術 (Quantum & Tech)**
-             - **環境・エネルギー (Green Tech)**
-             - **ライフサイエンス (Life Science)**
-             - **宇宙・航空 (Space & Aero)**
-        
-        4. **複合的影響**
-           - Discuss how these shifts affect each other (Synergy).
-           - e.g., "Quantum advancements accelerating Bio-simulation."
-
-        5. **今後の注目点**
-           - What to watch next week/month.
-           - Specific KPIs or Events.
-        
-        ## Internal Linking
-        - **MANDATORY**: Embed links to "Today's Featured Articles" naturally within the relevant Sector Update.
-        - Format: `[Title](URL)`
-
-        ## フォーマット
-        - Markdown形式
-        - 4000文字程度
-        - 技術仕様はテーブルで比較
-        - HTMLタグ使用禁止
-
-        ## Title Rules (Pure SEO)
-        1. **Goal**: Maximize Click-Through Rate (CTR) and Search Volume.
-        2. **Format**: [Hero Keyword] + [Impact/Action]
-        3. **Rules**:
-           - **NO** "Daily Shift" or Date prefix.
-           - Start with the most important Keyword (e.g., "全固体電池", "GPT-5").
-           - Include "Impact", "Roadmap", "Future", or "Industry Shift".
-           - Limit to 32 characters (Google Search Snippet limit).
-        4. **Good Examples**:
-           - 「全固体電池の量産はいつ？最新ロードマップと課題」
-           - 「AIエージェントが変える仕事の未来と6つの業界動向」
-           - 「核融合発電の現状と2026年の注目ポイント」
         """)
         
         try:
-            response = self._retry_request(
-                self.client.models.generate_content,
-                model='gemini-3.1-pro-preview',
-                contents=prompt
-            )
+            response = self.generate_with_prefix(BRIEFING_INSTRUCTIONS, prompt, model='gemini-3.1-pro-preview')
+            if not response: raise Exception("No response")
             return response.text
         except Exception as e:
             print(f"Briefing writing failed: {e}")
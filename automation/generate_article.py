@@ -1,20 +1,38 @@
 import argparse
+import contextvars
+import os
 import sys
 import re
 import json
-import markdown
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 try:
-    from automation.gemini_client import GeminiClient
+    from automation.lazy import lazy_import
     from automation.wp_client import WordPressClient
-    from automation.analysis.classifier import ArticleClassifier
+    from automation.wp_batch import publish_post
+    from automation.enrichment import ArticleEnricher
     from automation.internal_linker import InternalLinkSuggester
+    from automation.link_injector import LinkIndex, inject_links
+    from automation.image_queue import ImageJobQueue
+    from automation.client_registry import get_gemini_client
+    from automation.streaming import ArticleStream
 except ImportError:
-    import gemini_client
-    from gemini_client import GeminiClient
+    from lazy import lazy_import
     from wp_client import WordPressClient
-    from analysis.classifier import ArticleClassifier
+    from wp_batch import publish_post
+    from enrichment import ArticleEnricher
     from internal_linker import InternalLinkSuggester
+    from link_injector import LinkIndex, inject_links
+    from image_queue import ImageJobQueue
+    from client_registry import get_gemini_client
+    from streaming import ArticleStream
+
+markdown = lazy_import("markdown")
+
+# Model and approximate LLM requests per generated article (classify, summarize, dedupe,
+# write, SEO, image prompt, SNS, impact), used by orchestrators to plan against the LLM budget
+ARTICLE_MODEL = 'gemini-3.1-pro-preview'
+LLM_REQUESTS_PER_ARTICLE = 8
 
 def parse_article_content(text):
     """
@@ -87,10 +105,111 @@ keyword: {keyword}
     except Exception as e:
         print(f"Warning: Failed to save local file: {e}")
 
-def run_generation_task(args, gemini_client=None, wp_client=None):
+def draft_path(keyword):
+    """Local draft the streamed article is written to (same naming as save_to_file)."""
+    output_dir = os.path.join(os.path.dirname(__file__), "generated_articles")
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    safe_keyword = re.sub(r'[\\/*?:\"<>| ]', '_', keyword)
+    return os.path.join(output_dir, f"{date_str}_{safe_keyword}.draft.md")
+
+class EarlyTitleWork:
+    """
+    Work that only needs the generated title, started while the body is still streaming:
+    classification, hero image prompt and a duplicate check against recent posts
+    (skipped when existing_titles is empty, e.g. the caller already deduplicated).
+    A duplicate cancels the stream.
+    """
+
+    def __init__(self, enricher, summary, article_type, existing_titles=None):
+        self.enricher = enricher
+        self.summary = summary
+        self.article_type = article_type
+        self.existing_titles = existing_titles or []
+        self.stream = None
+        self.duplicate_of = None
+        self.futures = {}
+        self.dedup = None
+        self.executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="early-title")
+
+    def start(self, title):
+        """ArticleStream on_title callback (called again if a retried stream changes the title)."""
+        print(f"Title streamed: {title} (starting classification, image prompt and dedup)")
+        self.futures = {
+            "classification": self._submit(self.enricher.classifier.classify_article, title, self.summary),
+            "image_prompt": self._submit(self.enricher.gemini.generate_image_prompt, title, self.summary, self.article_type),
+        }
+        if self.existing_titles:
+            self.dedup = self._submit(self._check_duplicate, title)
+
+    def _submit(self, func, *args):
+        # Run in the caller's context so the requests count against its llm_stage
+        return self.executor.submit(contextvars.copy_context().run, func, *args)
+
+    def _check_duplicate(self, title):
+        duplicate_of = self.enricher.gemini.check_duplication(title, self.summary, self.existing_titles)
+        if duplicate_of and self.stream and self.stream.title == title:
+            self.duplicate_of = duplicate_of
+            self.stream.cancel(f"title duplicates existing post '{duplicate_of}'")
+        return duplicate_of
+
+    def duplicate(self):
+        """Title of the existing post the generated title duplicates (waits for the check), or None."""
+        if self.dedup is not None:
+            try:
+                self.dedup.result()
+            except Exception as e:
+                print(f"Early duplicate check failed: {e}")
+        return self.duplicate_of
+
+    def results(self):
+        """Finished early fields as {field: value} (failed ones are left to the enricher)."""
+        results = {}
+        for field, future in self.futures.items():
+            try:
+                results[field] = future.result()
+            except Exception as e:
+                print(f"Early {field} failed: {e}")
+        return results
+
+    def shutdown(self):
+        # Early work not started yet is no longer needed (skip / enrichment took over)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def queue_hero_image(image_queue, gemini, wp, title, content, args, output_dir, post_id=None, image_prompt=None):
+    """
+    Queue hero image generation for an article.
+    If no shared queue is given, a private queue is used and drained before returning
+    (the post itself is already published at this point).
+    """
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    safe_keyword = re.sub(r'[\\/*?:"\<\>| ]', '_', args.keyword)
+    image_filename = f"{date_str}_{safe_keyword}_hero.png"
+    image_path = os.path.join(output_dir, image_filename)
+
+    owns_queue = image_queue is None
+    if owns_queue:
+        image_queue = ImageJobQueue(gemini, wp, max_workers=1)
+
+    image_queue.submit(
+        title,
+        content[:1000],  # Use first 1000 chars as summary
+        image_path,
+        article_type=args.type,
+        post_id=post_id,
+        alt_text=args.keyword,
+        image_prompt=image_prompt
+    )
+
+    if owns_queue:
+        image_queue.shutdown(wait=True)
+
+def run_generation_task(args, gemini_client=None, wp_client=None, image_queue=None):
     """
     Main workflow for generating a single article.
     Can be called from other scripts (pipeline.py) or main().
+
+    If image_queue (ImageJobQueue) is given, the hero image is generated in the background
+    after the post is published; the caller is responsible for draining the queue.
     """
     print(f"Starting article generation for keyword: {args.keyword} (Type: {args.type})")
     
@@ -106,7 +225,7 @@ def run_generation_task(args, gemini_client=None, wp_client=None):
 
     if gemini is None:
         try:
-            gemini = GeminiClient()
+            gemini = get_gemini_client()
         except Exception as e:
              print(f"Failed to initialize Gemini Client: {e}")
              return False
@@ -146,15 +265,23 @@ def run_generation_task(args, gemini_client=None, wp_client=None):
         print("Keyword-based generation mode")
     
     # 1.5 Internal Linking Suggestions
+    # inject (default): links are placed after generation by matching the candidates'
+    # key_topics / entities (link_injector.py); prompt: candidates go into the prompt
+    link_mode = getattr(args, "link_mode", None) or os.getenv("LINK_MODE", "inject")
     extra_instructions = None
+    existing_titles = []
+    candidates = []
     if wp:
         try:
             print("--- Internal Link Suggester ---")
             linker = InternalLinkSuggester(wp, gemini) # Pass existing clients
             # Limit to 50 for performance during generation
             candidates = linker.fetch_candidates(limit=50) 
+            existing_titles = [c['title'] for c in candidates]
             
-            if candidates:
+            if candidates and link_mode == "inject":
+                print(f"Link mode: inject ({len(candidates)} candidates, placed after generation)")
+            elif candidates:
                 # Simple context for scoring
                 scoring_context = f"Keyword: {args.keyword}\nType: {args.type}"
                 if context:
@@ -217,20 +344,49 @@ Select the most relevant ones (if any) and include them in the article using sta
         except Exception as e:
             print(f"Warning: Internal linking failed: {e}")
 
+    enrichment_mode = getattr(args, "enrichment", None) or "combined"
+    try:
+        from seo_optimizer import SEOOptimizer
+    except ImportError:
+        from automation.seo_optimizer import SEOOptimizer
+    optimizer = SEOOptimizer(client=gemini)
+    enricher = ArticleEnricher(gemini, optimizer=optimizer, mode=enrichment_mode)
+
     # 2. Generate Content
     print("Generating content with Gemini...")
     # NOTE: We pass category=None because args.category is for WP Taxonomy override, 
     # while gemini.generate_article uses 'category' for Prompt Selection.
     # We rely on 'article_type' to select the correct Prompt (market-analysis, featured-news, etc).
+    # Streamed by default: title-only work starts as soon as the title line arrives,
+    # and the text is written to a local draft as it comes in.
+    early = None
+    stream = None
+    if getattr(args, "stream", True):
+        summary = context.get('summary', '') if context else args.keyword
+        # Callers that checked the source article already (pipeline / daemon / worker) skip the title check
+        early = EarlyTitleWork(enricher, summary, args.type,
+                               existing_titles=None if getattr(args, "deduplicated", False) else existing_titles)
+        stream = ArticleStream(on_title=early.start, draft_path=draft_path(args.keyword))
+        early.stream = stream
     generated_text = gemini.generate_article(
         args.keyword, 
         article_type=args.type, 
         context=context, 
         extra_instructions=extra_instructions, 
-        category=None
+        category=None,
+        stream=stream
     )
+    if stream:
+        stream.close(remove_draft=bool(generated_text))
     
+    if early and early.duplicate():
+        early.shutdown()
+        print(f"SKIP: Generated title duplicates '{early.duplicate_of}'")
+        return False
+
     if not generated_text:
+        if early:
+            early.shutdown()
         print("Failed to generate content.")
         return False
         
@@ -238,80 +394,44 @@ Select the most relevant ones (if any) and include them in the article using sta
     
     print(f"Generated Title: {title}")
     print(f"Content Length: {len(content)} chars")
-    
-    # 3. Generate SEO Metadata
-    print("Generating SEO metadata...")
-    meta_desc = ""
-    optimized_title = title
-    
-    try:
-        try:
-            from seo_optimizer import SEOOptimizer
-        except ImportError:
-            from automation.seo_optimizer import SEOOptimizer
-            
-        optimizer = SEOOptimizer(client=gemini)
-        
-        # Generate Meta Description
-        meta_desc = optimizer.generate_meta_description(title, content, args.keyword)
-        print(f"Meta Description: {meta_desc}")
-        
-        # Optimize Title
-        optimized_title = optimizer.optimize_title(title)
-        print(f"Original Title: {title}")
-        print(f"Optimized Title: {optimized_title}")
-        
-    except Exception as e:
-        print(f"Warning: SEO Optimization failed: {e}")
 
-    # 2.5 Generate Hero Image
-    # if gemini.use_vertex: # Allow for both Vertex and API Key
-    print("Generating hero image...")
+    if link_mode == "inject" and candidates:
+        content, links = inject_links(content, LinkIndex.from_candidates(candidates))
+        print(f"Internal links inserted: {len(links)}")
+        for link in links:
+            print(f"  - {link['term']} -> {link['title']}")
     
-    # Generate contextual image prompt based on article content
-    content_summary = content[:1000]  # Use first 1000 chars as summary
-    image_prompt = gemini.generate_image_prompt(title, content_summary, args.type)
-    print(f"Image prompt: {image_prompt}")
-    
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    safe_keyword = re.sub(r'[\\/*?:"\<\>| ]', '_', args.keyword)
-    image_filename = f"{date_str}_{safe_keyword}_hero.png"
-    image_path = os.path.join(OUTPUT_DIR, image_filename)
-    
-    generated_image_path = gemini.generate_image(image_prompt, image_path, aspect_ratio="16:9")
-    
-    if generated_image_path:
-        # Re-save the file (without inserting image into content)
-        save_to_file(title, content, args.keyword)
-        print(f"Hero image generated: {image_filename}")
-    
-    # 3. Classify Content
-    print("Classifying content (TechShift Taxonomy)...")
-    category_id = None
-    tag_ids = []
-    
-    try:
-        # Inject client into Classifier
-        classifier = ArticleClassifier(client=gemini)
-        classification = classifier.classify_article(title, content[:1000])
-        
-        # Override category if provided via arguments (Source of Truth)
-        if args.category:
-            print(f"Category forced by argument: {args.category}")
-            classification["category"] = args.category
-            
-        print(f"Classification Result: {classification}")
-        
-    except Exception as e:
-        print(f"Classification failed: {e}")
-        classification = {}
-
-    # 4. Generate AI Structured Summary (New)
-    print("Generating AI Structured Summary...")
-    # Strip HTML for efficient token usage
-    text_content_for_summary = re.sub('<[^<]+?>', '', content)
-    structured_summary = gemini.generate_structured_summary(text_content_for_summary)
+    # 3. Post-generation enrichment (meta description, image prompt, taxonomy,
+    #    structured summary, impact analysis, SNS copy) - one call in "combined" mode;
+    #    fields already produced from the streamed title are not requested again
+    print("Generating article metadata...")
+    precomputed = early.results() if early else None
+    if early:
+        early.shutdown()
+    enrichment = enricher.enrich(title, content, args.keyword, article_type=args.type, precomputed=precomputed)
+
+    meta_desc = enrichment.get("meta_description") or ""
+    print(f"Meta Description: {meta_desc}")
+
+    # Optimize Title (local rule, no model call)
+    optimized_title = optimizer.optimize_title(title)
+    print(f"Original Title: {title}")
+    print(f"Optimized Title: {optimized_title}")
+
+    # 2.5 Save local copy
+    # Hero image generation runs in the background after posting (see queue_hero_image)
+    save_to_file(title, content, args.keyword)
     
+    # Classification (TechShift Taxonomy)
+    classification = enrichment.get("classification") or {}
+    # Override category if provided via arguments (Source of Truth)
+    if args.category:
+        print(f"Category forced by argument: {args.category}")
+        classification["category"] = args.category
+    print(f"Classification Result: {classification}")
+
+    # AI Structured Summary
+    structured_summary = enrichment.get("structured_summary")
     if structured_summary:
         print("  - Structured summary generated.")
         if args.dry_run:
@@ -329,6 +449,8 @@ Select the most relevant ones (if any) and include them in the article using sta
         print(f"Title: {optimized_title}")
         print(f"Meta Description: {meta_desc}")
         print(content[:500] + "...")
+        queue_hero_image(image_queue, gemini, None, title, content, args, OUTPUT_DIR,
+                         image_prompt=enrichment.get("image_prompt"))
         return True
 
     # 5. Post to WordPress
@@ -336,33 +458,10 @@ Select the most relevant ones (if any) and include them in the article using sta
     try:
         # Use existing WP client
         
-        # Resolve Categories and Tags
-        if classification:
-            cat_slug = classification.get("category")
-            if cat_slug:
-                cat_id = wp.get_category_id(cat_slug)
-                if cat_id:
-                    category_id = [cat_id]
-                    print(f"Resolved Category: {cat_slug} -> {cat_id}")
-            
-            t_slugs = classification.get("tags", [])
-            for t_slug in t_slugs:
-                t_id = wp.get_tag_id(t_slug)
-                if t_id:
-                    tag_ids.append(t_id)
-            print(f"Resolved Tags: {t_slugs} -> {tag_ids}")
-
-        featured_media_id = None
-
-        # Upload generated hero image explicitly
-        if 'generated_image_path' in locals() and generated_image_path and os.path.exists(generated_image_path):
-            print(f"Uploading hero image to WordPress: {image_filename}")
-            media_result = wp.upload_media(generated_image_path, alt_text=args.keyword)
-            if media_result and 'id' in media_result:
-                featured_media_id = media_result['id']
-                print(f"Set as featured media ID: {featured_media_id}")
-            else:
-                print(f"Failed to upload hero image.")
+        # Hero image is attached after publishing; use the placeholder until then
+        featured_media_id = ImageJobQueue.placeholder_media_id()
+        if featured_media_id:
+            print(f"Using placeholder featured media ID: {featured_media_id}")
 
         # Upload other images found in content
         image_pattern = r'!\[([^\]]*)\]\(([^)]+)\)'
@@ -444,57 +543,86 @@ Select the most relevant ones (if any) and include them in the article using sta
             json_ld_string = optimizer.create_json_ld(article_data_ld, schema_type=schema_type)
             meta_fields["_techshift_json_ld"] = json_ld_string
 
-        # --- 4.5 Generate TechShift Impact Analysis (New) ---
-        print("Generating TechShift Impact Analysis...")
-        try:
-            # Call specialized single-article analyzer
-            impact_analysis = gemini.analyze_single_article_impact(
-                title=title,
-                content=content,
-                article_type=args.type
-            )
+        # --- 4.5 TechShift Impact Analysis (from enrichment) ---
+        impact_analysis = enrichment.get("impact_analysis")
+        if impact_analysis:
+            shift_score = impact_analysis.get('shift_score', 50)
+            shift_data = impact_analysis.get('shift_analysis', {})
+            the_shift = shift_data.get('the_shift', '')
             
-            if impact_analysis:
-                shift_score = impact_analysis.get('shift_score', 50)
-                shift_data = impact_analysis.get('shift_analysis', {})
-                the_shift = shift_data.get('the_shift', '')
-                
-                print(f"  - Impact Score: {shift_score}")
-                print(f"  - Phase Shift: {the_shift}")
-                
-                # Save to meta_fields using new TechShift keys
-                meta_fields["_techshift_impact"] = shift_score
-                meta_fields["_techshift_phase"] = the_shift[:255]
-                
-                meta_fields["_techshift_catalyst"] = shift_data.get('catalyst', '')
-                meta_fields["_techshift_next_wall"] = shift_data.get('next_wall', '')
-                meta_fields["_techshift_signal"] = shift_data.get('signal', '')
-                
-            else:
-                print("  - Warning: Impact analysis returned empty.")
-                
-        except Exception as e:
-            print(f"  - Warning: Impact analysis failed: {e}") 
+            print(f"  - Impact Score: {shift_score}")
+            print(f"  - Phase Shift: {the_shift}")
+            
+            # Save to meta_fields using new TechShift keys
+            meta_fields["_techshift_impact"] = shift_score
+            meta_fields["_techshift_phase"] = the_shift[:255]
+            
+            meta_fields["_techshift_catalyst"] = shift_data.get('catalyst', '')
+            meta_fields["_techshift_next_wall"] = shift_data.get('next_wall', '')
+            meta_fields["_techshift_signal"] = shift_data.get('signal', '')
+        else:
             # Non-critical failure, proceed with posting
-
-
-
-        result = wp.create_post(
-            title=optimized_title, 
-            content=html_content, 
-            status=status,
-            date=schedule_date,
-            categories=category_id,
-            tags=tag_ids,
-            featured_media=featured_media_id,
-            excerpt=meta_desc,
-            meta=meta_fields
+            print("  - Warning: Impact analysis returned empty.")
+
+        # Tags (created if missing) and the post go out as batch/v1 requests;
+        # category/tag IDs come from the per-process term cache (see wp_batch.py)
+        post_data = {"title": optimized_title, "content": html_content, "status": status}
+        if schedule_date:
+            post_data["date"] = schedule_date
+        if featured_media_id:
+            post_data["featured_media"] = featured_media_id
+        if meta_desc:
+            post_data["excerpt"] = meta_desc
+        if meta_fields:
+            post_data["meta"] = meta_fields
+
+        # Queue workers (worker.py): only the task holding the publish claim posts
+        publish_guard = getattr(args, "publish_guard", None)
+        if publish_guard is not None and not publish_guard.acquire():
+            print("Skipping post: already published (or being published) by another task.")
+            return False
+        if publish_guard is not None:
+            # An earlier lease of this task may have posted before it died
+            existing = publish_guard.existing_post(wp) if publish_guard.in_doubt else None
+            if existing:
+                print(f"Post already exists from an earlier attempt. ID: {existing.get('id')}")
+                publish_guard.settle({"id": existing.get('id'), "link": existing.get('link')})
+                return True
+            post_data["content"] = publish_guard.mark(html_content)
+
+        result, _ = publish_post(
+            wp,
+            post_data,
+            category_slug=(classification or {}).get("category"),
+            tag_slugs=(classification or {}).get("tags", [])
         )
         
         if result:
             print(f"Successfully created post. ID: {result.get('id')}")
+            if publish_guard is not None:
+                publish_guard.settle({"id": result.get('id'), "link": result.get('link')})
             print(f"Link: {result.get('link')}")
             
+            # Mark the source article as generated (daily briefing deep dives)
+            source_hash = getattr(args, "source_url_hash", None)
+            if source_hash and status == "publish" and not args.dry_run and result.get('link'):
+                try:
+                    try:
+                        from automation.db.client import DBClient
+                    except ImportError:
+                        from db.client import DBClient
+                    if not DBClient().set_article_url(source_hash, result.get('link'), record=getattr(args, "source_record", None)):
+                        print(f"Warning: Article URL not recorded for {source_hash[:12]} (no ts_articles row?)")
+                except Exception as e:
+                    print(f"Failed to record article URL: {e}")
+
+            # --- Hero Image (Background) ---
+            try:
+                queue_hero_image(image_queue, gemini, wp, title, content, args, OUTPUT_DIR, post_id=result.get('id'),
+                                 image_prompt=enrichment.get("image_prompt"))
+            except Exception as e:
+                print(f"Hero image job failed to queue: {e}")
+            
             # --- SNS Posting (X/Twitter) ---
             # Only post if status is 'publish' (not 'future' or 'draft')
             if status == "publish" and not args.dry_run:
@@ -508,7 +636,8 @@ Select the most relevant ones (if any) and include them in the article using sta
                     
                     if sns.x_client:
                         print("Generating SNS content...")
-                        sns_content_data = gemini.generate_sns_content(optimized_title, content, args.type)
+                        sns_content_data = enrichment.get("sns_content") or enricher.fallback(
+                            "sns_content", optimized_title, content, args.keyword, args.type)
                         
                         if sns_content_data:
                             # Construct post text
@@ -552,6 +681,9 @@ def main():
     parser.add_argument('--schedule', type=str, help='Schedule date (YYYY-MM-DD HH:MM or YYYY-MM-DD HH:MM:SS)')
     parser.add_argument('--context', type=str, help='Article context for News/Global articles (JSON string, optional)')
     parser.add_argument('--category', type=str, help='Article category slug (e.g., market-analysis, featured-news)')
+    parser.add_argument('--enrichment', type=str, default='combined', choices=['combined', 'separate'], help='Post-generation metadata: one combined call (with per-field fallbacks) or separate calls')
+    parser.add_argument('--no-stream', dest='stream', action='store_false', help='Wait for the complete response instead of streaming it')
+    parser.add_argument('--link-mode', type=str, default=None, choices=['inject', 'prompt'], help='Internal links: placed after generation by entity matching (inject, default: LINK_MODE or inject) or listed in the prompt')
     
     args = parser.parse_args()
     
@@ -8,9 +8,15 @@ Generate and publish static pages (privacy policy, about, contact) using Gemini
 import os
 import sys
 import argparse
-import markdown
+
+# Allow running from the automation dir or via `python -m automation`
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
 from gemini_client import GeminiClient
 from wp_client import WordPressClient
+from lazy import lazy_import
+
+markdown = lazy_import("markdown")
 
 # Page configurations
 PAGE_CONFIGS = {
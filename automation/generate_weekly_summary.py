@@ -5,7 +5,6 @@ import sys
 import argparse
 from datetime import datetime, timedelta
 import re
-import markdown
 
 # Add parent directory to path to allow imports from automation package if run directly
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,12 +13,18 @@ try:
     from automation.gemini_client import GeminiClient
     from automation.wp_client import WordPressClient
     from automation.seo_optimizer import SEOOptimizer
+    from automation.lazy import lazy_import
+    from automation.llm_budget import set_stage
 except ImportError:
     # Fallback for local run
     import gemini_client
     from gemini_client import GeminiClient
     from wp_client import WordPressClient
     from seo_optimizer import SEOOptimizer
+    from lazy import lazy_import
+    from llm_budget import set_stage
+
+markdown = lazy_import("markdown")
 
 def parse_article_content(text):
     """
@@ -45,6 +50,7 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Dry run mode (no posting)")
     parser.add_argument("--days", type=int, default=7, help="Days to look back (default: 7)")
     args = parser.parse_args()
+    set_stage("weekly")
     
     print(f"=== Starting Weekly Summary Generation (Lookback: {args.days} days) ===")
     
@@ -0,0 +1,283 @@
+"""
+Deadlines and Hedged Requests for TechShift
+
+None of the model calls had a client-side deadline, so one stuck request
+(typically to gemini-3.1-pro-preview) stalled the serial pipeline until the
+HTTP stack gave up.
+
+run_hedged() wraps a single model call:
+- deadline: every call gets a per-stage deadline (LLM_DEADLINES). The wait is
+  abandoned when it passes (DeadlineExceeded) and the request itself carries
+  the same HTTP timeout, so the abandoned thread ends as well
+- hedging (HEDGE_ENABLED=1): once a call has been running longer than the
+  observed p95 latency of its (stage, model), a duplicate is sent to an
+  alternate: the same model on another backend when the backend pool has
+  several credentials, otherwise the next model of the LLM budget's fallback
+  chain. The first valid response wins; the loser's result is discarded and
+  its thread ends at its HTTP timeout (the sync SDK cannot abort a request)
+- at most HEDGE_MAX_RATE of a stage's calls are hedged, and only after
+  HEDGE_MIN_SAMPLES latencies were observed
+
+Latencies, hedge rate / wins and deadline misses per stage are kept in
+hedge_stats (printed by the pipeline, exported on the daemon's /metrics).
+
+Configuration (.env):
+    LLM_DEADLINES=scoring=90,generation=300,briefing=600,default=180
+    HEDGE_ENABLED=0
+    HEDGE_MIN_SAMPLES=20
+    HEDGE_MIN_DELAY=2
+    HEDGE_MAX_RATE=0.1
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    from automation.llm_budget import _parse_map
+except ImportError:
+    from llm_budget import _parse_map
+
+DEFAULT_DEADLINES = {"scoring": 90, "generation": 300, "briefing": 600, "weekly": 600, "default": 180}
+LATENCY_WINDOW = 200
+
+
+class DeadlineExceeded(TimeoutError):
+    """A model call did not return a valid response within its stage deadline."""
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def has_content(response):
+    """Default validity check: the response carries text, candidates or images."""
+    if response is None:
+        return False
+    for attr in ("generated_images", "candidates"):
+        if getattr(response, attr, None):
+            return True
+    try:
+        return bool(getattr(response, "text", None))
+    except Exception:
+        return False
+
+
+def with_timeout(config, seconds):
+    """
+    Return a generate_content config carrying an HTTP timeout of `seconds`.
+
+    Accepts None, a dict or a GenerateContentConfig; a timeout already set by
+    the caller is kept.
+    """
+    ms = int(seconds * 1000)
+    if config is None or isinstance(config, dict):
+        config = dict(config or {})
+        http_options = config.get("http_options")
+        if http_options is None:
+            config["http_options"] = {"timeout": ms}
+        elif isinstance(http_options, dict) and not http_options.get("timeout"):
+            config["http_options"] = {**http_options, "timeout": ms}
+        elif not isinstance(http_options, dict) and not http_options.timeout:
+            config["http_options"] = http_options.model_copy(update={"timeout": ms})
+        return config
+
+    http_options = config.http_options
+    if http_options is not None and http_options.timeout:
+        return config
+    if http_options is None:
+        from google.genai import types
+        http_options = types.HttpOptions(timeout=ms)
+    else:
+        http_options = http_options.model_copy(update={"timeout": ms})
+    return config.model_copy(update={"http_options": http_options})
+
+
+class HedgePolicy:
+    """Deadlines and hedging thresholds, read from the environment."""
+
+    def __init__(self, deadlines=None, enabled=None, min_samples=None, min_delay=None, max_rate=None):
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines if deadlines is not None
+                                                   else _parse_map(os.getenv("LLM_DEADLINES"), float))}
+        if enabled is None:
+            enabled = os.getenv("HEDGE_ENABLED", "0").lower() not in ("0", "false", "no")
+        self.enabled = enabled
+        self.min_samples = min_samples if min_samples is not None else int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv("HEDGE_MIN_DELAY", "2"))
+        self.max_rate = max_rate if max_rate is not None else float(os.getenv("HEDGE_MAX_RATE", "0.1"))
+
+    def deadline(self, stage):
+        return self.deadlines.get(stage or "default", self.deadlines["default"])
+
+
+class HedgeStats:
+    """Thread-safe per-stage latencies and hedging / deadline counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}  # (stage, model) -> deque of seconds
+        self._stages = {}
+
+    def _stage(self, stage):
+        return self._stages.setdefault(stage or "default", {
+            "calls": 0, "hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0, "failed": 0,
+        })
+
+    def observe(self, stage, model, seconds):
+        with self._lock:
+            self._latency.setdefault((stage or "default", model), deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def p95(self, stage, model, min_samples):
+        with self._lock:
+            samples = self._latency.get((stage or "default", model))
+            if not samples or len(samples) < min_samples:
+                return None
+            return _percentile(samples, 0.95)
+
+    def count(self, stage, key):
+        with self._lock:
+            self._stage(stage)[key] += 1
+
+    def hedge_rate(self, stage):
+        with self._lock:
+            s = self._stage(stage)
+            return s["hedged"] / s["calls"] if s["calls"] else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            stages = {stage: dict(s) for stage, s in self._stages.items()}
+            latency = {key: list(v) for key, v in self._latency.items()}
+        for stage, s in stages.items():
+            samples = [x for (st, _), values in latency.items() if st == stage for x in values]
+            s["p50"] = _percentile(samples, 0.5) if samples else None
+            s["p95"] = _percentile(samples, 0.95) if samples else None
+        return stages
+
+    def summary(self):
+        lines = []
+        for stage, s in self.snapshot().items():
+            rate = s["hedged"] / s["calls"] if s["calls"] else 0.0
+            p50 = "-" if s["p50"] is None else f"{s['p50']:.1f}s"
+            p95 = "-" if s["p95"] is None else f"{s['p95']:.1f}s"
+            lines.append(f"[{stage}] calls={s['calls']} p50={p50} p95={p95} hedged={s['hedged']} ({rate:.0%}, "
+                         f"won {s['hedge_wins']}) deadline_exceeded={s['deadline_exceeded']} failed={s['failed']}")
+        return "\n".join(lines) if lines else "(no model calls)"
+
+    def render_metrics(self, prefix="techshift_llm_call"):
+        """Prometheus text lines (used by daemon.py /metrics)."""
+        lines = []
+        for stage, s in self.snapshot().items():
+            for key in ("calls", "hedged", "hedge_wins", "deadline_exceeded", "failed"):
+                lines.append(f'{prefix}_{key}_total{{stage="{stage}"}} {s[key]}')
+            if s["p95"] is not None:
+                lines.append(f'{prefix}_latency_p95_seconds{{stage="{stage}"}} {s["p95"]:.3f}')
+        return lines
+
+
+hedge_stats = HedgeStats()
+
+
+class _Race:
+    """Results of the primary / hedge attempts, in completion order."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.done = []  # (label, ok, value)
+        self.started = set()
+
+
+def _launch(race, label, func, on_finish):
+    """Run func in a daemon thread in the caller's context (llm_stage etc.)."""
+    ctx = contextvars.copy_context()
+
+    def run():
+        started = time.perf_counter()
+        try:
+            value, ok = ctx.run(func), True
+        except Exception as e:
+            value, ok = e, False
+        on_finish(label, ok, value, time.perf_counter() - started)
+        with race.cond:
+            race.done.append((label, ok, value))
+            race.cond.notify_all()
+
+    race.started.add(label)
+    threading.Thread(target=run, name=f"llm-{label}", daemon=True).start()
+
+
+def run_hedged(primary, model, stage=None, alternate=None, policy=None, stats=hedge_stats, validate=has_content):
+    """
+    Run primary() under the stage deadline, hedging with alternate() if it runs long.
+
+    Args:
+        primary: performs the model call
+        model: model of the primary call (latency is tracked per stage and model)
+        alternate: returns a callable for the duplicate request, or None if no
+                   hedge can be sent right now (e.g. no budget); called lazily
+        validate: response -> bool; an invalid response only wins when no
+                  other attempt is left
+    Returns:
+        The winning response.
+    Raises:
+        DeadlineExceeded, or the primary's exception when every attempt failed.
+    """
+    policy = policy or HedgePolicy()
+    stats.count(stage, "calls")
+    deadline = policy.deadline(stage)
+    hedge_after = None
+    if policy.enabled and alternate is not None and stats.hedge_rate(stage) < policy.max_rate:
+        p95 = stats.p95(stage, model, policy.min_samples)
+        if p95 is not None and p95 + policy.min_delay < deadline:
+            hedge_after = max(policy.min_delay, p95)
+
+    def on_finish(label, ok, value, seconds):
+        if ok and label == "primary":
+            stats.observe(stage, model, seconds)
+
+    race = _Race()
+    start = time.monotonic()
+    _launch(race, "primary", primary, on_finish)
+
+    fallback = None  # an invalid response, returned if nothing better arrives
+    seen = 0
+    with race.cond:
+        while True:
+            for label, ok, value in race.done[seen:]:
+                seen += 1
+                if ok and validate(value):
+                    if label == "hedge":
+                        stats.count(stage, "hedge_wins")
+                    return value
+                if ok:
+                    fallback = fallback or (value,)
+                elif label == "primary" and "hedge" not in race.started:
+                    stats.count(stage, "failed")
+                    raise value
+            if len(race.done) == len(race.started) and (hedge_after is None or "hedge" in race.started):
+                if fallback:
+                    return fallback[0]
+                stats.count(stage, "failed")
+                raise next(value for label, _, value in race.done if label == "primary")
+
+            elapsed = time.monotonic() - start
+            if elapsed >= deadline:
+                stats.count(stage, "deadline_exceeded")
+                raise DeadlineExceeded(f"{model} call in stage '{stage or 'default'}' exceeded {deadline:.0f}s")
+
+            if hedge_after is not None and "hedge" not in race.started and elapsed >= hedge_after:
+                hedge = alternate()
+                if hedge is None:
+                    hedge_after = None
+                else:
+                    stats.count(stage, "hedged")
+                    print(f"[hedge] {stage or 'default'}: {model} call slower than p95 ({hedge_after:.1f}s), sending a duplicate")
+                    _launch(race, "hedge", hedge, on_finish)
+                continue
+
+            wake = deadline
+            if hedge_after is not None and "hedge" not in race.started:
+                wake = min(wake, hedge_after)
+            race.cond.wait(max(0.01, wake - elapsed))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Hero Image Job Queue for TechShift
+
+Decouples hero image generation from article posting.
+Articles are published first (with an optional placeholder featured image),
+then background workers generate the hero image, upload it and attach it to
+the post via WordPressClient.update_resource().
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ImageJobQueue:
+    """
+    Background worker pool for hero image jobs.
+
+    A job runs: image prompt -> image generation -> media upload -> featured_media update.
+    Workers share the GeminiClient passed in, so the cached image client is reused
+    across all jobs of a run.
+    """
+
+    def __init__(self, gemini_client, wp_client=None, max_workers=2):
+        self.gemini = gemini_client
+        self.wp = wp_client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-worker")
+        self._futures = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def placeholder_media_id():
+        """
+        Featured media ID used until the real hero image is attached.
+        Configured via WP_PLACEHOLDER_MEDIA_ID. Returns None if unset
+        (the theme then shows themes/techshift/assets/images/no-image.png).
+        """
+        value = os.getenv("WP_PLACEHOLDER_MEDIA_ID")
+        if value and value.isdigit():
+            return int(value)
+        return None
+
+    def submit(self, title, content_summary, output_path, article_type="topic-focus",
+               post_id=None, alt_text="", image_prompt=None, aspect_ratio="16:9"):
+        """
+        Queue a hero image job.
+
+        Args:
+            title: Article title (used for the image prompt)
+            content_summary: Short excerpt of the article body
+            output_path: Local path to save the generated PNG
+            article_type: Article type passed to generate_image_prompt
+            post_id: WordPress post ID to attach the image to (None = generate only)
+            alt_text: Alt text for the uploaded media
+            image_prompt: Pre-built prompt (skips the prompt generation call)
+            aspect_ratio: Image aspect ratio
+
+        Returns:
+            concurrent.futures.Future resolving to the job result dict
+        """
+        job = {
+            "title": title,
+            "content_summary": content_summary,
+            "output_path": output_path,
+            "article_type": article_type,
+            "post_id": post_id,
+            "alt_text": alt_text or title,
+            "image_prompt": image_prompt,
+            "aspect_ratio": aspect_ratio,
+        }
+        print(f"Queued hero image job for: {title[:40]}... (Post ID: {post_id})")
+        future = self._executor.submit(contextvars.copy_context().run, self._run_job, job)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _run_job(self, job):
+        result = {
+            "post_id": job["post_id"],
+            "image_path": None,
+            "media_id": None,
+            "attached": False,
+        }
+        try:
+            prompt = job["image_prompt"]
+            if not prompt:
+                prompt = self.gemini.generate_image_prompt(job["title"], job["content_summary"], job["article_type"])
+            print(f"[Image Worker] Prompt: {prompt}")
+
+            image_path = self.gemini.generate_image(prompt, job["output_path"], aspect_ratio=job["aspect_ratio"])
+            if not image_path:
+                print(f"[Image Worker] No image generated for: {job['title'][:40]}...")
+                return result
+            result["image_path"] = image_path
+
+            if not self.wp or not job["post_id"]:
+                return result
+
+            media_result = self.wp.upload_media(image_path, alt_text=job["alt_text"])
+            if not media_result or not media_result.get("id"):
+                print(f"[Image Worker] Failed to upload hero image: {image_path}")
+                return result
+            result["media_id"] = media_result["id"]
+
+            updated = self.wp.update_resource("posts", job["post_id"], {"featured_media": media_result["id"]})
+            if updated:
+                result["attached"] = True
+                print(f"[Image Worker] Attached media {media_result['id']} to post {job['post_id']}")
+            else:
+                print(f"[Image Worker] Failed to attach media {media_result['id']} to post {job['post_id']}")
+
+        except Exception as e:
+            print(f"[Image Worker] Job failed for {job['title'][:40]}...: {e}")
+        return result
+
+    def join(self):
+        """Wait for all queued jobs and return their results."""
+        with self._lock:
+            futures = list(self._futures)
+            self._futures = []
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"[Image Worker] Unexpected error: {e}")
+        return results
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs. With wait=True, blocks until pending jobs finish."""
+        results = self.join() if wait else []
+        self._executor.shutdown(wait=wait)
+        if results:
+            attached = sum(1 for r in results if r.get("attached"))
+            print(f"Hero image jobs finished: {attached}/{len(results)} attached.")
+        return results
@@ -55,11 +55,13 @@ class InternalLinkSuggester:
         # Check meta location - standard API vs custom endpoint structure might differ slightly
         # get_posts returns dict directly. get_popular_posts returns similar struct.
         
-        meta = post.get('meta', {})
-        if '_ai_structured_summary' in meta:
+        meta = post.get('meta') or {}
+        # Posts store it as ai_structured_summary (generate_article.py); older ones with a leading underscore
+        summary_key = next((k for k in ('ai_structured_summary', '_ai_structured_summary') if meta.get(k)), None)
+        if summary_key:
              try:
                  # Check if it's already a dict (API sometimes expands) or string
-                 summary_val = meta['_ai_structured_summary']
+                 summary_val = meta[summary_key]
                  if isinstance(summary_val, str):
                     ai_summary_json = json.loads(summary_val)
                  elif isinstance(summary_val, dict):
@@ -83,7 +85,9 @@ class InternalLinkSuggester:
             "title": title,
             "url": post['link'] if 'link' in post else post.get('guid', {}).get('rendered', ''),
             "summary_context": summary_text,
-            "excerpt": self._clean_excerpt(excerpt_text)
+            "excerpt": self._clean_excerpt(excerpt_text),
+            # key_topics / entities feed the link injector (link_injector.py)
+            "summary_data": ai_summary_json
         }
 
     def score_relevance(self, new_article_keyword: str, new_article_context: str, candidates: List[Dict]) -> List[Dict]:
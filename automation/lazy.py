@@ -0,0 +1,42 @@
+"""
+Lazy module loading helper for TechShift automation.
+
+Heavy third-party packages (google-genai, bs4/lxml, feedparser, markdown, tweepy,
+requests) are only imported on first attribute access, so `--help` and
+collection-only runs don't pay for SDKs they never use.
+
+Usage:
+    feedparser = lazy_import("feedparser")
+    feed = feedparser.parse(content)  # imported here, on first use
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Return a proxy for module `name` that is imported on first use."""
+    return LazyModule(name)
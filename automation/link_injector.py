@@ -0,0 +1,287 @@
+"""
+Internal Link Injector for TechShift
+
+Places internal links after generation instead of pasting every candidate's
+ID, title, URL and summary into the generation prompt and asking the model
+to link them.
+
+- The key_topics / entities of each candidate's ai_structured_summary are
+  compiled into one Aho-Corasick automaton (AhoCorasick)
+- Matching is Japanese-aware: text and terms are NFKC-normalised and
+  case-folded per character (full-width Latin, half-width katakana), Latin
+  terms only match on word boundaries ("AI" does not match inside "MAIN");
+  CJK terms match anywhere
+- Terms shared by too many candidates (MAX_TERM_SHARE) are too generic to
+  point at one article and are dropped
+- inject_links() scans the Markdown once: the leftmost-longest mention outside
+  headings, code, existing links, URLs and HTML becomes a [mention](url) link,
+  at most once per article, per_section per section, max_links in total
+
+Deterministic, no LLM call, and the generation prompt gets shorter.
+
+Usage:
+    index = LinkIndex.from_candidates(InternalLinkSuggester(wp, None).fetch_candidates(limit=50))
+    content, links = inject_links(content, index, max_links=5)
+
+    python -m automation link-inject --file generated_articles/draft.md
+"""
+
+import argparse
+import bisect
+import re
+import unicodedata
+from collections import deque
+
+DEFAULT_MAX_LINKS = 5
+DEFAULT_PER_SECTION = 1
+# A term found in more than this share of the candidates links nowhere
+MAX_TERM_SHARE = 0.2
+MIN_TERM_CHARS = 2
+
+_HEADING_RE = re.compile(r"^#{1,6}\s", re.M)
+_PROTECTED_RE = re.compile(
+    r"```.*?```"                    # fenced code
+    r"|`[^`\n]*`"                   # inline code
+    r"|!?\[[^\]\n]*\]\([^)\n]*\)"   # links / images
+    r"|\[[^\]\n]*\]\[[^\]\n]*\]"    # reference links
+    r"|https?://\S+"                # bare URLs
+    r"|<[^>\n]+>"                   # HTML tags / autolinks
+    r"|^#{1,6}\s[^\n]*"             # headings
+    r"|^\*\*関連記事[^\n]*",         # related-article lines written by the model
+    re.S | re.M,
+)
+
+
+def _fold_char(ch):
+    return unicodedata.normalize("NFKC", ch).casefold()
+
+
+def normalize(text):
+    """
+    Per-character NFKC + casefold. Returns (normalized, offsets) where offsets[i]
+    is the index in `text` of the character that produced normalized[i].
+    """
+    out, offsets = [], []
+    for i, ch in enumerate(text):
+        folded = _fold_char(ch) if not ch.isascii() or ch.isupper() else ch
+        out.append(folded)
+        offsets.extend([i] * len(folded))
+    return "".join(out), offsets
+
+
+def _is_word_char(ch):
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: every occurrence of every pattern in one pass over the text."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # pattern ids ending at each state
+        self.patterns = []
+        self._built = False
+
+    def add(self, pattern):
+        """Add a (normalized) pattern; returns its id."""
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self.patterns.append(pattern)
+        self._out[state].append(len(self.patterns) - 1)
+        self._built = False
+        return len(self.patterns) - 1
+
+    def build(self):
+        """Compute failure links (BFS) and merge outputs along them."""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def iter_matches(self, text):
+        """Yield (start, end, pattern_id) for every occurrence, in order of `end`."""
+        if not self._built:
+            self.build()
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in out[state]:
+                yield i + 1 - len(patterns[pid]), i + 1, pid
+
+
+def _summary_of(candidate):
+    summary = candidate.get("summary_data")
+    return summary if isinstance(summary, dict) else {}
+
+
+class LinkIndex:
+    """Automaton over candidate terms; each term points at one candidate article."""
+
+    def __init__(self, max_term_share=MAX_TERM_SHARE):
+        self.max_term_share = max_term_share
+        self.matcher = AhoCorasick()
+        self.targets = []  # pattern id -> candidate
+        self.terms = []    # pattern id -> original term
+
+    @classmethod
+    def from_candidates(cls, candidates, exclude_urls=(), max_term_share=MAX_TERM_SHARE):
+        """
+        candidates: dicts with title, url and summary_data (parsed ai_structured_summary),
+        in priority order (a term shared by several candidates links to the first).
+        """
+        index = cls(max_term_share)
+        candidates = [c for c in candidates if c.get("url") and c["url"] not in exclude_urls and _summary_of(c)]
+        owners = {}
+        for rank, candidate in enumerate(candidates):
+            summary = _summary_of(candidate)
+            for term in list(summary.get("entities") or []) + list(summary.get("key_topics") or []):
+                if not isinstance(term, str):
+                    continue
+                term = term.strip()
+                key = normalize(term)[0]
+                if len(key) < MIN_TERM_CHARS:
+                    continue
+                owners.setdefault(key, {"term": term, "candidates": []})
+                if rank not in owners[key]["candidates"]:
+                    owners[key]["candidates"].append(rank)
+
+        limit = max(1, int(len(candidates) * max_term_share))
+        for key, owner in owners.items():
+            if len(owner["candidates"]) > limit:
+                continue  # generic ("AI", "半導体") across the archive
+            index.matcher.add(key)
+            index.targets.append(candidates[owner["candidates"][0]])
+            index.terms.append(owner["term"])
+        index.matcher.build()
+        return index
+
+    def __len__(self):
+        return len(self.targets)
+
+
+class _Spans:
+    """Sorted, non-overlapping protected ranges of the Markdown source."""
+
+    def __init__(self, text):
+        spans = [(m.start(), m.end()) for m in _PROTECTED_RE.finditer(text)]
+        self.starts = [s for s, _ in spans]
+        self.ends = [e for _, e in spans]
+
+    def overlaps(self, start, end):
+        k = bisect.bisect_right(self.starts, end - 1) - 1
+        return k >= 0 and start < self.ends[k]
+
+
+def inject_links(markdown, index, max_links=DEFAULT_MAX_LINKS, per_section=DEFAULT_PER_SECTION):
+    """
+    Link the first good mention of each candidate in `markdown`.
+
+    Returns:
+        (markdown with links, [{"id", "title", "url", "term"} per inserted link])
+    """
+    if not markdown or not index or max_links <= 0:
+        return markdown, []
+    norm, offsets = normalize(markdown)
+    protected = _Spans(markdown)
+    section_starts = [m.start() for m in _HEADING_RE.finditer(markdown)]
+
+    # Leftmost-longest, non-overlapping matches (matches arrive ordered by end)
+    matches = sorted(index.matcher.iter_matches(norm), key=lambda m: (m[0], m[0] - m[1]))
+
+    inserted, linked_urls, per_section_count = [], set(), {}
+    edits = []
+    last_end = -1
+    for n_start, n_end, pid in matches:
+        if len(inserted) >= max_links:
+            break
+        if n_start < last_end:
+            continue
+        start, end = offsets[n_start], offsets[n_end - 1] + 1
+        # Latin terms only on word boundaries
+        term = index.matcher.patterns[pid]
+        if _is_word_char(term[0]) and start > 0 and _is_word_char(markdown[start - 1]):
+            continue
+        if _is_word_char(term[-1]) and end < len(markdown) and _is_word_char(markdown[end]):
+            continue
+        # Inside a heading, code, link, URL or HTML tag?
+        if protected.overlaps(start, end):
+            continue
+        target = index.targets[pid]
+        if target["url"] in linked_urls:
+            continue
+        section = bisect.bisect_right(section_starts, start)
+        if per_section and per_section_count.get(section, 0) >= per_section:
+            continue
+
+        edits.append((start, end, target["url"]))
+        linked_urls.add(target["url"])
+        per_section_count[section] = per_section_count.get(section, 0) + 1
+        last_end = n_end
+        inserted.append({"id": target.get("id"), "title": target.get("title"), "url": target["url"],
+                         "term": markdown[start:end]})
+
+    if not edits:
+        return markdown, []
+    parts, pos = [], 0
+    for start, end, url in edits:
+        parts.append(markdown[pos:start])
+        parts.append(f"[{markdown[start:end]}]({url})")
+        pos = end
+    parts.append(markdown[pos:])
+    return "".join(parts), inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Insert internal links into a Markdown article (no LLM call)")
+    parser.add_argument("--file", required=True, help="Markdown file to link")
+    parser.add_argument("--candidates", type=int, default=50, help="Published posts used as link targets")
+    parser.add_argument("--max-links", type=int, default=DEFAULT_MAX_LINKS, help="Max links inserted")
+    parser.add_argument("--per-section", type=int, default=DEFAULT_PER_SECTION, help="Max links per section (0 for no limit)")
+    parser.add_argument("--write", action="store_true", help="Overwrite the file with the linked version")
+    args = parser.parse_args()
+
+    try:
+        from automation.wp_client import WordPressClient
+        from automation.internal_linker import InternalLinkSuggester
+    except ImportError:
+        from wp_client import WordPressClient
+        from internal_linker import InternalLinkSuggester
+
+    candidates = InternalLinkSuggester(WordPressClient(), None).fetch_candidates(limit=args.candidates)
+    index = LinkIndex.from_candidates(candidates)
+    print(f"{len(index)} link term(s) from {len(candidates)} candidate(s).")
+
+    with open(args.file, encoding="utf-8") as f:
+        text = f.read()
+    linked, links = inject_links(text, index, max_links=args.max_links, per_section=args.per_section)
+    for link in links:
+        print(f"  {link['term']} -> {link['title']} ({link['url']})")
+    if args.write and links:
+        with open(args.file, "w", encoding="utf-8") as f:
+            f.write(linked)
+        print(f"Wrote {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+"""
+Daily LLM Quota and Cost Budget for TechShift
+
+Hitting the Gemini quota used to mean _retry_request sleeping through five
+exponential backoffs and giving up, and a long pipeline run could use up the
+day's quota before the daily briefing ran.
+
+BudgetManager tracks requests, tokens and cost per model for the current
+quota day and decides, per request, which model to use:
+
+- every request runs in a stage (llm_stage("scoring"), ...) with a priority:
+  critical (daily briefing, weekly summary), normal (article generation),
+  low (scoring, batch backfills)
+- daily request limits are shared out by priority: critical stages may use
+  the whole limit, normal stages all but LLM_BUDGET_RESERVE of it, low stages
+  LLM_BUDGET_LOW_SHARE of what normal stages may use. The same shares apply
+  to the daily cost limit
+- a stage without headroom on the requested model drops to the next model of
+  its fallback chain (gemini-3.1-pro-preview -> gemini-3-flash-preview ->
+  gemini-2.0-flash); when no model in the chain is left it is deferred
+  (BudgetDeferred) instead of retried
+- per-minute limits and 429 retry delays are waited out precisely (critical
+  stages wait for their own model, others switch to a ready fallback first);
+  a wait longer than max_wait defers the request
+- orchestrators read allowance() / headroom() up front and size the run
+  (articles to generate, items to score) instead of discovering the limit
+  through 429s
+
+Daily usage is persisted in automation/data/llm_usage.json and merged with
+other processes on save; the quota day follows the Gemini reset time
+(midnight Pacific). Per-minute windows are per process. The reserve only sees
+spend recorded in the same data directory: on one host that is automatic, in
+GitHub Actions the workflows restore and save automation/data through the
+Actions cache (concurrent jobs: the last save wins).
+
+Configuration (.env):
+    LLM_DAILY_LIMITS=gemini-3.1-pro-preview=250,gemini-3-flash-preview=1000,gemini-2.0-flash=2000
+    LLM_RPM_LIMITS=gemini-3.1-pro-preview=25,gemini-2.0-flash=200
+    LLM_DAILY_COST_LIMIT=5.0
+    LLM_BUDGET_RESERVE=0.25
+    LLM_BUDGET_LOW_SHARE=0.5
+    LLM_FALLBACK_MODELS=gemini-3.1-pro-preview>gemini-3-flash-preview>gemini-2.0-flash
+    LLM_PRICES=gemini-3.1-pro-preview=2.0/12.0
+    LLM_BUDGET_TZ=America/Los_Angeles
+
+Usage:
+    budget = get_llm_budget()
+    with llm_stage("scoring"):
+        model = budget.acquire("gemini-2.0-flash")   # may degrade or raise BudgetDeferred
+        response = client.models.generate_content(model=model, ...)
+        budget.record(model, response)
+    budget.allowance("generation", "gemini-3.1-pro-preview")  # requests left (None = unlimited)
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_usage.json")
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+
+STAGE_PRIORITIES = {
+    "briefing": CRITICAL,
+    "weekly": CRITICAL,
+    "generation": NORMAL,
+    "scoring": LOW,
+    "backfill": LOW,
+}
+
+DEFAULT_FALLBACKS = {
+    "gemini-3.1-pro-preview": ["gemini-3-flash-preview", "gemini-2.0-flash"],
+    "gemini-3-flash-preview": ["gemini-2.0-flash"],
+}
+
+# USD per 1M tokens (input, output); approximate list prices, override with LLM_PRICES
+DEFAULT_PRICES = {
+    "gemini-3.1-pro-preview": (2.0, 12.0),
+    "gemini-3-flash-preview": (0.5, 3.0),
+    "gemini-2.0-flash": (0.1, 0.4),
+    "gemini-2.0-flash-exp": (0.1, 0.4),
+}
+
+DEFAULT_RESERVE = 0.25
+DEFAULT_LOW_SHARE = 0.5
+DEFAULT_TZ = "America/Los_Angeles"
+MAX_WAIT = 60  # longest rate-limit wait before a request is deferred
+RATE_WINDOW = 60
+
+_current_stage = contextvars.ContextVar("llm_stage", default=None)
+
+
+@contextmanager
+def llm_stage(name):
+    """Attribute LLM requests made inside the block (in this thread) to a stage."""
+    token = _current_stage.set(name)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def set_stage(name):
+    """Attribute every later request in this thread to a stage (script entry points, worker loops)."""
+    _current_stage.set(name)
+
+
+def current_stage():
+    return _current_stage.get()
+
+
+def priority_of(stage):
+    return STAGE_PRIORITIES.get(stage, NORMAL)
+
+
+class BudgetDeferred(Exception):
+    """No model in the fallback chain has headroom for the stage right now."""
+
+    def __init__(self, stage, model, reason, retry_at=None):
+        self.stage = stage
+        self.model = model
+        self.reason = reason
+        self.retry_at = retry_at
+        super().__init__(f"LLM budget: {stage or 'default'} request for {model} deferred ({reason})")
+
+
+def _parse_map(value, cast=float):
+    """'a=1,b=2' -> {'a': 1, 'b': 2}"""
+    result = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            key, val = item.rsplit("=", 1)
+            result[key.strip()] = cast(val)
+    return result
+
+
+def _parse_chains(value):
+    """'a>b>c;d>e' -> {'a': ['b', 'c'], 'b': ['c'], 'd': ['e']}"""
+    chains = {}
+    for chain in (value or "").split(";"):
+        models = [m.strip() for m in chain.split(">") if m.strip()]
+        for i, model in enumerate(models[:-1]):
+            chains[model] = models[i + 1:]
+    return chains
+
+
+def _parse_prices(value):
+    """'model=in/out,...' -> {'model': (in, out)}"""
+    return {model: tuple(float(p) for p in price.split("/", 1)) for model, price in _parse_map(value, str).items()}
+
+
+def _env_float(name, default=None):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def quota_day(tz=DEFAULT_TZ):
+    try:
+        from zoneinfo import ZoneInfo
+        return datetime.now(ZoneInfo(tz)).date().isoformat()
+    except Exception:
+        return datetime.now().date().isoformat()
+
+
+def retry_delay(error_text):
+    """Seconds the server asked us to wait in a 429 error ('retry in 12.5s', retryDelay '12s'), or None."""
+    match = re.search(r"retry(?:delay)?\D{0,20}?(\d+(?:\.\d+)?)\s*s", (error_text or "").lower())
+    return float(match.group(1)) if match else None
+
+
+def _empty_usage():
+    return {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+
+
+class BudgetManager:
+    """Thread-safe per-model usage against daily / per-minute limits, with priority shares."""
+
+    def __init__(self, path=DEFAULT_PATH, daily_limits=None, rpm_limits=None, daily_cost_limit=None,
+                 reserve=DEFAULT_RESERVE, low_share=DEFAULT_LOW_SHARE, fallbacks=None, prices=None,
+                 max_wait=MAX_WAIT, tz=DEFAULT_TZ, clock=time.time, sleep=time.sleep, today=None):
+        self.path = path
+        self.daily_limits = daily_limits or {}
+        self.rpm_limits = rpm_limits or {}
+        self.daily_cost_limit = daily_cost_limit
+        self.reserve = reserve
+        self.low_share = low_share
+        self.fallbacks = DEFAULT_FALLBACKS if fallbacks is None else fallbacks
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+        self.max_wait = max_wait
+        self.tz = tz
+        self.clock = clock
+        self.sleep = sleep
+        self.today = today or (lambda: quota_day(self.tz))
+        self.day = None
+        self.usage = {}   # model -> counters for the quota day (all processes, as of the last load/save)
+        self.stages = {}  # stage -> requests today
+        self.degraded = {}  # (stage, from, to) -> count (this process)
+        self.deferred = {}  # stage -> count (this process)
+        self._delta = {"models": {}, "stages": {}}  # not yet saved
+        self._window = {}  # model -> deque of request times (last RATE_WINDOW seconds)
+        self._cooldown = {}  # model -> epoch until which the server asked us to back off
+        self._exhausted = set()  # models whose daily quota the server reported as used up
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, path=DEFAULT_PATH, **kwargs):
+        fallbacks = _parse_chains(os.getenv("LLM_FALLBACK_MODELS"))
+        config = dict(
+            daily_limits=_parse_map(os.getenv("LLM_DAILY_LIMITS"), int),
+            rpm_limits=_parse_map(os.getenv("LLM_RPM_LIMITS"), int),
+            daily_cost_limit=_env_float("LLM_DAILY_COST_LIMIT"),
+            reserve=_env_float("LLM_BUDGET_RESERVE", DEFAULT_RESERVE),
+            low_share=_env_float("LLM_BUDGET_LOW_SHARE", DEFAULT_LOW_SHARE),
+            fallbacks=fallbacks or None,
+            prices=_parse_prices(os.getenv("LLM_PRICES")),
+            tz=os.getenv("LLM_BUDGET_TZ", DEFAULT_TZ),
+        )
+        config.update(kwargs)
+        budget = cls(path=path, **config)
+        budget.load()
+        return budget
+
+    # --- Persistence ---------------------------------------------------------
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read LLM usage ({e}). Starting fresh.")
+            return {}
+
+    def load(self):
+        data = self._read()
+        with self._lock:
+            self._roll()
+            if data.get("day") == self.day:
+                self.usage = {m: {**_empty_usage(), **u} for m, u in data.get("models", {}).items()}
+                self.stages = dict(data.get("stages", {}))
+                self._apply(self._delta)
+
+    def save(self):
+        """Add this process's unsaved usage to the file (other runs may have written since we loaded)."""
+        if not self.path:
+            return
+        data = self._read()
+        with self._lock:
+            self._roll()
+            if data.get("day") != self.day:
+                data = {"day": self.day, "models": {}, "stages": {}}
+            delta, self._delta = self._delta, {"models": {}, "stages": {}}
+            unchanged = not delta["models"] and not delta["stages"] and "models" in data
+            for model, d in delta["models"].items():
+                u = data["models"].setdefault(model, _empty_usage())
+                for key, value in d.items():
+                    u[key] = u.get(key, 0) + value
+            for stage, count in delta["stages"].items():
+                data["stages"][stage] = data["stages"].get(stage, 0) + count
+            self.usage = {m: {**_empty_usage(), **u} for m, u in data["models"].items()}
+            self.stages = dict(data["stages"])
+        if unchanged:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def _apply(self, delta):
+        for model, d in delta["models"].items():
+            u = self.usage.setdefault(model, _empty_usage())
+            for key, value in d.items():
+                u[key] += value
+        for stage, count in delta["stages"].items():
+            self.stages[stage] = self.stages.get(stage, 0) + count
+
+    def _roll(self):
+        """Start a new quota day (caller holds the lock)."""
+        today = self.today()
+        if today != self.day:
+            self.day = today
+            self.usage = {}
+            self.stages = {}
+            self._delta = {"models": {}, "stages": {}}
+            self._exhausted.clear()
+
+    def _add(self, model, stage=None, **counters):
+        for target in (self.usage.setdefault(model, _empty_usage()),
+                       self._delta["models"].setdefault(model, _empty_usage())):
+            for key, value in counters.items():
+                target[key] += value
+        if stage is not None:
+            for target in (self.stages, self._delta["stages"]):
+                target[stage] = target.get(stage, 0) + 1
+
+    # --- Headroom ------------------------------------------------------------
+
+    def share(self, priority):
+        """Fraction of each daily limit a priority may use."""
+        if priority == CRITICAL:
+            return 1.0
+        normal = max(0.0, 1.0 - self.reserve)
+        return normal if priority == NORMAL else normal * self.low_share
+
+    def chain(self, model):
+        return [model] + [m for m in self.fallbacks.get(model, []) if m != model]
+
+    def _cost_used(self):
+        return sum(u["cost"] for u in self.usage.values())
+
+    def _cost_left(self, priority):
+        if self.daily_cost_limit is None:
+            return None
+        return max(0.0, self.daily_cost_limit * self.share(priority) - self._cost_used())
+
+    def _avg_cost(self, model):
+        u = self.usage.get(model)
+        return u["cost"] / u["requests"] if u and u["requests"] else 0.0
+
+    def _requests_left(self, model, priority):
+        """Requests the priority may still send to the model today (None = no limit)."""
+        if model in self._exhausted:
+            return 0
+        limit = self.daily_limits.get(model)
+        if limit is None:
+            return None
+        used = self.usage.get(model, {}).get("requests", 0)
+        return max(0, int(limit * self.share(priority)) - used)
+
+    def _has_headroom(self, model, priority):
+        if self._requests_left(model, priority) == 0:
+            return False
+        cost_left = self._cost_left(priority)
+        return cost_left is None or cost_left > self._avg_cost(model)
+
+    def _wait(self, model, now):
+        """Seconds until the model accepts a request under its per-minute limit / server cooldown."""
+        wait = max(0.0, self._cooldown.get(model, 0.0) - now)
+        rpm = self.rpm_limits.get(model)
+        if rpm:
+            window = self._window.setdefault(model, deque())
+            while window and window[0] <= now - RATE_WINDOW:
+                window.popleft()
+            if len(window) >= rpm:
+                wait = max(wait, window[0] + RATE_WINDOW - now)
+        return wait
+
+    def allowance(self, stage, model):
+        """
+        Requests the stage can still make today on the model or its fallbacks
+        (None = unlimited). Bounded by the cost share when a cost limit is set.
+        """
+        priority = priority_of(stage)
+        with self._lock:
+            self._roll()
+            total = 0
+            for candidate in self.chain(model):
+                left = self._requests_left(candidate, priority)
+                if left is None:
+                    total = None
+                    break
+                total += left
+            cost_left = self._cost_left(priority)
+            if cost_left is not None:
+                avg = min((self._avg_cost(m) for m in self.chain(model)), default=0.0)
+                if avg > 0:
+                    by_cost = int(cost_left / avg)
+                    total = by_cost if total is None else min(total, by_cost)
+            return total
+
+    def headroom(self, stage=None):
+        """Snapshot for orchestrators / metrics: usage, limits and what `stage` may still use."""
+        priority = priority_of(stage)
+        now = self.clock()
+        with self._lock:
+            self._roll()
+            models = {}
+            for model in sorted(set(self.usage) | set(self.daily_limits) | set(self.rpm_limits)):
+                u = self.usage.get(model, _empty_usage())
+                models[model] = {
+                    **u,
+                    "daily_limit": self.daily_limits.get(model),
+                    "left": self._requests_left(model, priority),
+                    "rpm_limit": self.rpm_limits.get(model),
+                    "wait": round(self._wait(model, now), 1),
+                    "exhausted": model in self._exhausted,
+                }
+            return {
+                "day": self.day,
+                "stage": stage,
+                "priority": priority,
+                "cost": {"used": round(self._cost_used(), 4), "limit": self.daily_cost_limit,
+                         "left": self._cost_left(priority)},
+                "models": models,
+                "stages": dict(self.stages),
+            }
+
+    # --- Requests ------------------------------------------------------------
+
+    def preferred(self, model, stage=None):
+        """The model acquire() would pick right now, without counting a request (None if deferred)."""
+        stage = current_stage() if stage is None else stage
+        priority = priority_of(stage)
+        with self._lock:
+            self._roll()
+            for candidate in self.chain(model):
+                if self._has_headroom(candidate, priority):
+                    return candidate
+        return None
+
+    def acquire(self, model, stage=None):
+        """
+        Pick the model for one request of `stage` (default: the current llm_stage)
+        and count the request against it.
+
+        Returns:
+            The requested model, or a cheaper fallback when the requested one has
+            no headroom left for the stage's priority (or is rate limited and the
+            stage is not critical).
+        Raises:
+            BudgetDeferred: no model in the chain has daily headroom, or the only
+            ones left are rate limited for longer than max_wait.
+        """
+        stage = current_stage() if stage is None else stage
+        priority = priority_of(stage)
+        while True:
+            with self._lock:
+                self._roll()
+                now = self.clock()
+                available = [(self._wait(m, now), m) for m in self.chain(model) if self._has_headroom(m, priority)]
+                if not available:
+                    self.deferred[stage] = self.deferred.get(stage, 0) + 1
+                    raise BudgetDeferred(stage, model, "daily budget exhausted")
+
+                wait, chosen = next(((w, m) for w, m in available if w <= 0), min(available))
+                # Critical stages keep their model through a short rate limit instead of degrading
+                if priority == CRITICAL and available[0][1] == model and available[0][0] <= self.max_wait:
+                    wait, chosen = available[0]
+
+                if wait <= 0:
+                    if self.rpm_limits.get(chosen):
+                        self._window.setdefault(chosen, deque()).append(now)
+                    self._add(chosen, stage, requests=1)
+                    if chosen != model:
+                        key = (stage, model, chosen)
+                        if key not in self.degraded:
+                            print(f"[budget] {stage or 'default'}: {model} unavailable (no headroom or rate limited), using {chosen}")
+                        self.degraded[key] = self.degraded.get(key, 0) + 1
+                    return chosen
+
+                if wait > self.max_wait:
+                    self.deferred[stage] = self.deferred.get(stage, 0) + 1
+                    raise BudgetDeferred(stage, model, f"rate limited for {wait:.0f}s", retry_at=now + wait)
+            print(f"[budget] {chosen} rate limited, waiting {wait:.1f}s")
+            self.sleep(wait)
+
+    def record(self, model, response):
+        """Add the response's token usage (and its cost) to the model."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        input_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = ((getattr(usage, "candidates_token_count", 0) or 0)
+                         + (getattr(usage, "thoughts_token_count", 0) or 0))
+        price_in, price_out = self.prices.get(model, (0.0, 0.0))
+        cost = (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+        with self._lock:
+            self._roll()
+            self._add(model, input_tokens=input_tokens, output_tokens=output_tokens, cost=cost)
+
+    def note_rate_limited(self, model, error_text="", default_delay=5.0):
+        """
+        A request got a 429. Parks the model for the server's retry delay (or
+        default_delay); a daily-quota error parks it for the rest of the quota day.
+        Returns the cooldown in seconds (None for daily exhaustion).
+        """
+        text = (error_text or "").lower()
+        with self._lock:
+            self._roll()
+            if "perday" in text.replace(" ", "").replace("_", "") or "per day" in text:
+                self._exhausted.add(model)
+                print(f"[budget] {model}: daily quota exhausted")
+                return None
+            delay = retry_delay(text) or default_delay
+            self._cooldown[model] = max(self._cooldown.get(model, 0.0), self.clock() + delay)
+            return delay
+
+    # --- Reporting -----------------------------------------------------------
+
+    def summary(self, stage=None):
+        h = self.headroom(stage)
+        lines = [f"LLM budget ({h['day']}, as {h['stage'] or 'default'} / {h['priority']}):"]
+        for model, m in h["models"].items():
+            limit = "-" if m["daily_limit"] is None else m["daily_limit"]
+            left = "unlimited" if m["left"] is None else m["left"]
+            flag = " (exhausted)" if m["exhausted"] else ""
+            lines.append(f"    {model:<26} requests={m['requests']}/{limit} left={left} "
+                         f"tokens={m['input_tokens']}+{m['output_tokens']} cost=${m['cost']:.3f}{flag}")
+        cost = h["cost"]
+        if cost["limit"] is not None:
+            lines.append(f"    cost ${cost['used']:.3f}/${cost['limit']:.2f} (left for this priority: ${cost['left']:.3f})")
+        for (stage_name, src, dst), count in sorted(self.degraded.items(), key=lambda kv: str(kv[0])):
+            lines.append(f"    degraded {stage_name or 'default'}: {src} -> {dst} x{count}")
+        for stage_name, count in self.deferred.items():
+            lines.append(f"    deferred {stage_name or 'default'}: {count}")
+        return "\n".join(lines)
+
+    def render_metrics(self, prefix="techshift_llm"):
+        """Prometheus text lines (used by daemon.py /metrics)."""
+        h = self.headroom()
+        lines = []
+        for model, m in h["models"].items():
+            lines.append(f'{prefix}_requests_today{{model="{model}"}} {m["requests"]}')
+            lines.append(f'{prefix}_cost_usd_today{{model="{model}"}} {m["cost"]:.4f}')
+            if m["daily_limit"] is not None:
+                lines.append(f'{prefix}_daily_limit{{model="{model}"}} {m["daily_limit"]}')
+        for (stage, src, dst), count in self.degraded.items():
+            lines.append(f'{prefix}_degraded_total{{stage="{stage or "default"}",from="{src}",to="{dst}"}} {count}')
+        for stage, count in self.deferred.items():
+            lines.append(f'{prefix}_deferred_total{{stage="{stage or "default"}"}} {count}')
+        return lines
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_llm_budget():
+    """Process-wide budget (configured from the environment, saved at exit)."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = BudgetManager.from_env()
+            atexit.register(_budget.save)
+        return _budget
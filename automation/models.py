@@ -0,0 +1,218 @@
+"""
+Article Record for TechShift
+
+Collected articles used to travel as plain dicts that every stage copied and
+extended ({**article, ...}, article.copy(), rebuilt records for the REST API),
+with `published` stringified by the collector and re-parsed downstream. On
+multi-thousand-item backfills that meant one dict per copy per stage.
+
+Article is a __slots__ record instead:
+- source / region are interned (a few dozen distinct values shared by all rows)
+- published_at is a datetime (None if the feed had no date)
+- heavy fields (full content, scoring output) stay None until a stage attaches them
+- stages update the same object; nothing is copied between collection,
+  clustering, scoring and generation
+- it still answers dict-style access (article['title'], article.get('score', 0),
+  article['cluster_size'] = 3) so existing code keeps working; keys without a
+  slot go to a small per-article dict. As with the old dicts, a key is present
+  once it was set (the collector's fields always are), even if its value is
+  None; stage fields (content, score, ...) are absent until a stage sets them
+
+Codec:
+    Article.from_dict(d) / article.to_dict()   JSON-safe, legacy key names
+    article.to_record(**fields)                  payload for POST techshift/v1/articles
+"""
+
+import sys
+from datetime import datetime
+
+try:
+    from automation.db.known_urls import url_hash as _url_hash
+except ImportError:
+    from db.known_urls import url_hash as _url_hash
+
+UNKNOWN_DATE = "Unknown"
+
+# Mapping keys backed by a slot (everything else lives in _extra)
+_SLOT_KEYS = ("title", "url", "source", "region", "summary", "content",
+              "score", "reasoning", "relevance", "scored_by")
+_SLOT_BITS = {key: 1 << i for i, key in enumerate(_SLOT_KEYS)}
+# Keys the collector's dicts always carried (present even when None)
+_BASE_KEYS = sum(_SLOT_BITS[key] for key in ("title", "url", "source", "region", "summary"))
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def parse_published(value):
+    """datetime from a feed / legacy 'published' value (None if unknown)."""
+    if value is None or isinstance(value, datetime):
+        return value
+    value = str(value)
+    if not value or value == UNKNOWN_DATE:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            from dateutil import parser as date_parser
+            return date_parser.parse(value)
+        except (ImportError, ValueError, OverflowError):
+            return None
+
+
+class Article:
+    __slots__ = ("title", "url", "source", "region", "published_at", "summary", "content",
+                 "score", "reasoning", "relevance", "scored_by", "_url_hash", "_extra", "_keys_set")
+
+    def __init__(self, title, url, source=None, region=None, published_at=None, summary=""):
+        self.title = title
+        self.url = url
+        self.source = _intern(source)
+        self.region = _intern(region)
+        self.published_at = parse_published(published_at)
+        self.summary = summary
+        self.content = None
+        self.score = None
+        self.reasoning = None
+        self.relevance = None
+        self.scored_by = None
+        self._url_hash = None
+        self._extra = None
+        self._keys_set = _BASE_KEYS
+
+    def __repr__(self):
+        return f"Article({self.source!r}, {self.title[:40]!r})"
+
+    @property
+    def url_hash(self):
+        """sha256 of the URL (ts_articles.url_hash), computed on first use."""
+        if self._url_hash is None:
+            self._url_hash = _url_hash(self.url)
+        return self._url_hash
+
+    @property
+    def published(self):
+        """Legacy string form ('2025-01-01 09:00:00+00:00' or 'Unknown')."""
+        return str(self.published_at) if self.published_at else UNKNOWN_DATE
+
+    # Stage updates (in place)
+
+    def attach_content(self, content, summary_chars=None, summary_tokens=None):
+        """
+        Attach extracted full text; optionally replace the summary with its head
+        (summary_chars) or its most salient part within a token budget (summary_tokens).
+        """
+        self.content = content
+        if summary_tokens:
+            try:
+                from automation.token_budget import fit_to_budget
+            except ImportError:
+                from token_budget import fit_to_budget
+            self.summary = fit_to_budget(content, summary_tokens, query=self.title)
+        elif summary_chars:
+            self.summary = content[:summary_chars]
+
+    def update(self, fields=(), **kwargs):
+        for key, value in dict(fields, **kwargs).items():
+            self[key] = value
+
+    # dict-style access
+
+    def _has_slot(self, key):
+        return getattr(self, key) is not None or bool(self._keys_set & _SLOT_BITS[key])
+
+    def __getitem__(self, key):
+        if key in _SLOT_KEYS:
+            if not self._has_slot(key):
+                raise KeyError(key)
+            return getattr(self, key)
+        if key == "published":
+            return self.published
+        if key == "url_hash":
+            return self.url_hash
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _SLOT_KEYS:
+            setattr(self, key, _intern(value) if key in ("source", "region") else value)
+            self._keys_set |= _SLOT_BITS[key]
+        elif key == "published":
+            self.published_at = parse_published(value)
+        elif key == "url_hash":
+            self._url_hash = value
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self):
+        keys = [k for k in _SLOT_KEYS if self._has_slot(k)]
+        keys.append("published")
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    # Codec
+
+    def to_dict(self):
+        """JSON-safe dict with the legacy key names (url_hash only if already computed)."""
+        d = {key: self[key] for key in self.keys()}
+        if self._url_hash is not None:
+            d["url_hash"] = self._url_hash
+        return d
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        article = cls(
+            title=data.get("title", ""),
+            url=data.get("url"),
+            source=data.get("source"),
+            region=data.get("region"),
+            published_at=data.get("published_at", data.get("published")),
+            summary=data.get("summary", ""),
+        )
+        for key, value in data.items():
+            if key not in ("title", "url", "source", "region", "published", "published_at", "summary"):
+                article[key] = value
+        return article
+
+    def to_record(self, default_date=None, **fields):
+        """
+        Payload for DBClient.save_article (ts_articles columns).
+        default_date is used when the feed had no date; fields override or add columns
+        (is_relevant, relevance_reason, impact_score, ...).
+        """
+        record = {
+            "url_hash": self.url_hash,
+            "title": self.title,
+            "source": self.source,
+            "region": self.region or "Global",
+            "published_at": self.published if self.published_at else default_date,
+            "summary": self.summary,
+        }
+        record.update(fields)
+        return record
@@ -2,11 +2,12 @@
 """
 FinShift Automation Pipeline
 
-Orchestrates the flow:
+Orchestrates the flow as concurrent stages with bounded buffers (stages.py):
 1. Collection (collector.py)
-2. Scoring (scorer.py)
-3. Selection (Filter high scores)
-4. Generation (generate_article.py)
+2. Dedupe (known-URL index, story clustering, pre-filter)
+3. Scoring (scorer.py)
+4. Selection (top-k heap of high scores)
+5. Generation (generate_article.py)
 """
 
 import argparse
@@ -28,6 +29,79 @@ def run_command(command):
         return None
     return result.stdout
 
+class TaskArgs:
+    """Stand-in for the argparse.Namespace that run_generation_task expects."""
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def generate_from_article(article, gemini_client, classifier, wp_client, image_queue=None, dry_run=False,
+                          publish_guard=None):
+    """
+    Classify a scored article, build reading context from its URL and run generation.
+    Shared by the one-shot pipeline, the daemon (daemon.py) and queue workers (worker.py,
+    which pass a work_queue.PublishGuard so the article is posted at most once).
+
+    Returns:
+        True if the article was generated (and posted unless dry_run).
+    """
+    from automation.collectors.url_reader import extract_content
+    from automation.summarizer import summarize_article
+    from automation.generate_article import run_generation_task
+    from automation.db.known_urls import url_hash
+
+    # Determine Category & Type
+    classification = classifier.classify_article(article['title'], article['summary'], excluded_categories=['market-analysis'])
+    category_slug = classification.get('category', 'featured-news')
+
+    # TechShift Simplification: Pipeline always generates Single Topic Deep Dives
+    article_type = "topic-focus"
+
+    print(f"Category: {category_slug} -> Type: {article_type}")
+
+    task_args_dict = {
+        "keyword": article['title'],
+        "type": article_type,
+        "category": category_slug,
+        "dry_run": dry_run,
+        "schedule": None, # Default immediate
+        "context": None,
+        # lets run_generation_task link the post back to the ts_articles row
+        "source_url_hash": article.get('url_hash') or url_hash(article['url']),
+        # creates the ts_articles row if the source was never saved there (pipeline / daemon sources)
+        "source_record": article.to_record(is_relevant=1, relevance_reason=f"Score {article.get('score')}: {article.get('reasoning', '')}")
+                         if hasattr(article, "to_record") else None,
+        "publish_guard": publish_guard,
+        # every caller runs check_duplication before generating
+        "deduplicated": True,
+    }
+
+    # Context Generation
+    if article_type in ["news", "global", "market-analysis", "featured-news", "strategic-assets", "topic-focus"]:
+        print("\n--- Context-based generation (URL reading + summarization) ---")
+
+        try:
+            article_content = extract_content(article['url'], article['source'])
+
+            if article_content['content'] and "Error" not in article_content['title']:
+                summary_data = summarize_article(article_content['content'], article['title'], client=gemini_client)
+                if article.get('corroborating_sources'):
+                    summary_data['corroborating_sources'] = article['corroborating_sources']
+                task_args_dict["context"] = json.dumps(summary_data, ensure_ascii=False)
+                print(f"Context created: {len(summary_data['summary'])} chars summary, {len(summary_data['key_facts'])} key facts")
+            else:
+                print("Warning: Failed to extract content, falling back to keyword-based generation")
+        except Exception as e:
+            print(f"Error during context creation: {e}")
+            print("Falling back to keyword-based generation")
+    else:
+        print("\n--- Keyword-based generation (traditional) ---")
+
+    # Execute Generation Task
+    task_args = TaskArgs(**task_args_dict)
+    return run_generation_task(task_args, gemini_client=gemini_client, wp_client=wp_client, image_queue=image_queue)
+
+
 def main():
     parser = argparse.ArgumentParser(description="FinShift Automation Pipeline")
     parser.add_argument("--days", type=int, help="Days to look back for collection")
@@ -36,6 +110,11 @@ def main():
     parser.add_argument("--limit", type=int, default=2, help="Max articles to generate per run")
     parser.add_argument("--score-limit", type=int, default=0, help="Max articles to score (0 for all)")
     parser.add_argument("--dry-run", action="store_true", help="Dry run mode (no posting)")
+    parser.add_argument("--rescore", action="store_true", help="Score articles already seen in previous runs")
+    parser.add_argument("--no-prefilter", action="store_true", help="Send every article to the LLM scorer")
+    parser.add_argument("--explore-rate", type=float, default=0.05, help="Share of pre-filter rejects scored anyway")
+    parser.add_argument("--all-sources", action="store_true", help="Fetch every source, not only those due per the poll schedule")
+    parser.add_argument("--enqueue", action="store_true", help="Queue scrape tasks for the due sources and exit (run `worker` to consume them)")
     
     args = parser.parse_args()
     
@@ -43,21 +122,52 @@ def main():
     articles_file = os.path.join(base_dir, "collected_articles.json")
     scored_file = os.path.join(base_dir, "scored_articles.json")
     
-    # 1. Collection
-    print("\n=== Step 1: Collection ===")
+    # Stages run concurrently (see stages.py):
+    # collect -> dedupe (known URLs, story clusters, pre-filter) -> score -> top-k -> generate
+    print("\n=== Streaming pipeline: collect -> dedupe -> score -> select -> generate ===")
     
     # Import modules directly
     sys.path.append(os.path.dirname(base_dir))
     from automation.collectors.collector import fetch_rss, DEFAULT_SOURCES
-    from automation.analysis.scorer import score_article, score_articles_batch
-    from automation.collectors.url_reader import extract_content
-    from automation.summarizer import summarize_article
+    from automation.collectors.scheduler import PollScheduler
+    from automation.analysis.scorer import score_article, score_articles_batch, scoring_failed
     from automation.analysis.classifier import ArticleClassifier
     from automation.wp_client import WordPressClient
-    from automation.gemini_client import GeminiClient
-    
-    collected_articles = []
+    from automation.client_registry import get_gemini_client
+    from automation.db.client import DBClient
+    from automation.db.known_urls import KnownUrlIndex, url_hash
+    from automation.analysis.clustering import StoryIndex, cluster_members
+    from automation.analysis.prefilter import Prefilter, record_scores
+    from automation.analysis.cascade import CascadePolicy, cascade_stats
+    from automation.hedging import hedge_stats
+    from automation.image_queue import ImageJobQueue
+    from automation.stages import StageGraph
+    from automation.llm_budget import get_llm_budget, set_stage
+    from automation.generate_article import ARTICLE_MODEL, LLM_REQUESTS_PER_ARTICLE
     
+    # Size the run from today's LLM budget instead of discovering the limit through 429s.
+    # Generation and scoring yield to the capacity reserved for the daily briefing.
+    batch_size = 10
+    budget = get_llm_budget()
+    generation_allowance = budget.allowance("generation", ARTICLE_MODEL)
+    if generation_allowance is not None and generation_allowance // LLM_REQUESTS_PER_ARTICLE < args.limit:
+        args.limit = generation_allowance // LLM_REQUESTS_PER_ARTICLE
+        print(f"LLM budget: generation limited to {args.limit} article(s) today.")
+        if args.limit < 1:
+            print(budget.summary("generation"))
+            print("Deferring this run: no LLM budget left for generation.")
+            return
+    scoring_allowance = budget.allowance("scoring", CascadePolicy().cheap_model)
+    if scoring_allowance is not None:
+        # One cheap-model call per batch (escalations draw on the strong model's budget)
+        max_scored = scoring_allowance * batch_size
+        if args.score_limit <= 0 or max_scored < args.score_limit:
+            args.score_limit = max_scored
+            print(f"LLM budget: scoring at most {args.score_limit} article(s).")
+            if args.score_limit < 1:
+                print("Deferring this run: no LLM budget left for scoring.")
+                return
+
     # Determine lookback
     lookback_hours = None
     lookback_days = None
@@ -73,36 +183,46 @@ def main():
         lookback_hours = 6
         print(f"Collecting articles from last {lookback_hours} hours (default)...")
         
+    # Only sources that are due per their learned publish cadence (collectors/scheduler.py)
+    scheduler = PollScheduler.load()
+    due_sources = list(DEFAULT_SOURCES) if args.all_sources else scheduler.due(DEFAULT_SOURCES)
+    print(f"Polling {len(due_sources)}/{len(DEFAULT_SOURCES)} sources due this run.")
+
     # Shuffle sources to randomize fetch order (User Request)
-    source_items = list(DEFAULT_SOURCES.items())
+    source_items = [(name, DEFAULT_SOURCES[name]) for name in due_sources]
     random.shuffle(source_items)
 
-    for name, url in source_items:
-        # fetch_rss accepts both, prioritizes hours if set not None
-        fetched = fetch_rss(url, name, days=lookback_days, hours=lookback_hours)
-        collected_articles.extend(fetched)
-        
-    print(f"Collected {len(collected_articles)} articles.")
-    
-    # 2. Scoring
-    print("\n=== Step 2: Scoring ===")
-    scored_articles = []
-    
-    articles_to_score = collected_articles
-    if args.score_limit > 0:
-        print(f"Limiting scoring to first {args.score_limit} articles.")
-        articles_to_score = collected_articles[:args.score_limit]
-    
-    
-    # Initialize Gemini Client once
-    gemini_client = GeminiClient()
-    
-    import time
-    batch_size = 10
-    print(f"Scoring in batches of {batch_size}...")
+    if args.enqueue:
+        # Scoring / generation happen in the workers (worker.py); the key collapses
+        # repeated runs within the same 10 minutes into one scrape per source
+        from automation.work_queue import open_queue
+        work_queue = open_queue()
+        window = int(datetime.now().timestamp()) // 600
+        ids = work_queue.enqueue_many("scrape", [
+            ({"source": name, "url": url, "hours": lookback_hours or (lookback_days or 0) * 24}, f"{name}@{window}", 0)
+            for name, url in source_items
+        ])
+        print(f"Queued {sum(1 for i in ids if i is not None)} scrape task(s).")
+        work_queue.close()
+        return
+
+    known_index = KnownUrlIndex.open()
+    if not args.rescore:
+        synced = known_index.sync(DBClient())
+        if synced is None:
+            print("Warning: Known-URL index sync failed. Using local index only.")
+
+    # Local pre-filter: drop clear rejects before any LLM call
+    prefilter = None if args.no_prefilter else Prefilter.load()
+    if prefilter:
+        print(f"Pre-filter enabled (cutoff {prefilter.cutoff:.3f}).")
+    elif not args.no_prefilter:
+        print("Pre-filter model not trained yet (python -m automation train-prefilter). Scoring all articles.")
+
+    # Shared Gemini Client (process-wide registry)
+    gemini_client = get_gemini_client()
     
     # Early Exit Logic
-    high_score_count = 0
     early_exit_threshold = int(args.limit * 2) # Updated to 2x buffer
     # Ensure at least 1
     if early_exit_threshold < 1:
@@ -110,60 +230,8 @@ def main():
     
     print(f"Early Exit Threshold configured: Stop if {early_exit_threshold} high-score articles found.")
 
-    for i in range(0, len(articles_to_score), batch_size):
-        batch = articles_to_score[i:i + batch_size]
-        print(f"[{i+1}-{min(i+batch_size, len(articles_to_score))}/{len(articles_to_score)}] Processing batch...")
-        
-        try:
-            batch_results = score_articles_batch(batch, client=gemini_client, start_id=i)
-            
-            if batch_results:
-                scored_articles.extend(batch_results)
-                 # Simple progress indication & Count High Scores
-                for res in batch_results:
-                     score = res.get('score', 0)
-                     print(f"  - Scored: {res.get('title', 'Unknown')[:40]}... -> {score} pts")
-                     if score >= args.threshold:
-                         high_score_count += 1
-            else:
-                print("Warning: Batch failed or returned no results. Falling back to individual scoring...")
-                for article in batch:
-                    print(f"  Fallback Scoring: {article['title'][:30]}...")
-                    # Pass client to score_article as well
-                    scored = score_article(article, client=gemini_client)
-                    scored_articles.append(scored)
-                    if scored.get('score', 0) >= args.threshold:
-                        high_score_count += 1
-            
-            # Check for Early Exit
-            if high_score_count >= early_exit_threshold:
-                print(f"\n🚀 Early Exit: Found {high_score_count} candidate articles (Target >= {early_exit_threshold}). Stopping scoring.")
-                break
-                
-        except Exception as e:
-            print(f"Error processing batch: {e}")
-                
-        time.sleep(2) # Rate limit protection
-        
-    # Filter
-    high_score_articles = [a for a in scored_articles if a["score"] >= args.threshold]
-    high_score_articles.sort(key=lambda x: x["score"], reverse=True)
-    
-    print(f"\nFound {len(high_score_articles)} articles above threshold {args.threshold}.")
-    
-    # 3. Generation
-    # 3. Generation
-    print("\n=== Step 3: Generation ===")
-    
-    if not high_score_articles:
-        print("No articles to generate. Exiting.")
-        return
-
-    count = 0
-    
     # Initialize Classifier & Clients
     print("Initializing clients for generation...")
-    # gemini_client is already initialized
     classifier = ArticleClassifier(client=gemini_client)
     
     # Initialize WP Client
@@ -173,10 +241,8 @@ def main():
     except Exception as e:
          print(f"Warning: Failed to initialize WP Client: {e}")
 
-    # Imports for generation (moved from top level to avoid circular imports if any, though generated_article imports pipeline? No.)
-    # Actually, import at top level is fine in Python usually unless circular.
-    # But let's import here or at top.
-    from automation.generate_article import run_generation_task
+    # Hero images are generated in the background after each post is published
+    image_queue = ImageJobQueue(gemini_client, wp_client)
     
     # Fetch existing posts for deduplication
     print("Fetching recent posts for deduplication check...")
@@ -195,85 +261,169 @@ def main():
     else:
         print("Skipping deduplication check (WP Client not available).")
 
-    generated_titles_this_run = []
+    stats = {"collected": 0, "known": 0, "clustered": 0, "prefilter_rejected": 0, "scored": 0, "high": 0, "generated": 0}
+
+    def collect(_):
+        for name, url in source_items:
+            # Window reaches back to the source's previous poll (slow feeds are polled less often)
+            hours = scheduler.lookback_hours(name, lookback_hours) if lookback_hours is not None else None
+            # fetch_rss accepts both, prioritizes hours if set not None
+            for article in fetch_rss(url, name, days=lookback_days, hours=hours, scheduler=scheduler):
+                stats["collected"] += 1
+                yield article
+
+    def dedupe(articles):
+        # Merge cross-source copies of the same story as they arrive (local, before any LLM call).
+        # The first copy becomes the story; later copies are attached to it while it is in flight.
+        story_index = StoryIndex()
+        stories = {}
+        rng = random.Random()
+        passed = 0
+        for article in articles:
+            # Drop articles scored in a previous run (local index, no network / LLM cost)
+            if not args.rescore and url_hash(article['url']) in known_index:
+                stats["known"] += 1
+                continue
+            leader = story_index.match(article)
+            if leader is not None:
+                story = stories.get(leader)
+                if story is not None:
+                    story['cluster_size'] += 1
+                    story['corroborating_sources'].append(
+                        {"source": article.get('source'), "url": article.get('url'), "title": article.get('title')})
+                known_index.add(url_hash(article['url']))
+                stats["clustered"] += 1
+                continue
+            story = article
+            story.update(cluster_size=1, corroborating_sources=[])
+            stories[article.get('url')] = story
+            if len(stories) > story_index.max_items:
+                stories.pop(next(iter(stories)))
+
+            if prefilter:
+                candidates, rejected = prefilter.split([story], explore_rate=args.explore_rate, rng=rng)
+                if rejected:
+                    # Not marked known: a retrained pre-filter may let it through next run
+                    stats["prefilter_rejected"] += 1
+                    continue
+
+            yield story
+            passed += 1
+            if args.score_limit > 0 and passed >= args.score_limit:
+                print(f"Score limit reached ({args.score_limit} articles). Stopping collection.")
+                return
+
+    def score(stories):
+        import time
+        set_stage("scoring")
+        high_score_count = 0
+        for batch in stories.batches(batch_size):
+            print(f"[{stats['scored'] + 1}-{stats['scored'] + len(batch)}] Scoring batch...")
+            scored = []
+            try:
+                batch_results = score_articles_batch(batch, client=gemini_client, start_id=stats['scored'], threshold=args.threshold)
+                if batch_results:
+                    scored = batch_results
+                else:
+                    print("Warning: Batch failed or returned no results. Falling back to individual scoring...")
+                    for article in batch:
+                        print(f"  Fallback Scoring: {article['title'][:30]}...")
+                        scored.append(score_article(article, client=gemini_client))
+            except Exception as e:
+                print(f"Error processing batch: {e}")
+
+            stats["scored"] += len(batch)
+            # Training history for the pre-filter; remember stories below the threshold for the next run
+            record_scores(scored)
+            # Failed scores stay unknown so the next run retries them; candidates are
+            # marked once generated or rejected as duplicates (cut by early exit,
+            # the limit or a failed generation, they are scored again next run)
+            known_index.add_many(url_hash(u) for a in scored
+                                 if not scoring_failed(a) and a.get('score', 0) < args.threshold
+                                 for u in cluster_members(a))
+
+            for res in scored:
+                score_value = res.get('score', 0)
+                print(f"  - Scored: {res.get('title', 'Unknown')[:40]}... -> {score_value} pts")
+                if score_value >= args.threshold:
+                    high_score_count += 1
+                    stats["high"] += 1
+                    yield res
 
-    for article in high_score_articles:
-        if count >= args.limit:
-            break
+            # Check for Early Exit
+            if high_score_count >= early_exit_threshold:
+                print(f"\n🚀 Early Exit: Found {high_score_count} candidate articles (Target >= {early_exit_threshold}). Stopping scoring.")
+                return
+            time.sleep(2) # Rate limit protection
+
+    def generate(candidates):
+        set_stage("generation")
+        generated_titles_this_run = []
+        # Best-scored candidate available at the time the generator is free
+        for article in candidates:
+            print(f"Generating article for: {article['title']}")
+            print(f"Score: {article['score']}")
+            print(f"Reason: {article['reasoning']}")
             
-        print(f"Generating article for: {article['title']}")
-        print(f"Score: {article['score']}")
-        print(f"Reason: {article['reasoning']}")
-        
-        # --- Deduplication Check ---
-        print("Checking for duplicates...")
-        # Combine existing WP titles and locally processed titles
-        comparison_pool = existing_titles + generated_titles_this_run
-        
-        duplicate_of = gemini_client.check_duplication(article['title'], article.get('summary', ''), comparison_pool)
-        
-        if duplicate_of:
-            print(f"SKIP: Duplicate detected! '{article['title']}' is a duplicate of '{duplicate_of}'")
-            continue
+            # --- Deduplication Check ---
+            print("Checking for duplicates...")
+            # Combine existing WP titles and locally processed titles
+            comparison_pool = existing_titles + generated_titles_this_run
             
-        print("No duplicate found. Proceeding...")
-        generated_titles_this_run.append(article['title'])
-        # ---------------------------
-        
-        # Determine Category & Type
-        classification = classifier.classify_article(article['title'], article['summary'], excluded_categories=['market-analysis'])
-        category_slug = classification.get('category', 'featured-news')
-        
-        # TechShift Simplification: Pipeline always generates Single Topic Deep Dives
-        article_type = "topic-focus"
+            duplicate_of = gemini_client.check_duplication(article['title'], article.get('summary', ''), comparison_pool)
             
-        print(f"Category: {category_slug} -> Type: {article_type}")
-        
-        # Prepare arguments for task
-        # We need a namespace or mock object appropriately since run_generation_task expects argparse.Namespace
-        class TaskArgs:
-            def __init__(self, **kwargs):
-                self.__dict__.update(kwargs)
+            if duplicate_of:
+                print(f"SKIP: Duplicate detected! '{article['title']}' is a duplicate of '{duplicate_of}'")
+                known_index.add_many(url_hash(u) for u in cluster_members(article))
+                continue
                 
-        task_args_dict = {
-            "keyword": article['title'],
-            "type": article_type,
-            "category": category_slug,
-            "dry_run": args.dry_run,
-            "schedule": None, # Default immediate
-            "context": None
-        }
-        
-        # Context Generation
-        if article_type in ["news", "global", "market-analysis", "featured-news", "strategic-assets", "topic-focus"]:
-            print("\n--- Context-based generation (URL reading + summarization) ---")
+            print("No duplicate found. Proceeding...")
+            generated_titles_this_run.append(article['title'])
+            # ---------------------------
             
             try:
-                article_content = extract_content(article['url'], article['source'])
-                
-                if article_content['content'] and "Error" not in article_content['title']:
-                    summary_data = summarize_article(article_content['content'], article['title'], client=gemini_client)
-                    task_args_dict["context"] = json.dumps(summary_data, ensure_ascii=False)
-                    print(f"Context created: {len(summary_data['summary'])} chars summary, {len(summary_data['key_facts'])} key facts")
-                else:
-                    print("Warning: Failed to extract content, falling back to keyword-based generation")
+                if generate_from_article(article, gemini_client, classifier, wp_client,
+                                         image_queue=image_queue, dry_run=args.dry_run):
+                    stats["generated"] += 1
+                    known_index.add_many(url_hash(u) for u in cluster_members(article))
+                    yield article
             except Exception as e:
-                print(f"Error during context creation: {e}")
-                print("Falling back to keyword-based generation")
-        else:
-             print("\n--- Keyword-based generation (traditional) ---")
-             
-        # Execute Generation Task
-        task_args = TaskArgs(**task_args_dict)
-        
-        try:
-             success = run_generation_task(task_args, gemini_client=gemini_client, wp_client=wp_client)
-             if success:
-                 count += 1
-        except Exception as e:
-             print(f"Error executing generation task: {e}")
+                print(f"Error executing generation task: {e}")
+
+            print("-" * 40)
+            if stats["generated"] >= args.limit:
+                return
+
+    graph = StageGraph(buffer_size=batch_size * 3)
+    raw = graph.channel()
+    stories = graph.channel()
+    candidates = graph.topk(k=early_exit_threshold, key=lambda a: a.get('score', 0))
+    graph.add("collect", collect, out=raw)
+    graph.add("dedupe", dedupe, inp=raw, out=stories)
+    graph.add("score", score, inp=stories, out=candidates)
+    graph.add("generate", generate, inp=candidates)
+
+    try:
+        graph.run()
+    finally:
+        known_index.close()
+        scheduler.save()
+
+        print(f"\nCollected {stats['collected']} articles: {stats['known']} already seen, "
+              f"{stats['clustered']} merged into existing stories, {stats['prefilter_rejected']} rejected by pre-filter.")
+        print(f"Scored {stats['scored']}, {stats['high']} above threshold {args.threshold}, generated {stats['generated']}.")
+
+        # Wait for background hero image jobs before exiting
+        print("Waiting for hero image jobs to finish...")
+        image_queue.shutdown(wait=True)
 
-        print("-" * 40)
+        print("\n=== Model Cascade ===")
+        print(cascade_stats.summary())
+        print(gemini_client.context_cache.summary())
+        print(budget.summary())
+        print("\n=== Model Call Latency / Hedging ===")
+        print(hedge_stats.summary())
+        gemini_client.context_cache.close()
 
 if __name__ == "__main__":
     main()
@@ -12,9 +12,11 @@ import re
 import json
 from datetime import datetime
 try:
-    from automation.gemini_client import GeminiClient
+    from automation.client_registry import get_gemini_client
+    from automation.token_budget import budget_for, fit_to_budget
 except ImportError:
-    from gemini_client import GeminiClient
+    from client_registry import get_gemini_client
+    from token_budget import budget_for, fit_to_budget
 
 
 class SEOOptimizer:
@@ -22,7 +24,7 @@ class SEOOptimizer:
         if client:
             self.gemini = client
         else:
-            self.gemini = GeminiClient()
+            self.gemini = get_gemini_client()
     
     def generate_meta_description(self, title, content, keyword):
         """
@@ -36,11 +38,12 @@ class SEOOptimizer:
         Returns:
             str: Meta description
         """
+        excerpt = fit_to_budget(content, budget_for("meta_description"), query=f"{title} {keyword}")
         prompt = f"""以下の記事のメタディスクリプションを作成してください。
 
 タイトル: {title}
 キーワード: {keyword}
-本文（抜粋）: {content[:1000]}
+本文（抜粋）: {excerpt}
 
 【TechShiftのトーン＆マナー】
 - 未来予測（Foresight）と技術的インパクト（Impact）を重視する。
@@ -12,14 +12,19 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
     from wp_client import WordPressClient
+    from wp_batch import BatchPublisher, upsert_term, term_id_from_result
 except ImportError:
     # Fallback for running from root
     from automation.wp_client import WordPressClient
-
-import requests
+    from automation.wp_batch import BatchPublisher, upsert_term, term_id_from_result
 
 def create_techshift_taxonomy(wp):
-    """Create TechShift categories and tags."""
+    """
+    Create TechShift categories and tags.
+    All writes go out as batch/v1 requests: sectors, formats and tags first,
+    then topics (which need their sector's ID), then updates of existing terms.
+    """
+    publisher = BatchPublisher(wp)
     
     # --- 1. Main Categories (Sectors) ---
     # Slug format: English slug derived from "Space & Aero" -> "space-aero"
@@ -32,12 +37,8 @@ def create_techshift_taxonomy(wp):
         {"name": "環境・エネルギー", "slug": "green-tech", "description": "Green Tech: 核融合発電、全固体電池、直接空気回収(DAC)、グリーン水素、SMR（小型モジュール炉）など、脱炭素社会を実現しエネルギー問題を根本解決するクライメートテックの技術革新。"}
     ]
 
-    print("--- Creating Main Categories (Sectors) ---")
-    sector_map = {} # name -> id
     for sector in sectors:
-        cat_id = _create_or_update_term(wp, "categories", sector)
-        if cat_id:
-            sector_map[sector["slug"]] = cat_id
+        upsert_term(publisher, "categories", sector)
 
     # --- 2. Sub Categories (Topics) ---
     # Structure: parent_slug -> list of children
@@ -86,16 +87,10 @@ def create_techshift_taxonomy(wp):
         ]
     }
 
-    print("\n--- Creating Sub Categories (Topics) ---")
     for parent_slug, children in topics.items():
-        if parent_slug not in sector_map:
-            print(f"Skipping children for {parent_slug} (Parent not found)")
-            continue
-            
-        parent_id = sector_map[parent_slug]
+        parent_key = f"categories:{parent_slug}"
         for child in children:
-            child["parent"] = parent_id # Assign parent ID
-            _create_or_update_term(wp, "categories", child)
+            upsert_term(publisher, "categories", child, depends_on=[parent_key], prepare=_with_parent(parent_key))
 
 
     # --- 1.5. Special Categories (Formats) ---
@@ -103,9 +98,8 @@ def create_techshift_taxonomy(wp):
         {"name": "日次・週次まとめ", "slug": "summary", "description": "日次・週次のテクノロジーニュースまとめ。主要セクターの重要ニュースを横断的に分析し、1日のトレンドを短時間で把握するための要約レポート。"},
     ]
 
-    print("\n--- Creating Special Categories (Formats) ---")
     for fmt in formats:
-        _create_or_update_term(wp, "categories", fmt)
+        upsert_term(publisher, "categories", fmt)
 
     # --- 3. Tags ---
     tags = [
@@ -131,63 +125,44 @@ def create_techshift_taxonomy(wp):
         {"name": "Strategic Asset", "slug": "strategic-asset", "description": "戦略的技術資産"},
     ]
 
-    print("\n--- Creating Tags ---")
     for tag in tags:
-        _create_or_update_term(wp, "tags", tag)
+        upsert_term(publisher, "tags", tag)
 
+    print("--- Creating Categories and Tags (batch) ---")
+    results = publisher.flush()
+    _report(results)
+    print(f"({publisher.round_trips} batch request(s))")
+    return results
 
-def _create_or_update_term(wp, taxonomy, term_data):
-    """Helper to create or update terms."""
-    # term_data should have 'name', 'slug', 'description', and optional 'parent'
-    
-    try:
-        # 1. Try create
-        url = f"{wp.api_url}/{taxonomy}"
-        response = requests.post(url, json=term_data, auth=wp.auth)
-        
-        if response.status_code == 201:
-            print(f"✓ Created {taxonomy[:-1]}: {term_data['name']}")
-            return response.json()['id']
-            
-        elif response.status_code == 400 and "term_exists" in response.text:
-            # 2. Update existing
-            # First, we need to find the ID of the existing term.
-            # Unfortunately, the 400 error usually contains the ID, but it's cleaner to fetch by slug.
-            
-            get_url = f"{wp.api_url}/{taxonomy}"
-            params = {"slug": term_data['slug']}
-            get_res = requests.get(get_url, params=params, auth=wp.auth)
-            
-            if get_res.status_code == 200 and len(get_res.json()) > 0:
-                existing = get_res.json()[0]
-                term_id = existing['id']
-                
-                print(f"- {taxonomy[:-1].capitalize()} exists: {term_data['name']} (ID: {term_id}). Updating...")
-                
-                # Prepare update data (excluding slug/name to avoid conflicts if case differs)
-                update_data = {"description": term_data.get('description', '')}
-                if 'parent' in term_data:
-                    update_data['parent'] = term_data['parent']
-                
-                update_url = f"{wp.api_url}/{taxonomy}/{term_id}"
-                update_res = requests.post(update_url, json=update_data, auth=wp.auth)
-                
-                if update_res.status_code == 200:
-                     print(f"  ✓ Updated.")
-                     return term_id
-                else:
-                     print(f"  ✗ Update failed: {update_res.text}")
-                     return term_id # Return ID anyway
+
+def _with_parent(parent_key):
+    """prepare() for a topic: set parent to the ID of its sector."""
+    def prepare(body, results):
+        parent_id = term_id_from_result(results[parent_key])
+        if not parent_id:
+            raise ValueError(f"parent {parent_key} not found")
+        return {**body, "parent": parent_id}
+    return prepare
+
+
+def _report(results):
+    """Print one line per term from the batch results."""
+    for key, result in results.items():
+        if key.endswith(":update"):
+            continue
+        taxonomy, slug = key.split(":", 1)
+        label = {"categories": "category", "tags": "tag"}.get(taxonomy, taxonomy)
+        update = results.get(f"{key}:update")
+        if result.ok:
+            print(f"✓ Created {label}: {slug}")
+        elif result.error_code == "term_exists":
+            term_id = term_id_from_result(result)
+            if update and update.ok:
+                print(f"- {label.capitalize()} exists: {slug} (ID: {term_id}). ✓ Updated.")
             else:
-                print(f"  ✗ ID lookup failed for {term_data['slug']}")
-                return None
+                print(f"- {label.capitalize()} exists: {slug} (ID: {term_id}). ✗ Update failed: {update}")
         else:
-            print(f"✗ Creation failed for {term_data['name']}: {response.text}")
-            return None
-            
-    except Exception as e:
-        print(f"✗ Error processing {term_data['name']}: {e}")
-        return None
+            print(f"✗ Creation failed for {slug}: {result.error or result.body}")
 
 def main():
     print("=== TechShift Taxonomy Setup ===\n")
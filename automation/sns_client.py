@@ -1,6 +1,12 @@
 import os
-import tweepy
 from dotenv import load_dotenv
+try:
+    from automation.lazy import lazy_import
+except ImportError:
+    from lazy import lazy_import
+
+# tweepy is only loaded when authenticating
+tweepy = lazy_import("tweepy")
 
 load_dotenv()
 
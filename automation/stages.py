@@ -0,0 +1,239 @@
+"""
+Streaming Stage Graph for TechShift
+
+Runs a one-shot pipeline as stages connected by bounded buffers instead of
+materialising a full list between steps. Each stage is a generator function
+in its own thread, so generation of the first candidate can start while later
+batches are still being scored, and memory stays flat in the backlog size
+(a full buffer blocks the stage that feeds it).
+
+- Channel: bounded FIFO between two stages (iterate it, or read batches())
+- TopK: bounded selection buffer; keeps the k best items in a heap and hands
+  out the best one available whenever the consumer asks (nothing is re-sorted)
+- StageGraph: owns the threads, a shared stop event and per-stage counters
+
+Usage:
+    graph = StageGraph()
+    raw = graph.channel()
+    best = graph.topk(k=4, key=lambda a: a["score"])
+    graph.add("collect", lambda _: fetch_all(), out=raw)
+    graph.add("score", score_stage, inp=raw, out=best)
+    graph.add("generate", generate_stage, inp=best)
+    graph.run()
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+DEFAULT_BUFFER_SIZE = 32
+_POLL = 0.2  # seconds between stop checks while blocked
+_CLOSED = object()
+
+
+class Channel:
+    """Bounded FIFO between two stages. put() blocks while full (backpressure)."""
+
+    def __init__(self, maxsize, stop_event):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = stop_event
+        self._cancelled = threading.Event()
+
+    def put(self, item):
+        """Returns False if the graph was stopped or the consumer cancelled before the item was queued."""
+        while not (self._stop.is_set() or self._cancelled.is_set()):
+            try:
+                self._queue.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        # If this fails the consumer is gone or stopping anyway
+        self.put(_CLOSED)
+
+    def cancel(self):
+        """Consumer side: stop accepting items (the producing stage ends at its next put)."""
+        self._cancelled.set()
+
+    def _get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __iter__(self):
+        while not self._stop.is_set():
+            item = self._get(_POLL)
+            if item is None:
+                continue
+            if item is _CLOSED:
+                return
+            yield item
+
+    def batches(self, size, linger=2.0):
+        """
+        Yield lists of up to `size` items. A partial batch is released after
+        `linger` seconds without a new item, so a slow upstream does not hold
+        back items that are already waiting.
+        """
+        batch = []
+        while not self._stop.is_set():
+            item = self._get(linger if batch else _POLL)
+            if item is None:
+                if batch:
+                    yield batch
+                    batch = []
+                continue
+            if item is _CLOSED:
+                break
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch and not self._stop.is_set():
+            yield batch
+
+
+class TopK:
+    """
+    Selection buffer holding at most k items, ranked by key (higher is better).
+
+    put() never blocks: when full, the lowest item is dropped (or the new one,
+    if it ranks lower). Iterating yields the best item currently held, waiting
+    for new items until the upstream stage closes the buffer.
+    """
+
+    def __init__(self, k, key, stop_event):
+        self.k = max(1, k)
+        self.key = key
+        self.dropped = 0
+        self._heap = []  # min-heap of (rank, seq, item); the root is the weakest item
+        self._seq = itertools.count()
+        self._closed = False
+        self._cancelled = False
+        self._cond = threading.Condition()
+        self._stop = stop_event
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+    def put(self, item):
+        """Returns False once the consumer has cancelled (it needs no more items)."""
+        entry = (self.key(item), next(self._seq), item)
+        with self._cond:
+            if self._cancelled:
+                return False
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+            else:
+                heapq.heappushpop(self._heap, entry)
+                self.dropped += 1
+            self._cond.notify()
+        return True
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def cancel(self):
+        with self._cond:
+            self._cancelled = True
+
+    def pop_best(self):
+        """Remove and return the best item held now, or None."""
+        with self._cond:
+            if not self._heap:
+                return None
+            best = max(range(len(self._heap)), key=lambda i: (self._heap[i][0], -self._heap[i][1]))
+            entry = self._heap[best]
+            last = self._heap.pop()
+            if best < len(self._heap):
+                self._heap[best] = last
+                heapq.heapify(self._heap)
+            return entry[2]
+
+    def __iter__(self):
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._heap and not self._closed and not self._stop.is_set():
+                    self._cond.wait(_POLL)
+                if not self._heap and (self._closed or self._stop.is_set()):
+                    return
+            item = self.pop_best()
+            if item is not None:
+                yield item
+
+
+class StageGraph:
+    """Threads running generator stages, linked by Channel / TopK buffers."""
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.stop_event = threading.Event()
+        self.counts = {}
+        self.errors = []
+        self._stages = []
+        self._lock = threading.Lock()
+
+    def channel(self, maxsize=None):
+        return Channel(maxsize or self.buffer_size, self.stop_event)
+
+    def topk(self, k, key):
+        return TopK(k, key, self.stop_event)
+
+    def add(self, name, func, inp=None, out=None):
+        """
+        Register a stage. func(inp) must return an iterable; everything it
+        yields is put on `out` (if any). `out` is closed when the stage ends.
+        """
+        self.counts[name] = 0
+        self._stages.append((name, func, inp, out))
+
+    def stop(self):
+        """Ask every stage to finish (buffers stop accepting and yielding items)."""
+        self.stop_event.set()
+
+    def _run_stage(self, name, func, inp, out):
+        started = time.time()
+        try:
+            for item in func(inp):
+                with self._lock:
+                    self.counts[name] += 1
+                if out is not None and not out.put(item):
+                    break
+        except Exception as e:
+            print(f"Stage '{name}' failed: {e}")
+            self.errors.append((name, e))
+            self.stop()
+        finally:
+            if out is not None:
+                out.close()
+            # A stage that returns early (limit reached) releases the stages feeding it
+            if inp is not None:
+                inp.cancel()
+            print(f"[{name}] done: {self.counts[name]} item(s) in {time.time() - started:.1f}s")
+
+    def run(self):
+        """Start every stage and wait for all of them. Returns the list of (stage, exception) errors."""
+        threads = [
+            threading.Thread(target=self._run_stage, args=stage, name=f"stage-{stage[0]}", daemon=True)
+            for stage in self._stages
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(timeout=_POLL)
+        except KeyboardInterrupt:
+            print("Interrupted, stopping stages...")
+            self.stop()
+            for t in threads:
+                t.join()
+        return self.errors
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Streaming Generation Helpers for TechShift
+
+Articles are several thousand characters long. Streaming them lets the caller
+act on the title as soon as its line is complete (classification, image
+prompt and dedup start while the body is still being written) and keeps a
+local draft on disk as the text arrives.
+
+- consume_stream(): reads a google-genai response stream, raising StreamStalled
+  when no chunk arrives within the stall timeout, StreamTruncated when the
+  stream ends without a normal finish and DeadlineExceeded when the whole
+  stream outlives its stage deadline
+- ArticleStream: sink for one article (title callback, draft file, cancellation)
+
+GeminiClient.generate_stream() retries stalled / truncated streams; 429s raised
+while the stream is read are retried with backoff like any other call.
+"""
+
+import os
+import queue
+import threading
+import time
+
+try:
+    from automation.hedging import DeadlineExceeded
+except ImportError:
+    from hedging import DeadlineExceeded
+
+FIRST_CHUNK_TIMEOUT = 120  # seconds; thinking models can take a while before the first token
+STALL_TIMEOUT = 30  # seconds between chunks
+MAX_ATTEMPTS = 3
+
+_END = object()
+
+
+class StreamStalled(Exception):
+    pass
+
+
+class StreamTruncated(Exception):
+    pass
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+def _pump(stream, out, abandoned):
+    """Move stream chunks onto a queue (runs in a daemon thread)."""
+    try:
+        for chunk in stream:
+            if abandoned.is_set():
+                break
+            out.put(chunk)
+        out.put(_END)
+    except Exception as e:
+        out.put(e)
+
+
+def _finish_reason(chunk):
+    try:
+        reason = chunk.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return None
+    return getattr(reason, "name", reason)
+
+
+def consume_stream(stream, on_text, first_chunk_timeout=FIRST_CHUNK_TIMEOUT, stall_timeout=STALL_TIMEOUT,
+                   should_stop=None, min_chars=0, deadline=None, on_chunk=None):
+    """
+    Read a response stream to the end, passing each text delta to on_text.
+
+    deadline (seconds) bounds the whole stream; on_chunk(chunk) sees every raw
+    chunk (the last one carries the request's usage_metadata).
+
+    Returns:
+        The full text.
+    Raises:
+        StreamStalled: no chunk within the timeout
+        StreamTruncated: finish reason other than STOP, or fewer than min_chars
+        StreamCancelled: should_stop() became true
+        DeadlineExceeded: the stream ran past `deadline`
+        Exception: any error raised by the stream itself (e.g. a 429)
+    """
+    out = queue.Queue()
+    abandoned = threading.Event()
+    threading.Thread(target=_pump, args=(stream, out, abandoned), daemon=True).start()
+
+    parts = []
+    finish = None
+    timeout = first_chunk_timeout
+    ends_at = time.monotonic() + deadline if deadline else None
+    try:
+        while True:
+            if should_stop and should_stop():
+                raise StreamCancelled("stream cancelled by caller")
+            wait = timeout
+            if ends_at is not None:
+                wait = min(wait, ends_at - time.monotonic())
+                if wait <= 0:
+                    raise DeadlineExceeded(f"stream exceeded {deadline:.0f}s after {sum(map(len, parts))} chars")
+            try:
+                item = out.get(timeout=wait)
+            except queue.Empty:
+                if wait < timeout:
+                    continue  # the deadline check above raises
+                raise StreamStalled(f"no chunk for {timeout}s after {sum(map(len, parts))} chars")
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if on_chunk:
+                on_chunk(item)
+            timeout = stall_timeout
+            finish = _finish_reason(item) or finish
+            text = getattr(item, "text", None)
+            if text:
+                parts.append(text)
+                on_text(text)
+    finally:
+        # A stalled producer thread may still be blocked inside the SDK; drop whatever it yields later
+        abandoned.set()
+
+    text = "".join(parts)
+    if finish not in ("STOP", None) or (finish is None and not text):
+        raise StreamTruncated(f"finish_reason={finish} after {len(text)} chars")
+    if len(text) < min_chars:
+        raise StreamTruncated(f"only {len(text)} chars (expected at least {min_chars})")
+    return text
+
+
+class ArticleStream:
+    """
+    Receives a streamed Markdown article.
+
+    - on_title(title) is called once the first "# ..." line is complete
+      (again only if a retried attempt produces a different title)
+    - every chunk is appended to draft_path, which is truncated on retry
+    - cancel() stops the stream at the next chunk (e.g. the title is a duplicate)
+
+    Usage:
+        stream = ArticleStream(on_title=start_early_work, draft_path=path)
+        text = gemini.generate_article(keyword, stream=stream)
+    """
+
+    def __init__(self, on_title=None, draft_path=None):
+        self.on_title = on_title
+        self.draft_path = draft_path
+        self.title = None
+        self.cancel_reason = None
+        self._buffer = ""
+        self._title_done = False
+        self._draft = None
+
+    def write(self, text):
+        if self.draft_path:
+            if self._draft is None:
+                os.makedirs(os.path.dirname(self.draft_path) or ".", exist_ok=True)
+                self._draft = open(self.draft_path, "w", encoding="utf-8")
+            self._draft.write(text)
+            self._draft.flush()
+        if not self._title_done:
+            self._buffer += text
+            self._scan_title()
+
+    def _scan_title(self):
+        # Same rule as parse_article_content: the first line starting with '#'
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            line = line.strip()
+            if line.startswith("#"):
+                self._title_done = True
+                self._buffer = ""
+                title = line.lstrip("#").strip()
+                if title != self.title:
+                    self.title = title
+                    if self.on_title:
+                        self.on_title(title)
+                return
+
+    def reset(self):
+        """Start over for a retried attempt."""
+        self._buffer = ""
+        self._title_done = False
+        if self._draft:
+            self._draft.seek(0)
+            self._draft.truncate()
+
+    def cancel(self, reason):
+        self.cancel_reason = reason
+
+    @property
+    def cancelled(self):
+        return self.cancel_reason is not None
+
+    def close(self, remove_draft=False):
+        if self._draft:
+            self._draft.close()
+            self._draft = None
+        if remove_draft and self.draft_path and os.path.exists(self.draft_path):
+            os.remove(self.draft_path)
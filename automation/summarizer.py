@@ -12,11 +12,11 @@ import sys
 import json
 from dotenv import load_dotenv
 try:
-    from automation.gemini_client import GeminiClient
+    from automation.client_registry import get_gemini_client
 except ImportError:
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from automation.gemini_client import GeminiClient
+    from automation.client_registry import get_gemini_client
 
 SUMMARIZATION_PROMPT = """あなたはテクノロジーメディア「TechShift」のシニア・テックアナリストです。
 以下の記事（外部ソース）を要約し、技術責任者や事業責任者にとって重要な「産業構造へのインパクト」を抽出してください。
@@ -60,7 +60,7 @@ def summarize_article(content: str, title: str, model_name: str = "gemini-3-flas
     
     if client is None:
         try:
-            client = GeminiClient()
+            client = get_gemini_client()
         except Exception as e:
             print(f"Error initializing GeminiClient: {e}")
             return {
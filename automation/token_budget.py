@@ -0,0 +1,282 @@
+"""
+Token Budgets for Prompt Inputs
+
+Prompt inputs used to be cut with fixed character slices (content[:4000],
+summary[:500], ...). The same number of characters is roughly 4x more tokens
+in Japanese than in English, so English articles were cut short while Japanese
+ones overran, and cuts landed mid-sentence.
+
+- count_tokens(text): calibrated per-script estimate (CJK characters, Latin
+  words, digits, symbols), or the SDK's local Gemini tokenizer when
+  TOKEN_COUNTER=local (needs sentencepiece; the tokenizer model is downloaded
+  on first use)
+- trim_to_tokens(text, budget): keeps whole sentences (。！？ / . ! ? / line
+  breaks) from the start
+- fit_to_budget(text, budget, query): keeps the lead paragraph, then the most
+  salient paragraphs (figures, named entities, terms of `query`) in their
+  original order, trimming the last one on a sentence boundary
+- budget_for(name): per-call budgets (PROMPT_BUDGETS, overridable)
+
+Configuration (.env):
+    PROMPT_TOKEN_BUDGETS=structured_summary=1200,sns=900,impact=1000,meta_description=350
+    TOKEN_COUNTER=estimate          # or local
+    TOKEN_ESTIMATE_SCALE=1.0        # from `python -m automation token-budget --calibrate`
+
+Usage:
+    python -m automation token-budget --file article.md --budget 800
+    python -m automation token-budget --calibrate --model gemini-2.0-flash
+"""
+
+import argparse
+import glob
+import math
+import os
+import re
+import threading
+
+# Tokens per call site (estimated tokens of the trimmed input, not of the whole prompt)
+PROMPT_BUDGETS = {
+    "structured_summary": 1200,  # generate_structured_summary
+    "sns": 900,                  # generate_sns_content
+    "impact": 1000,              # analyze_single_article_impact
+    "meta_description": 350,     # SEOOptimizer.generate_meta_description
+    "relevance_summary": 150,    # check_relevance_batch (per article)
+    "article_summary": 1200,     # full text attached as summary (daily briefing)
+    "enrichment": 2400,          # ArticleEnricher combined call (all post-generation fields)
+}
+
+# Approximate rates for the Gemini (Gemma) sentencepiece vocabulary
+CJK_TOKENS_PER_CHAR = 0.7      # kanji / kana / hangul; common words merge into one token
+LATIN_CHARS_PER_EXTRA_TOKEN = 8  # a Latin word is one token, plus one per 8 characters
+SYMBOL_TOKENS_PER_CHAR = 0.8   # punctuation, brackets, full-width symbols
+
+_CJK = "぀-ヿ㐀-䶿一-鿿가-힯ｦ-ﾟ"
+_CJK_RE = re.compile(f"[{_CJK}]")
+_WORD_RE = re.compile(r"[A-Za-zÀ-ɏ]+")
+_DIGIT_RE = re.compile(r"\d")
+_SYMBOL_RE = re.compile(rf"[^\sA-Za-zÀ-ɏ\d{_CJK}]")
+
+# Sentence end: Japanese terminators (no space needed), Latin terminators before
+# whitespace, or a line break
+_SENTENCE_RE = re.compile(r"[^。！？!?\n]*?(?:[。！？]+[」』）)]*|[.!?]+[\"')\]]*(?=\s)|\n+|$)", re.S)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_FIGURE_RE = re.compile(r"\d[\d,.]*\s*(?:%|％|億|万|兆|円|ドル|billion|million|trillion|[kKMGT]?W|qubits?|nm|倍)?")
+_ENTITY_RE = re.compile(r"\b[A-Z][A-Za-z0-9]+(?:[ -][A-Z][A-Za-z0-9]+)*|[ァ-ヺー]{3,}")
+_TERM_RE = re.compile(rf"[A-Za-z0-9]{{3,}}|[{_CJK}]+")
+
+
+def _env_scale():
+    try:
+        return float(os.getenv("TOKEN_ESTIMATE_SCALE", "1.0"))
+    except ValueError:
+        return 1.0
+
+
+def estimate_tokens(text):
+    """Per-script token estimate of `text` (no tokenizer needed)."""
+    if not text:
+        return 0
+    words = _WORD_RE.findall(text)
+    tokens = (len(_CJK_RE.findall(text)) * CJK_TOKENS_PER_CHAR
+              + sum(1 + len(w) // LATIN_CHARS_PER_EXTRA_TOKEN for w in words)
+              + len(_DIGIT_RE.findall(text))  # Gemini tokenizes digits one by one
+              + len(_SYMBOL_RE.findall(text)) * SYMBOL_TOKENS_PER_CHAR)
+    return int(math.ceil(tokens * _env_scale()))
+
+
+class _LocalCounter:
+    """google-genai's local tokenizer (loaded once; None if unavailable)."""
+
+    _lock = threading.Lock()
+    _tokenizer = None
+    _failed = False
+
+    @classmethod
+    def count(cls, text):
+        with cls._lock:
+            if cls._tokenizer is None and not cls._failed:
+                try:
+                    from google.genai.local_tokenizer import LocalTokenizer
+                    cls._tokenizer = LocalTokenizer(model_name=os.getenv("TOKENIZER_MODEL", "gemini-2.0-flash"))
+                except Exception as e:
+                    print(f"Local tokenizer unavailable ({e}), using the token estimate.")
+                    cls._failed = True
+        if cls._tokenizer is None:
+            return None
+        return cls._tokenizer.count_tokens(text).total_tokens
+
+
+def count_tokens(text):
+    """Tokens of `text`: local tokenizer if TOKEN_COUNTER=local (and available), else estimate_tokens."""
+    if text and os.getenv("TOKEN_COUNTER", "estimate") == "local":
+        counted = _LocalCounter.count(text)
+        if counted is not None:
+            return counted
+    return estimate_tokens(text)
+
+
+def budget_for(name, default=None):
+    """Token budget for a call site (PROMPT_TOKEN_BUDGETS overrides PROMPT_BUDGETS)."""
+    overrides = {}
+    for item in (os.getenv("PROMPT_TOKEN_BUDGETS") or "").split(","):
+        key, _, value = item.partition("=")
+        if value.strip().isdigit():
+            overrides[key.strip()] = int(value)
+    return overrides.get(name, PROMPT_BUDGETS.get(name, default))
+
+
+def split_sentences(text):
+    """Sentences with their terminators and trailing whitespace (''.join() gives back the text)."""
+    sentences = [m.group(0) for m in _SENTENCE_RE.finditer(text) if m.group(0)]
+    # Whitespace after a Latin terminator belongs to the sentence it ends
+    merged = []
+    for s in sentences:
+        if merged and not s.strip():
+            merged[-1] += s
+        elif merged and s[:1].isspace() and not merged[-1].endswith("\n"):
+            stripped = s.lstrip()
+            merged[-1] += s[:len(s) - len(stripped)]
+            merged.append(stripped)
+        else:
+            merged.append(s)
+    return merged
+
+
+def _hard_cut(text, budget):
+    """Cut a single over-long sentence to about `budget` tokens (character bisection)."""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def trim_to_tokens(text, budget):
+    """Leading whole sentences of `text` within `budget` tokens (a hard cut only if the first one is too long)."""
+    if not text or count_tokens(text) <= budget:
+        return text or ""
+    kept, used = [], 0
+    for sentence in split_sentences(text):
+        cost = count_tokens(sentence)
+        if used + cost > budget:
+            if not kept:
+                return _hard_cut(sentence, budget).rstrip()
+            break
+        kept.append(sentence)
+        used += cost
+    return "".join(kept).rstrip()
+
+
+def _terms(query):
+    terms = set()
+    for term in _TERM_RE.findall(query or ""):
+        if term.isascii():
+            terms.add(term.lower())
+        else:
+            # CJK has no spaces: match on character bigrams
+            terms.update(term[i:i + 2] for i in range(len(term) - 1))
+    return terms
+
+
+def salience(paragraph, index, terms=()):
+    """Heuristic importance of a paragraph: position, figures, named entities, overlap with the query terms."""
+    score = 1.0 / (1 + index)
+    score += min(3, len(_FIGURE_RE.findall(paragraph))) * 0.5
+    score += min(5, len(_ENTITY_RE.findall(paragraph))) * 0.3
+    if terms:
+        text = paragraph.lower()
+        score += 3.0 * sum(1 for t in terms if t in text) / len(terms)
+    if count_tokens(paragraph) < 12:
+        score -= 1.0  # captions, bylines, "Read more" lines
+    return score
+
+
+def fit_to_budget(text, budget, query=None):
+    """
+    Fill `budget` tokens with the most useful parts of `text`.
+
+    The lead paragraph is always kept; the others are added by salience
+    (see salience(); `query` is usually the title) and put back in their
+    original order. The last paragraph that does not fit whole is trimmed on a
+    sentence boundary.
+    """
+    if not text or count_tokens(text) <= budget:
+        return text or ""
+    paragraphs = [p.strip() for p in _PARAGRAPH_RE.split(text) if p.strip()]
+    if len(paragraphs) == 1:
+        paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+
+    lead = trim_to_tokens(paragraphs[0], budget)
+    chosen = {0: lead}
+    left = budget - count_tokens(lead) - 1
+    terms = _terms(query)
+    ranked = sorted(range(1, len(paragraphs)), key=lambda i: salience(paragraphs[i], i, terms), reverse=True)
+    for i in ranked:
+        if left < 20:
+            break
+        cost = count_tokens(paragraphs[i]) + 1  # +1 for the separator
+        if cost <= left:
+            chosen[i] = paragraphs[i]
+            left -= cost
+        elif salience(paragraphs[i], i, terms) > 0:
+            part = trim_to_tokens(paragraphs[i], left - 1)
+            if part:
+                chosen[i] = part
+                left -= count_tokens(part) + 1
+    return "\n\n".join(chosen[i] for i in sorted(chosen))
+
+
+def calibrate(texts, model="gemini-2.0-flash", client=None):
+    """
+    Compare estimate_tokens with the API's count_tokens on sample texts.
+    Returns the scale to set as TOKEN_ESTIMATE_SCALE.
+    """
+    if client is None:
+        try:
+            from automation.client_registry import get_gemini_client
+        except ImportError:
+            from client_registry import get_gemini_client
+        client = get_gemini_client().client
+    counted = estimated = 0
+    for text in texts:
+        counted += client.models.count_tokens(model=model, contents=text).total_tokens
+        estimated += estimate_tokens(text) / _env_scale()
+    return counted / estimated if estimated else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token counts / budgeted trimming of prompt inputs")
+    parser.add_argument("--file", help="Text file to measure and fit to --budget")
+    parser.add_argument("--budget", type=int, default=800, help="Token budget for --file")
+    parser.add_argument("--query", default=None, help="Terms that raise a paragraph's salience (e.g. the title)")
+    parser.add_argument("--calibrate", action="store_true", help="Fit the estimate to count_tokens on generated articles")
+    parser.add_argument("--model", default="gemini-2.0-flash", help="Model whose tokenizer is used for --calibrate")
+    parser.add_argument("--samples", type=int, default=10, help="Articles used for --calibrate")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        pattern = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generated_articles", "*.md")
+        files = sorted(glob.glob(pattern), key=os.path.getmtime, reverse=True)[:args.samples]
+        if not files:
+            parser.error(f"no sample articles in {os.path.dirname(pattern)}")
+        texts = [open(path, encoding="utf-8").read() for path in files]
+        scale = calibrate(texts, model=args.model)
+        print(f"{len(texts)} sample(s): count_tokens / estimate = {scale:.3f}")
+        print(f"Set TOKEN_ESTIMATE_SCALE={scale:.2f} in .env")
+        return
+
+    if not args.file:
+        parser.error("--file or --calibrate is required")
+    text = open(args.file, encoding="utf-8").read()
+    fitted = fit_to_budget(text, args.budget, query=args.query)
+    print(f"Input: {len(text)} chars, ~{count_tokens(text)} tokens")
+    print(f"Fitted: {len(fitted)} chars, ~{count_tokens(fitted)} tokens (budget {args.budget})")
+    print("-" * 40)
+    print(fitted)
+
+
+if __name__ == "__main__":
+    main()
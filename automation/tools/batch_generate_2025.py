@@ -2,17 +2,16 @@
 import os
 import re
 import json
-import subprocess
+import argparse
 import time
 import sys
-from datetime import datetime
 
 # Path Configuration for TechShift
-BASE_DIR = "/Users/matsumotoakira/Documents/Private_development/Techshift"
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 MARKDOWN_FILE = os.path.join(BASE_DIR, "docs/03_automation/seo_target_keywords_2025.md")
-SCRIPT_PATH = os.path.join(BASE_DIR, "automation/generate_article.py")
-# Assume running in the same venv or system python if explicit venv not found
-PYTHON_EXEC = sys.executable 
+
+# Run generation in-process (shared clients) instead of one subprocess per article
+sys.path.append(BASE_DIR)
 
 def parse_markdown_table(file_path):
     tasks = []
@@ -94,6 +93,10 @@ def parse_markdown_table(file_path):
     return tasks
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate SEO target articles from seo_target_keywords_2025.md")
+    parser.add_argument("--dry-run", action="store_true", help="Generate content but do not post to WordPress")
+    args = parser.parse_args()
+
     if not os.path.exists(MARKDOWN_FILE):
         print(f"Error: File not found: {MARKDOWN_FILE}")
         return
@@ -102,7 +105,28 @@ def main():
     tasks = parse_markdown_table(MARKDOWN_FILE)
     print(f"Found {len(tasks)} target articles.")
     
+    from automation.generate_article import run_generation_task, ARTICLE_MODEL, LLM_REQUESTS_PER_ARTICLE
+    from automation.client_registry import get_gemini_client
+    from automation.image_queue import ImageJobQueue
+    from automation.llm_budget import get_llm_budget, set_stage
+
+    # Backfills run at low priority and yield to the briefing / pipeline in the LLM budget
+    set_stage("backfill")
+    budget = get_llm_budget()
+
+    # Clients are built once and shared by every task
+    gemini = get_gemini_client()
+    wp = None
+    if not args.dry_run:
+        from automation.wp_client import WordPressClient
+        wp = WordPressClient()
+    image_queue = ImageJobQueue(gemini, wp)
+
     for i, task in enumerate(tasks):
+        allowance = budget.allowance("backfill", ARTICLE_MODEL)
+        if allowance is not None and allowance < LLM_REQUESTS_PER_ARTICLE:
+            print(f"\nLLM budget for backfills is used up for today; deferring the remaining {len(tasks) - i} article(s).")
+            break
         print(f"\n[{i+1}/{len(tasks)}] Target: {task['keyword']}")
         print(f"  Context: {task['context_summary']}")
         
@@ -113,44 +137,30 @@ def main():
         }
         context_json = json.dumps(context, ensure_ascii=False)
         
-        cmd = [
-            PYTHON_EXEC, SCRIPT_PATH,
-            '--keyword', task['keyword'],
-            '--type', task['type'],
-            '--context', context_json,
-            # '--dry-run' # Uncomment to test without generating
-        ]
+        task_args = argparse.Namespace(
+            keyword=task['keyword'],
+            type=task['type'],
+            context=context_json,
+            category=None,
+            schedule=None,
+            dry_run=args.dry_run
+        )
         
         try:
-            # Check for existing file (Simple check by keyword match in directory)
-            # generate_article.py does its own saving, but we can skip early if we want.
-            # For now, we let generate_article.py run, or we can check output dir.
-            
-            date_str = datetime.now().strftime("%Y-%m-%d")
-            safe_keyword = re.sub(r'[\\/*?:"<>| ]', '_', task['keyword'])
-            # Note: generate_article.py uses slightly different slugification logic depending on impl
-            # But let's rely on the script execution.
-            
-            print(f"  Executing: {' '.join(cmd)}")
-            
-            # Run the generation script
-            # We capture output to avoid spamming the console, but print errors
-            result = subprocess.run(cmd, check=True, text=True, capture_output=True)
-            
-            print("  > Success!")
-            # Extract generated file path or title from stdout if needed
-            for line in result.stdout.split('\n'):
-                if "Generated Title:" in line or "Saved local copy" in line:
-                    print(f"    {line.strip()}")
-            
-        except subprocess.CalledProcessError as e:
-            print(f"  > Error generating article for {task['keyword']}:")
-            print(f"    STDOUT: {e.stdout[-500:]}") # Last 500 chars
-            print(f"    STDERR: {e.stderr[-500:]}")
+            success = run_generation_task(task_args, gemini_client=gemini, wp_client=wp, image_queue=image_queue)
+            if success:
+                print("  > Success!")
+            else:
+                print(f"  > Error generating article for {task['keyword']}")
+        except Exception as e:
+            print(f"  > Error generating article for {task['keyword']}: {e}")
         
         # Usage throttling
         print("  Waiting 10s...")
         time.sleep(10)
 
+    print("Waiting for hero image jobs to finish...")
+    image_queue.shutdown(wait=True)
+
 if __name__ == "__main__":
     main()
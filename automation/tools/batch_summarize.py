@@ -13,12 +13,31 @@ from typing import List, Dict
 try:
     from automation.gemini_client import GeminiClient
     from automation.wp_client import WordPressClient
+    from automation.wp_batch import BatchPublisher, MAX_BATCH_SIZE
+    from automation.llm_budget import set_stage
 except ImportError:
     from gemini_client import GeminiClient
     from wp_client import WordPressClient
+    from wp_batch import BatchPublisher, MAX_BATCH_SIZE
+    from llm_budget import set_stage
+
+def flush_updates(publisher):
+    """Send queued meta updates as batch/v1 requests. Returns the number that succeeded."""
+    if not len(publisher):
+        return 0
+    print(f"  - Sending {len(publisher)} meta update(s) in one batch...")
+    updated = 0
+    for key, result in publisher.flush().items():
+        if result.ok:
+            updated += 1
+        else:
+            print(f"  - Failed to update meta for {key}: {result.status} {result.error or result.body}")
+    return updated
 
 def main():
     print("--- Batch Summarizer Started ---")
+    # Backfills run at low priority and yield to the briefing / pipeline in the LLM budget
+    set_stage("backfill")
     
     # Initialize Clients
     try:
@@ -35,6 +54,7 @@ def main():
     
     updated_count = 0
     skipped_count = 0
+    publisher = BatchPublisher(wp)
     
     for post in posts:
         post_id = post['id']
@@ -85,42 +105,15 @@ def main():
             summary_json = gemini.generate_structured_summary(text_content)
             
             if summary_json:
-                # 3. Update Post Meta
-                print("  - Updating WordPress post meta...")
-                
-                # Convert JSON dict to string for storage
+                # 3. Queue Post Meta update (sent in batches of MAX_BATCH_SIZE)
                 meta_value = json.dumps(summary_json, ensure_ascii=False)
-                
-                # Update post
-                # We need a method in WP Client to update meta.
-                # Since create_post can update if ID is provided, or we can use a new method.
-                # Let's see if we can use create_post or if we need to add update_post.
-                # Actually, verify if wp.create_post supports updating by ID?
-                # Looking at wp_client.py (I can't see it now, but standard logic):
-                # Usually create_post makes a NEW post. 
-                # We should add an 'update_post_meta' or usage of 'posts/<id>' endpoint.
-                
-                # For now, we will assume we need to use the requests object directly from wp client 
-                # or add a method. Let's try to use a direct request here for flexibility.
-                
-                # Use api_url which corresponds to /wp/v2
-                url = f"{wp.api_url}/posts/{post_id}"
-                data = {
+                publisher.add(f"post {post_id}", f"/wp/v2/posts/{post_id}", {
                     "meta": {
                         "ai_structured_summary": meta_value
                     }
-                }
-                
-                # We need to manually add authentication since we are using requests directly via session if available, 
-                # or just requests.post with auth. The wp_client instance has .auth tuple.
-                import requests
-                response = requests.post(url, json=data, auth=wp.auth)
-                
-                if response.status_code == 200:
-                    print("  - Success: Meta updated.")
-                    updated_count += 1
-                else:
-                    print(f"  - Failed to update meta: {response.status_code} {response.text}")
+                })
+                if len(publisher) >= MAX_BATCH_SIZE:
+                    updated_count += flush_updates(publisher)
                     
             else:
                 print("  - Failed to generate summary (Gemini returned None).")
@@ -131,6 +124,8 @@ def main():
         except Exception as e:
             print(f"  - Error processing post {post_id}: {e}")
 
+    updated_count += flush_updates(publisher)
+
     print(f"\n--- Batch Complete ---")
     print(f"Updated: {updated_count}")
     print(f"Skipped: {skipped_count}")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Import-time Benchmark for the Automation CLI
+
+Runs `python -m automation <command> --help` for each command in a fresh
+interpreter and reports:
+- wall time of the startup
+- which heavy third-party packages got imported (they shouldn't, for --help)
+
+Exits with code 1 when a command fails to start or loads a heavy package;
+add --budget-ms to also fail when a command exceeds the startup budget, e.g. in CI:
+
+    python -m automation bench-imports --budget-ms 300
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Packages that must not be loaded just to print --help
+HEAVY_MODULES = ["google.genai", "bs4", "lxml", "feedparser", "markdown", "tweepy", "requests", "numpy"]
+
+PROBE_CODE = """
+import json, sys
+sys.argv = ["automation"] + {argv!r}
+from automation.cli import main
+try:
+    main()
+except SystemExit:
+    pass
+heavy = [m for m in {heavy!r} if m in sys.modules]
+sys.stdout.write("\\n__BENCH__" + json.dumps(heavy))
+"""
+
+
+def probe(command, runs=3):
+    """Measure `<command> --help` startup. Returns (best_ms, heavy_modules, error)."""
+    argv = [command, "--help"] if command else ["--help"]
+    code = PROBE_CODE.format(argv=argv, heavy=HEAVY_MODULES)
+
+    best_ms = None
+    heavy = []
+    error = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        marker = proc.stdout.rfind("__BENCH__")
+        if marker == -1:
+            error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+            break
+        heavy = json.loads(proc.stdout[marker + len("__BENCH__"):])
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+
+    return best_ms, heavy, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup / import time per command")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per command (best is reported)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if a command's startup exceeds this")
+    parser.add_argument("--command", action="append", help="Only benchmark these commands (repeatable)")
+    args = parser.parse_args()
+
+    from automation.cli import COMMANDS
+
+    commands = args.command or [None] + [c for c in COMMANDS if c != "bench-imports"]
+
+    # Baseline: bare interpreter startup
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], capture_output=True)
+    baseline_ms = (time.perf_counter() - start) * 1000
+    print(f"Interpreter baseline: {baseline_ms:.0f} ms\n")
+
+    print(f"{'Command':<18} | {'Startup (ms)':>12} | Heavy modules loaded")
+    print("-" * 70)
+
+    failed = False
+    for command in commands:
+        label = command or "(top-level)"
+        best_ms, heavy, error = probe(command, runs=args.runs)
+        if error:
+            print(f"{label:<18} | {'ERROR':>12} | {error}")
+            failed = True
+            continue
+
+        print(f"{label:<18} | {best_ms:>12.0f} | {', '.join(heavy) if heavy else '-'}")
+        if heavy:
+            failed = True
+        if args.budget_ms is not None and best_ms > args.budget_ms:
+            failed = True
+
+    if args.budget_ms is not None or failed:
+        print("\nResult:", "FAIL" if failed else "OK")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
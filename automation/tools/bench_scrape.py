@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Per-Source Scraping Benchmark
+
+Selector drift (a site redesign) does not raise: extract_content quietly
+falls through to the RSS summary or to the slow all-<p> path. This tool
+catches that offline.
+
+--record snapshots a few article pages per CONTENT_SELECTORS entry (taken
+from the source's feed) into automation/data/scrape_fixtures/<source>/.
+The benchmark then replays the fixtures through parse_html() and reports
+per source and parser backend:
+- parse time (best of --runs) and peak Python memory (tracemalloc; memory
+  allocated inside C parsers such as selectolax is not visible to it)
+- extracted characters
+- selector hit rate, plus which alternative of the content selector matched
+- pages that fell through to the all-<p> fallback (or extracted nothing)
+
+Backends: lxml, html.parser (BeautifulSoup) and selectolax if installed.
+Use --fail-on-fallback to exit 1 when any page misses its content selector:
+
+    python -m automation bench-scrape --record --per-source 3
+    python -m automation bench-scrape --backend lxml --fail-on-fallback
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Allow running the file directly as well as `python -m automation bench-scrape`
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from automation.collectors.url_reader import CONTENT_SELECTORS, NOISE_TAGS, REQUEST_HEADERS, parse_html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "scrape_fixtures")
+MANIFEST = "manifest.json"
+BS4_BACKENDS = ["lxml", "html.parser"]
+
+try:
+    from selectolax.parser import HTMLParser as _SelectolaxParser
+except ImportError:
+    _SelectolaxParser = None
+
+
+def available_backends():
+    return BS4_BACKENDS + (["selectolax"] if _SelectolaxParser is not None else [])
+
+
+def parse_selectolax(html, selectors, paragraph_fallback=True):
+    """parse_html() equivalent on selectolax (same result keys)."""
+    tree = _SelectolaxParser(html)
+
+    title_elem = tree.css_first(selectors["title"])
+    title = title_elem.text(strip=True) if title_elem else "No Title"
+
+    content = None
+    content_elem = tree.css_first(selectors["content"])
+    if content_elem:
+        for tag in content_elem.css(", ".join(NOISE_TAGS)):
+            tag.decompose()
+        content = content_elem.text(separator="\n", strip=True)
+
+    path = "selector"
+    if not content:
+        path = "empty"
+        if paragraph_fallback:
+            content = "\n".join(p.text(strip=True) for p in tree.css("p"))
+            path = "paragraphs" if content else "empty"
+
+    author_elem = tree.css_first(selectors["author"])
+    author = author_elem.text(strip=True) if author_elem else "Unknown"
+
+    return {"title": title, "content": content or "", "author": author, "path": path}
+
+
+def run_parser(backend, html, selectors):
+    if backend == "selectolax":
+        return parse_selectolax(html, selectors)
+    return parse_html(html, selectors, parser=backend)
+
+
+# --- Fixtures ------------------------------------------------------------------
+
+
+def load_fixtures(fixture_dir, sources=None):
+    """{source: [(name, html_bytes, url)]} for every recorded page."""
+    fixtures = {}
+    if not os.path.isdir(fixture_dir):
+        return fixtures
+    for source in sorted(os.listdir(fixture_dir)):
+        if sources and source not in sources:
+            continue
+        manifest_path = os.path.join(fixture_dir, source, MANIFEST)
+        if not os.path.exists(manifest_path):
+            continue
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        pages = []
+        for entry in manifest:
+            with open(os.path.join(fixture_dir, source, entry["file"]), "rb") as f:
+                pages.append((entry["file"], f.read(), entry.get("url")))
+        if pages:
+            fixtures[source] = pages
+    return fixtures
+
+
+def record(fixture_dir, sources, per_source, days):
+    """Fetch the newest article pages of each source's feed and store them as fixtures."""
+    import requests
+
+    from automation.collectors.collector import DEFAULT_SOURCES, fetch_rss
+
+    for source in sources:
+        feed_url = DEFAULT_SOURCES.get(source)
+        if not feed_url:
+            print(f"{source}: no feed in DEFAULT_SOURCES, skipped")
+            continue
+        articles = fetch_rss(feed_url, source, days=days)
+        source_dir = os.path.join(fixture_dir, source)
+        os.makedirs(source_dir, exist_ok=True)
+
+        manifest = []
+        for article in articles:
+            if len(manifest) >= per_source:
+                break
+            try:
+                response = requests.get(article.url, headers=REQUEST_HEADERS, timeout=10)
+            except requests.RequestException as e:
+                print(f"{source}: {article.url} failed ({type(e).__name__})")
+                continue
+            if response.status_code != 200:
+                print(f"{source}: {article.url} returned {response.status_code}")
+                continue
+            name = f"{article.url_hash[:12]}.html"
+            with open(os.path.join(source_dir, name), "wb") as f:
+                f.write(response.content)
+            manifest.append({"file": name, "url": article.url, "recorded_at": datetime.now().isoformat()})
+
+        with open(os.path.join(source_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"{source}: recorded {len(manifest)} page(s)")
+
+
+# --- Benchmark -----------------------------------------------------------------
+
+
+def selector_alternatives(html, selectors):
+    """Which comma-separated alternatives of the content selector match with text (lxml)."""
+    import bs4
+
+    soup = bs4.BeautifulSoup(html, "lxml")
+    return [
+        alt for alt in (a.strip() for a in selectors["content"].split(","))
+        if (elem := soup.select_one(alt)) is not None and elem.get_text(strip=True)
+    ]
+
+
+def measure(backend, html, selectors, runs):
+    """(best seconds, peak bytes, result) for one page."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = run_parser(backend, html, selectors)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        run_parser(backend, html, selectors)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def bench_source(source, pages, backends, runs):
+    selectors = CONTENT_SELECTORS[source]
+    report = {"pages": len(pages), "backends": {}, "alternatives": {}, "fallback_pages": []}
+
+    for name, html, _ in pages:
+        for alt in selector_alternatives(html, selectors):
+            report["alternatives"][alt] = report["alternatives"].get(alt, 0) + 1
+
+    for backend in backends:
+        times, peaks, chars, hits = [], [], [], 0
+        for name, html, url in pages:
+            elapsed, peak, result = measure(backend, html, selectors, runs)
+            times.append(elapsed)
+            peaks.append(peak)
+            chars.append(len(result["content"]))
+            if result["path"] == "selector":
+                hits += 1
+            elif backend == backends[0]:
+                report["fallback_pages"].append({"file": name, "url": url, "path": result["path"]})
+        report["backends"][backend] = {
+            "avg_ms": sum(times) / len(times) * 1000,
+            "max_ms": max(times) * 1000,
+            "peak_kb": max(peaks) / 1024,
+            "avg_chars": sum(chars) / len(chars),
+            "hit_rate": hits / len(pages),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract_content parsing per source on recorded pages")
+    parser.add_argument("--record", action="store_true", help="Fetch and store fixture pages first (network)")
+    parser.add_argument("--per-source", type=int, default=3, help="Pages to record per source")
+    parser.add_argument("--days", type=int, default=14, help="Feed lookback when recording")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="Fixture directory")
+    parser.add_argument("--source", action="append", help="Only these sources (repeatable)")
+    parser.add_argument("--backend", action="append", help=f"Parser backends (default: {', '.join(available_backends())})")
+    parser.add_argument("--runs", type=int, default=5, help="Parse runs per page (best is reported)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--fail-on-fallback", action="store_true", help="Exit 1 if any page misses its content selector")
+    args = parser.parse_args()
+
+    sources = [s for s in (args.source or CONTENT_SELECTORS) if s in CONTENT_SELECTORS]
+    backends = args.backend or available_backends()
+    unknown = [b for b in backends if b not in available_backends()]
+    if unknown:
+        parser.error(f"unavailable backend(s): {', '.join(unknown)} (available: {', '.join(available_backends())})")
+
+    if args.record:
+        record(args.fixtures, sources, args.per_source, args.days)
+
+    fixtures = load_fixtures(args.fixtures, sources)
+    if not fixtures:
+        print(f"No fixtures in {args.fixtures}. Run with --record first.")
+        sys.exit(1)
+
+    results = {source: bench_source(source, pages, backends, args.runs) for source, pages in fixtures.items()}
+    flagged = [source for source, r in results.items() if r["fallback_pages"]]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'Source':<22} {'Backend':<12} {'Pages':>5} {'avg ms':>8} {'max ms':>8} "
+              f"{'peak KB':>8} {'chars':>8} {'hit %':>6}")
+        print("-" * 84)
+        for source, r in results.items():
+            for backend, b in r["backends"].items():
+                print(f"{source:<22} {backend:<12} {r['pages']:>5} {b['avg_ms']:>8.1f} {b['max_ms']:>8.1f} "
+                      f"{b['peak_kb']:>8.0f} {b['avg_chars']:>8.0f} {b['hit_rate'] * 100:>5.0f}%")
+
+        print("\nContent selector alternatives matched (pages):")
+        for source, r in results.items():
+            used = ", ".join(f"{alt} x{n}" for alt, n in r["alternatives"].items()) or "none"
+            print(f"  {source:<22} {used}")
+            unused = [a.strip() for a in CONTENT_SELECTORS[source]["content"].split(",")
+                      if a.strip() not in r["alternatives"]]
+            if unused:
+                print(f"  {'':<22} never matched: {', '.join(unused)}")
+
+        if flagged:
+            print("\nSelectors falling through to the RSS summary / all-<p> path:")
+            for source in flagged:
+                for page in results[source]["fallback_pages"]:
+                    print(f"  {source:<22} {page['path']:<10} {page['file']} {page['url'] or ''}")
+
+        missing = [s for s in sources if s not in fixtures]
+        if missing:
+            print(f"\nNo fixtures for: {', '.join(missing)}")
+
+    if args.fail_on_fallback and flagged:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
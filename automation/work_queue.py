@@ -0,0 +1,562 @@
+"""
+Durable Work Queue for TechShift
+
+Lets pipeline stages (scrape -> score -> generate/publish, daily briefing) be
+consumed by N independent workers (worker.py) instead of one process.
+
+- Task: kind + JSON payload, optional idempotency key (url_hash for articles).
+  Enqueueing a (kind, key) pair that already exists is a no-op, so a story
+  picked up by two scrapers is scored and generated once
+- Lease: lease() hands a task to one worker until its visibility timeout;
+  the worker extends it with heartbeat() while it runs. An expired lease makes
+  the task visible again (the worker died), after max_attempts it goes to 'dead'
+- Fencing: every lease carries a token; complete() / retry() / heartbeat()
+  from a worker whose lease has expired (and was re-leased) are rejected
+- Publish claims: claim(key, task) / settle(key, task, result) mark a side
+  effect (posting to WordPress) as taken by one task and then as done, so a
+  retried or re-leased task never publishes twice (PublishGuard). A claim
+  left unsettled by an earlier lease of the same task (the worker died
+  between posting and settle) comes back as CLAIM_IN_DOUBT: the publisher
+  looks for the post by the guard's content marker before posting again
+- Counters: reserve(name, limit) / release(name) for limits shared by every
+  worker (articles per day)
+
+Backends:
+- SQLiteQueue: single node, any number of worker processes on the same file
+  (WAL, BEGIN IMMEDIATE for leases). Default: automation/data/work_queue.sqlite
+- RemoteQueue: the same interface over HTTP (JSON) to a QueueServer, which
+  serves a SQLiteQueue to workers on other machines. Running the server on
+  localhost is the local stand-in for a networked queue. The server binds to
+  127.0.0.1 unless --host is given, and refuses a non-loopback address
+  without WORK_QUEUE_TOKEN (anyone who can reach it could publish)
+
+Configuration (.env):
+    WORK_QUEUE_URL=sqlite:///path/to/work_queue.sqlite   # or http://host:8766
+    WORK_QUEUE_TOKEN=secret        # shared secret between server and workers
+    WORK_QUEUE_VISIBILITY=600      # default lease length (seconds)
+    WORK_QUEUE_MAX_ATTEMPTS=5
+
+Usage:
+    python -m automation work-queue stats
+    python -m automation work-queue serve --port 8766                  # localhost only
+    python -m automation work-queue serve --host 0.0.0.0 --port 8766   # needs WORK_QUEUE_TOKEN
+    python -m automation work-queue requeue --kind generate
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "work_queue.sqlite")
+DEFAULT_VISIBILITY = 600
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 3600
+
+STATUSES = ("pending", "leased", "done", "dead")
+
+# claim() results (falsy = refused)
+CLAIM_ACQUIRED = "acquired"
+CLAIM_IN_DOUBT = "in_doubt"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT,
+    payload TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    visible_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_until REAL,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (kind, status, priority, visible_at);
+CREATE TABLE IF NOT EXISTS claims (
+    key TEXT PRIMARY KEY,
+    task_id INTEGER NOT NULL,
+    token TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class Task:
+    """A leased task. `token` identifies this lease (fencing)."""
+
+    __slots__ = ("id", "kind", "key", "payload", "priority", "attempts", "max_attempts", "token")
+
+    def __init__(self, id, kind, key, payload, priority=0, attempts=0, max_attempts=DEFAULT_MAX_ATTEMPTS, token=None):
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.priority = priority
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.token = token
+
+    def __repr__(self):
+        return f"Task({self.id}, {self.kind}, key={self.key}, attempt {self.attempts}/{self.max_attempts})"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+
+def retry_backoff(attempts):
+    """Delay before a failed task becomes visible again (exponential, capped)."""
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+
+
+class SQLiteQueue:
+    """
+    Work queue in a SQLite file. Safe for several threads and processes on one
+    node: every state change is a single transaction, leases use BEGIN IMMEDIATE.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, visibility=None, max_attempts=None, clock=time.time):
+        self.path = path
+        self.visibility = visibility or int(os.getenv("WORK_QUEUE_VISIBILITY", str(DEFAULT_VISIBILITY)))
+        self.max_attempts = max_attempts or int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS)))
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Queues created before claims recorded the lease token
+        if "token" not in {row[1] for row in self._conn.execute("PRAGMA table_info(claims)")}:
+            self._conn.execute("ALTER TABLE claims ADD COLUMN token TEXT")
+
+    def _transaction(self, func):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    # --- Producers ---------------------------------------------------------
+
+    def enqueue(self, kind, payload, key=None, priority=0, delay=0, max_attempts=None):
+        """Add a task. Returns its id, or None if (kind, key) was already enqueued."""
+        ids = self.enqueue_many(kind, [(payload, key, priority)], delay=delay, max_attempts=max_attempts)
+        return ids[0]
+
+    def enqueue_many(self, kind, items, delay=0, max_attempts=None):
+        """items: iterable of (payload, key, priority). Returns ids (None for duplicates)."""
+        now = self.clock()
+        rows = [(kind, key, json.dumps(payload, ensure_ascii=False), priority,
+                 max_attempts or self.max_attempts, now + delay, now, now) for payload, key, priority in items]
+
+        def run(conn):
+            ids = []
+            for row in rows:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO tasks (kind, key, payload, priority, max_attempts, visible_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+                ids.append(cur.lastrowid if cur.rowcount else None)
+            return ids
+        return self._transaction(run)
+
+    # --- Workers -----------------------------------------------------------
+
+    def lease(self, kind, owner, limit=1, visibility=None):
+        """
+        Lease up to `limit` visible tasks of `kind`, highest priority first.
+        Tasks whose lease expired are visible again; those out of attempts go to 'dead'.
+        """
+        now = self.clock()
+        token = f"{owner}:{uuid.uuid4().hex}"
+        lease_until = now + (visibility or self.visibility)
+
+        def run(conn):
+            conn.execute(
+                "UPDATE tasks SET status = 'dead', error = COALESCE(error, 'lease expired'), lease_token = NULL, updated_at = ? "
+                "WHERE kind = ? AND status = 'leased' AND lease_until <= ? AND attempts >= max_attempts",
+                (now, kind, now))
+            rows = conn.execute(
+                "SELECT id, kind, key, payload, priority, attempts, max_attempts FROM tasks "
+                "WHERE kind = ? AND ((status = 'pending' AND visible_at <= ?) OR (status = 'leased' AND lease_until <= ?)) "
+                "ORDER BY priority DESC, visible_at, id LIMIT ?",
+                (kind, now, now, limit)).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_token = ?, "
+                "lease_until = ?, updated_at = ? WHERE id = ?",
+                [(owner, token, lease_until, now, row[0]) for row in rows])
+            return [Task(id, kind, key, json.loads(payload), priority, attempts + 1, max_attempts, token)
+                    for id, kind, key, payload, priority, attempts, max_attempts in rows]
+        return self._transaction(run)
+
+    def _update_leased(self, task, sql, params):
+        """Apply an update only while `task` still holds its lease. Returns True if applied."""
+        def run(conn):
+            cur = conn.execute(sql + " WHERE id = ? AND lease_token = ? AND status = 'leased'",
+                               (*params, task.id, task.token))
+            return cur.rowcount == 1
+        return self._transaction(run)
+
+    def heartbeat(self, task, visibility=None):
+        """Extend the lease. False if it was lost (expired and re-leased, or finished)."""
+        now = self.clock()
+        return self._update_leased(task, "UPDATE tasks SET lease_until = ?, updated_at = ?",
+                                   (now + (visibility or self.visibility), now))
+
+    def complete(self, task, result=None):
+        return self._update_leased(
+            task, "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_token = NULL, updated_at = ?",
+            (json.dumps(result, ensure_ascii=False), self.clock()))
+
+    def retry(self, task, error, delay=None):
+        """Failed attempt: back to pending after a backoff, or 'dead' when out of attempts."""
+        now = self.clock()
+        if task.attempts >= task.max_attempts:
+            return self._update_leased(
+                task, "UPDATE tasks SET status = 'dead', error = ?, lease_token = NULL, updated_at = ?",
+                (str(error)[:2000], now))
+        delay = retry_backoff(task.attempts) if delay is None else delay
+        return self._update_leased(
+            task, "UPDATE tasks SET status = 'pending', error = ?, visible_at = ?, lease_token = NULL, updated_at = ?",
+            (str(error)[:2000], now + delay, now))
+
+    def defer(self, task, delay, reason=None):
+        """Put the task back without using up an attempt (no budget, daily limit reached)."""
+        now = self.clock()
+        return self._update_leased(
+            task, "UPDATE tasks SET status = 'pending', attempts = attempts - 1, error = ?, visible_at = ?, "
+                  "lease_token = NULL, updated_at = ?",
+            (reason, now + delay, now))
+
+    # --- Claims / counters -------------------------------------------------
+
+    def claim(self, key, task):
+        """
+        Take the side effect `key` for `task`. The task must still hold its lease.
+
+        Returns:
+            CLAIM_ACQUIRED: it was free, or this lease already holds it (a retry)
+            CLAIM_IN_DOUBT: an earlier lease of this task took it and never settled;
+                the side effect may have happened (the claim moves to this lease)
+            False: another task holds it, or it is settled
+        """
+        now = self.clock()
+
+        def run(conn):
+            held = conn.execute("SELECT 1 FROM tasks WHERE id = ? AND lease_token = ? AND status = 'leased' "
+                                "AND lease_until > ?", (task.id, task.token, now)).fetchone()
+            if not held:
+                return False
+            row = conn.execute("SELECT task_id, token, done FROM claims WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO claims (key, task_id, token, updated_at) VALUES (?, ?, ?, ?)",
+                             (key, task.id, task.token, now))
+                return CLAIM_ACQUIRED
+            task_id, token, done = row
+            if task_id != task.id or done:
+                return False
+            if token == task.token:
+                return CLAIM_ACQUIRED
+            conn.execute("UPDATE claims SET token = ?, updated_at = ? WHERE key = ?", (task.token, now, key))
+            return CLAIM_IN_DOUBT
+        return self._transaction(run)
+
+    def settle(self, key, task, result=None):
+        """Mark the claimed side effect as done (it will never be claimed again)."""
+        def run(conn):
+            cur = conn.execute("UPDATE claims SET done = 1, result = ?, updated_at = ? WHERE key = ? AND task_id = ?",
+                               (json.dumps(result, ensure_ascii=False), self.clock(), key, task.id))
+            return cur.rowcount == 1
+        return self._transaction(run)
+
+    def reserve(self, name, limit):
+        """Increment counter `name` if it is below `limit` (0 = no limit). True if reserved."""
+        def run(conn):
+            row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+            value = row[0] if row else 0
+            if limit and value >= limit:
+                return False
+            conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", (name, value + 1))
+            return True
+        return self._transaction(run)
+
+    def release(self, name):
+        def run(conn):
+            conn.execute("UPDATE counters SET value = MAX(0, value - 1) WHERE name = ?", (name,))
+            return True
+        return self._transaction(run)
+
+    # --- Inspection / maintenance ------------------------------------------
+
+    def counts(self):
+        """{kind: {status: n}}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status").fetchall()
+        counts = {}
+        for kind, status, n in rows:
+            counts.setdefault(kind, dict.fromkeys(STATUSES, 0))[status] = n
+        return counts
+
+    def dead(self, kind=None, limit=20):
+        """Most recent dead tasks as dicts (id, kind, key, attempts, error)."""
+        sql = "SELECT id, kind, key, attempts, error FROM tasks WHERE status = 'dead'"
+        params = ()
+        if kind:
+            sql, params = sql + " AND kind = ?", (kind,)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY updated_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [dict(zip(("id", "kind", "key", "attempts", "error"), row)) for row in rows]
+
+    def requeue(self, kind=None):
+        """Give dead tasks a fresh set of attempts. Returns how many were requeued."""
+        now = self.clock()
+        sql = "UPDATE tasks SET status = 'pending', attempts = 0, visible_at = ?, updated_at = ? WHERE status = 'dead'"
+        params = (now, now)
+        if kind:
+            sql, params = sql + " AND kind = ?", (*params, kind)
+        return self._transaction(lambda conn: conn.execute(sql, params).rowcount)
+
+    def purge(self, older_than_days=14):
+        """Delete finished tasks (done / dead) older than the given age; claims are kept."""
+        cutoff = self.clock() - older_than_days * 86400
+        return self._transaction(lambda conn: conn.execute(
+            "DELETE FROM tasks WHERE status IN ('done', 'dead') AND updated_at < ?", (cutoff,)).rowcount)
+
+    def render_metrics(self, prefix="techshift_work_queue"):
+        """Prometheus text lines (used by worker.py /metrics)."""
+        lines = []
+        for kind, statuses in self.counts().items():
+            for status, n in statuses.items():
+                lines.append(f'{prefix}_tasks{{kind="{kind}",status="{status}"}} {n}')
+        return lines
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Network backend -------------------------------------------------------
+
+# Methods a QueueServer exposes; Task arguments / results travel as dicts
+REMOTE_METHODS = ("enqueue", "enqueue_many", "lease", "heartbeat", "complete", "retry", "defer",
+                  "claim", "settle", "reserve", "release", "counts", "dead", "requeue", "purge")
+
+
+class RemoteQueue:
+    """SQLiteQueue interface over HTTP to a QueueServer (workers on other nodes)."""
+
+    def __init__(self, url, token=None, timeout=30):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+        token = token if token is not None else os.getenv("WORK_QUEUE_TOKEN")
+        if token:
+            self._session.headers["Authorization"] = f"Bearer {token}"
+
+    def _call(self, method, *args, **kwargs):
+        args = [a.to_dict() if isinstance(a, Task) else a for a in args]
+        response = self._session.post(f"{self.url}/rpc/{method}", json={"args": args, "kwargs": kwargs},
+                                      timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def __getattr__(self, method):
+        if method not in REMOTE_METHODS:
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            result = self._call(method, *args, **kwargs)
+            if method == "lease":
+                return [Task.from_dict(t) for t in result]
+            return result
+        return call
+
+    def render_metrics(self, prefix="techshift_work_queue"):
+        return SQLiteQueue.render_metrics(self, prefix)
+
+    def close(self):
+        self._session.close()
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def make_queue_server(queue, port, host="127.0.0.1", token=None):
+    """
+    HTTP server exposing `queue` to RemoteQueue clients (serve_forever in a thread).
+
+    Raises:
+        ValueError: `host` is not a loopback address and no token is set
+    """
+    token = token if token is not None else os.getenv("WORK_QUEUE_TOKEN")
+    if not token and not is_loopback(host):
+        raise ValueError(f"refusing to serve the work queue on {host} without WORK_QUEUE_TOKEN")
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._reply(200, {"status": "ok", "counts": queue.counts()})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                return self._reply(401, {"error": "unauthorized"})
+            method = self.path.rsplit("/", 1)[-1]
+            if not self.path.startswith("/rpc/") or method not in REMOTE_METHODS:
+                return self._reply(404, {"error": f"unknown method: {method}"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                args = [Task.from_dict(a) if isinstance(a, dict) and set(a) == set(Task.__slots__) else a
+                        for a in request.get("args", [])]
+                result = getattr(queue, method)(*args, **request.get("kwargs", {}))
+            except Exception as e:
+                return self._reply(500, {"error": str(e)})
+            if method == "lease":
+                result = [t.to_dict() for t in result]
+            self._reply(200, {"result": result})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def open_queue(url=None):
+    """Queue from WORK_QUEUE_URL: sqlite:///path (default: data/work_queue.sqlite) or http(s)://host:port."""
+    url = url or os.getenv("WORK_QUEUE_URL") or ""
+    if url.startswith(("http://", "https://")):
+        return RemoteQueue(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteQueue(url[len("sqlite:///"):])
+    return SQLiteQueue(url or DEFAULT_PATH)
+
+
+class PublishGuard:
+    """
+    Passed to run_generation_task / the daily briefing as args.publish_guard:
+    acquire() before posting (False = another task owns or already did it),
+    settle(result) once the post exists.
+
+    The publisher embeds mark(content) in the post. When acquire() leaves
+    `in_doubt` set, it calls existing_post(wp) first and settles with the post
+    an earlier lease created instead of posting again.
+    """
+
+    in_doubt = False
+
+    def __init__(self, queue, task, key):
+        self.queue = queue
+        self.task = task
+        self.key = key
+
+    @property
+    def marker(self):
+        return f"techshift-claim:{self.key}"
+
+    def acquire(self):
+        state = self.queue.claim(self.key, self.task)
+        self.in_doubt = state == CLAIM_IN_DOUBT
+        return bool(state)
+
+    def mark(self, content):
+        """Post content with the claim marker (an HTML comment) appended."""
+        return f"{content}\n<!-- {self.marker} -->"
+
+    def existing_post(self, wp):
+        """Post carrying this claim's marker, or None. Raises if WordPress can't be searched."""
+        return wp.find_post_with_marker(self.marker)
+
+    def settle(self, result=None):
+        return self.queue.settle(self.key, self.task, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or serve the TechShift work queue")
+    parser.add_argument("action", choices=["stats", "serve", "requeue", "purge"], nargs="?", default="stats")
+    parser.add_argument("--queue", default=None, help="Queue URL (default: WORK_QUEUE_URL or the local SQLite file)")
+    parser.add_argument("--kind", default=None, help="Limit requeue / dead-task listing to one task kind")
+    parser.add_argument("--host", default="127.0.0.1", help="Address for 'serve' (non-loopback needs WORK_QUEUE_TOKEN)")
+    parser.add_argument("--port", type=int, default=8766, help="Port for 'serve'")
+    parser.add_argument("--days", type=int, default=14, help="Age of finished tasks removed by 'purge'")
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue)
+    if args.action == "serve":
+        if isinstance(queue, RemoteQueue):
+            parser.error("serve needs a local SQLite queue")
+        try:
+            server = make_queue_server(queue, args.port, host=args.host)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Work queue {queue.path} served on http://{args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            queue.close()
+        return
+    if args.action == "requeue":
+        print(f"Requeued {queue.requeue(args.kind)} dead task(s).")
+    elif args.action == "purge":
+        print(f"Removed {queue.purge(args.days)} finished task(s).")
+
+    counts = queue.counts()
+    if not counts:
+        print("Work queue is empty.")
+    for kind, statuses in sorted(counts.items()):
+        print(f"{kind:<10} " + " ".join(f"{status}={statuses[status]}" for status in STATUSES))
+    for task in queue.dead(args.kind, limit=10):
+        print(f"  dead #{task['id']} {task['kind']} {task['key'] or ''} after {task['attempts']} attempt(s): "
+              f"{(task['error'] or '')[:100]}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
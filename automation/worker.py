@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+TechShift Queue Worker
+
+Consumes pipeline tasks from the work queue (work_queue.py). Any number of
+workers, on one node (shared SQLite file) or several (WORK_QUEUE_URL pointing
+at a `work-queue serve` instance), can run side by side; each task is leased
+to one worker at a time and articles are keyed by url_hash.
+
+Task kinds (enqueued by `pipeline --enqueue` / `briefing --enqueue`):
+- scrape   {source, url, hours}: fetch one feed; unseen stories -> score
+- score    article: scored in batches (--score-batch); above threshold ->
+           generate, with the score as priority (best articles first)
+- generate article: dedup check against the published posts, then generation.
+           Posting is claimed under publish:<url_hash>, so a retried or
+           re-leased task never posts the same article twice
+- briefing {phase, region, hours, dry_run}: the daily briefing, claimed per
+           day and region
+
+Tasks that hit the LLM budget are deferred without using up an attempt; the
+articles-per-day limit is a counter shared by all workers (generate tasks
+over it wait for the next day). Stories enter the known-URL index when they
+score below the threshold or once generated / rejected as duplicates.
+
+Usage:
+    python -m automation worker --kinds scrape,score,generate --threshold 85 --daily-limit 6
+    python -m automation worker --kinds briefing
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automation.work_queue import open_queue, PublishGuard
+from automation.llm_budget import get_llm_budget, llm_stage
+
+KINDS = ("scrape", "score", "generate", "briefing")
+
+# How long a task without LLM budget waits before it becomes visible again
+BUDGET_RETRY_SECONDS = 10 * 60
+IDLE_POLL_SECONDS = 5
+# Scrape tasks whose new stories are remembered (a retried task keeps its own items)
+SCRAPE_TASKS_REMEMBERED = 1000
+
+
+class Deferred(Exception):
+    """Raised by a handler to put its tasks back without using up an attempt."""
+
+    def __init__(self, delay, reason):
+        super().__init__(reason)
+        self.delay = delay
+
+
+class _Guard(PublishGuard):
+    """PublishGuard that remembers a refused claim (not a failure, nothing to retry)."""
+
+    refused = False
+
+    def acquire(self):
+        if not super().acquire():
+            self.refused = True
+            return False
+        return True
+
+
+class Worker:
+    """Leases tasks of the configured kinds and runs their handlers."""
+
+    def __init__(self, queue, kinds=KINDS, threshold=85, daily_limit=6, score_batch_size=10,
+                 dry_run=False, worker_id=None):
+        self.queue = queue
+        self.kinds = list(kinds)
+        self.threshold = threshold
+        self.daily_limit = daily_limit
+        self.score_batch_size = score_batch_size
+        self.dry_run = dry_run
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = threading.Event()
+        self.budget = get_llm_budget()
+        self.counts = {kind: {"done": 0, "retried": 0, "deferred": 0, "lost": 0} for kind in KINDS}
+        self._lock = threading.Lock()
+
+        self.gemini = None
+        self.wp = None
+        self.classifier = None
+        self.image_queue = None
+        self.known_index = None
+        self.prefilter = None
+        self.scheduler = None
+        self.story_index = None
+        self._scrape_stories = OrderedDict()  # scrape task id -> URLs it indexed as new stories
+
+    # --- Setup -------------------------------------------------------------
+
+    def warm_up(self):
+        """Build the clients the configured kinds need (once per process)."""
+        from automation.client_registry import get_gemini_client
+        from automation.db.client import DBClient
+        from automation.db.known_urls import KnownUrlIndex
+
+        if {"scrape", "score", "generate"} & set(self.kinds):
+            self.known_index = KnownUrlIndex.open()
+            if self.known_index.sync(DBClient()) is None:
+                print("Warning: Known-URL index sync failed. Using local index only.")
+
+        if {"scrape", "score"} & set(self.kinds):
+            from automation.analysis.clustering import StoryIndex
+            from automation.analysis.prefilter import Prefilter
+            from automation.collectors.scheduler import PollScheduler
+
+            self.prefilter = Prefilter.load()
+            self.scheduler = PollScheduler.load()
+            self.story_index = StoryIndex()
+
+        if {"score", "generate"} & set(self.kinds):
+            self.gemini = get_gemini_client()
+
+        if "generate" in self.kinds:
+            from automation.analysis.classifier import ArticleClassifier
+            from automation.image_queue import ImageJobQueue
+            from automation.wp_client import WordPressClient
+
+            self.classifier = ArticleClassifier(client=self.gemini)
+            try:
+                self.wp = WordPressClient()
+            except Exception as e:
+                print(f"Warning: Failed to initialize WP Client: {e}")
+            self.image_queue = ImageJobQueue(self.gemini, self.wp)
+
+    # --- Handlers ----------------------------------------------------------
+
+    def handle_scrape(self, tasks):
+        from automation.collectors.collector import fetch_rss
+        from automation.db.known_urls import url_hash
+
+        task = tasks[0]
+        source, url = task.payload["source"], task.payload["url"]
+        hours = self.scheduler.lookback_hours(source, task.payload.get("hours") or 6)
+        # The story index is per process and match() indexes new stories: on a retry
+        # this task's own stories from the failed attempt must not count as duplicates
+        own = self._scrape_stories.pop(task.id, set())
+        self._scrape_stories[task.id] = own
+        while len(self._scrape_stories) > SCRAPE_TASKS_REMEMBERED:
+            self._scrape_stories.popitem(last=False)
+        items = []
+        for article in fetch_rss(url, source, hours=hours, scheduler=self.scheduler):
+            key = url_hash(article['url'])
+            if key in self.known_index:
+                continue
+            leader = self.story_index.match(article)
+            if leader is None:
+                own.add(article['url'])
+            elif not (leader == article['url'] and leader in own):
+                continue
+            if self.prefilter:
+                _, rejected = self.prefilter.split([article])
+                if rejected:
+                    continue  # not marked known: a retrained pre-filter may let it through later
+            items.append((article.to_dict(), key, 0))
+        self.scheduler.save()
+        ids = self.queue.enqueue_many("score", items)
+        queued = sum(1 for i in ids if i is not None)
+        print(f"[scrape] {source}: {queued} new item(s) queued for scoring")
+        return {"queued": queued}
+
+    def handle_score(self, tasks):
+        from automation.analysis.scorer import score_article, score_articles_batch, scoring_failed
+        from automation.analysis.prefilter import record_scores
+        from automation.analysis.clustering import cluster_members
+        from automation.db.known_urls import url_hash
+        from automation.models import Article
+
+        if self.budget.allowance("scoring", self.gemini.cascade.cheap_model) == 0:
+            raise Deferred(BUDGET_RETRY_SECONDS, "no LLM budget for scoring")
+
+        batch = [Article.from_dict(task.payload) for task in tasks]
+        results = score_articles_batch(batch, client=self.gemini, threshold=self.threshold)
+        if not results:
+            results = [score_article(article, client=self.gemini) for article in batch]
+        record_scores(results)
+        # Failed scores stay unknown so a later scrape queues them again; candidates
+        # are marked known by handle_generate once generated or rejected as duplicates
+        self.known_index.add_many(url_hash(u) for a in results
+                                  if not scoring_failed(a) and a.get('score', 0) < self.threshold
+                                  for u in cluster_members(a))
+        self.known_index.save()
+
+        high = []
+        for res in results:
+            score = res.get('score', 0)
+            print(f"  - Scored: {res.get('title', 'Unknown')[:40]}... -> {score} pts")
+            if score >= self.threshold:
+                payload = res.to_dict() if hasattr(res, "to_dict") else dict(res)
+                high.append((payload, url_hash(res['url']), score))
+        self.queue.enqueue_many("generate", high)
+        scores = {url_hash(res['url']): res.get('score', 0) for res in results}
+        return {task.id: {"score": scores.get(task.key)} for task in tasks}
+
+    def handle_generate(self, tasks):
+        from automation.pipeline import generate_from_article
+        from automation.generate_article import ARTICLE_MODEL, LLM_REQUESTS_PER_ARTICLE
+        from automation.models import Article
+
+        task = tasks[0]
+        article = Article.from_dict(task.payload)
+        allowance = self.budget.allowance("generation", ARTICLE_MODEL)
+        if allowance is not None and allowance < LLM_REQUESTS_PER_ARTICLE:
+            raise Deferred(BUDGET_RETRY_SECONDS, "no LLM budget for generation")
+
+        # Shared by every worker, like the daemon's daily limit
+        now = datetime.now()
+        slot = f"generated:{now:%Y-%m-%d}"
+        if not self.queue.reserve(slot, self.daily_limit):
+            # Held for tomorrow's quota: the task key blocks a later scrape from queueing it again
+            tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            raise Deferred(int((tomorrow - now).total_seconds()) + 1, f"daily limit ({self.daily_limit}) reached")
+
+        try:
+            # Posts published by other workers count for the duplicate check
+            existing_titles = []
+            if self.wp:
+                recent_posts = self.wp.get_posts(limit=30, status="publish") or []
+                existing_titles = [p['title']['rendered'] for p in recent_posts]
+            duplicate_of = self.gemini.check_duplication(article['title'], article.get('summary', ''), existing_titles)
+            if duplicate_of:
+                print(f"SKIP: Duplicate detected! '{article['title']}' is a duplicate of '{duplicate_of}'")
+                self.queue.release(slot)
+                self._mark_known(article)
+                return {"skipped": f"duplicate of {duplicate_of}"}
+
+            guard = _Guard(self.queue, task, f"publish:{task.key}")
+            print(f"Generating article for: {article['title']} (Score: {article.get('score')})")
+            success = generate_from_article(article, self.gemini, self.classifier, self.wp, image_queue=self.image_queue,
+                                            dry_run=self.dry_run, publish_guard=guard)
+        except BaseException:
+            self.queue.release(slot)
+            raise
+        if guard.refused:
+            self.queue.release(slot)
+            self._mark_known(article)
+            return {"skipped": "already published"}
+        if not success:
+            self.queue.release(slot)
+            raise RuntimeError("generation failed")
+        self._mark_known(article)
+        return {"generated": True}
+
+    def _mark_known(self, article):
+        """Add a generated / rejected story (every copy of it) to the known-URL index."""
+        from automation.analysis.clustering import cluster_members
+        from automation.db.known_urls import url_hash
+
+        if self.known_index is not None:
+            self.known_index.add_many(url_hash(u) for u in cluster_members(article))
+            self.known_index.save()
+
+    def handle_briefing(self, tasks):
+        from automation import daily_briefing
+
+        task = tasks[0]
+        region = task.payload.get("region", "all")
+        # One post per day and region, whichever phases the task runs
+        guard = _Guard(self.queue, task, f"briefing:{task.payload.get('date')}:{region}")
+        args = SimpleNamespace(phase=task.payload.get("phase", "all"), region=region,
+                               hours=task.payload.get("hours", 24), dry_run=task.payload.get("dry_run", False),
+                               publish_guard=guard)
+        if args.phase in ("collect", "all"):
+            daily_briefing.phase_1_collection(args)
+        if args.phase in ("analyze", "all"):
+            daily_briefing.phase_2_analysis(args)
+        return {"skipped": "already published"} if guard.refused else {"done": True}
+
+    # --- Loop --------------------------------------------------------------
+
+    def _heartbeat(self, tasks, done):
+        """Keep the leases alive while the handler runs."""
+        interval = max(1.0, self.queue_visibility() / 3)
+        while not done.wait(interval):
+            for task in tasks:
+                if not self.queue.heartbeat(task):
+                    print(f"[worker] lease lost: {task}")
+
+    def queue_visibility(self):
+        return getattr(self.queue, "visibility", None) or 600
+
+    def _count(self, kind, key, n=1):
+        with self._lock:
+            self.counts[kind][key] += n
+
+    def run_once(self, kind):
+        """Lease and process one batch of `kind`. Returns the number of tasks leased."""
+        limit = self.score_batch_size if kind == "score" else 1
+        tasks = self.queue.lease(kind, self.worker_id, limit=limit)
+        if not tasks:
+            return 0
+
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(tasks, done), name=f"heartbeat-{kind}", daemon=True).start()
+        stage = {"score": "scoring", "generate": "generation", "briefing": "briefing"}.get(kind)
+        try:
+            with llm_stage(stage):
+                result = getattr(self, f"handle_{kind}")(tasks)
+        except Deferred as e:
+            print(f"[{kind}] deferring {len(tasks)} task(s) for {e.delay}s: {e}")
+            for task in tasks:
+                self.queue.defer(task, e.delay, str(e))
+            self._count(kind, "deferred", len(tasks))
+            return len(tasks)
+        except Exception as e:
+            print(f"[{kind}] failed ({tasks[0]}): {e}")
+            for task in tasks:
+                if not self.queue.retry(task, e):
+                    self._count(kind, "lost")
+            self._count(kind, "retried", len(tasks))
+            return len(tasks)
+        finally:
+            done.set()
+
+        for task in tasks:
+            task_result = result.get(task.id, result) if isinstance(result, dict) else result
+            if self.queue.complete(task, task_result):
+                self._count(kind, "done")
+            else:
+                # The lease expired and another worker took the task over
+                self._count(kind, "lost")
+        return len(tasks)
+
+    def run(self, max_tasks=None):
+        """Process tasks until stopped (or max_tasks were handled); idle when nothing is visible."""
+        handled = 0
+        while not self.stop_event.is_set():
+            leased = 0
+            for kind in self.kinds:
+                if self.stop_event.is_set():
+                    break
+                leased += self.run_once(kind)
+            handled += leased
+            if max_tasks and handled >= max_tasks:
+                break
+            if not leased:
+                self.stop_event.wait(IDLE_POLL_SECONDS)
+        return handled
+
+    def summary(self):
+        lines = []
+        for kind in self.kinds:
+            c = self.counts[kind]
+            lines.append(f"{kind:<10} done={c['done']} retried={c['retried']} deferred={c['deferred']} lost={c['lost']}")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TechShift queue worker (scrape / score / generate / briefing tasks)")
+    parser.add_argument("--kinds", default="scrape,score,generate", help=f"Comma-separated task kinds ({', '.join(KINDS)})")
+    parser.add_argument("--queue", default=None, help="Queue URL (default: WORK_QUEUE_URL or the local SQLite file)")
+    parser.add_argument("--threshold", type=int, default=85, help="Score threshold for generation")
+    parser.add_argument("--daily-limit", type=int, default=6, help="Max articles generated per day by all workers (0 for unlimited)")
+    parser.add_argument("--score-batch", type=int, default=10, help="Score tasks leased per scoring call")
+    parser.add_argument("--max-tasks", type=int, default=0, help="Exit after this many tasks (0 to run until stopped)")
+    parser.add_argument("--dry-run", action="store_true", help="Dry run mode (no posting)")
+    args = parser.parse_args()
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown task kind(s): {', '.join(sorted(unknown))}")
+
+    worker = Worker(open_queue(args.queue), kinds=kinds, threshold=args.threshold, daily_limit=args.daily_limit,
+                    score_batch_size=args.score_batch, dry_run=args.dry_run)
+
+    def handle_signal(signum, frame):
+        print(f"\nReceived signal {signum}. Finishing the current task...")
+        worker.stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print(f"Worker {worker.worker_id} starting ({', '.join(kinds)})...")
+    worker.warm_up()
+    started = time.time()
+    try:
+        worker.run(max_tasks=args.max_tasks or None)
+    finally:
+        if worker.image_queue:
+            print("Waiting for hero image jobs to finish...")
+            worker.image_queue.shutdown(wait=True)
+        if worker.known_index:
+            worker.known_index.close()
+        worker.budget.save()
+        print(f"\nWorker stopped after {time.time() - started:.0f}s.")
+        print(worker.summary())
+        print(worker.budget.summary())
+        worker.queue.close()
+
+
+if __name__ == "__main__":
+    main()
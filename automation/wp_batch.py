@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+WordPress Batch Publisher for TechShift
+
+Groups REST writes into `batch/v1` requests (WordPress 5.6+) instead of one
+HTTP round trip per write.
+
+- BatchPublisher: queue writes with add(), send them with flush()
+  - items are sent in dependency waves: an item goes out once everything in
+    its depends_on has a result; prepare(body, results) fills in IDs from them
+  - each wave is split into chunks of MAX_BATCH_SIZE (the server's default limit)
+  - every item gets its own BatchResult (status + body), so errors map back
+    to the caller's key
+- TermCache: category/tag slug -> ID, loaded once per process (the batch route
+  only accepts writes, so lookups are avoided rather than batched)
+- publish_post(): tags + post in at most 2 batch round trips
+- StubWordPress: in-memory stand-in for the batch, posts and terms routes (tests)
+
+Note: media uploads are multipart and cannot be batched.
+"""
+
+import itertools
+import threading
+
+MAX_BATCH_SIZE = 25  # rest_get_max_batch_size() default
+
+
+class SkipItem(Exception):
+    """Raised from prepare() when an item turns out to be unnecessary."""
+
+
+class BatchResult:
+    """Outcome of one batched write."""
+
+    def __init__(self, status, body=None, error=None):
+        self.status = status
+        self.body = body
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status is not None and 200 <= self.status < 300
+
+    @property
+    def skipped(self):
+        return self.status is None and self.error is None
+
+    @property
+    def error_code(self):
+        return self.body.get("code") if isinstance(self.body, dict) else None
+
+    def __repr__(self):
+        return f"BatchResult(status={self.status}, error={self.error or self.error_code})"
+
+
+class BatchPublisher:
+    """
+    Usage:
+        publisher = BatchPublisher(wp)
+        publisher.add("tag:japan", "/wp/v2/tags", {"name": "japan", "slug": "japan"})
+        publisher.add("post", "/wp/v2/posts", {...}, depends_on=["tag:japan"], prepare=fill_tag_ids)
+        results = publisher.flush()   # {"tag:japan": BatchResult, "post": BatchResult}
+    """
+
+    def __init__(self, wp, max_batch_size=MAX_BATCH_SIZE, validation="normal"):
+        self.wp = wp
+        self.max_batch_size = max_batch_size
+        self.validation = validation
+        self.batch_url = f"{wp.wp_url}/?rest_route=/batch/v1"
+        self.round_trips = 0
+        self._items = {}
+
+    def add(self, key, path, body=None, method="POST", depends_on=(), prepare=None, strict=True):
+        """
+        Queue a write.
+
+        Args:
+            key: Caller's identifier for the result
+            path: REST route, e.g. "/wp/v2/posts" or "/wp/v2/posts/12", or a
+                callable(results) -> route for IDs known only after a dependency
+            body: JSON body
+            method: POST / PUT / PATCH / DELETE (GET is not batchable)
+            depends_on: Keys that must have a result before this item is sent
+            prepare: Optional callable(body, results) -> body, run just before sending
+            strict: Fail this item (status 424) if any dependency failed
+        """
+        if key in self._items:
+            raise ValueError(f"Duplicate batch key: {key}")
+        self._items[key] = {
+            "path": path,
+            "body": dict(body or {}),
+            "method": method,
+            "depends_on": list(depends_on),
+            "prepare": prepare,
+            "strict": strict,
+        }
+        return key
+
+    def __len__(self):
+        return len(self._items)
+
+    def flush(self):
+        """Send every queued item. Returns {key: BatchResult}."""
+        pending, self._items = self._items, {}
+        results = {}
+        for key, item in pending.items():
+            missing = [dep for dep in item["depends_on"] if dep not in pending]
+            if missing:
+                raise ValueError(f"{key} depends on unknown items: {missing}")
+
+        while pending:
+            wave = []
+            for key, item in list(pending.items()):
+                if any(dep not in results for dep in item["depends_on"]):
+                    continue
+                del pending[key]
+                failed = [dep for dep in item["depends_on"] if not results[dep].ok and not results[dep].skipped]
+                if failed and item["strict"]:
+                    results[key] = BatchResult(424, error=f"dependency failed: {', '.join(failed)}")
+                    continue
+                body = item["body"]
+                if item["prepare"]:
+                    try:
+                        body = item["prepare"](body, results)
+                    except SkipItem:
+                        results[key] = BatchResult(None)
+                        continue
+                    except Exception as e:
+                        results[key] = BatchResult(None, error=f"prepare failed: {e}")
+                        continue
+                path = item["path"](results) if callable(item["path"]) else item["path"]
+                wave.append((key, {"method": item["method"], "path": path, "body": body}))
+            if not wave and pending:
+                raise ValueError(f"Circular batch dependencies: {sorted(pending)}")
+            for start in range(0, len(wave), self.max_batch_size):
+                results.update(self._send(wave[start:start + self.max_batch_size]))
+        return results
+
+    def _send(self, chunk):
+        self.round_trips += 1
+        payload = {"validation": self.validation, "requests": [request for _, request in chunk]}
+        try:
+            response = self.wp.session.post(self.batch_url, json=payload)
+            response.raise_for_status()
+            responses = response.json().get("responses", [])
+        except Exception as e:
+            print(f"Batch request failed ({len(chunk)} items): {e}")
+            return {key: BatchResult(None, error=str(e)) for key, _ in chunk}
+
+        results = {}
+        for i, (key, _) in enumerate(chunk):
+            entry = responses[i] if i < len(responses) else None
+            if not isinstance(entry, dict):
+                results[key] = BatchResult(None, error="no response for item")
+            else:
+                results[key] = BatchResult(entry.get("status"), entry.get("body"))
+        return results
+
+
+class TermCache:
+    """Process-wide slug -> ID map for categories and tags."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._loaded = set()
+
+    def load(self, wp, taxonomy):
+        """Fetch every term of a taxonomy once (1 GET per 100 terms)."""
+        with self._lock:
+            if taxonomy in self._loaded:
+                return
+            page = 1
+            while True:
+                response = wp.session.get(f"{wp.api_url}/{taxonomy}", params={"per_page": 100, "page": page, "_fields": "id,slug"})
+                response.raise_for_status()
+                terms = response.json()
+                for term in terms:
+                    self._ids[(taxonomy, term["slug"])] = term["id"]
+                total_pages = int(response.headers.get("X-WP-TotalPages", 1) or 1)
+                if page >= total_pages or not terms:
+                    break
+                page += 1
+            self._loaded.add(taxonomy)
+
+    def is_loaded(self, taxonomy):
+        return taxonomy in self._loaded
+
+    def get(self, taxonomy, slug):
+        return self._ids.get((taxonomy, slug))
+
+    def set(self, taxonomy, slug, term_id):
+        with self._lock:
+            self._ids[(taxonomy, slug)] = term_id
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._loaded.clear()
+
+
+term_cache = TermCache()
+
+
+def term_id_from_result(result):
+    """ID of a created term, or of the existing one when the create hit term_exists."""
+    if result.ok and isinstance(result.body, dict):
+        return result.body.get("id")
+    if result.error_code == "term_exists":
+        return ((result.body or {}).get("data") or {}).get("term_id")
+    return None
+
+
+def upsert_term(publisher, taxonomy, term, key=None, depends_on=(), prepare=None):
+    """
+    Queue create-or-update for a term (name, slug, description, optional parent).
+
+    The create goes first; if it reports term_exists, a dependent update sets
+    description/parent on the existing term. prepare(body, results) can fill in
+    fields from dependencies (e.g. the parent ID) and raise to fail the term.
+    Returns the key of the create item (use term_id_from_result on its result).
+    """
+    key = key or f"{taxonomy}:{term['slug']}"
+
+    def create_body(body, results):
+        return prepare(body, results) if prepare else body
+
+    def update_body(body, results):
+        created = results[key]
+        if created.ok or created.error_code != "term_exists":
+            raise SkipItem()
+        fields = create_body(dict(term), results)
+        body = {"description": fields.get("description", "")}
+        if "parent" in fields:
+            body["parent"] = fields["parent"]
+        return body
+
+    def update_path(results):
+        return f"/wp/v2/{taxonomy}/{term_id_from_result(results[key])}"
+
+    publisher.add(key, f"/wp/v2/{taxonomy}", term, depends_on=depends_on, prepare=create_body, strict=False)
+    publisher.add(f"{key}:update", update_path, depends_on=[key], strict=False, prepare=update_body)
+    return key
+
+
+def publish_post(wp, post_data, category_slug=None, tag_slugs=(), publisher=None, cache=term_cache):
+    """
+    Create a post with its category and tags in as few round trips as possible.
+
+    Category and tag IDs come from the term cache; unknown tags are created in
+    one batch (term_exists responses map to the existing ID), and the post is
+    created in the next wave. Unknown categories are skipped, as before.
+
+    Returns:
+        (post dict or None, {key: BatchResult})
+    """
+    publisher = publisher or BatchPublisher(wp)
+    try:
+        cache.load(wp, "categories")
+        cache.load(wp, "tags")
+    except Exception as e:
+        print(f"Warning: Failed to load term cache: {e}")
+
+    category_id = cache.get("categories", category_slug) if category_slug else None
+    if category_slug and not category_id and not cache.is_loaded("categories"):
+        category_id = wp.get_category_id(category_slug)
+        if category_id:
+            cache.set("categories", category_slug, category_id)
+
+    tag_keys = {}
+    for slug in dict.fromkeys(tag_slugs):
+        if cache.get("tags", slug) is None:
+            tag_keys[slug] = publisher.add(f"tags:{slug}", "/wp/v2/tags", {"name": slug, "slug": slug})
+
+    def fill_terms(body, results):
+        tag_ids = []
+        for slug in dict.fromkeys(tag_slugs):
+            term_id = cache.get("tags", slug)
+            if term_id is None and slug in tag_keys:
+                term_id = term_id_from_result(results[tag_keys[slug]])
+                if term_id:
+                    cache.set("tags", slug, term_id)
+            if term_id:
+                tag_ids.append(term_id)
+            else:
+                print(f"Warning: Could not resolve tag '{slug}'")
+        body = dict(body)
+        if category_id:
+            body["categories"] = [category_id]
+        if tag_ids:
+            body["tags"] = tag_ids
+        print(f"Resolved Terms: {category_slug} -> {category_id}, {list(tag_slugs)} -> {tag_ids}")
+        return body
+
+    publisher.add("post", "/wp/v2/posts", post_data, depends_on=list(tag_keys.values()), prepare=fill_terms, strict=False)
+    results = publisher.flush()
+    post = results["post"]
+    if not post.ok:
+        print(f"Error creating post: {post.status} {post.error or (post.body or {}).get('message')}")
+        return None, results
+    return post.body, results
+
+
+class _StubResponse:
+    def __init__(self, status, body, headers=None):
+        self.status_code = status
+        self._body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} error: {self._body}")
+
+
+class StubWordPress:
+    """
+    In-memory WordPress for tests: batch/v1 plus the posts/tags/categories routes.
+
+    Mimics the parts the publisher relies on: 25-item limit, per-item status
+    and body, term_exists errors carrying the existing term_id, and X-WP-TotalPages.
+    Counts HTTP requests in `requests`.
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE):
+        self.wp_url = "http://stub"
+        self.api_url = f"{self.wp_url}/?rest_route=/wp/v2"
+        self.max_batch_size = max_batch_size
+        self.session = self
+        self.requests = 0
+        self.terms = {"categories": {}, "tags": {}}
+        self.posts = {}
+        self._ids = itertools.count(1)
+
+    # --- session interface ---
+
+    def get(self, url, params=None):
+        self.requests += 1
+        taxonomy = url.rsplit("/", 1)[-1]
+        params = params or {}
+        terms = sorted(self.terms.get(taxonomy, {}).values(), key=lambda t: t["id"])
+        per_page, page = int(params.get("per_page", 10)), int(params.get("page", 1))
+        total_pages = max(1, -(-len(terms) // per_page))
+        return _StubResponse(200, terms[(page - 1) * per_page:page * per_page], {"X-WP-TotalPages": str(total_pages)})
+
+    def post(self, url, json=None):
+        self.requests += 1
+        if not url.endswith("/batch/v1"):
+            path = url.split("rest_route=", 1)[-1]
+            status, body = self.dispatch("POST", path, json or {})
+            return _StubResponse(status, body)
+        requests = (json or {}).get("requests", [])
+        if len(requests) > self.max_batch_size:
+            return _StubResponse(400, {"code": "rest_batch_max_requests_exceeded"})
+        responses = []
+        for request in requests:
+            status, body = self.dispatch(request.get("method", "POST"), request["path"], request.get("body") or {})
+            responses.append({"status": status, "body": body, "headers": {}})
+        return _StubResponse(207, {"responses": responses})
+
+    # --- routes ---
+
+    def dispatch(self, method, path, body):
+        parts = path.strip("/").split("/")  # wp, v2, resource[, id]
+        if method == "GET" or len(parts) < 3 or parts[:2] != ["wp", "v2"]:
+            return 400, {"code": "rest_batch_not_allowed"}
+        resource = parts[2]
+        resource_id = int(parts[3]) if len(parts) > 3 and parts[3].isdigit() else None
+        if resource in self.terms:
+            return self._term(resource, resource_id, body)
+        if resource == "posts":
+            return self._post(resource_id, body)
+        return 404, {"code": "rest_no_route"}
+
+    def _term(self, taxonomy, term_id, body):
+        terms = self.terms[taxonomy]
+        if term_id is not None:
+            term = next((t for t in terms.values() if t["id"] == term_id), None)
+            if term is None:
+                return 404, {"code": "rest_term_invalid"}
+            term.update(body)
+            return 200, term
+        slug = body.get("slug") or body.get("name")
+        if not slug:
+            return 400, {"code": "rest_missing_callback_param"}
+        if slug in terms:
+            return 400, {"code": "term_exists", "message": "A term with the name provided already exists.",
+                         "data": {"status": 400, "term_id": terms[slug]["id"]}}
+        terms[slug] = {"id": next(self._ids), "slug": slug, **body}
+        return 201, terms[slug]
+
+    def _post(self, post_id, body):
+        if post_id is not None:
+            if post_id not in self.posts:
+                return 404, {"code": "rest_post_invalid_id"}
+            self.posts[post_id].update(body)
+            return 200, self.posts[post_id]
+        if not body.get("title"):
+            return 400, {"code": "empty_content"}
+        post_id = next(self._ids)
+        self.posts[post_id] = {"id": post_id, "link": f"{self.wp_url}/?p={post_id}", **body}
+        return 201, self.posts[post_id]
@@ -1,9 +1,13 @@
 import os
-import requests
 import base64
 from dotenv import load_dotenv
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+try:
+    from automation.lazy import lazy_import
+except ImportError:
+    from lazy import lazy_import
+
+# requests is only loaded when the client is constructed
+requests = lazy_import("requests")
 
 env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(env_path, override=True)
@@ -20,6 +24,9 @@ class WordPressClient:
         self.auth = (self.wp_user, self.wp_password)
         
         # Initialize Session with Retries and Connection Pooling
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
         self.session = requests.Session()
         self.session.auth = self.auth
         
@@ -257,6 +264,21 @@ class WordPressClient:
                 print(f"Response content: {e.response.text[:200]}...")
             return None
 
+    def find_post_with_marker(self, marker, status="publish,future,draft,pending,private"):
+        """
+        Most recent post whose raw content contains `marker`, or None.
+        Raises on request errors (callers must not treat them as "not found").
+        """
+        response = self.session.get(f"{self.api_url}/posts", params={
+            "search": marker, "status": status, "context": "edit", "per_page": 20,
+            "orderby": "date", "order": "desc",
+        })
+        response.raise_for_status()
+        for post in response.json():
+            if marker in ((post.get("content") or {}).get("raw") or ""):
+                return post
+        return None
+
     def get_post(self, post_id):
         """
         Retrieve a single post by ID.
@@ -308,6 +330,7 @@ class WordPressClient:
             filename = os.path.basename(file_path)
             
             # Use multipart upload which is often more robust
+            # (alt text is sent as a form field of the same request)
             with open(file_path, 'rb') as f:
                 files = {
                     'file': (filename, f, 'image/png')
@@ -316,20 +339,14 @@ class WordPressClient:
                 # Upload file
                 response = self.session.post(
                     url,
-                    files=files
+                    files=files,
+                    data={'alt_text': alt_text} if alt_text else None
                 )
             
             response.raise_for_status()
             
             result = response.json()
             
-            # Update alt text if provided
-            if alt_text and 'id' in result:
-                media_id = result['id']
-                update_url = f"{self.api_url}/media/{media_id}"
-                update_data = {"alt_text": alt_text}
-                self.session.post(update_url, json=update_data)
-            
             return {
                 'id': result.get('id'),
                 'source_url': result.get('source_url')
@@ -0,0 +1,97 @@
+import pytest
+
+from automation.backend_pool import Backend, BackendPool, BackendUnavailable, FakeGenaiClient, PooledClient
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(*fakes, clock=None, **kwargs):
+    clock = clock or Clock()
+    for fake in fakes:
+        fake.clock = clock
+    return BackendPool([Backend(f.name, f) for f in fakes], clock=clock, **kwargs), clock
+
+
+def test_routes_to_least_loaded_backend():
+    a, b = FakeGenaiClient("a"), FakeGenaiClient("b")
+    pool, _ = make_pool(a, b)
+    client = PooledClient(pool)
+    for i in range(10):
+        client.models.generate_content(model="m", contents=f"r{i}")
+    assert (a.calls, b.calls) == (5, 5)
+
+
+def test_rate_limited_backend_is_skipped_not_slept_on():
+    a, b = FakeGenaiClient("a", rpm=1), FakeGenaiClient("b", rpm=10)
+    pool, _ = make_pool(a, b)
+    client = PooledClient(pool)
+    backends = [client.models.generate_content(model="m", contents=str(i)).backend for i in range(6)]
+    assert backends.count("a") == 1
+    assert backends.count("b") == 5
+    assert pool.snapshot()[0]["cooling_down"] > 0
+
+
+def test_error_when_every_backend_is_cooling_down():
+    a, b = FakeGenaiClient("a", rpm=1), FakeGenaiClient("b", rpm=1)
+    pool, clock = make_pool(a, b)
+    client = PooledClient(pool)
+    client.models.generate_content(model="m", contents="1")
+    client.models.generate_content(model="m", contents="2")
+    with pytest.raises(RuntimeError, match="429 all 2 backends"):
+        client.models.generate_content(model="m", contents="3")
+    clock.now += 61
+    assert client.models.generate_content(model="m", contents="4").text
+
+
+def test_stream_fails_over_on_429():
+    a, b = FakeGenaiClient("a", rpm=1), FakeGenaiClient("b", rpm=10)
+    pool, _ = make_pool(a, b)
+    client = PooledClient(pool)
+    texts = []
+    for i in range(4):
+        texts.append("".join(c.text for c in client.models.generate_content_stream(model="m", contents=f"s{i}")))
+    assert all(t.startswith("[") for t in texts)
+    assert a.calls == 1 and b.calls == 3
+    assert all(s["inflight"] == 0 for s in pool.snapshot())
+
+
+def test_stream_fails_over_on_auth_error_and_backend_is_rechecked():
+    a, b = FakeGenaiClient("a", broken=True), FakeGenaiClient("b")
+    pool, clock = make_pool(a, b, recheck=300)
+    client = PooledClient(pool)
+    text = "".join(c.text for c in client.models.generate_content_stream(model="m", contents="x"))
+    assert text.startswith("[b/m]")
+    assert not pool.snapshot()[0]["healthy"]
+
+    a.broken = False
+    client.models.generate_content(model="m", contents="y")
+    assert a.calls == 0  # still out of rotation
+    clock.now += 301
+    for i in range(2):
+        client.models.generate_content(model="m", contents=str(i))
+    assert a.calls == 1
+    assert pool.snapshot()[0]["healthy"]
+
+
+def test_cached_requests_stay_on_primary():
+    a, b = FakeGenaiClient("a", rpm=1), FakeGenaiClient("b")
+    pool, _ = make_pool(a, b)
+    client = PooledClient(pool)
+    config = {"cached_content": "cachedContents/1"}
+    assert client.models.generate_content(model="m", contents="1", config=config).backend == "a"
+    with pytest.raises(BackendUnavailable):
+        client.models.generate_content(model="m", contents="2", config=config)
+    assert b.calls == 0
+
+
+def test_health_check_reports_broken_backend():
+    pool, _ = make_pool(FakeGenaiClient("a"), FakeGenaiClient("b", broken=True))
+    results = pool.health_check()
+    assert results["a"] is None
+    assert "403" in results["b"]
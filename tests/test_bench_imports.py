@@ -0,0 +1,21 @@
+import pytest
+
+from automation.cli import COMMANDS
+from automation.tools import bench_imports
+
+
+@pytest.mark.parametrize("command", [None] + sorted(COMMANDS))
+def test_help_does_not_load_heavy_packages(command):
+    _, heavy, error = bench_imports.probe(command, runs=1)
+
+    assert error is None
+    assert heavy == []
+
+
+def test_heavy_package_fails_without_a_budget(monkeypatch):
+    monkeypatch.setattr(bench_imports, "probe", lambda command, runs: (50.0, ["requests"], None))
+    monkeypatch.setattr("sys.argv", ["bench-imports", "--runs", "1", "--command", "collect"])
+
+    with pytest.raises(SystemExit) as exc:
+        bench_imports.main()
+    assert exc.value.code == 1
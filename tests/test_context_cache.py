@@ -0,0 +1,145 @@
+import threading
+
+import pytest
+
+from automation.context_cache import ContextCacheManager, FakeCacheBackend
+
+PREFIX = "Scoring criteria. " * 400
+OTHER_PREFIX = "Category taxonomy. " * 400
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SlowBackend(FakeCacheBackend):
+    """Blocks create() for the first prefix until release is set."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def create(self, model, system_instruction, ttl):
+        if system_instruction == PREFIX:
+            self.entered.set()
+            assert self.release.wait(5)
+        return super().create(model, system_instruction, ttl)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def manager_for(backend, clock, **kwargs):
+    kwargs.setdefault("ttl", 3600)
+    kwargs.setdefault("min_tokens", 100)
+    return ContextCacheManager(backend, enabled=True, clock=clock, **kwargs)
+
+
+def test_creates_once_then_hits(clock):
+    backend = FakeCacheBackend(clock=clock)
+    manager = manager_for(backend, clock)
+
+    name = manager.get("m", PREFIX)
+
+    assert backend.get(name) == PREFIX
+    assert manager.get("m", PREFIX) == name
+    assert manager.get("other-model", PREFIX) != name
+    assert backend.calls["create"] == 2
+    assert manager.stats["hits"] == 1
+
+
+def test_refreshes_near_expiry_and_recreates_after_expiry(clock):
+    backend = FakeCacheBackend(clock=clock)
+    manager = manager_for(backend, clock)
+    name = manager.get("m", PREFIX)
+
+    clock.now += 3600 - 60
+    assert manager.get("m", PREFIX) == name
+    assert backend.calls["refresh"] == 1
+
+    clock.now += 3600 + 1
+    recreated = manager.get("m", PREFIX)
+    assert recreated != name
+    assert backend.get(recreated) == PREFIX
+    assert manager.stats["expired"] == 1
+
+
+def test_refresh_of_a_cache_the_server_lost_recreates_it(clock):
+    backend = FakeCacheBackend(clock=clock)
+    manager = manager_for(backend, clock)
+    name = manager.get("m", PREFIX)
+    backend.caches.clear()
+
+    clock.now += 3600 - 60
+    recreated = manager.get("m", PREFIX)
+
+    assert recreated != name
+    assert backend.get(recreated) == PREFIX
+
+
+def test_small_prefix_is_sent_uncached(clock):
+    backend = FakeCacheBackend(clock=clock)
+    manager = manager_for(backend, clock)
+
+    assert manager.get("m", "short prompt") is None
+    assert backend.calls["create"] == 0
+
+
+def test_create_failure_backs_off(clock):
+    backend = FakeCacheBackend(clock=clock, min_tokens=10 ** 6)
+    manager = manager_for(backend, clock)
+
+    assert manager.get("m", PREFIX) is None
+    assert manager.get("m", PREFIX) is None
+    assert backend.calls["create"] == 1
+    assert manager.stats["failures"] == 1
+
+
+def test_invalidate_forgets_the_cache(clock):
+    backend = FakeCacheBackend(clock=clock)
+    manager = manager_for(backend, clock)
+    name = manager.get("m", PREFIX)
+
+    manager.invalidate(name)
+
+    assert manager.get("m", PREFIX) != name
+
+
+def test_close_deletes_created_caches(clock):
+    backend = FakeCacheBackend(clock=clock)
+    manager = manager_for(backend, clock)
+    manager.get("m", PREFIX)
+    manager.get("m", OTHER_PREFIX)
+
+    manager.close()
+
+    assert backend.caches == {}
+
+
+def test_create_does_not_block_other_prefixes_and_runs_once_per_prefix(clock):
+    backend = SlowBackend(clock=clock)
+    manager = manager_for(backend, clock)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.get("m", PREFIX))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert backend.entered.wait(5)
+
+    # A miss on another prefix goes through while PREFIX's create is in flight
+    other = manager.get("m", OTHER_PREFIX)
+    assert backend.get(other) == OTHER_PREFIX
+
+    backend.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 3 and len(set(results)) == 1
+    assert backend.get(results[0]) == PREFIX
+    assert backend.calls["create"] == 2
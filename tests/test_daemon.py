@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import automation.daemon as daemon_module
+import automation.pipeline as pipeline
+from automation.daemon import PipelineDaemon, _seconds_until_tomorrow
+from automation.db.known_urls import url_hash
+
+
+class Budget:
+    def __init__(self, allowance=None):
+        self.left = allowance
+
+    def allowance(self, stage, model):
+        return self.left
+
+
+class KnownIndex(set):
+    def add_many(self, keys):
+        self.update(keys)
+
+    def save(self):
+        pass
+
+
+class Gemini:
+    def __init__(self, error=None):
+        self.error = error
+        self.checked = []
+
+    def check_duplication(self, title, summary, pool):
+        self.checked.append(title)
+        if self.error:
+            raise self.error
+        return None
+
+
+def item(seq, title, score=90):
+    return (-score, seq, {"title": title, "url": f"https://a.example/{seq}", "score": score, "summary": ""})
+
+
+@pytest.fixture
+def daemon(monkeypatch, tmp_path):
+    generated = []
+    monkeypatch.setattr(pipeline, "generate_from_article",
+                        lambda article, *args, **kwargs: generated.append(article["title"]) or True)
+    d = PipelineDaemon(daily_limit=1, queue_size=2, pending_path=str(tmp_path / "pending.json"))
+    d.budget = Budget()
+    d.gemini = Gemini()
+    d.generated = generated
+    yield d
+    d.stop_event.set()
+
+
+def run_loop(daemon, until, timeout=5.0):
+    thread = threading.Thread(target=daemon.generate_loop, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not until() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    daemon.stop_event.set()
+    thread.join(timeout)
+    assert not thread.is_alive()
+
+
+def test_items_over_the_daily_limit_wait_for_the_next_day(daemon, monkeypatch):
+    monkeypatch.setattr(daemon_module, "_seconds_until_tomorrow", lambda: 60)
+    daemon.generate_queue.put(item(1, "first"))
+    daemon.generate_queue.put(item(2, "second", score=86))
+
+    run_loop(daemon, until=lambda: daemon.metrics.counters.get("generation_limit_deferred_total"))
+
+    assert daemon.generated == ["first"]
+    assert [held[2]["title"] for held in daemon._held] == ["second"]
+
+
+def test_holding_does_not_block_on_a_full_queue(daemon, monkeypatch):
+    monkeypatch.setattr(daemon_module, "_seconds_until_tomorrow", lambda: 60)
+    daemon._generated_today = (datetime.now().date(), 1)
+    daemon.generate_queue.put(item(1, "first"))
+    daemon.generate_queue.put(item(2, "second"))
+
+    def refill():
+        # The scorer takes the freed slot before the generator holds the item
+        if not daemon.generate_queue.full():
+            daemon.generate_queue.put_nowait(item(3, "third"))
+        return daemon.metrics.counters.get("generation_limit_deferred_total")
+
+    run_loop(daemon, until=refill)
+
+    assert daemon.generated == []
+    assert [held[2]["title"] for held in daemon._held] == ["first"]
+    assert daemon.generate_queue.full()
+
+
+def test_budget_hold_does_not_block_on_a_full_queue(daemon):
+    daemon.budget = Budget(allowance=0)
+    daemon.generate_queue.put(item(1, "first"))
+
+    seq = iter(range(2, 100))
+
+    def refill():
+        # The scorer keeps the queue full
+        while not daemon.generate_queue.full():
+            daemon.generate_queue.put_nowait(item(next(seq), "later"))
+        return daemon.metrics.counters.get("generation_budget_deferred_total")
+
+    run_loop(daemon, until=refill)
+
+    assert daemon.generated == []
+    assert [held[2]["title"] for held in daemon._held] == ["first"]
+
+
+def test_pending_candidates_survive_a_restart(daemon, monkeypatch):
+    monkeypatch.setattr(daemon_module, "_seconds_until_tomorrow", lambda: 60)
+    daemon._generated_today = (datetime.now().date(), 1)
+    daemon.generate_queue.put(item(1, "held", score=95))
+    daemon.generate_queue.put(item(2, "queued", score=88))
+    run_loop(daemon, until=lambda: daemon.metrics.counters.get("generation_limit_deferred_total"))
+
+    daemon.save_pending()
+
+    restarted = PipelineDaemon(pending_path=daemon.pending_path)
+    restarted.known_index = KnownIndex({url_hash("https://a.example/2")})
+    restarted.load_pending()
+    assert [(held[0], held[2]["title"]) for held in restarted._held] == [(-95, "held")]
+    assert not restarted._mark_seen("https://a.example/1")
+
+
+def test_dedup_error_does_not_stop_the_generator(daemon):
+    daemon.daily_limit = 0
+    daemon.gemini = Gemini(error=RuntimeError("dedup backend down"))
+    daemon.generate_queue.put(item(1, "first"))
+    daemon.generate_queue.put(item(2, "second"))
+
+    run_loop(daemon, until=lambda: len(daemon.gemini.checked) == 2)
+
+    assert daemon.gemini.checked == ["first", "second"]
+    assert daemon.metrics.counters["generation_errors_total"] == 2
+    assert daemon._generated_today[1] == 0
+
+
+def test_candidates_become_known_only_once_generated(daemon):
+    daemon.known_index = KnownIndex()
+    daemon.daily_limit = 0
+    daemon.generate_queue.put(item(1, "first"))
+
+    run_loop(daemon, until=lambda: len(daemon.known_index))
+
+    assert url_hash("https://a.example/1") in daemon.known_index
+
+
+def test_seconds_until_tomorrow():
+    assert _seconds_until_tomorrow(datetime(2026, 1, 1, 23, 0)) == 3600
+    assert _seconds_until_tomorrow(datetime(2026, 1, 1, 23, 59, 59, 999999)) == 1.0
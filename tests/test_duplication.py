@@ -0,0 +1,56 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from automation.analysis.cascade import CascadePolicy
+from automation.gemini_client import UNMATCHED_DUPLICATE, GeminiClient
+
+EXISTING = ["OpenAI&#8217;s new agent SDK ships", "Toyota starts solid-state battery pilot line"]
+
+
+def client(responses):
+    """GeminiClient whose model answers with the given JSON verdicts, one per call."""
+    gemini = GeminiClient.__new__(GeminiClient)
+    gemini.cascade = CascadePolicy(cheap_model="cheap", strong_model="strong", enabled=True)
+    gemini.calls = []
+
+    def generate_content(model, contents, config):
+        gemini.calls.append(model)
+        return SimpleNamespace(text=json.dumps(responses[model]))
+
+    gemini.client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    gemini._retry_request = lambda func, **kwargs: func(**kwargs)
+    return gemini
+
+
+def verdict(duplicate_of, is_duplicate=True, confidence=0.95):
+    return {"is_duplicate": is_duplicate, "duplicate_of": duplicate_of, "confidence": confidence, "reason": "r"}
+
+
+def test_decoded_title_maps_back_to_the_stored_one():
+    gemini = client({"cheap": verdict("OpenAI’s new agent SDK ships")})
+
+    assert gemini.check_duplication("Agent SDK", "", EXISTING) == EXISTING[0]
+    assert gemini.calls == ["cheap"]
+
+
+@pytest.mark.parametrize("duplicate_of", [None, "Some title the model made up"])
+def test_unmatched_cheap_verdict_escalates(duplicate_of):
+    gemini = client({"cheap": verdict(duplicate_of), "strong": verdict("Toyota starts solid-state battery pilot line")})
+
+    assert gemini.check_duplication("Toyota pilot line", "", EXISTING) == EXISTING[1]
+    assert gemini.calls == ["cheap", "strong"]
+
+
+@pytest.mark.parametrize("duplicate_of, expected", [(None, UNMATCHED_DUPLICATE), ("Made up", "Made up")])
+def test_unmatched_strong_verdict_is_still_a_duplicate(duplicate_of, expected):
+    gemini = client({"cheap": verdict(duplicate_of), "strong": verdict(duplicate_of)})
+
+    assert gemini.check_duplication("Toyota pilot line", "", EXISTING) == expected
+
+
+def test_not_a_duplicate():
+    gemini = client({"cheap": verdict(None, is_duplicate=False)})
+
+    assert gemini.check_duplication("Fusion record", "", EXISTING) is None
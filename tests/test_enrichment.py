@@ -0,0 +1,18 @@
+from automation.enrichment import FIELDS, build_prompt
+from automation.token_budget import budget_for, estimate_tokens
+
+
+def test_prompt_content_fits_the_enrichment_budget():
+    content = "\n\n".join(f"段落{i}: 全固体電池の量産ラインが稼働し、エネルギー密度が向上した。" * 5 for i in range(200))
+    empty = build_prompt("全固体電池", "", "battery", "topic-focus")
+
+    prompt = build_prompt("全固体電池", content, "battery", "topic-focus")
+
+    assert estimate_tokens(prompt) - estimate_tokens(empty) <= budget_for("enrichment") + 10
+    assert all(f"\n{i}. " in prompt for i in range(1, len(FIELDS) + 1))
+
+
+def test_short_content_is_kept_whole():
+    content = "Fusion startup reports net energy gain."
+
+    assert content in build_prompt("Fusion", content, "fusion", "news")
@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from automation.generate_article import EarlyTitleWork
+
+
+class Gemini:
+    def __init__(self):
+        self.checked = []
+
+    def check_duplication(self, title, summary, pool):
+        self.checked.append(title)
+        return None
+
+    def generate_image_prompt(self, title, summary, article_type):
+        return f"prompt for {title}"
+
+
+class Classifier:
+    def __init__(self, release=None):
+        self.release = release
+
+    def classify_article(self, title, summary):
+        if self.release:
+            assert self.release.wait(5)
+        return {"category": "ai"}
+
+
+def enricher(**kwargs):
+    return SimpleNamespace(gemini=Gemini(), classifier=Classifier(**kwargs))
+
+
+def test_no_title_check_when_the_caller_already_deduplicated():
+    work = EarlyTitleWork(enricher(), "summary", "topic-focus", existing_titles=None)
+    work.start("Fusion startup reaches net gain")
+
+    assert work.duplicate() is None
+    assert work.results()["image_prompt"] == "prompt for Fusion startup reaches net gain"
+    assert work.enricher.gemini.checked == []
+    work.shutdown()
+
+
+def test_shutdown_cancels_work_not_started():
+    release = threading.Event()
+    work = EarlyTitleWork(enricher(release=release), "summary", "topic-focus")
+    work.executor = ThreadPoolExecutor(max_workers=1)  # the image prompt waits behind classification
+    work.start("Fusion startup reaches net gain")
+
+    work.shutdown()
+    release.set()
+
+    assert work.futures["image_prompt"].cancelled()
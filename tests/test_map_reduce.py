@@ -0,0 +1,45 @@
+from automation.analysis import map_reduce
+from automation.analysis.map_reduce import AnalysisBudget, condense_digests, digest_text, estimate_tokens
+
+
+def budget(**kwargs):
+    kwargs = {"shard_tokens": 400, "digest_tokens": 100, "synthesis_tokens": 300, "workers": 2, **kwargs}
+    return AnalysisBudget(mode="on", **kwargs)
+
+
+def sector_lines(sector, count):
+    return [f"- [2026-10-19] {sector} development {i}: a concrete result with numbers and names" for i in range(count)]
+
+
+def test_failed_reduce_keeps_the_sector_with_trimmed_input():
+    digests = [("AI", sector_lines("AI", 30)), ("Space", sector_lines("Space", 30))]
+
+    def condense(sector, lines):
+        if sector == "Space":
+            raise RuntimeError("503 UNAVAILABLE")
+        return lines[:2]
+
+    result = dict(condense_digests(digests, budget(), condense))
+
+    assert result["AI"] == sector_lines("AI", 2)
+    assert result["Space"] and result["Space"][0] == sector_lines("Space", 1)[0]
+    assert estimate_tokens(digest_text(list(result.items()))) <= 300
+
+
+def test_small_digests_are_not_condensed():
+    digests = [("AI", sector_lines("AI", 2))]
+    calls = []
+
+    result = condense_digests(digests, budget(), lambda sector, lines: calls.append(sector) or lines)
+
+    assert result == digests
+    assert calls == []
+
+
+def test_fallback_digest_fits_the_digest_budget():
+    lines = sector_lines("AI", 50)
+
+    fallback = map_reduce.fallback_digest(lines, budget())
+
+    assert fallback[0] == lines[0]
+    assert estimate_tokens("\n".join(fallback)) <= 100
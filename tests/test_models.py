@@ -0,0 +1,54 @@
+import pytest
+
+from automation.models import Article
+
+
+def article(**kwargs):
+    kwargs = {"title": "Fusion startup reaches net gain", "url": "https://a.example/1", "source": "a", **kwargs}
+    return Article(**kwargs)
+
+
+def test_collector_fields_are_keys_even_when_none():
+    art = article(region=None, summary=None)
+
+    assert art["region"] is None
+    assert art["summary"] is None
+    assert "region" in art and "summary" in art
+    assert art.get("summary", "fallback") is None
+
+
+def test_stage_fields_are_absent_until_set():
+    art = article()
+
+    assert "score" not in art
+    assert art.get("score", 0) == 0
+    with pytest.raises(KeyError):
+        art["content"]
+
+    art["score"] = 90
+    art["content"] = None
+
+    assert art["score"] == 90
+    assert "content" in art and art["content"] is None
+    assert {"score", "content"} <= set(art.keys())
+
+
+def test_unknown_keys_raise():
+    art = article()
+
+    with pytest.raises(KeyError):
+        art["cluster_size"]
+    art["cluster_size"] = 3
+    assert art["cluster_size"] == 3
+
+
+def test_dict_round_trip_keeps_none_values():
+    data = {"title": "t", "url": "https://a.example/2", "source": "a", "region": None,
+            "summary": "", "published": "Unknown", "reasoning": None, "cluster_size": 2}
+
+    restored = Article.from_dict(data).to_dict()
+
+    assert restored["region"] is None
+    assert restored["reasoning"] is None
+    assert "score" not in restored
+    assert restored["cluster_size"] == 2
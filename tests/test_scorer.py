@@ -0,0 +1,49 @@
+import gc
+import json
+import weakref
+
+from automation.analysis import scorer
+
+
+class Client:
+    article_scorer = None
+
+
+class SlottedClient:
+    __slots__ = ("models",)
+
+
+def test_scorer_is_reused_per_client_and_released_with_it():
+    client = Client()
+    first = scorer._get_scorer(client)
+
+    assert scorer._get_scorer(client) is first
+    assert first.client is client
+    assert scorer._get_scorer(Client()) is not first
+
+    ref = weakref.ref(client)
+    del client, first
+    gc.collect()
+    assert ref() is None
+
+
+def test_clients_without_a_scorer_slot_get_a_fresh_scorer():
+    client = SlottedClient()
+
+    first = scorer._get_scorer(client)
+
+    assert first.client is client
+    assert scorer._get_scorer(client) is not first
+
+
+def test_failed_scores_are_not_recorded_as_labels(tmp_path):
+    from automation.analysis.prefilter import record_scores
+
+    path = tmp_path / "history.jsonl"
+    record_scores([
+        {"title": "scored", "score": 90, "reasoning": "Fusion milestone"},
+        {"title": "api error", "score": 0, "reasoning": "Error: 503"},
+        {"title": "no client", "score": 0, "reasoning": "Client Init Failed"},
+    ], path=str(path))
+
+    assert [json.loads(line)["title"] for line in path.read_text().splitlines()] == ["scored"]
@@ -0,0 +1,37 @@
+import time
+
+import automation.collectors.collector as collector
+from automation.collectors.health import SourceHealthRegistry
+from automation.collectors.scheduler import PollScheduler
+
+
+def open_circuit(health, source="dead"):
+    for _ in range(health.failure_threshold):
+        health.record(source, "feed", ok=False, latency=15, error="timeout")
+
+
+def test_retry_at_follows_the_circuit():
+    now = [1000.0]
+    health = SourceHealthRegistry(path=None, clock=lambda: now[0])
+    assert health.retry_at("dead", "feed") == 0.0
+
+    open_circuit(health)
+    assert not health.allow("dead", "feed")
+    assert health.retry_at("dead", "feed") == 1000.0 + health.base_cooldown
+
+    now[0] += health.base_cooldown
+    assert health.allow("dead", "feed")
+    assert health.retry_at("dead", "feed") == now[0] + health.base_cooldown
+
+
+def test_circuit_open_skip_defers_the_source(monkeypatch):
+    health = SourceHealthRegistry(path=None)
+    open_circuit(health)
+    monkeypatch.setattr(collector, "get_source_health", lambda: health)
+    scheduler = PollScheduler(path=None)
+
+    assert collector.fetch_rss("https://dead.example/feed", "dead", scheduler=scheduler) == []
+
+    assert not scheduler.is_due("dead")
+    assert abs(scheduler.next_poll("dead") - health.retry_at("dead", "feed")) < 5
+    assert scheduler.next_poll("dead") > time.time() + health.base_cooldown - 60
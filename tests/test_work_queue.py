@@ -0,0 +1,171 @@
+import threading
+
+import pytest
+
+from automation.work_queue import CLAIM_IN_DOUBT, PublishGuard, RemoteQueue, SQLiteQueue, make_queue_server
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    q = SQLiteQueue(str(tmp_path / "queue.sqlite"), visibility=60, max_attempts=2, clock=clock)
+    yield q
+    q.close()
+
+
+def test_idempotency_key_deduplicates(queue):
+    assert queue.enqueue("score", {"url": "a"}, key="h1") is not None
+    assert queue.enqueue("score", {"url": "a"}, key="h1") is None
+    assert queue.enqueue("generate", {"url": "a"}, key="h1") is not None
+    assert queue.counts()["score"]["pending"] == 1
+
+
+def test_lease_complete_and_priority(queue):
+    queue.enqueue("score", {"n": 1}, key="low", priority=1)
+    queue.enqueue("score", {"n": 2}, key="high", priority=5)
+    (task,) = queue.lease("score", "w1")
+    assert task.key == "high" and task.payload == {"n": 2}
+    assert queue.complete(task, {"ok": True})
+    assert [t.key for t in queue.lease("score", "w1", limit=5)] == ["low"]
+    assert queue.lease("score", "w1") == []
+
+
+def test_expired_lease_is_fenced_and_goes_dead(queue, clock):
+    queue.enqueue("generate", {}, key="k")
+    (first,) = queue.lease("generate", "w1")
+    clock.now += 61
+    (second,) = queue.lease("generate", "w2")
+    assert second.id == first.id and second.attempts == 2
+    # The first worker's lease was taken over
+    assert not queue.heartbeat(first)
+    assert not queue.complete(first)
+    assert queue.heartbeat(second)
+    clock.now += 200
+    assert queue.lease("generate", "w3") == []
+    assert queue.dead("generate")[0]["error"] == "lease expired"
+    assert queue.requeue("generate") == 1
+    assert len(queue.lease("generate", "w3")) == 1
+
+
+def test_retry_backoff_then_dead(queue, clock):
+    queue.enqueue("score", {}, key="k")
+    (task,) = queue.lease("score", "w1")
+    assert queue.retry(task, "boom", delay=30)
+    assert queue.lease("score", "w1") == []
+    clock.now += 31
+    (task,) = queue.lease("score", "w1")
+    assert queue.retry(task, "boom again")
+    assert queue.counts()["score"]["dead"] == 1
+
+
+def test_defer_keeps_attempts(queue, clock):
+    queue.enqueue("generate", {}, key="k")
+    (task,) = queue.lease("generate", "w1")
+    assert queue.defer(task, 10, "no budget")
+    clock.now += 11
+    (task,) = queue.lease("generate", "w1")
+    assert task.attempts == 1
+
+
+def test_publish_claim_only_once(queue, clock):
+    queue.enqueue("generate", {}, key="a")
+    queue.enqueue("generate", {}, key="b")
+    task_a, task_b = queue.lease("generate", "w1", limit=2)
+    guard = PublishGuard(queue, task_a, "publish:x")
+    assert guard.acquire()
+    assert guard.acquire()  # same task (retry inside the lease)
+    assert not PublishGuard(queue, task_b, "publish:x").acquire()
+    assert guard.settle({"id": 1})
+    assert not guard.acquire()
+
+
+def test_claim_left_by_an_expired_lease_is_in_doubt(queue, clock):
+    queue.enqueue("generate", {}, key="a")
+    (first,) = queue.lease("generate", "w1")
+    assert PublishGuard(queue, first, "publish:a").acquire()
+    clock.now += 61
+
+    (second,) = queue.lease("generate", "w2")
+    guard = PublishGuard(queue, second, "publish:a")
+    assert guard.acquire() and guard.in_doubt
+    # The claim now belongs to the new lease
+    assert guard.acquire() and not guard.in_doubt
+    assert not queue.claim("publish:a", first)
+
+
+def test_in_doubt_guard_finds_the_earlier_post(queue):
+    class WordPress:
+        def find_post_with_marker(self, marker):
+            return {"id": 7} if marker == "techshift-claim:publish:a" else None
+
+    guard = PublishGuard(queue, None, "publish:a")
+    assert guard.mark("<p>body</p>").endswith("<!-- techshift-claim:publish:a -->")
+    assert guard.existing_post(WordPress()) == {"id": 7}
+
+
+def test_claim_needs_a_live_lease(queue, clock):
+    queue.enqueue("generate", {}, key="a")
+    (task,) = queue.lease("generate", "w1")
+    clock.now += 61
+    assert not queue.claim("publish:a", task)
+
+
+def test_shared_counter(queue):
+    assert queue.reserve("generated:today", 2)
+    assert queue.reserve("generated:today", 2)
+    assert not queue.reserve("generated:today", 2)
+    queue.release("generated:today")
+    assert queue.reserve("generated:today", 2)
+
+
+@pytest.fixture
+def server(queue):
+    srv = make_queue_server(queue, 0, token="secret")
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_remote_queue_round_trip(server):
+    remote = RemoteQueue(server, token="secret")
+    assert remote.enqueue("score", {"url": "a"}, key="h1") is not None
+    assert remote.enqueue("score", {"url": "a"}, key="h1") is None
+    (task,) = remote.lease("score", "remote-worker")
+    assert task.payload == {"url": "a"}
+    assert remote.heartbeat(task)
+    assert remote.claim("publish:h1", task)
+    assert remote.complete(task, {"score": 90})
+    assert remote.counts()["score"]["done"] == 1
+    remote.close()
+
+
+def test_remote_queue_rejects_bad_token(server):
+    import requests
+
+    remote = RemoteQueue(server, token="wrong")
+    with pytest.raises(requests.HTTPError, match="401"):
+        remote.enqueue("generate", {}, key="x")
+    remote.close()
+
+
+def test_server_refuses_public_bind_without_token(queue, monkeypatch):
+    monkeypatch.delenv("WORK_QUEUE_TOKEN", raising=False)
+    with pytest.raises(ValueError, match="WORK_QUEUE_TOKEN"):
+        make_queue_server(queue, 0, host="0.0.0.0")
+    srv = make_queue_server(queue, 0)  # loopback without a token is fine
+    assert srv.server_address[0] == "127.0.0.1"
+    srv.server_close()
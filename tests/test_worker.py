@@ -0,0 +1,64 @@
+import pytest
+
+from automation.analysis.clustering import StoryIndex
+from automation.models import Article
+from automation.work_queue import SQLiteQueue
+from automation.worker import Worker
+
+
+class Scheduler:
+    def lookback_hours(self, name, default):
+        return default
+
+    def save(self):
+        pass
+
+
+FEED = [
+    Article(title="Quantinuum unveils 98-qubit trapped ion processor with record fidelity",
+            url="https://a.example/1", source="a", summary="Trapped ion quantum computer with record two-qubit gate fidelity"),
+    Article(title="Quantinuum unveils 98-qubit trapped ion processor with record fidelity",
+            url="https://a.example/1-copy", source="a", summary="Trapped ion quantum computer with record two-qubit gate fidelity"),
+    Article(title="Solid-state battery startup opens pilot line for sulfide electrolytes",
+            url="https://a.example/2", source="a", summary="Pilot production of sulfide solid electrolytes begins"),
+]
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    import automation.collectors.collector as collector
+
+    monkeypatch.setattr(collector, "fetch_rss", lambda url, source, hours=None, scheduler=None: list(FEED))
+    queue = SQLiteQueue(str(tmp_path / "queue.sqlite"))
+    w = Worker(queue, kinds=["scrape"])
+    w.known_index = set()
+    w.story_index = StoryIndex()
+    w.scheduler = Scheduler()
+    yield w
+    queue.close()
+
+
+def scrape_task(worker):
+    worker.queue.enqueue("scrape", {"source": "a", "url": "https://a.example/feed"}, key="a@1")
+    return worker.queue.lease("scrape", "w1")
+
+
+def test_scrape_clusters_copies(worker):
+    (task,) = scrape_task(worker)
+    assert worker.handle_scrape([task]) == {"queued": 2}
+
+
+def test_retried_scrape_keeps_its_own_stories(worker):
+    (task,) = scrape_task(worker)
+    worker.handle_scrape([task])
+    # The score tasks were lost with the failed attempt; the retry must find the stories again
+    worker.queue._conn.execute("DELETE FROM tasks WHERE kind = 'score'")
+    assert worker.handle_scrape([task]) == {"queued": 2}
+
+
+def test_other_task_does_not_requeue_known_stories(worker):
+    (task,) = scrape_task(worker)
+    worker.handle_scrape([task])
+    worker.queue.enqueue("scrape", {"source": "a", "url": "https://a.example/feed"}, key="a@2")
+    (other,) = worker.queue.lease("scrape", "w1")
+    assert worker.handle_scrape([other]) == {"queued": 0}
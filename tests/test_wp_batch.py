@@ -0,0 +1,146 @@
+import pytest
+
+from automation.wp_batch import (
+    BatchPublisher,
+    SkipItem,
+    StubWordPress,
+    TermCache,
+    publish_post,
+    term_id_from_result,
+    upsert_term,
+)
+
+
+@pytest.fixture
+def wp():
+    wp = StubWordPress()
+    wp.terms["categories"]["ai"] = {"id": 100, "slug": "ai", "name": "AI"}
+    wp.terms["tags"]["japan"] = {"id": 101, "slug": "japan", "name": "japan"}
+    return wp
+
+
+def test_publish_post_creates_missing_tags_then_the_post(wp):
+    cache = TermCache()
+
+    post, results = publish_post(wp, {"title": "Hello", "status": "draft"}, category_slug="ai",
+                                 tag_slugs=["japan", "robotics", "japan"], cache=cache)
+
+    robotics = wp.terms["tags"]["robotics"]["id"]
+    assert post["categories"] == [100]
+    assert post["tags"] == [101, robotics]
+    assert results["tags:robotics"].ok
+    # 2 term-list GETs + tag batch + post batch
+    assert wp.requests == 4
+    assert cache.get("tags", "robotics") == robotics
+
+
+def test_publish_post_with_a_warm_cache_is_one_round_trip(wp):
+    cache = TermCache()
+    publish_post(wp, {"title": "First"}, category_slug="ai", tag_slugs=["japan"], cache=cache)
+    wp.requests = 0
+
+    post, _ = publish_post(wp, {"title": "Second"}, category_slug="ai", tag_slugs=["japan"], cache=cache)
+
+    assert post["tags"] == [101]
+    assert wp.requests == 1
+
+
+def test_tag_created_elsewhere_maps_term_exists_to_the_existing_id(wp):
+    cache = TermCache()
+    cache.load(wp, "categories")
+    cache.load(wp, "tags")
+    wp.terms["tags"]["late"] = {"id": 555, "slug": "late", "name": "late"}
+
+    post, results = publish_post(wp, {"title": "Hello"}, tag_slugs=["late"], cache=cache)
+
+    assert results["tags:late"].error_code == "term_exists"
+    assert post["tags"] == [555]
+
+
+def test_failed_post_returns_none(wp):
+    post, results = publish_post(wp, {"status": "draft"}, cache=TermCache())
+
+    assert post is None
+    assert results["post"].status == 400
+
+
+def test_waves_are_split_into_batches_of_max_size(wp):
+    publisher = BatchPublisher(wp)
+    for i in range(30):
+        publisher.add(f"tag:{i}", "/wp/v2/tags", {"name": f"t{i}", "slug": f"t{i}"})
+
+    results = publisher.flush()
+
+    assert all(result.ok for result in results.values())
+    assert publisher.round_trips == 2
+    assert len(publisher) == 0
+
+
+def test_dependency_failure_fails_strict_items_only(wp):
+    publisher = BatchPublisher(wp)
+    publisher.add("bad", "/wp/v2/posts", {})
+    publisher.add("strict", "/wp/v2/posts", {"title": "a"}, depends_on=["bad"])
+    publisher.add("lenient", "/wp/v2/posts", {"title": "b"}, depends_on=["bad"], strict=False)
+
+    results = publisher.flush()
+
+    assert results["bad"].status == 400
+    assert results["strict"].status == 424
+    assert results["lenient"].ok
+
+
+def test_prepare_fills_ids_from_dependencies_and_can_skip(wp):
+    publisher = BatchPublisher(wp)
+    publisher.add("post", "/wp/v2/posts", {"title": "a"})
+    publisher.add("update", lambda results: f"/wp/v2/posts/{results['post'].body['id']}", {"excerpt": "x"},
+                  depends_on=["post"])
+
+    def skip(body, results):
+        raise SkipItem()
+
+    publisher.add("noop", "/wp/v2/posts", {"title": "b"}, depends_on=["post"], prepare=skip)
+
+    results = publisher.flush()
+
+    assert results["update"].ok
+    assert wp.posts[results["post"].body["id"]]["excerpt"] == "x"
+    assert results["noop"].skipped
+    assert len(wp.posts) == 1
+
+
+def test_upsert_term_updates_an_existing_term(wp):
+    publisher = BatchPublisher(wp)
+    created = upsert_term(publisher, "tags", {"name": "new", "slug": "new", "description": "fresh"})
+    existing = upsert_term(publisher, "tags", {"name": "japan", "slug": "japan", "description": "updated"})
+
+    results = publisher.flush()
+
+    assert term_id_from_result(results[created]) == wp.terms["tags"]["new"]["id"]
+    assert results[f"{created}:update"].skipped
+    assert term_id_from_result(results[existing]) == 101
+    assert results[f"{existing}:update"].ok
+    assert wp.terms["tags"]["japan"]["description"] == "updated"
+
+
+def test_unknown_or_circular_dependencies_are_rejected(wp):
+    publisher = BatchPublisher(wp)
+    publisher.add("a", "/wp/v2/posts", {"title": "a"}, depends_on=["missing"])
+    with pytest.raises(ValueError, match="unknown"):
+        publisher.flush()
+
+    publisher.add("a", "/wp/v2/posts", {"title": "a"}, depends_on=["b"])
+    publisher.add("b", "/wp/v2/posts", {"title": "b"}, depends_on=["a"])
+    with pytest.raises(ValueError, match="Circular"):
+        publisher.flush()
+
+
+def test_transport_error_fails_every_item_in_the_chunk(wp):
+    publisher = BatchPublisher(wp, max_batch_size=30)
+    wp.max_batch_size = 25
+    for i in range(26):
+        publisher.add(i, "/wp/v2/posts", {"title": str(i)})
+
+    results = publisher.flush()
+
+    assert all(result.status is None and result.error for result in results.values())
+    assert wp.posts == {}
@@ -615,6 +615,7 @@ function techshift_initialize_tables() {
         is_relevant tinyint(1) DEFAULT 1,
         relevance_reason text DEFAULT NULL,
         impact_score int(11) DEFAULT NULL,
+        article_url varchar(512) DEFAULT NULL,
         PRIMARY KEY  (id),
         UNIQUE KEY url_hash (url_hash),
         KEY idx_region (region),
@@ -683,6 +684,26 @@ function techshift_register_api_routes() {
         'callback' => 'techshift_api_check_articles_exist',
         'permission_callback' => 'techshift_api_auth_check',
     ) );
+    register_rest_route( $namespace, '/articles/hashes', array(
+        'methods' => 'GET',
+        'callback' => 'techshift_api_get_article_hashes',
+        'permission_callback' => 'techshift_api_auth_check',
+    ) );
+    register_rest_route( $namespace, '/articles/labels', array(
+        'methods' => 'GET',
+        'callback' => 'techshift_api_get_article_labels',
+        'permission_callback' => 'techshift_api_auth_check',
+    ) );
+    register_rest_route( $namespace, '/articles/context', array(
+        'methods' => 'GET',
+        'callback' => 'techshift_api_get_articles_context',
+        'permission_callback' => 'techshift_api_auth_check',
+    ) );
+    register_rest_route( $namespace, '/articles/link', array(
+        'methods' => 'POST',
+        'callback' => 'techshift_api_set_article_link',
+        'permission_callback' => 'techshift_api_auth_check',
+    ) );
     register_rest_route( $namespace, '/articles', array(
         'methods' => 'POST',
         'callback' => 'techshift_api_save_article',
@@ -867,36 +888,130 @@ function techshift_api_check_articles_exist( $request ) {
     return array( 'exists' => $existing );
 }
 
-function techshift_api_save_article( $request ) {
+/**
+ * Incremental url_hash feed (id > since_id) for the automation's local known-URL index.
+ */
+function techshift_api_get_article_hashes( $request ) {
     global $wpdb;
     $table = $wpdb->prefix . TECHSHIFT_TBL_ARTICLES;
-    $params = $request->get_json_params();
 
-    // Use replace or insert ignore? 
-    // Requirement is deduplication. If hash exists, we might want to update or skip.
-    // Client logic usually checks existence first. But INSERT IGNORE or ON DUPLICATE UPDATE is safer.
-    // Let's use $wpdb->replace which does DELETE + INSERT (might change ID).
-    // Or just custom query for INSERT IGNORE.
-    // Let's use replace for simplicity, assumption is hash is unique.
+    $since_id = $request->get_param('since_id') ? intval($request->get_param('since_id')) : 0;
+    $limit = $request->get_param('limit') ? intval($request->get_param('limit')) : 5000;
+    $limit = max( 1, min( $limit, 10000 ) );
 
-    $result = $wpdb->replace( 
-        $table, 
-        array( 
-            'url_hash' => $params['url_hash'],
-            'title' => $params['title'],
-            'source' => $params['source'],
-            'region' => $params['region'],
-            'published_at' => $params['published_at'], // Ensure ISO format or mysql format
-            'summary' => $params['summary'],
-            'is_relevant' => isset($params['is_relevant']) ? $params['is_relevant'] : 1,
-            'relevance_reason' => isset($params['relevance_reason']) ? $params['relevance_reason'] : '',
-            'impact_score' => isset($params['impact_score']) ? $params['impact_score'] : (isset($params['sentiment_score']) ? $params['sentiment_score'] : null),
-        ),
-        array( '%s', '%s', '%s', '%s', '%s', '%s', '%d', '%s', '%d' ) 
+    $rows = $wpdb->get_results( $wpdb->prepare(
+        "SELECT id, url_hash FROM $table WHERE id > %d ORDER BY id ASC LIMIT %d",
+        $since_id, $limit
+    ) );
+
+    $last_id = $since_id;
+    if ( ! empty( $rows ) ) {
+        $last_id = intval( end( $rows )->id );
+    }
+
+    return array(
+        'hashes'   => array_column( $rows, 'url_hash' ),
+        'last_id'  => $last_id,
+        'has_more' => count( $rows ) === $limit,
     );
-    
-    if ( $result === false ) return new WP_Error( 'db_error', $wpdb->last_error, array( 'status' => 500 ) );
-    return array( 'success' => true, 'id' => $wpdb->insert_id );
+}
+
+/**
+ * Relevance labels (id > since_id) for training the automation's scoring pre-filter.
+ */
+function techshift_api_get_article_labels( $request ) {
+    global $wpdb;
+    $table = $wpdb->prefix . TECHSHIFT_TBL_ARTICLES;
+
+    $since_id = $request->get_param('since_id') ? intval($request->get_param('since_id')) : 0;
+    $limit = $request->get_param('limit') ? intval($request->get_param('limit')) : 2000;
+    $limit = max( 1, min( $limit, 5000 ) );
+
+    $rows = $wpdb->get_results( $wpdb->prepare(
+        "SELECT id, title, LEFT(summary, 600) AS summary, source, is_relevant, relevance_reason FROM $table WHERE id > %d ORDER BY id ASC LIMIT %d",
+        $since_id, $limit
+    ) );
+
+    $last_id = $since_id;
+    if ( ! empty( $rows ) ) {
+        $last_id = intval( end( $rows )->id );
+    }
+
+    return array(
+        'articles' => $rows,
+        'last_id'  => $last_id,
+        'has_more' => count( $rows ) === $limit,
+    );
+}
+
+/**
+ * Insert or update a ts_articles row by url_hash (INSERT ... ON DUPLICATE KEY UPDATE).
+ * Columns missing (or null) in $params keep their stored value on update; in
+ * particular article_url is only written when given, so re-saving a collected
+ * article keeps the link to the TechShift post written from it.
+ */
+function techshift_upsert_article( $params ) {
+    global $wpdb;
+    $table = $wpdb->prefix . TECHSHIFT_TBL_ARTICLES;
+
+    $columns = array(
+        'url_hash' => array( $params['url_hash'], '%s' ),
+        'title' => array( $params['title'], '%s' ),
+    );
+    // Optional columns: on insert a missing one takes the table default (is_relevant = 1)
+    $optional = array(
+        'source' => '%s',
+        'region' => '%s',
+        'published_at' => '%s', // Ensure ISO format or mysql format
+        'summary' => '%s',
+        'is_relevant' => '%d',
+        'relevance_reason' => '%s',
+    );
+    foreach ( $optional as $name => $format ) {
+        if ( isset( $params[ $name ] ) ) {
+            $columns[ $name ] = array( $params[ $name ], $format );
+        }
+    }
+    $impact = isset($params['impact_score']) ? $params['impact_score'] : (isset($params['sentiment_score']) ? $params['sentiment_score'] : null);
+    if ( $impact !== null ) {
+        $columns['impact_score'] = array( $impact, '%d' );
+    }
+    if ( ! empty( $params['article_url'] ) ) {
+        $columns['article_url'] = array( esc_url_raw( $params['article_url'] ), '%s' );
+    }
+
+    $values = array();
+    $updates = array();
+    foreach ( $columns as $name => $column ) {
+        $values[] = ( $column[0] === null ) ? 'NULL' : $wpdb->prepare( $column[1], $column[0] );
+        if ( $name !== 'url_hash' ) {
+            $updates[] = "$name = VALUES($name)";
+        }
+    }
+    // Keeps insert_id pointing at the row on update as well
+    $updates[] = 'id = LAST_INSERT_ID(id)';
+
+    $sql = "INSERT INTO $table (" . implode( ', ', array_keys( $columns ) ) . ") VALUES (" . implode( ', ', $values ) . ")"
+        . " ON DUPLICATE KEY UPDATE " . implode( ', ', $updates );
+    if ( $wpdb->query( $sql ) === false ) {
+        return false;
+    }
+    return intval( $wpdb->insert_id );
+}
+
+function techshift_api_save_article( $request ) {
+    global $wpdb;
+    $params = $request->get_json_params();
+
+    if ( empty( $params['url_hash'] ) || empty( $params['title'] ) ) {
+        return new WP_Error( 'missing_params', 'url_hash and title are required', array( 'status' => 400 ) );
+    }
+
+    // Deduplication by url_hash: an existing row is updated in place (same id)
+    $id = techshift_upsert_article( $params );
+
+    if ( $id === false ) return new WP_Error( 'db_error', $wpdb->last_error, array( 'status' => 500 ) );
+    return array( 'success' => true, 'id' => $id );
 }
 
 function techshift_api_get_articles( $request ) {
@@ -920,6 +1035,105 @@ function techshift_api_get_articles( $request ) {
     return $articles;
 }
 
+/**
+ * Briefing context for several regions in one request.
+ * Each relevant article is returned once, tagged with the requested regions it
+ * matches ('Global' rows match all of them) and with is_generated = 1 when a
+ * TechShift post has been written from it (article_url is set).
+ */
+function techshift_api_get_articles_context( $request ) {
+    global $wpdb;
+    $table = $wpdb->prefix . TECHSHIFT_TBL_ARTICLES;
+
+    $hours = $request->get_param('hours') ? intval($request->get_param('hours')) : 24;
+    $limit = $request->get_param('limit') ? intval($request->get_param('limit')) : 50;
+    $limit = max( 1, min( $limit, 500 ) );
+    $generated_hours = $request->get_param('generated_hours') ? intval($request->get_param('generated_hours')) : 24;
+
+    $regions = array_filter( array_map( 'trim', explode( ',', (string) $request->get_param('regions') ) ) );
+    $regions = array_values( array_diff( $regions, array( 'Global' ) ) );
+
+    // in_window: inside the news window; rows outside it are only returned as deep dives
+    $query = $wpdb->prepare(
+        "SELECT url_hash, title, summary, source, region, published_at, article_url,
+            (published_at >= DATE_SUB(NOW(), INTERVAL %d HOUR)) AS in_window
+        FROM $table WHERE is_relevant = 1",
+        $hours
+    );
+    $query .= $wpdb->prepare(
+        " AND ( published_at >= DATE_SUB(NOW(), INTERVAL %d HOUR) OR ( article_url IS NOT NULL AND article_url <> '' AND published_at >= DATE_SUB(NOW(), INTERVAL %d HOUR) ) )",
+        $hours, $generated_hours
+    );
+
+    // The limit applies per region, so one busy region cannot crowd out the others
+    $rows = array();
+    if ( empty( $regions ) ) {
+        $rows = $wpdb->get_results( $query . $wpdb->prepare( " ORDER BY published_at DESC LIMIT %d", $limit ) );
+    } else {
+        foreach ( $regions as $region ) {
+            $region_rows = $wpdb->get_results(
+                $query . $wpdb->prepare( " AND (region = %s OR region = 'Global') ORDER BY published_at DESC LIMIT %d", $region, $limit )
+            );
+            foreach ( $region_rows as $row ) {
+                $rows[ $row->url_hash ] = $row; // 'Global' rows come back for every region
+            }
+        }
+        $rows = array_values( $rows );
+        usort( $rows, function ( $a, $b ) {
+            return strcmp( (string) $b->published_at, (string) $a->published_at );
+        } );
+    }
+
+    $articles = array();
+    foreach ( $rows as $row ) {
+        $row->regions = ( $row->region === 'Global' && ! empty( $regions ) ) ? $regions : array( $row->region );
+        $row->in_window = intval( $row->in_window );
+        $row->is_generated = ! empty( $row->article_url ) ? 1 : 0;
+        if ( ! $row->is_generated ) {
+            $row->article_url = null;
+        }
+        $articles[] = $row;
+    }
+    return array( 'articles' => $articles );
+}
+
+/**
+ * Record the TechShift post written from a collected article.
+ */
+function techshift_api_set_article_link( $request ) {
+    global $wpdb;
+    $table = $wpdb->prefix . TECHSHIFT_TBL_ARTICLES;
+    $params = $request->get_json_params();
+
+    if ( empty( $params['url_hash'] ) || empty( $params['article_url'] ) ) {
+        return new WP_Error( 'missing_params', 'url_hash and article_url are required', array( 'status' => 400 ) );
+    }
+
+    $exists = $wpdb->get_var( $wpdb->prepare( "SELECT id FROM $table WHERE url_hash = %s", $params['url_hash'] ) );
+
+    if ( ! $exists ) {
+        // Pipeline sources are often not in ts_articles yet: create the row from the
+        // article fields sent along, so the briefing can find the deep dive
+        if ( empty( $params['title'] ) ) {
+            return new WP_Error( 'not_found', 'No article with this url_hash (send title etc. to create it)', array( 'status' => 404 ) );
+        }
+        $id = techshift_upsert_article( $params );
+        if ( $id === false ) return new WP_Error( 'db_error', $wpdb->last_error, array( 'status' => 500 ) );
+        return array( 'success' => true, 'updated' => 1, 'created' => true );
+    }
+
+    $result = $wpdb->update(
+        $table,
+        array( 'article_url' => esc_url_raw( $params['article_url'] ) ),
+        array( 'url_hash' => $params['url_hash'] ),
+        array( '%s' ),
+        array( '%s' )
+    );
+
+    if ( $result === false ) return new WP_Error( 'db_error', $wpdb->last_error, array( 'status' => 500 ) );
+    return array( 'success' => true, 'updated' => 1, 'created' => false );
+}
+
 
 
 